@@ -0,0 +1,286 @@
+"""
+Persistencia de los tests en curso.
+
+`AlmacenSesiones` es el backend en memoria (no persiste nada) y define la
+interfaz; `AlmacenSQLite` guarda las sesiones en SQLite en modo WAL.
+
+Los handlers solo marcan la sesión como modificada (O(1), sin tocar disco).
+Una tarea en segundo plano vuelca cada poco tiempo todos los cambios
+pendientes en una única transacción desde un hilo aparte. Varias respuestas
+del mismo usuario entre dos volcados se escriben una sola vez.
+
+Al arrancar no se carga nada: cada sesión se restaura la primera vez que su
+usuario vuelve a usar el bot, siempre que el banco de preguntas sea el mismo
+(misma huella) con el que se creó.
+
+Los cursores de preguntas sin repetición (cursores.py) se guardan igual,
+con escritura diferida, en la tabla `cursores`: una fila por usuario y
+bloque/tema con la semilla y el desplazamiento.
+
+La selección de bloque/tema hecha en los menús (antes de que exista un test)
+va a la tabla `selecciones`, para que un botón de cantidad pulsado tras un
+reinicio siga aplicándose al bloque/tema que el usuario eligió.
+
+Si una escritura falla, el lote vuelve a la cola de pendientes (sin pisar
+cambios más recientes) y se reintenta en el siguiente volcado.
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+
+from cursores import Cursor
+from sesiones import TestSession
+
+# Valor pendiente que indica "borrar la sesión"
+_BORRAR = None
+
+
+class AlmacenSesiones:
+    """Backend en memoria: no persiste nada"""
+
+    def guardar(self, user_id, sesion):
+        """Marca la sesión como modificada"""
+
+    def borrar(self, user_id):
+        """Marca la sesión como terminada"""
+
+    async def restaurar(self, user_id, banco):
+        """Devuelve la TestSession guardada del usuario o None"""
+        return None
+
+    def guardar_cursor(self, user_id, clave, cursor):
+        """Marca como modificado el cursor del usuario para `clave` = (bloque, tema)"""
+
+    async def restaurar_cursores(self, user_id):
+        """Devuelve los cursores guardados del usuario: {(bloque, tema): Cursor}"""
+        return {}
+
+    def guardar_seleccion(self, user_id, bloque, tema):
+        """Marca como modificada la selección de bloque/tema del usuario"""
+
+    async def restaurar_seleccion(self, user_id):
+        """Devuelve la selección guardada del usuario, (bloque, tema), o None"""
+        return None
+
+    async def vaciar(self):
+        """Escribe los cambios pendientes"""
+
+    async def vaciar_periodicamente(self):
+        """Tarea en segundo plano que vuelca cambios cada cierto intervalo"""
+
+    async def cerrar(self):
+        await self.vaciar()
+
+
+class AlmacenSQLite(AlmacenSesiones):
+    """Sesiones en SQLite (WAL) con escritura diferida por lotes"""
+
+    def __init__(self, ruta, intervalo=1.0):
+        self.ruta = ruta
+        self.intervalo = intervalo
+        self._pendientes = {}      # user_id -> TestSession o _BORRAR
+        self._cursores = {}        # (user_id, bloque, tema) -> Cursor
+        self._selecciones = {}     # user_id -> (bloque, tema)
+        self._consultados = set()  # usuarios ya buscados en disco
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        self._conexion.execute(
+            """CREATE TABLE IF NOT EXISTS sesiones (
+                user_id INTEGER PRIMARY KEY,
+                huella TEXT,
+                bloque TEXT,
+                tema TEXT,
+                cantidad INTEGER,
+                indices BLOB,
+                respuestas BLOB,
+                aciertos BLOB,
+                pregunta_actual INTEGER,
+                puntuacion INTEGER,
+                actualizado REAL
+            )"""
+        )
+        self._conexion.execute(
+            """CREATE TABLE IF NOT EXISTS cursores (
+                user_id INTEGER,
+                bloque TEXT,
+                tema TEXT,
+                huella TEXT,
+                semilla INTEGER,
+                desplazamiento INTEGER,
+                tamaño INTEGER,
+                excluidos BLOB,
+                PRIMARY KEY (user_id, bloque, tema)
+            )"""
+        )
+        self._conexion.execute(
+            """CREATE TABLE IF NOT EXISTS selecciones (
+                user_id INTEGER PRIMARY KEY,
+                bloque TEXT,
+                tema TEXT
+            )"""
+        )
+        self._conexion.commit()
+
+    def guardar(self, user_id, sesion):
+        self._pendientes[user_id] = sesion
+        self._consultados.add(user_id)
+
+    def borrar(self, user_id):
+        self._pendientes[user_id] = _BORRAR
+        self._consultados.add(user_id)
+
+    async def restaurar(self, user_id, banco):
+        if user_id in self._consultados:
+            return None
+        self._consultados.add(user_id)
+        fila = await asyncio.to_thread(self._leer, user_id)
+        if fila is None:
+            return None
+
+        huella, bloque, tema, cantidad, indices, respuestas, aciertos, actual, puntuacion = fila
+        if huella != banco.huella:
+            logging.info(f"Sesión de {user_id} descartada: el banco de preguntas ha cambiado")
+            self.borrar(user_id)
+            return None
+
+        seleccion = array("I")
+        seleccion.frombytes(indices)
+        sesion = TestSession(banco, seleccion, bloque, tema, cantidad)
+        sesion.respuestas[:] = respuestas
+        sesion.aciertos[:] = aciertos
+        sesion.pregunta_actual = actual
+        sesion.puntuacion = puntuacion
+        return sesion
+
+    def guardar_cursor(self, user_id, clave, cursor):
+        self._cursores[(user_id, *clave)] = cursor
+
+    async def restaurar_cursores(self, user_id):
+        filas = await asyncio.to_thread(self._leer_cursores, user_id)
+        cursores = {}
+        for bloque, tema, huella, semilla, desplazamiento, tamaño, excluidos in filas:
+            ids = array("q")
+            ids.frombytes(excluidos)
+            cursores[(bloque, tema or None)] = Cursor(semilla, tamaño, huella, desplazamiento, ids)
+        return cursores
+
+    def guardar_seleccion(self, user_id, bloque, tema):
+        self._selecciones[user_id] = (bloque, tema)
+
+    async def restaurar_seleccion(self, user_id):
+        if user_id in self._selecciones:
+            return self._selecciones[user_id]
+        fila = await asyncio.to_thread(self._leer_seleccion, user_id)
+        if fila is None:
+            return None
+        bloque, tema = fila
+        return bloque, tema or None
+
+    def _leer_seleccion(self, user_id):
+        with self._lock:
+            return self._conexion.execute(
+                "SELECT bloque, tema FROM selecciones WHERE user_id = ?", (user_id,)
+            ).fetchone()
+
+    def _leer_cursores(self, user_id):
+        with self._lock:
+            return self._conexion.execute(
+                "SELECT bloque, tema, huella, semilla, desplazamiento, tamaño, excluidos "
+                "FROM cursores WHERE user_id = ?",
+                (user_id,)
+            ).fetchall()
+
+    def _leer(self, user_id):
+        with self._lock:
+            return self._conexion.execute(
+                "SELECT huella, bloque, tema, cantidad, indices, respuestas, aciertos, "
+                "pregunta_actual, puntuacion FROM sesiones WHERE user_id = ?",
+                (user_id,)
+            ).fetchone()
+
+    async def vaciar(self):
+        if not self._pendientes and not self._cursores and not self._selecciones:
+            return
+        pendientes, self._pendientes = self._pendientes, {}
+        cursores, self._cursores = self._cursores, {}
+        selecciones, self._selecciones = self._selecciones, {}
+
+        # La instantánea se toma en el event loop (bytes pequeños); el disco, en otro hilo
+        ahora = time.time()
+        filas, borrados = [], []
+        for user_id, sesion in pendientes.items():
+            if sesion is _BORRAR:
+                borrados.append((user_id,))
+                continue
+            filas.append((
+                user_id, sesion.banco.huella, sesion.bloque, sesion.tema, sesion.cantidad,
+                sesion.indices.tobytes(), bytes(sesion.respuestas), bytes(sesion.aciertos),
+                sesion.pregunta_actual, sesion.puntuacion, ahora
+            ))
+        filas_cursores = [
+            (user_id, bloque, tema or "", c.huella, c.semilla, c.desplazamiento, c.tamaño,
+             array("q", sorted(c.excluidos)).tobytes())
+            for (user_id, bloque, tema), c in cursores.items()
+        ]
+        filas_selecciones = [
+            (user_id, bloque, tema or "") for user_id, (bloque, tema) in selecciones.items()
+        ]
+        try:
+            await asyncio.to_thread(self._escribir, filas, borrados, filas_cursores, filas_selecciones)
+        except Exception:
+            # El lote vuelve a la cola; lo que haya cambiado mientras tanto es más reciente
+            for pendientes_actuales, lote in ((self._pendientes, pendientes),
+                                              (self._cursores, cursores),
+                                              (self._selecciones, selecciones)):
+                for clave, valor in lote.items():
+                    pendientes_actuales.setdefault(clave, valor)
+            raise
+
+    def _escribir(self, filas, borrados, filas_cursores=(), filas_selecciones=()):
+        with self._lock, self._conexion:
+            if borrados:
+                self._conexion.executemany("DELETE FROM sesiones WHERE user_id = ?", borrados)
+            if filas:
+                self._conexion.executemany(
+                    "INSERT OR REPLACE INTO sesiones VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    filas
+                )
+            if filas_cursores:
+                self._conexion.executemany(
+                    "INSERT OR REPLACE INTO cursores VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    filas_cursores
+                )
+            if filas_selecciones:
+                self._conexion.executemany(
+                    "INSERT OR REPLACE INTO selecciones VALUES (?, ?, ?)",
+                    filas_selecciones
+                )
+
+    async def vaciar_periodicamente(self):
+        while True:
+            await asyncio.sleep(self.intervalo)
+            try:
+                await self.vaciar()
+            except Exception as e:
+                logging.error(f"Error al guardar sesiones en {self.ruta}: {e}")
+
+    async def cerrar(self):
+        await self.vaciar()
+        with self._lock:
+            self._conexion.close()
+
+
+def crear_almacen():
+    """Crea el backend indicado en ALMACEN_SESIONES ("sqlite" por defecto o "memoria")"""
+    tipo = os.getenv("ALMACEN_SESIONES", "sqlite").strip().lower()
+    if tipo == "memoria":
+        return AlmacenSesiones()
+    ruta = os.getenv("RUTA_SESIONES", os.path.join(os.path.dirname(__file__), "sesiones.db"))
+    return AlmacenSQLite(ruta, intervalo=float(os.getenv("INTERVALO_GUARDADO", "1")))
@@ -0,0 +1,239 @@
+"""
+Lista de usuarios autorizados, consultada en cada update.
+
+`ListaAutorizados` guarda en memoria las entradas (ID numérico o @username)
+y responde `permitido(user_id, username)` con una búsqueda O(1) por ID:
+  - los usernames se resuelven a su ID la primera vez que se ven y desde
+    entonces se comprueba solo el ID (un cambio de username no afecta),
+  - los IDs rechazados van a una caché negativa acotada (LRU), que se
+    invalida cuando se añade alguien.
+
+`ListaFichero` la respalda en un fichero de texto (una entrada por línea,
+"@username 12345" cuando ya está resuelto). Se vigila por mtime y tamaño
+como preguntas.json: al cambiar se aplican solo las altas y bajas respecto
+a la última lectura, y los cambios hechos desde el bot (comandos de
+administración, resoluciones de usernames) se escriben desde un hilo.
+"""
+
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+
+_SIN_ENTRADA = object()
+
+
+def clave_entrada(texto):
+    """"12345" -> 12345; "@Usuario" / "usuario" -> "usuario"; vacío -> None"""
+    texto = str(texto).strip().strip('"').strip("'")
+    try:
+        return int(texto)
+    except ValueError:
+        pass
+    nombre = texto.lstrip("@").lower()
+    return nombre or None
+
+
+def crear_lista_autorizados(iniciales=()):
+    """Lista respaldada por RUTA_AUTORIZADOS; si el fichero no existe se crea con `iniciales`
+    (p. ej. lo que hubiera en USUARIOS_AUTORIZADOS)"""
+    ruta = os.getenv("RUTA_AUTORIZADOS", os.path.join(os.path.dirname(__file__), "usuarios_autorizados.txt"))
+    return ListaFichero(ruta, iniciales, intervalo=float(os.getenv("INTERVALO_RECARGA", "5")))
+
+
+class ListaAutorizados:
+    """Lista en memoria (sin persistencia); también sirve para ADMINISTRADORES"""
+
+    def __init__(self, entradas=(), max_rechazados=4096):
+        self._entradas = {}  # clave -> ID permitido (None: username aún sin resolver)
+        self._ids = {}       # ID permitido -> nº de entradas que lo permiten
+        self._rechazados = OrderedDict()
+        self.max_rechazados = max_rechazados
+        self.sucio = False   # hay cambios en memoria sin guardar
+        for entrada in entradas:
+            clave = clave_entrada(entrada)
+            if clave is not None:
+                self._poner(clave, clave if isinstance(clave, int) else None)
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def _contar(self, user_id, delta):
+        n = self._ids.get(user_id, 0) + delta
+        if n > 0:
+            self._ids[user_id] = n
+        else:
+            self._ids.pop(user_id, None)
+
+    def _poner(self, clave, user_id):
+        self._quitar(clave)
+        self._entradas[clave] = user_id
+        if user_id is not None:
+            self._contar(user_id, 1)
+            self._rechazados.pop(user_id, None)
+        else:
+            # Un username sin resolver puede ser cualquiera de los rechazados
+            self._rechazados.clear()
+
+    def _quitar(self, clave):
+        user_id = self._entradas.pop(clave, _SIN_ENTRADA)
+        if user_id is _SIN_ENTRADA:
+            return False
+        if user_id is not None:
+            self._contar(user_id, -1)
+        return True
+
+    def permitido(self, user_id, username=None):
+        if user_id in self._ids:
+            return True
+        if user_id in self._rechazados:
+            self._rechazados.move_to_end(user_id)
+            return False
+        if username:
+            clave = username.lower()
+            if clave in self._entradas and self._entradas[clave] is None:
+                self._poner(clave, user_id)
+                self.sucio = True
+                logging.info(f"Usuario @{username} resuelto a ID {user_id}")
+                return True
+        self._rechazados[user_id] = None
+        if len(self._rechazados) > self.max_rechazados:
+            self._rechazados.popitem(last=False)
+        return False
+
+    def añadir(self, entrada):
+        """Alta de un ID o @username. Devuelve False si no es válida o ya estaba"""
+        clave = clave_entrada(entrada)
+        if clave is None or clave in self._entradas:
+            return False
+        self._poner(clave, clave if isinstance(clave, int) else None)
+        self.sucio = True
+        return True
+
+    def quitar(self, entrada):
+        """Baja de un ID (también de los usernames resueltos a él) o de un @username"""
+        clave = clave_entrada(entrada)
+        if clave is None:
+            return False
+        claves = [clave] if clave in self._entradas else []
+        if isinstance(clave, int):
+            claves += [c for c, uid in self._entradas.items() if uid == clave and c != clave]
+        for c in claves:
+            self._quitar(c)
+        if claves:
+            self.sucio = True
+        return bool(claves)
+
+    def describir(self):
+        """Entradas legibles para /autorizados"""
+        lineas = []
+        for clave, user_id in self._entradas.items():
+            if isinstance(clave, int):
+                lineas.append(str(clave))
+            elif user_id is None:
+                lineas.append(f"@{clave} (sin resolver)")
+            else:
+                lineas.append(f"@{clave} ({user_id})")
+        return lineas
+
+
+class ListaFichero(ListaAutorizados):
+    """Lista respaldada por un fichero de texto que se recarga al cambiar"""
+
+    def __init__(self, ruta, iniciales=(), intervalo=5.0, max_rechazados=4096):
+        super().__init__((), max_rechazados)
+        self.ruta = ruta
+        self.intervalo = intervalo
+        self._firma = None
+        self._leido = {}  # contenido del fichero en la última lectura/escritura
+        if os.path.exists(ruta):
+            self._aplicar(self._leer())
+        else:
+            for entrada in iniciales:
+                self.añadir(entrada)
+            self._guardar()
+        self.sucio = False
+
+    def _firma_fichero(self):
+        st = os.stat(self.ruta)
+        return (st.st_mtime_ns, st.st_size)
+
+    def _leer(self):
+        """Fichero -> {clave: ID o None}. Formato: "12345", "@usuario" o "@usuario 12345"; # comenta"""
+        contenido = {}
+        firma = self._firma_fichero()
+        with open(self.ruta, encoding="utf-8") as fichero:
+            for linea in fichero:
+                partes = linea.split("#", 1)[0].split()
+                if not partes:
+                    continue
+                clave = clave_entrada(partes[0])
+                if clave is None:
+                    continue
+                if isinstance(clave, int):
+                    contenido[clave] = clave
+                else:
+                    resuelto = partes[1] if len(partes) > 1 else ""
+                    contenido[clave] = int(resuelto) if resuelto.isdigit() else None
+        self._firma = firma
+        return contenido
+
+    def _aplicar(self, contenido):
+        """Aplica solo las diferencias con la última lectura (los cambios hechos
+        desde el bot y aún no guardados se conservan)"""
+        altas = bajas = 0
+        for clave in self._leido.keys() - contenido.keys():
+            bajas += self._quitar(clave)
+        for clave, user_id in contenido.items():
+            if self._leido.get(clave, _SIN_ENTRADA) != user_id:
+                if user_id is None and self._entradas.get(clave) is not None:
+                    continue  # ya resuelto en memoria, pendiente de guardar
+                self._poner(clave, user_id)
+                altas += 1
+        self._leido = contenido
+        return altas, bajas
+
+    def _guardar(self, contenido=None):
+        if contenido is None:
+            contenido = dict(self._entradas)
+        temporal = self.ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as fichero:
+            fichero.write("# Usuarios autorizados: ID numérico o @username (uno por línea)\n")
+            for clave, user_id in contenido.items():
+                if isinstance(clave, int):
+                    fichero.write(f"{clave}\n")
+                else:
+                    fichero.write(f"@{clave} {user_id}\n" if user_id is not None else f"@{clave}\n")
+        os.replace(temporal, self.ruta)
+        self._firma = self._firma_fichero()
+        self._leido = contenido
+
+    async def guardar(self):
+        self.sucio = False
+        try:
+            # La copia se hace aquí, en el loop: el hilo no debe recorrer un dict que cambia
+            await asyncio.to_thread(self._guardar, dict(self._entradas))
+        except OSError as e:
+            self.sucio = True
+            logging.error(f"No se pudo guardar {self.ruta}: {e}")
+
+    def ha_cambiado(self):
+        try:
+            return self._firma_fichero() != self._firma
+        except FileNotFoundError:
+            return False
+
+    async def vigilar(self):
+        """Bucle en segundo plano: aplica cambios externos y guarda los propios"""
+        while True:
+            await asyncio.sleep(self.intervalo)
+            if self.ha_cambiado():
+                try:
+                    contenido = await asyncio.to_thread(self._leer)
+                except (OSError, ValueError) as e:
+                    logging.error(f"No se pudo recargar {self.ruta}: {e}")
+                else:
+                    altas, bajas = self._aplicar(contenido)
+                    logging.info(f"Autorizados recargados: {altas} altas, {bajas} bajas ({len(self)} en total)")
+            if self.sucio:
+                await self.guardar()
@@ -0,0 +1,189 @@
+"""
+Banco de preguntas compilado a un fichero binario que se abre con mmap.
+
+procesar_preguntas escribe preguntas.bin junto a preguntas.json. Al
+arrancar, el bot solo mapea el fichero y lee la cabecera: las columnas
+(id, bloque, tema, respuesta) y los índices por bloque/tema son vistas
+`memoryview` sobre el mapa, y el texto de una pregunta se decodifica solo
+cuando se muestra. El arranque no depende del tamaño del banco y varios
+procesos del bot en la misma máquina comparten las páginas del fichero.
+
+Formato (orden de bytes nativo, indicado en la cabecera; secciones alineadas a 8):
+  cabecera      CABECERA: magia, versión, orden, nº de preguntas / opciones /
+                cadenas / grupos, huella (sha256 del preguntas.json de origen)
+                y el desplazamiento de cada sección
+  heap          textos UTF-8 (enunciados y cadenas de opciones)
+  ids           q × n
+  bloques       B × n     (0 = sin asignar)
+  temas         B × n
+  respuestas    B × n
+  inicio_texto  Q × (n+1) desplazamientos de cada enunciado en el heap
+  inicio_opc    I × (n+1) primera opción de cada pregunta en `opciones`
+  opciones      I × m     nº de cadena de cada opción (las opciones repetidas se guardan una vez)
+  inicio_cadena Q × (s+1) desplazamientos de cada cadena de opción en el heap
+  grupos        GRUPO × g (bloque, tema, inicio, cuenta) en `agrupados`; tema 0 es
+                el bloque entero y tema > 0 un tema del bloque
+  agrupados     I × k     índices de pregunta de cada grupo, en orden creciente
+                (seleccion_adaptativa busca en ellos con bisect)
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from banco_preguntas import QuestionBank, siguiente_generacion
+
+MAGIA = b"BNCP"
+VERSION = 2
+_ORDEN = {"little": 1, "big": 2}[sys.byteorder]
+_SECCIONES = ("heap", "ids", "bloques", "temas", "respuestas", "inicio_texto", "inicio_opc",
+              "opciones", "inicio_cadena", "grupos", "agrupados")
+CABECERA = struct.Struct("<4sHH4I32s%dQ" % len(_SECCIONES))
+GRUPO = struct.Struct("=BBxxII")
+
+
+def es_banco_binario(ruta):
+    """True si el fichero empieza por la marca del formato binario"""
+    with open(ruta, "rb") as f:
+        return f.read(len(MAGIA)) == MAGIA
+
+
+def escribir_banco_binario(banco, ruta, huella):
+    """Compila un QuestionBank (en columnas) a `ruta`. `huella` es el sha256
+    (hex) del preguntas.json de origen: es lo que identifica el banco al
+    restaurar sesiones, igual que cuando se carga el JSON. Escritura atómica."""
+    n = len(banco)
+    inicio_texto = array("Q", [0])
+    numeros = {}
+    opciones = array("I")
+    temporal = ruta + ".tmp"
+    with open(temporal, "wb") as f:
+        f.write(bytes(CABECERA.size))
+        # Heap primero: así los desplazamientos se conocen según se escribe
+        inicio_heap = f.tell()
+        posicion = 0
+        for idx in range(n):
+            texto = banco.enunciado(idx).encode("utf-8")
+            f.write(texto)
+            posicion += len(texto)
+            inicio_texto.append(posicion)
+        inicio_cadena = array("Q", [posicion])
+        for opcion in banco._opciones:
+            numero = numeros.get(opcion)
+            if numero is None:
+                numero = numeros[opcion] = len(numeros)
+                texto = opcion.encode("utf-8")
+                f.write(texto)
+                posicion += len(texto)
+                inicio_cadena.append(posicion)
+            opciones.append(numero)
+
+        grupos = {}
+        for idx, (bloque, tema) in enumerate(zip(banco._bloques, banco._temas)):
+            if bloque:
+                grupos.setdefault((bloque, 0), array("I")).append(idx)
+                if tema:
+                    grupos.setdefault((bloque, tema), array("I")).append(idx)
+        agrupados = array("I")
+        tabla_grupos = bytearray()
+        for (bloque, tema), indices in sorted(grupos.items()):
+            tabla_grupos += GRUPO.pack(bloque, tema, len(agrupados), len(indices))
+            agrupados.extend(indices)
+
+        columnas = {
+            "ids": array("q", banco._ids), "bloques": banco._bloques, "temas": banco._temas,
+            "respuestas": banco._respuestas, "inicio_texto": inicio_texto,
+            "inicio_opc": array("I", banco._inicio_opciones), "opciones": opciones,
+            "inicio_cadena": inicio_cadena, "grupos": tabla_grupos, "agrupados": agrupados,
+        }
+        desplazamientos = [inicio_heap]
+        for nombre in _SECCIONES[1:]:
+            f.write(bytes(-f.tell() % 8))
+            desplazamientos.append(f.tell())
+            columna = columnas[nombre]
+            f.write(columna.tobytes() if isinstance(columna, array) else columna)
+
+        f.seek(0)
+        f.write(CABECERA.pack(MAGIA, VERSION, _ORDEN, n, len(opciones), len(numeros), len(grupos),
+                              bytes.fromhex(huella), *desplazamientos))
+    os.replace(temporal, ruta)
+
+
+def leer_huella_binaria(ruta):
+    """Huella del preguntas.json con el que se compiló, o None si no es un banco válido"""
+    try:
+        with open(ruta, "rb") as f:
+            cabecera = f.read(CABECERA.size)
+        magia, version, orden, *_, huella = CABECERA.unpack(cabecera)[:8]
+    except (OSError, struct.error):
+        return None
+    if magia != MAGIA or version != VERSION or orden != _ORDEN:
+        return None
+    return huella.hex()
+
+
+class BancoBinario(QuestionBank):
+    """QuestionBank sobre un preguntas.bin mapeado en memoria (no copia datos)"""
+
+    perezoso = True
+
+    def __init__(self, mapa):
+        magia, version, orden, n, m, s, g, huella, *inicios = CABECERA.unpack_from(mapa)
+        if magia != MAGIA or version != VERSION:
+            raise ValueError("no es un banco binario compatible")
+        if orden != _ORDEN:
+            raise ValueError("banco binario compilado en una máquina con otro orden de bytes")
+        self.huella = huella.hex()
+        self.generacion = siguiente_generacion()
+        self.render = None
+        # El mmap sigue vivo mientras haya vistas sobre él (sesiones con este banco)
+        self._mapa = mapa
+        vista = memoryview(mapa)
+        secciones = dict(zip(_SECCIONES, inicios))
+
+        def columna(nombre, formato, cuenta):
+            inicio = secciones[nombre]
+            return vista[inicio:inicio + cuenta * struct.calcsize(formato)].cast(formato)
+
+        self._ids = columna("ids", "q", n)
+        self._bloques = columna("bloques", "B", n)
+        self._temas = columna("temas", "B", n)
+        self._respuestas = columna("respuestas", "B", n)
+        self._inicio_texto = columna("inicio_texto", "Q", n + 1)
+        self._inicio_opciones = columna("inicio_opc", "I", n + 1)
+        self._opciones = columna("opciones", "I", m)
+        self._inicio_cadena = columna("inicio_cadena", "Q", s + 1)
+        self._heap = vista[secciones["heap"]:secciones["ids"]]
+
+        # Índices por bloque / (bloque, tema): tramos de `agrupados`, sin copiar
+        grupos = [GRUPO.unpack_from(mapa, secciones["grupos"] + i * GRUPO.size) for i in range(g)]
+        agrupados = columna("agrupados", "I", sum(cuenta for *_, cuenta in grupos))
+        self._por_bloque = {}
+        self._por_bloque_tema = {}
+        self._todas = range(n)
+        for bloque, tema, inicio, cuenta in grupos:
+            if tema:
+                self._por_bloque_tema[(bloque, tema)] = agrupados[inicio:inicio + cuenta]
+            else:
+                self._por_bloque[bloque] = agrupados[inicio:inicio + cuenta]
+
+    def enunciado(self, idx):
+        return str(self._heap[self._inicio_texto[idx]:self._inicio_texto[idx + 1]], "utf-8")
+
+    def _cadena(self, numero):
+        return str(self._heap[self._inicio_cadena[numero]:self._inicio_cadena[numero + 1]], "utf-8")
+
+    def opciones(self, idx):
+        return [self._cadena(n) for n in self._opciones[self._inicio_opciones[idx]:self._inicio_opciones[idx + 1]]]
+
+
+def abrir_banco_binario(ruta):
+    """Mapea `ruta` (solo lectura, compartido entre procesos) y devuelve el banco"""
+    with open(ruta, "rb") as f:
+        mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # Acceso aleatorio: sin lectura anticipada, solo se cargan las páginas que se tocan
+    if hasattr(mmap, "MADV_RANDOM"):
+        mapa.madvise(mmap.MADV_RANDOM)
+    return BancoBinario(mapa)
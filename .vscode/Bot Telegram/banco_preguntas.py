@@ -0,0 +1,282 @@
+"""
+Banco de preguntas indexado en memoria.
+
+Se construye una sola vez al cargar `preguntas.json` y mantiene arrays de
+índices precalculados:
+  - (bloque, tema) -> índices
+  - bloque          -> índices
+  - global          -> range(len(preguntas))
+
+Así filtrar es una simple búsqueda en un dict y el muestreo aleatorio es O(k)
+sin copiar nada proporcional al tamaño del banco.
+
+Las preguntas se guardan en columnas paralelas (arrays de enteros pequeños
+para id/bloque/tema/respuesta, textos de opciones internados) en lugar de un
+dict por pregunta; `Pregunta` es un acceso ligero a una fila.
+
+`RecargadorBanco` vigila el fichero (mtime + hash del contenido) y vuelve a
+parsearlo en un hilo aparte para poder sustituir el banco en caliente.
+El fichero puede ser preguntas.json o el banco compilado preguntas.bin
+(banco_binario.py), que se mapea en memoria sin parsear nada.
+"""
+
+import asyncio
+import hashlib
+import itertools
+import json
+import logging
+import os
+import random
+import sys
+import time
+from array import array
+
+
+# Número distinto para cada banco construido (a diferencia de id(), no se reutiliza
+# cuando el banco anterior se libera): permite comparar bancos sin retenerlos
+_generaciones = itertools.count(1)
+
+
+def siguiente_generacion():
+    return next(_generaciones)
+
+
+def _entero(valor, campo, nombre, minimo, maximo):
+    """Convierte un campo numérico (admite "3") comprobando su rango"""
+    if isinstance(valor, bool) or (isinstance(valor, float) and not valor.is_integer()):
+        raise ValueError(f"{nombre}: '{campo}' no es un número")
+    if isinstance(valor, str):
+        valor = valor.strip()
+    try:
+        valor = int(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"{nombre}: '{campo}' no es un número entero") from None
+    if not minimo <= valor <= maximo:
+        raise ValueError(f"{nombre}: '{campo}' fuera de rango ({minimo}..{maximo})")
+    return valor
+
+
+class Pregunta:
+    """Vista de solo lectura sobre una fila del banco (no copia datos)"""
+
+    __slots__ = ("_banco", "indice")
+
+    def __init__(self, banco, indice):
+        self._banco = banco
+        self.indice = indice
+
+    @property
+    def id(self):
+        return self._banco._ids[self.indice]
+
+    @property
+    def bloque(self):
+        return self._banco._bloques[self.indice] or None
+
+    @property
+    def tema(self):
+        return self._banco._temas[self.indice] or None
+
+    @property
+    def pregunta(self):
+        return self._banco.enunciado(self.indice)
+
+    @property
+    def opciones(self):
+        return self._banco.opciones(self.indice)
+
+    @property
+    def respuesta_correcta(self):
+        return self._banco._respuestas[self.indice]
+
+
+class QuestionBank:
+    """Preguntas cargadas (en columnas) más sus índices por bloque y por (bloque, tema)"""
+
+    # Los textos se leen al pedirlos (banco binario): no convertirlos todos al cargar
+    perezoso = False
+
+    def __init__(self, preguntas=()):
+        # sha256 del fichero de origen (identifica el banco al restaurar sesiones)
+        self.huella = None
+        self.generacion = siguiente_generacion()
+        # Caché de presentación (textos y teclados); la rellena quien carga el banco
+        self.render = None
+        # Columnas paralelas; 0 en bloque/tema significa "sin asignar"
+        self._ids = array("q")
+        self._bloques = array("B")
+        self._temas = array("B")
+        self._respuestas = array("B")
+        self._enunciados = []
+        self._opciones = []
+        self._inicio_opciones = array("I", [0])
+
+        for pregunta in preguntas:
+            self._añadir(pregunta)
+
+        self._construir_indices()
+
+    @classmethod
+    def desde_json(cls, datos):
+        """Construye el banco desde el texto JSON: una lista de preguntas o
+        {"preguntas": [...]}. Lanza ValueError si el contenido no es válido."""
+        preguntas = json.loads(datos)
+        if isinstance(preguntas, dict) and isinstance(preguntas.get("preguntas"), list):
+            preguntas = preguntas["preguntas"]
+        if not isinstance(preguntas, list):
+            raise ValueError("se esperaba una lista de preguntas")
+        return cls(preguntas)
+
+    def _añadir(self, pregunta):
+        """Valida una pregunta y la vuelca a las columnas (todo o nada)"""
+        numero = len(self._ids) + 1
+        if not isinstance(pregunta, dict):
+            raise ValueError(f"pregunta {numero}: no es un objeto JSON")
+        nombre = f"pregunta {numero} (id {pregunta.get('id')!r})" if "id" in pregunta else f"pregunta {numero}"
+        id_pregunta = _entero(pregunta.get("id", numero), "id", nombre, -2**63, 2**63 - 1)
+        bloque = _entero(pregunta.get("bloque") or 0, "bloque", nombre, 0, 255)
+        tema = _entero(pregunta.get("tema") or 0, "tema", nombre, 0, 255)
+        respuesta = _entero(pregunta.get("respuesta_correcta", 0), "respuesta_correcta", nombre, 0, 255)
+        enunciado = pregunta.get("pregunta", "")
+        if not isinstance(enunciado, str):
+            raise ValueError(f"{nombre}: 'pregunta' no es un texto")
+        opciones = pregunta.get("opciones", ())
+        if not isinstance(opciones, (list, tuple)):
+            raise ValueError(f"{nombre}: 'opciones' no es una lista")
+
+        self._ids.append(id_pregunta)
+        self._bloques.append(bloque)
+        self._temas.append(tema)
+        self._respuestas.append(respuesta)
+        self._enunciados.append(enunciado)
+        # Las opciones se repiten mucho ("Todas las anteriores"...): internarlas
+        self._opciones.extend(sys.intern(str(o)) for o in opciones)
+        self._inicio_opciones.append(len(self._opciones))
+
+    def _construir_indices(self):
+        self._por_bloque = {}
+        self._por_bloque_tema = {}
+        self._todas = range(len(self._ids))
+
+        for idx, (bloque, tema) in enumerate(zip(self._bloques, self._temas)):
+            if not bloque:
+                continue
+            self._por_bloque.setdefault(bloque, array("I")).append(idx)
+            if tema:
+                self._por_bloque_tema.setdefault((bloque, tema), array("I")).append(idx)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __getitem__(self, idx):
+        return Pregunta(self, idx)
+
+    def enunciado(self, idx):
+        return self._enunciados[idx]
+
+    def opciones(self, idx):
+        return self._opciones[self._inicio_opciones[idx]:self._inicio_opciones[idx + 1]]
+
+    def num_opciones(self, idx):
+        """Número de opciones de la pregunta `idx` (sin decodificarlas)"""
+        return self._inicio_opciones[idx + 1] - self._inicio_opciones[idx]
+
+    def indices(self, bloque, tema=None):
+        """Devuelve (sin copiar) los índices de las preguntas del bloque/tema.
+        `bloque` puede ser "aleatorio" para todo el banco."""
+        if bloque == "aleatorio":
+            return self._todas
+        bloque_int = int(bloque)
+        if tema is None:
+            return self._por_bloque.get(bloque_int, ())
+        return self._por_bloque_tema.get((bloque_int, int(tema)), ())
+
+    def muestrear(self, indices, cantidad):
+        """Elige `cantidad` índices al azar sin reemplazo (O(k))"""
+        if len(indices) <= cantidad:
+            return list(indices)
+        return random.sample(indices, cantidad)
+
+    def temas_por_bloque(self):
+        """Devuelve {bloque: [(tema, num_preguntas), ...]} solo con temas no vacíos"""
+        resultado = {}
+        for (bloque, tema), indices in sorted(self._por_bloque_tema.items()):
+            resultado.setdefault(str(bloque), []).append((tema, len(indices)))
+        return resultado
+
+
+def leer_banco(ruta, preparar=None):
+    """Lee y parsea el fichero de preguntas (JSON o banco binario compilado).
+    Devuelve (QuestionBank, huella sha256 del JSON de origen).
+    `preparar(banco)`, si se indica, se ejecuta también aquí (fuera del event loop)."""
+    # Import diferido: banco_binario importa este módulo
+    from banco_binario import abrir_banco_binario, es_banco_binario
+    if es_banco_binario(ruta):
+        banco = abrir_banco_binario(ruta)
+        huella = banco.huella
+    else:
+        with open(ruta, 'rb') as f:
+            datos = f.read()
+        huella = hashlib.sha256(datos).hexdigest()
+        banco = QuestionBank.desde_json(datos)
+        banco.huella = huella
+    if preparar is not None:
+        preparar(banco)
+    return banco, huella
+
+
+class RecargadorBanco:
+    """Detecta cambios en el fichero de preguntas y lo recarga fuera del event loop"""
+
+    def __init__(self, ruta, intervalo=5.0, preparar=None):
+        self.ruta = ruta
+        self.intervalo = intervalo
+        self.preparar = preparar
+        self.huella = None
+        self._firma = None
+
+    def _firma_fichero(self):
+        st = os.stat(self.ruta)
+        return (st.st_mtime_ns, st.st_size)
+
+    def cargar(self):
+        """Carga síncrona para el arranque del bot"""
+        firma = self._firma_fichero()
+        banco, huella = leer_banco(self.ruta, self.preparar)
+        self._firma, self.huella = firma, huella
+        return banco
+
+    def ha_cambiado(self):
+        """Comprobación barata: solo mira mtime y tamaño"""
+        try:
+            return self._firma_fichero() != self._firma
+        except FileNotFoundError:
+            return False
+
+    async def recargar(self, forzar=False):
+        """Parsea el fichero en un hilo. Devuelve (banco nuevo o None si el
+        contenido no ha cambiado, segundos de parseo)"""
+        firma = self._firma_fichero()
+        inicio = time.perf_counter()
+        banco, huella = await asyncio.to_thread(leer_banco, self.ruta, self.preparar)
+        segundos = time.perf_counter() - inicio
+        self._firma = firma
+        if huella == self.huella and not forzar:
+            return None, segundos
+        self.huella = huella
+        return banco, segundos
+
+    async def vigilar(self, al_recargar):
+        """Bucle en segundo plano: llama a `al_recargar(banco, segundos)` con cada banco nuevo"""
+        while True:
+            await asyncio.sleep(self.intervalo)
+            if not self.ha_cambiado():
+                continue
+            try:
+                banco, segundos = await self.recargar()
+            except Exception as e:
+                # Un fichero a medio escribir o inválido no debe tumbar el bot
+                logging.error(f"No se pudo recargar {self.ruta}: {e}")
+                continue
+            if banco is not None:
+                al_recargar(banco, segundos)
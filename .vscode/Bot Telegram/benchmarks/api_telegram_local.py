@@ -0,0 +1,433 @@
+"""
+Sustituto local de api.telegram.org para pruebas de rendimiento de extremo a extremo.
+
+Implementa sobre servidor_http.ServidorHTTP los métodos de la Bot API que
+usa el bot (getMe, getUpdates, setWebhook, deleteWebhook, getWebhookInfo,
+sendMessage, editMessageText, answerCallbackQuery) con:
+  - latencia configurable con variación aleatoria en cada llamada,
+  - límites de envío como los de Telegram (global por segundo y por chat
+    con ráfagas cortas) que devuelven 429 con `retry_after`, igual que el
+    RetryAfter real,
+  - entrega de updates por long polling (getUpdates) o, tras setWebhook,
+    por POST al webhook del bot con el secret token,
+  - tráfico guionizado: AlumnoGuion hace tests completos reaccionando a
+    los mensajes y teclados que el bot envía o edita.
+
+El bot se apunta aquí con API_TELEGRAM_URL=http://127.0.0.1:<puerto>
+(ver bench_extremo_a_extremo.py). Los parámetros se aceptan como JSON,
+formulario o query string (python-telegram-bot envía formulario con los
+valores no textuales codificados en JSON).
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import math
+import os
+import random
+import sys
+import time
+from collections import defaultdict, deque
+from urllib.parse import parse_qsl, urlsplit
+
+DIR_BOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIR_BOT)
+
+from servidor_http import ServidorHTTP, respuesta_json
+
+# Parámetros que llegan codificados en JSON cuando la petición es un formulario
+CAMPOS_JSON = {
+    "chat_id", "message_id", "reply_markup", "offset", "limit", "timeout", "allowed_updates",
+    "show_alert", "cache_time", "max_connections", "drop_pending_updates", "disable_web_page_preview",
+}
+METODOS_LIMITADOS = {"sendMessage", "editMessageText"}
+# Mensajes del bot tras los que el alumno vuelve a /test. Solo estos: en modo
+# clásico la corrección "❌ Incorrecto..." también empieza por ❌ y el test sigue.
+MENSAJES_REINICIO = ("❌ No hay test activo", "❌ No hay preguntas", "❌ Este bloque todavía no tiene preguntas")
+
+
+def parametros(peticion):
+    """Parámetros de una llamada a la API (query string + cuerpo JSON o formulario)"""
+    datos = dict(parse_qsl(peticion.consulta))
+    if peticion.cuerpo:
+        tipo = peticion.cabeceras.get("content-type", "")
+        if tipo.startswith("application/json"):
+            return {**datos, **json.loads(peticion.cuerpo)}
+        datos.update(parse_qsl(peticion.cuerpo.decode("utf-8"), keep_blank_values=True))
+    for campo in CAMPOS_JSON & datos.keys():
+        if isinstance(datos[campo], str):
+            try:
+                datos[campo] = json.loads(datos[campo])
+            except ValueError:
+                pass
+    return datos
+
+
+def error_api(codigo, descripcion, retry_after=None):
+    cuerpo = {"ok": False, "error_code": codigo, "description": descripcion}
+    if retry_after is not None:
+        cuerpo["parameters"] = {"retry_after": retry_after}
+    return respuesta_json(cuerpo, codigo)
+
+
+def resultado_api(resultado):
+    return respuesta_json({"ok": True, "result": resultado})
+
+
+class _Cubo:
+    """Cubo de fichas: `ritmo` por segundo con capacidad `capacidad`"""
+
+    __slots__ = ("ritmo", "capacidad", "fichas", "momento")
+
+    def __init__(self, ritmo, capacidad, ahora):
+        self.ritmo = ritmo
+        self.capacidad = capacidad
+        self.fichas = capacidad
+        self.momento = ahora
+
+    def espera(self, ahora):
+        """Segundos hasta que haya una ficha (0 si ya la hay)"""
+        self.fichas = min(self.capacidad, self.fichas + (ahora - self.momento) * self.ritmo)
+        self.momento = ahora
+        return 0.0 if self.fichas >= 1 else (1 - self.fichas) / self.ritmo
+
+
+class ApiTelegramLocal:
+    """Servidor de Bot API falso con un bot (`token`) y usuarios guionizados"""
+
+    def __init__(self, token="123456:local", host="127.0.0.1", puerto=0, latencia=0.0, variacion=0.0,
+                 envios_por_segundo=30.0, envios_por_chat=1.0, rafaga_chat=3, rng=None):
+        self.token = token
+        self.latencia = latencia
+        self.variacion = variacion
+        self.envios_por_segundo = envios_por_segundo
+        self.envios_por_chat = envios_por_chat
+        self.rafaga_chat = rafaga_chat
+        self.rng = rng or random.Random()
+        self.servidor = ServidorHTTP(host, puerto)
+        self.bot = {"id": int(token.split(":")[0]), "is_bot": True, "first_name": "Bot local", "username": "bot_local"}
+
+        self.llamadas = defaultdict(int)    # método -> llamadas atendidas
+        self.rechazos_flood = 0             # respuestas 429
+        self.errores = defaultdict(int)     # descripción -> veces
+        self.listo = asyncio.Event()        # el bot ya pide updates o ha registrado su webhook
+        self.observadores = {}              # chat_id -> función(mensaje, editado)
+
+        self._update_id = itertools.count(1)
+        self._query_id = itertools.count(1)
+        self._pendientes = deque()          # updates sin confirmar / sin entregar
+        self._hay_updates = asyncio.Event()
+        self._mensajes = {}                 # (chat_id, message_id) -> mensaje
+        self._ultimo_mensaje = defaultdict(int)
+        self._cubo_global = None
+        self._cubos_chat = {}
+        self._webhook = None                # (url, secreto)
+        self._repartidores = []
+
+        for metodo in ("getMe", "getUpdates", "setWebhook", "deleteWebhook", "getWebhookInfo",
+                       "sendMessage", "editMessageText", "answerCallbackQuery"):
+            manejador = self._envolver(metodo, getattr(self, "_" + metodo))
+            for verbo in ("GET", "POST"):
+                self.servidor.ruta(verbo, f"/bot{token}/{metodo}", manejador)
+
+    @property
+    def url(self):
+        return f"http://{self.servidor.host}:{self.servidor.puerto}"
+
+    async def iniciar(self):
+        await self.servidor.iniciar()
+
+    async def detener(self):
+        await self._parar_webhook()
+        await self.servidor.detener()
+
+    # --- Infraestructura de las llamadas ---
+
+    def _envolver(self, metodo, funcion):
+        async def manejador(peticion):
+            espera = self.latencia + self.rng.uniform(-self.variacion, self.variacion)
+            if espera > 0:
+                await asyncio.sleep(espera)
+            try:
+                datos = parametros(peticion)
+            except (ValueError, UnicodeDecodeError):
+                return error_api(400, "Bad Request: can't parse request")
+            if metodo in METODOS_LIMITADOS:
+                rechazo = self._limitar(datos.get("chat_id"))
+                if rechazo is not None:
+                    return rechazo
+            resultado = await funcion(datos)
+            estado = resultado[0]
+            if estado == 200:
+                self.llamadas[metodo] += 1
+            return resultado
+        return manejador
+
+    def _limitar(self, chat_id):
+        """429 con retry_after (segundos enteros, como Telegram) si se pasa de algún límite"""
+        ahora = time.monotonic()
+        if self._cubo_global is None:
+            self._cubo_global = _Cubo(self.envios_por_segundo, max(1.0, self.envios_por_segundo), ahora)
+        cubo_chat = self._cubos_chat.get(chat_id)
+        if cubo_chat is None:
+            cubo_chat = self._cubos_chat[chat_id] = _Cubo(self.envios_por_chat, self.rafaga_chat, ahora)
+        espera = max(self._cubo_global.espera(ahora), cubo_chat.espera(ahora))
+        if espera > 0:
+            self.rechazos_flood += 1
+            segundos = max(1, math.ceil(espera))
+            return error_api(429, f"Too Many Requests: retry after {segundos}", segundos)
+        self._cubo_global.fichas -= 1
+        cubo_chat.fichas -= 1
+        return None
+
+    def _error(self, codigo, descripcion):
+        self.errores[descripcion] += 1
+        return error_api(codigo, descripcion)
+
+    # --- Métodos de la Bot API ---
+
+    async def _getMe(self, datos):
+        return resultado_api(self.bot)
+
+    async def _getUpdates(self, datos):
+        if self._webhook is not None:
+            return self._error(409, "Conflict: can't use getUpdates method while webhook is active; use deleteWebhook to delete the webhook first")
+        self.listo.set()
+        offset = int(datos.get("offset") or 0)
+        limite = min(100, int(datos.get("limit") or 100))
+        fin = time.monotonic() + float(datos.get("timeout") or 0)
+        while True:
+            # Confirmar (descartar) las updates anteriores a offset
+            while self._pendientes and self._pendientes[0]["update_id"] < offset:
+                self._pendientes.popleft()
+            if self._pendientes:
+                return resultado_api(list(itertools.islice(self._pendientes, limite)))
+            restante = fin - time.monotonic()
+            if restante <= 0:
+                return resultado_api([])
+            self._hay_updates.clear()
+            try:
+                await asyncio.wait_for(self._hay_updates.wait(), restante)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _setWebhook(self, datos):
+        url = datos.get("url", "")
+        await self._parar_webhook()
+        if url:
+            self._webhook = (url, datos.get("secret_token", ""))
+            conexiones = int(datos.get("max_connections") or 40)
+            self._repartidores = [asyncio.create_task(self._repartir()) for _ in range(min(conexiones, 8))]
+            self.listo.set()
+        return resultado_api(True)
+
+    async def _deleteWebhook(self, datos):
+        await self._parar_webhook()
+        if datos.get("drop_pending_updates"):
+            self._pendientes.clear()
+        return resultado_api(True)
+
+    async def _getWebhookInfo(self, datos):
+        url = self._webhook[0] if self._webhook else ""
+        return resultado_api({"url": url, "has_custom_certificate": False, "pending_update_count": len(self._pendientes)})
+
+    async def _sendMessage(self, datos):
+        chat_id = datos.get("chat_id")
+        if chat_id is None or "text" not in datos:
+            return self._error(400, "Bad Request: chat_id and text are required")
+        self._ultimo_mensaje[chat_id] += 1
+        mensaje = {
+            "message_id": self._ultimo_mensaje[chat_id], "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"}, "from": self.bot, "text": datos["text"],
+        }
+        if datos.get("reply_markup"):
+            mensaje["reply_markup"] = datos["reply_markup"]
+        self._mensajes[(chat_id, mensaje["message_id"])] = mensaje
+        self._notificar(chat_id, mensaje, False)
+        return resultado_api(mensaje)
+
+    async def _editMessageText(self, datos):
+        clave = (datos.get("chat_id"), datos.get("message_id"))
+        mensaje = self._mensajes.get(clave)
+        if mensaje is None:
+            return self._error(400, "Bad Request: message to edit not found")
+        teclado = datos.get("reply_markup") or None
+        if mensaje["text"] == datos.get("text") and mensaje.get("reply_markup") == teclado:
+            return self._error(400, "Bad Request: message is not modified")
+        mensaje = dict(mensaje, text=datos.get("text", ""), edit_date=int(time.time()))
+        mensaje.pop("reply_markup", None)
+        if teclado:
+            mensaje["reply_markup"] = teclado
+        self._mensajes[clave] = mensaje
+        self._notificar(clave[0], mensaje, True)
+        return resultado_api(mensaje)
+
+    async def _answerCallbackQuery(self, datos):
+        if not datos.get("callback_query_id"):
+            return self._error(400, "Bad Request: query is too old and response timeout expired or query ID is invalid")
+        return resultado_api(True)
+
+    def _notificar(self, chat_id, mensaje, editado):
+        observador = self.observadores.get(chat_id)
+        if observador is not None:
+            observador(mensaje, editado)
+
+    # --- Updates: generación y entrega ---
+
+    def encolar(self, update):
+        """Añade una update (se le asigna update_id) para el bot"""
+        update["update_id"] = next(self._update_id)
+        self._pendientes.append(update)
+        self._hay_updates.set()
+        return update
+
+    def usuario(self, user_id):
+        return {"id": user_id, "is_bot": False, "first_name": f"Alumno {user_id}", "username": f"alumno{user_id}"}
+
+    def comando(self, user_id, texto):
+        """Mensaje de texto del usuario (los que empiezan por / llevan la entidad bot_command)"""
+        self._ultimo_mensaje[user_id] += 1
+        mensaje = {
+            "message_id": self._ultimo_mensaje[user_id], "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"}, "from": self.usuario(user_id), "text": texto,
+        }
+        if texto.startswith("/"):
+            mensaje["entities"] = [{"type": "bot_command", "offset": 0, "length": len(texto.split()[0])}]
+        return self.encolar({"message": mensaje})
+
+    def pulsar(self, user_id, mensaje, data):
+        """Pulsación del botón `data` del `mensaje` (tal como lo tiene ahora el chat)"""
+        return self.encolar({"callback_query": {
+            "id": str(next(self._query_id)), "from": self.usuario(user_id),
+            "chat_instance": str(user_id), "data": data, "message": mensaje,
+        }})
+
+    async def _parar_webhook(self):
+        self._webhook = None
+        for tarea in self._repartidores:
+            tarea.cancel()
+        await asyncio.gather(*self._repartidores, return_exceptions=True)
+        self._repartidores = []
+
+    async def _repartir(self):
+        """Entrega updates al webhook por una conexión keep-alive (como hace Telegram)"""
+        url, secreto = self._webhook
+        partes = urlsplit(url)
+        ruta = partes.path or "/"
+        reader = writer = None
+        while True:
+            if not self._pendientes:
+                self._hay_updates.clear()
+                await self._hay_updates.wait()
+                continue
+            update = self._pendientes.popleft()
+            cuerpo = json.dumps(update).encode("utf-8")
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(partes.hostname, partes.port or 80)
+                writer.write(
+                    f"POST {ruta} HTTP/1.1\r\nHost: {partes.netloc}\r\nContent-Type: application/json\r\n"
+                    f"X-Telegram-Bot-Api-Secret-Token: {secreto}\r\nContent-Length: {len(cuerpo)}\r\n\r\n".encode()
+                    + cuerpo
+                )
+                await writer.drain()
+                estado = int((await reader.readline()).split()[1])
+                longitud = 0
+                while (linea := await reader.readline()) not in (b"\r\n", b""):
+                    nombre, _, valor = linea.decode("latin-1").partition(":")
+                    if nombre.strip().lower() == "content-length":
+                        longitud = int(valor)
+                if longitud:
+                    await reader.readexactly(longitud)
+                if estado != 200:
+                    self.errores[f"webhook HTTP {estado}"] += 1
+            except (OSError, ValueError, IndexError, asyncio.IncompleteReadError) as e:
+                # Telegram reintenta: la update vuelve a la cola
+                logging.debug(f"Webhook no disponible ({e}), se reintenta")
+                self._pendientes.appendleft(update)
+                if writer is not None:
+                    writer.close()
+                reader = writer = None
+                await asyncio.sleep(0.1)
+
+
+class AlumnoGuion:
+    """Usuario que hace `tests` tests completos: /test, pulsa un bloque, un tema,
+    la cantidad y responde al azar a cada pregunta que le llega.
+    `latencias` guarda, por cada acción, cuánto tardó en llegar la reacción del bot
+    (el siguiente teclado o el resultado final)."""
+
+    def __init__(self, api, user_id, tests=1, cantidad=50, bloques=("1", "2", "3", "4", "aleatorio"),
+                 pensar=0.0, rng=None):
+        self.api = api
+        self.user_id = user_id
+        self.tests = tests
+        self.cantidad = cantidad
+        self.bloques = bloques
+        self.pensar = pensar
+        self.rng = rng or random.Random(user_id)
+        self.latencias = []
+        self.acciones = 0
+        self.hechos = 0
+        self.terminado = asyncio.Event()
+        self._accion = None        # momento de la última acción sin reacción todavía
+        self._pendiente = None     # tarea de la siguiente acción
+        api.observadores[user_id] = self.recibir
+
+    def empezar(self):
+        self._actuar(lambda: self.api.comando(self.user_id, "/test"), 0.0)
+
+    def _actuar(self, accion, espera):
+        if self._pendiente is not None:
+            self._pendiente.cancel()
+
+        async def ejecutar():
+            if espera > 0:
+                await asyncio.sleep(espera)
+            self._accion = time.perf_counter()
+            self.acciones += 1
+            accion()
+
+        self._pendiente = asyncio.create_task(ejecutar())
+
+    def _reaccion(self):
+        if self._accion is not None:
+            self.latencias.append(time.perf_counter() - self._accion)
+            self._accion = None
+
+    def _elegir(self, botones):
+        for prefijo in ("respuesta_", "tema_"):
+            opciones = [b for b in botones if b.startswith(prefijo)]
+            if opciones:
+                return self.rng.choice(opciones)
+        bloques = [b for b in botones if b.startswith("bloque_") and b[7:] in self.bloques]
+        if bloques:
+            return self.rng.choice(bloques)
+        cantidad = f"cantidad_{self.cantidad}"
+        if cantidad in botones:
+            return cantidad
+        return botones[0] if botones else None
+
+    def recibir(self, mensaje, editado):
+        teclado = (mensaje.get("reply_markup") or {}).get("inline_keyboard")
+        if teclado:
+            botones = [b.get("callback_data") for fila in teclado for b in fila if b.get("callback_data")]
+            data = self._elegir(botones)
+            if data is not None:
+                self._reaccion()
+                espera = self.rng.uniform(0, 2 * self.pensar) if self.pensar else 0.0
+                self._actuar(lambda: self.api.pulsar(self.user_id, mensaje, data), espera)
+            return
+        texto = mensaje.get("text", "")
+        if "finalizado" in texto:
+            self._reaccion()
+            self.hechos += 1
+            if self.hechos >= self.tests:
+                self.terminado.set()
+            else:
+                self._actuar(lambda: self.api.comando(self.user_id, "/test"), self.pensar)
+        elif texto.startswith(MENSAJES_REINICIO):
+            # Selección sin preguntas, test caducado...: vuelve a empezar
+            self._reaccion()
+            self._actuar(lambda: self.api.comando(self.user_id, "/test"), self.pensar)
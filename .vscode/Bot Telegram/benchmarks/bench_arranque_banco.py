@@ -0,0 +1,109 @@
+"""
+Benchmark de arranque del banco: preguntas.json frente a preguntas.bin.
+
+Para bancos sintéticos de 10k, 100k y 1M preguntas mide, cada modo en un
+subproceso nuevo:
+  - carga: leer_banco hasta tener el banco listo para servir,
+  - RSS tras cargar y tras mostrar 1000 preguntas al azar (texto + opciones),
+    y de ese RSS la parte anónima (memoria propia del proceso; el resto son
+    páginas del fichero mapeado),
+  - µs por pregunta mostrada.
+El binario se compila una vez con escribir_banco_binario (coste de
+procesar_preguntas, no del bot) y se comprueba que da las mismas preguntas.
+Las páginas del binario son del fichero mapeado: varios procesos del bot en
+la misma máquina las comparten en la caché de páginas.
+
+Uso: python benchmarks/bench_arranque_banco.py [10000 100000 1000000]
+"""
+
+import gc
+import hashlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+DIR_BOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIR_BOT)
+
+from bench_memoria_banco import generar_banco, rss_actual_kb
+from banco_preguntas import QuestionBank, leer_banco
+from banco_binario import escribir_banco_binario
+
+
+def rss_anonimo_kb():
+    """RssAnon de /proc (Linux): memoria que no es de ficheros mapeados"""
+    try:
+        with open("/proc/self/status") as f:
+            for linea in f:
+                if linea.startswith("RssAnon:"):
+                    return int(linea.split()[1])
+    except OSError:
+        pass
+    return rss_actual_kb()
+
+
+def medir(ruta):
+    """Se ejecuta dentro del subproceso: carga el banco, muestra preguntas y mide"""
+    gc.collect()
+    base, base_anonimo = rss_actual_kb(), rss_anonimo_kb()
+    inicio = time.perf_counter()
+    banco, _ = leer_banco(ruta)
+    carga = time.perf_counter() - inicio
+    rss_carga = rss_actual_kb() - base
+
+    rnd = random.Random(0)
+    indices = [rnd.randrange(len(banco)) for _ in range(1000)]
+    inicio = time.perf_counter()
+    for idx in indices:
+        banco.enunciado(idx)
+        banco.opciones(idx)
+    por_pregunta = (time.perf_counter() - inicio) / len(indices)
+    print(json.dumps({"carga": carga, "rss_carga_kb": rss_carga, "rss_uso_kb": rss_actual_kb() - base,
+                      "anonimo_kb": rss_anonimo_kb() - base_anonimo,
+                      "us_pregunta": por_pregunta * 1e6, "n": len(banco)}))
+
+
+def main():
+    tamanos = [int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    print(f"{'preguntas':>10} {'modo':>8} {'MB fichero':>10} {'carga (s)':>10} "
+          f"{'RSS carga':>10} {'RSS 1000':>9} {'anónimo':>8} {'µs/preg':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in tamanos:
+            ruta_json = os.path.join(tmp, f"banco_{n}.json")
+            ruta_bin = os.path.join(tmp, f"banco_{n}.bin")
+            generar_banco(ruta_json, n)
+            with open(ruta_json, "rb") as f:
+                datos = f.read()
+            inicio = time.perf_counter()
+            origen = QuestionBank.desde_json(datos)
+            escribir_banco_binario(origen, ruta_bin, hashlib.sha256(datos).hexdigest())
+            compilar = time.perf_counter() - inicio
+
+            binario, _ = leer_banco(ruta_bin)
+            for idx in random.Random(n).sample(range(n), min(n, 200)):
+                assert (binario.enunciado(idx), binario.opciones(idx), binario[idx].id) == \
+                       (origen.enunciado(idx), origen.opciones(idx), origen[idx].id), "el binario difiere"
+            assert binario.temas_por_bloque() == origen.temas_por_bloque()
+            del origen, binario, datos
+
+            for modo, ruta in (("json", ruta_json), ("binario", ruta_bin)):
+                salida = subprocess.run(
+                    [sys.executable, __file__, "--medir", ruta],
+                    capture_output=True, text=True, check=True
+                ).stdout
+                r = json.loads(salida)
+                print(f"{n:>10} {modo:>8} {os.path.getsize(ruta) / 2**20:>10.1f} {r['carga']:>10.3f} "
+                      f"{r['rss_carga_kb'] / 1024:>10.1f} {r['rss_uso_kb'] / 1024:>9.1f} "
+                      f"{r['anonimo_kb'] / 1024:>8.1f} {r['us_pregunta']:>8.2f}")
+            print(f"{'':>10} compilar el binario: {compilar:.2f} s")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--medir":
+        medir(sys.argv[2])
+    else:
+        main()
@@ -0,0 +1,70 @@
+"""
+Benchmark del modo lote de convertir_preguntas.
+
+Genera `pares` ficheros preguntas_temaX_bloqueY.odt (odfpy) y
+respuestas_temaX_bloqueY.ods (pyexcel-ods3) con `preguntas` preguntas cada
+uno (alguna respuesta sin mapear para que haya avisos) y mide:
+  - secuencial: un solo proceso (como invocar el script fichero a fichero),
+  - pool: ProcessPoolExecutor con `trabajadores` procesos (por defecto, los núcleos),
+  - repetición: segunda pasada, en la que todo está al día y se salta.
+
+Requiere odfpy y pyexcel-ods3.
+
+Uso: python benchmarks/bench_convertir_lote.py [pares] [preguntas] [trabajadores]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+DIR_BOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIR_BOT)
+
+from odf.opendocument import OpenDocumentText
+from odf.text import P
+from pyexcel_ods3 import save_data
+
+from convertir_preguntas import convertir_directorio
+
+
+def generar_pares(directorio, pares, preguntas):
+    for n in range(pares):
+        nombre = f"tema{1 + n // 4}_bloque{1 + n % 4}"
+        doc = OpenDocumentText()
+        for i in range(1, preguntas + 1):
+            doc.text.addElement(P(text=f"{i}. ¿Enunciado de la pregunta {i} del {nombre}?"))
+            for letra in "ABCD":
+                doc.text.addElement(P(text=f"{letra}) Opción {letra} de la pregunta {i}"))
+        doc.save(os.path.join(directorio, f"preguntas_{nombre}.odt"))
+        respuestas = [["respuesta"]] + [["ABCD"[i % 4] if i % 25 else "Z"] for i in range(preguntas)]
+        save_data(os.path.join(directorio, f"respuestas_{nombre}.ods"), {"Hoja1": respuestas})
+
+
+def medir(nombre, directorio, salida, **kwargs):
+    informe = convertir_directorio(directorio, out_dir=salida, **kwargs)
+    avisos = sum(len(r["avisos"]) for r in informe["convertidos"])
+    print(f"{nombre:>12} {informe['segundos']:>8.2f} {len(informe['convertidos']):>11} "
+          f"{len(informe['omitidos']):>8} {avisos:>7} {informe['num_preguntas'] / max(informe['segundos'], 1e-9):>13.0f}")
+    return informe
+
+
+def main():
+    pares = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    preguntas = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    trabajadores = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count()
+
+    with tempfile.TemporaryDirectory() as raiz:
+        inicio = time.perf_counter()
+        generar_pares(raiz, pares, preguntas)
+        print(f"{pares} pares x {preguntas} preguntas generados en {time.perf_counter() - inicio:.1f} s; "
+              f"{trabajadores} trabajadores")
+        print(f"{'modo':>12} {'s':>8} {'convertidos':>11} {'omitidos':>8} {'avisos':>7} {'preguntas/s':>13}")
+        medir("secuencial", raiz, os.path.join(raiz, "secuencial"), trabajadores=1)
+        salida = os.path.join(raiz, "pool")
+        medir("pool", raiz, salida, trabajadores=trabajadores, forzar=True)
+        medir("repetición", raiz, salida, trabajadores=trabajadores)
+
+
+if __name__ == "__main__":
+    main()
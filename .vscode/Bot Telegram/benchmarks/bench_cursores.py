@@ -0,0 +1,105 @@
+"""
+Benchmark de los cursores de preguntas sin repetición.
+
+Para conjuntos de 300, 10k, 100k y 1M preguntas mide cuánto cuesta sacar
+un test de k preguntas con Cursor.siguientes (O(k), no depende del tamaño
+del conjunto) frente a random.sample, y comprueba que:
+  - una vuelta completa recorre cada pregunta exactamente una vez,
+  - tras una recarga que borra y añade preguntas, el resto de la vuelta
+    son las no vistas que siguen existiendo más las nuevas,
+  - los cursores sobreviven a un reinicio a través de AlmacenSQLite.
+
+Uso: python benchmarks/bench_cursores.py
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+DIR_BOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIR_BOT)
+
+from almacen_sesiones import AlmacenSQLite
+from banco_preguntas import QuestionBank
+from cursores import Cursor, CursoresPreguntas
+
+
+def generar_banco(ids, huella):
+    banco = QuestionBank({
+        "id": i, "bloque": 1, "tema": 1, "pregunta": f"¿{i}?",
+        "opciones": ["a", "b"], "respuesta_correcta": 0,
+    } for i in ids)
+    banco.huella = huella
+    return banco
+
+
+def medir_tiempos():
+    print("conjunto      k   random.sample   cursor")
+    for n in (300, 10_000, 100_000, 1_000_000):
+        indices = range(n)
+        banco = generar_banco([], "x")
+        banco._ids = indices  # solo se consultan ids[indice]
+        for k in (10, 50, 100):
+            repeticiones = 2000
+            inicio = time.perf_counter()
+            for _ in range(repeticiones):
+                random.sample(indices, k)
+            uniforme = (time.perf_counter() - inicio) / repeticiones * 1e6
+            cursor = Cursor(1, n, "x")
+            inicio = time.perf_counter()
+            for _ in range(repeticiones):
+                cursor.siguientes(banco, indices, k)
+            propio = (time.perf_counter() - inicio) / repeticiones * 1e6
+            print(f"{n:>9} {k:>4} {uniforme:12.1f} µs {propio:8.1f} µs")
+
+
+def comprobar_vueltas():
+    banco = generar_banco(range(1, 1001), "a")
+    indices = banco.indices("1", "1")
+    cursor = Cursor(7, len(indices), "a")
+    vistos = []
+    for _ in range(100):
+        vistos += cursor.siguientes(banco, indices, 10)
+    assert sorted(vistos) == list(range(1000)), "una vuelta debe recorrer todas una vez"
+
+    # Media vuelta, recarga que borra 100 ids y añade 50, y el resto de la vuelta
+    cursor = Cursor(8, len(indices), "a")
+    vistos = {banco._ids[i] for _ in range(50) for i in cursor.siguientes(banco, indices, 10)}
+    nuevos_ids = [i for i in range(1, 1001) if i % 10] + list(range(2001, 2051))
+    nuevo = generar_banco(nuevos_ids, "b")
+    cursor.reconciliar(banco, nuevo, indices, nuevo.indices("1", "1"))
+    pendientes = (set(nuevos_ids) - vistos)
+    resto = []
+    while len(resto) < len(pendientes):
+        resto += [nuevo._ids[i] for i in cursor.siguientes(nuevo, nuevo.indices("1", "1"), 10)]
+    assert set(resto[:len(pendientes)]) == pendientes, "tras recargar deben salir primero las no vistas"
+    print(f"vuelta completa y reconciliación OK ({len(pendientes)} pendientes tras recargar)")
+
+
+async def comprobar_persistencia():
+    banco = generar_banco(range(1, 501), "a")
+    indices = banco.indices("1", "1")
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "sesiones.db")
+        almacen = AlmacenSQLite(ruta)
+        antes = await CursoresPreguntas(almacen).siguientes(1, banco, ("1", "1"), indices, 250)
+        await almacen.cerrar()
+
+        almacen = AlmacenSQLite(ruta)
+        despues = await CursoresPreguntas(almacen).siguientes(1, banco, ("1", "1"), indices, 250)
+        await almacen.cerrar()
+    assert sorted(antes + despues) == list(range(500)), "el cursor debe continuar tras reiniciar"
+    print("persistencia OK")
+
+
+def main():
+    medir_tiempos()
+    comprobar_vueltas()
+    asyncio.run(comprobar_persistencia())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark del histórico de resultados y sus agregados (estadisticas.py).
+
+Reproduce 1M de respuestas (y un test terminado cada 20) de 5000 usuarios
+sobre 4 bloques × 10 temas y mide:
+  - coste por evento de registrar_respuesta (agregados + registro binario),
+  - vaciado del histórico a disco,
+  - arranque: reproducir todo el histórico frente a instantánea + cola,
+  - consulta de /estadisticas (agregados del usuario) para el usuario con
+    menos respuestas y el que más tiene: depende solo del nº de ámbitos
+    (total + bloques + temas, como mucho unas decenas), no del histórico,
+y comprueba que los agregados recargados coinciden con los calculados en vivo.
+
+Uso: python benchmarks/bench_estadisticas.py [eventos]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+DIR_BOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIR_BOT)
+
+from estadisticas import REGISTRO, RegistroResultados
+
+USUARIOS = 5000
+
+
+def eventos(n):
+    rnd = random.Random(n)
+    for i in range(n):
+        user_id = 1000 + int(rnd.paretovariate(1.2)) % USUARIOS  # unos pocos usuarios muy activos
+        yield user_id, i, rnd.randint(1, 4), rnd.randint(1, 10), rnd.random() < 0.7
+
+
+def iguales(a, b):
+    return a.keys() == b.keys() and all(
+        x.keys() == y.keys() and all(x[k].como_lista() == y[k].como_lista() for k in x)
+        for x, y in ((a[u], b[u]) for u in a)
+    )
+
+
+async def medir(n):
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "resultados.log")
+        registro = RegistroResultados(ruta)
+        lote = list(eventos(n))
+
+        inicio = time.perf_counter()
+        for num, (user_id, id_pregunta, bloque, tema, acierto) in enumerate(lote):
+            registro.registrar_respuesta(user_id, id_pregunta, bloque, tema, acierto)
+            if num % 20 == 19:
+                registro.registrar_test(user_id, str(bloque), str(tema), 14, 20)
+        registrar = time.perf_counter() - inicio
+        eventos_totales = n + n // 20
+        print(f"registrar {eventos_totales} eventos: {registrar:.2f} s ({registrar / eventos_totales * 1e6:.2f} µs/evento)")
+
+        inicio = time.perf_counter()
+        await registro.vaciar()
+        print(f"vaciar histórico: {time.perf_counter() - inicio:.2f} s, "
+              f"{os.path.getsize(ruta) / 2**20:.1f} MiB ({REGISTRO.size} B/registro)")
+
+        # Arranque sin instantánea: reproducir todo el histórico
+        if os.path.exists(registro.ruta_instantanea):
+            os.remove(registro.ruta_instantanea)
+        cargado = RegistroResultados(ruta)
+        inicio = time.perf_counter()
+        reproducidos = cargado.cargar()
+        print(f"arranque reproduciendo {reproducidos} registros: {time.perf_counter() - inicio:.2f} s")
+        assert iguales(registro._usuarios, cargado._usuarios), "la reproducción debe dar los mismos agregados"
+
+        # Arranque con instantánea y 1000 eventos más en la cola
+        inicio = time.perf_counter()
+        await registro.vaciar(instantanea=True)
+        print(f"guardar instantánea: {time.perf_counter() - inicio:.2f} s")
+        for user_id, id_pregunta, bloque, tema, acierto in lote[:1000]:
+            registro.registrar_respuesta(user_id, id_pregunta, bloque, tema, acierto)
+        await registro.vaciar()
+        cargado = RegistroResultados(ruta)
+        inicio = time.perf_counter()
+        reproducidos = cargado.cargar()
+        print(f"arranque con instantánea (+{reproducidos} registros): {time.perf_counter() - inicio:.2f} s")
+        assert iguales(registro._usuarios, cargado._usuarios), "instantánea + cola debe dar los mismos agregados"
+
+        # Consulta: agregados + el mismo recorrido que hace componer_estadisticas
+        por_usuario = {u: a[(0, 0)].respuestas for u, a in registro._usuarios.items()}
+        activo = max(por_usuario, key=por_usuario.get)
+        tranquilo = min(por_usuario, key=por_usuario.get)
+        for user_id in (tranquilo, activo):
+            inicio = time.perf_counter()
+            for _ in range(10000):
+                sorted(registro.agregados(user_id).items())
+            print(f"consulta usuario con {por_usuario[user_id]:>7} respuestas "
+                  f"({len(registro.agregados(user_id))} ámbitos): {(time.perf_counter() - inicio) / 10000 * 1e6:.1f} µs")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    asyncio.run(medir(n))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Rendimiento de extremo a extremo: el bot real contra la Bot API local.
+
+Arranca ApiTelegramLocal (api_telegram_local.py) con la latencia y los
+límites de envío indicados, lanza `python main.py` en un subproceso con
+API_TELEGRAM_URL apuntando a ella (en modo polling o webhook), un banco
+sintético y los alumnos autorizados, y deja que N AlumnoGuion hagan sus
+tests a la vez. Mide:
+  - duración y updates por segundo atendidas de principio a fin,
+  - tiempo de reacción del bot (acción del alumno -> siguiente teclado o
+    resultado): p50/p95/p99,
+  - llamadas a la API por método, respuestas 429 y otros errores de la API.
+Con --json guarda los resultados. Con --comprobar solo hace una pasada
+corta en modo clásico y otra en mensaje único, y falla si algún alumno
+no termina su test.
+
+Uso: python benchmarks/bench_extremo_a_extremo.py [--usuarios 50] [--tests 1]
+         [--cantidad 50] [--modo polling|webhook] [--latencia-ms 20] [--variacion-ms 10]
+         [--envios-por-segundo 30] [--envios-por-chat 1] [--rafaga-chat 3]
+         [--pensar-ms 0] [--mensaje-unico] [--json resultados.json] [--comprobar]
+Requiere python-telegram-bot y python-dotenv (los usa main.py).
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+from api_telegram_local import DIR_BOT, AlumnoGuion, ApiTelegramLocal
+from bench_memoria_banco import generar_banco
+
+TOKEN = "123456:local"
+SECRETO = "secreto-local"
+
+
+def percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    return ordenados[max(0, min(len(ordenados), math.ceil(p / 100 * len(ordenados))) - 1)]
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def entorno_bot(args, api, tmp, usuarios):
+    ruta_banco = os.path.join(tmp, "preguntas.json")
+    generar_banco(ruta_banco, args.preguntas)
+    ruta_autorizados = os.path.join(tmp, "usuarios_autorizados.txt")
+    with open(ruta_autorizados, "w", encoding="utf-8") as f:
+        f.write("\n".join(str(uid) for uid in usuarios) + "\n")
+    entorno = dict(
+        os.environ,
+        TELEGRAM_TOKEN=TOKEN,
+        API_TELEGRAM_URL=api.url,
+        MODO_BOT=args.modo,
+        RUTA_PREGUNTAS=ruta_banco,
+        RUTA_AUTORIZADOS=ruta_autorizados,
+        ALMACEN_SESIONES="memoria",
+        MENSAJE_UNICO="1" if args.mensaje_unico else "0",
+        # El bot respeta los mismos límites que impone el servidor
+        ENVIOS_POR_SEGUNDO=str(args.envios_por_segundo),
+        INTERVALO_ENVIOS_CHAT=str(1 / args.envios_por_chat),
+        RAFAGA_ENVIOS_CHAT=str(args.rafaga_chat),
+    )
+    if args.modo == "webhook":
+        puerto = puerto_libre()
+        entorno.update(
+            WEBHOOK_URL=f"http://127.0.0.1:{puerto}/webhook",
+            WEBHOOK_ESCUCHA=f"127.0.0.1:{puerto}",
+            WEBHOOK_RUTA="/webhook",
+            WEBHOOK_SECRETO=SECRETO,
+        )
+    return entorno
+
+
+async def ejecutar(args):
+    api = ApiTelegramLocal(
+        TOKEN, latencia=args.latencia_ms / 1000, variacion=args.variacion_ms / 1000,
+        envios_por_segundo=args.envios_por_segundo, envios_por_chat=args.envios_por_chat,
+        rafaga_chat=args.rafaga_chat, rng=random.Random(args.semilla),
+    )
+    await api.iniciar()
+    usuarios = list(range(1, args.usuarios + 1))
+    with tempfile.TemporaryDirectory() as tmp:
+        registro = open(os.path.join(tmp, "bot.log"), "wb")
+        bot = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.join(DIR_BOT, "main.py"), cwd=tmp,
+            env=entorno_bot(args, api, tmp, usuarios), stdout=registro, stderr=asyncio.subprocess.STDOUT,
+        )
+        try:
+            await asyncio.wait_for(api.listo.wait(), args.arranque)
+        except asyncio.TimeoutError:
+            bot.kill()
+            registro.close()
+            with open(os.path.join(tmp, "bot.log"), encoding="utf-8", errors="replace") as f:
+                print(f.read()[-3000:])
+            raise SystemExit("El bot no llegó a pedir updates a la API local")
+
+        rnd = random.Random(args.semilla)
+        alumnos = [
+            AlumnoGuion(api, uid, args.tests, args.cantidad, pensar=args.pensar_ms / 1000, rng=random.Random(rnd.random()))
+            for uid in usuarios
+        ]
+        inicio = time.perf_counter()
+        for alumno in alumnos:
+            alumno.empezar()
+        pendientes = [asyncio.create_task(a.terminado.wait()) for a in alumnos]
+        _, sin_terminar = await asyncio.wait(pendientes, timeout=args.limite)
+        segundos = time.perf_counter() - inicio
+        for tarea in sin_terminar:
+            tarea.cancel()
+
+        bot.send_signal(signal.SIGINT)
+        try:
+            await asyncio.wait_for(bot.wait(), 10)
+        except asyncio.TimeoutError:
+            bot.kill()
+        registro.close()
+    await api.detener()
+
+    latencias = sorted(l for a in alumnos for l in a.latencias)
+    acciones = sum(a.acciones for a in alumnos)
+    return {
+        "parametros": {k: v for k, v in vars(args).items() if k != "json"},
+        "segundos": segundos,
+        "alumnos_sin_terminar": len(sin_terminar),
+        "tests_terminados": sum(a.hechos for a in alumnos),
+        "updates": acciones,
+        "updates_por_segundo": acciones / segundos if segundos else 0.0,
+        "reaccion_ms": {
+            "n": len(latencias),
+            "p50": percentil(latencias, 50) * 1000,
+            "p95": percentil(latencias, 95) * 1000,
+            "p99": percentil(latencias, 99) * 1000,
+            "max": latencias[-1] * 1000 if latencias else 0.0,
+        },
+        "llamadas_api": dict(sorted(api.llamadas.items())),
+        "rechazos_429": api.rechazos_flood,
+        "errores_api": dict(api.errores),
+    }
+
+
+async def comprobar(args):
+    """Pasada corta en cada modo de mensajes: todos los alumnos deben terminar"""
+    for mensaje_unico in (False, True):
+        corta = argparse.Namespace(**dict(
+            vars(args), usuarios=3, tests=2, cantidad=50, preguntas=300, latencia_ms=1.0,
+            variacion_ms=0.0, pensar_ms=0.0, mensaje_unico=mensaje_unico, limite=min(args.limite, 60.0),
+        ))
+        resultado = await ejecutar(corta)
+        modo = "mensaje único" if mensaje_unico else "clásico"
+        if resultado["alumnos_sin_terminar"] or resultado["tests_terminados"] != corta.usuarios * corta.tests:
+            imprimir(resultado)
+            raise SystemExit(f"Comprobación fallida en modo {modo}: hay alumnos que no terminan")
+        print(f"modo {modo}: {resultado['tests_terminados']} tests en {resultado['segundos']:.2f} s OK")
+
+
+def imprimir(resultado):
+    p = resultado["parametros"]
+    print(f"{p['usuarios']} alumnos x {p['tests']} tests de {p['cantidad']} preguntas, modo {p['modo']}, "
+          f"latencia {p['latencia_ms']}±{p['variacion_ms']} ms, límites {p['envios_por_segundo']}/s y "
+          f"{p['envios_por_chat']}/s por chat (ráfaga {p['rafaga_chat']})")
+    print(f"{resultado['updates']} updates en {resultado['segundos']:.2f} s: {resultado['updates_por_segundo']:.1f} updates/s, "
+          f"{resultado['tests_terminados']} tests terminados, {resultado['alumnos_sin_terminar']} alumnos sin terminar")
+    r = resultado["reaccion_ms"]
+    print(f"reacción del bot: p50 {r['p50']:.1f} ms, p95 {r['p95']:.1f} ms, p99 {r['p99']:.1f} ms, máx {r['max']:.1f} ms")
+    print("llamadas a la API: " + ", ".join(f"{m}={n}" for m, n in resultado["llamadas_api"].items()))
+    print(f"429 devueltos: {resultado['rechazos_429']}")
+    if resultado["errores_api"]:
+        print("otros errores: " + ", ".join(f"{e} ({n})" for e, n in resultado["errores_api"].items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bot real contra la Bot API local")
+    parser.add_argument("--usuarios", type=int, default=50)
+    parser.add_argument("--tests", type=int, default=1)
+    parser.add_argument("--cantidad", type=int, default=50, choices=(50, 100))
+    parser.add_argument("--preguntas", type=int, default=5000, help="tamaño del banco sintético")
+    parser.add_argument("--modo", choices=("polling", "webhook"), default="polling")
+    parser.add_argument("--latencia-ms", type=float, default=20.0)
+    parser.add_argument("--variacion-ms", type=float, default=10.0)
+    parser.add_argument("--envios-por-segundo", type=float, default=30.0)
+    parser.add_argument("--envios-por-chat", type=float, default=1.0)
+    parser.add_argument("--rafaga-chat", type=int, default=3)
+    parser.add_argument("--pensar-ms", type=float, default=0.0, help="tiempo medio que tarda un alumno en pulsar")
+    parser.add_argument("--mensaje-unico", action="store_true")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--arranque", type=float, default=30.0, help="segundos máximos para que arranque el bot")
+    parser.add_argument("--limite", type=float, default=600.0, help="segundos máximos de la prueba")
+    parser.add_argument("--json", help="guardar los resultados en este fichero")
+    parser.add_argument("--comprobar", action="store_true", help="solo una pasada corta en cada modo")
+    args = parser.parse_args()
+
+    if args.comprobar:
+        asyncio.run(comprobar(args))
+        return
+    resultado = asyncio.run(ejecutar(args))
+    imprimir(resultado)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Flood de intentos no autorizados: bloqueo del event loop con y sin el
+registro asíncrono de intrusos.
+
+"antes": lo que hacía require_authorization por cada update de un intruso
+(FileHandler síncrono en intrusos.log + logging.warning + una respuesta).
+"después": registro_intrusos (QueueHandler + hilo escritor con rotación y
+gzip, intentos agrupados por ventana y respuestas con enfriamiento).
+
+Mientras `intrusos` usuarios mandan `updates` peticiones en ráfaga, una tarea
+"latido" duerme 1 ms en bucle y mide cuánto se retrasa cada despertar: ese
+retraso es el tiempo que el loop estuvo bloqueado y no pudo atender a nadie.
+
+No necesita python-telegram-bot.
+
+Uso: python benchmarks/bench_intrusos.py [updates] [intrusos]
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+DIR_BOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIR_BOT)
+
+from registro_intrusos import AgrupadorIntentos, configurar_registro_intrusos
+
+LATIDO = 0.001
+RESPUESTA = 0.0002  # coste de CPU de preparar/encolar una respuesta
+
+
+class Respuestas:
+    def __init__(self):
+        self.enviadas = 0
+
+    async def enviar(self):
+        self.enviadas += 1
+        time.sleep(RESPUESTA)
+        await asyncio.sleep(0)
+
+
+def logger_sincrono(ruta, consola):
+    """Configuración anterior: FileHandler directo en el logger "intrusos" + log general"""
+    logger = logging.getLogger("intrusos_antes")
+    logger.setLevel(logging.WARNING)
+    logger.propagate = False
+    manejador = logging.FileHandler(ruta, encoding="utf-8")
+    manejador.setFormatter(logging.Formatter(
+        '%(asctime)s | USUARIO NO AUTORIZADO | Username: %(username)s | ID: %(user_id)s | Chat: %(chat_id)s'
+    ))
+    logger.addHandler(manejador)
+    general = logging.getLogger("general_antes")
+    general.propagate = False
+    general.addHandler(logging.FileHandler(consola, encoding="utf-8"))
+    return logger, general, [manejador] + general.handlers
+
+
+async def latido(retrasos, parar):
+    while not parar.is_set():
+        esperado = time.perf_counter() + LATIDO
+        await asyncio.sleep(LATIDO)
+        retrasos.append(max(0.0, time.perf_counter() - esperado))
+
+
+async def flood(manejar, updates, intrusos):
+    async def intruso(uid):
+        for _ in range(updates // intrusos):
+            await manejar(str(uid), uid, f"spam{uid}")
+            await asyncio.sleep(0)  # cada update es un paso distinto del loop
+    await asyncio.gather(*(intruso(10_000 + i) for i in range(intrusos)))
+
+
+async def escenario(nombre, directorio, updates, intrusos):
+    respuestas = Respuestas()
+    ruta = os.path.join(directorio, f"{nombre}.log")
+    if nombre == "antes":
+        logger, general, manejadores = logger_sincrono(ruta, os.path.join(directorio, "consola.log"))
+
+        async def manejar(user_id, chat_id, username):
+            logger.warning("Intento", extra={"username": username, "user_id": user_id, "chat_id": chat_id})
+            await respuestas.enviar()
+            general.warning(f"Acceso denegado a usuario: {username} (ID: {user_id})")
+
+        cerrar = lambda: [m.close() for m in manejadores]
+    else:
+        logger, listener = configurar_registro_intrusos(ruta, max_bytes=256 * 1024, copias=3)
+        agrupador = AgrupadorIntentos(logger, ventana=60.0, enfriamiento=300.0)
+
+        async def manejar(user_id, chat_id, username):
+            es_nuevo, responder = agrupador.registrar(user_id, chat_id, username)
+            if responder:
+                await respuestas.enviar()
+
+        def cerrar():
+            agrupador.vaciar(todo=True)
+            listener.stop()
+
+    retrasos = []
+    parar = asyncio.Event()
+    tarea_latido = asyncio.create_task(latido(retrasos, parar))
+    inicio = time.perf_counter()
+    await flood(manejar, updates, intrusos)
+    segundos = time.perf_counter() - inicio
+    parar.set()
+    await tarea_latido
+    cerrar()
+
+    retrasos.sort()
+    p99 = retrasos[int(0.99 * (len(retrasos) - 1))] if retrasos else 0.0
+    maximo = retrasos[-1] if retrasos else 0.0
+    bytes_log = sum(os.path.getsize(os.path.join(directorio, f)) for f in os.listdir(directorio)
+                    if f.startswith(nombre))
+    with open(ruta, encoding="utf-8") as fichero:
+        lineas = sum(1 for _ in fichero)
+    print(f"{nombre:>8} {updates / segundos:>10.0f} {p99 * 1000:>12.2f} {maximo * 1000:>12.2f} "
+          f"{lineas:>10} {bytes_log / 1024:>10.0f} {respuestas.enviadas:>10}")
+
+
+async def main():
+    updates = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    intrusos = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    print(f"{updates} updates de {intrusos} intrusos")
+    print(f"{'modo':>8} {'updates/s':>10} {'bloqueo p99':>12} {'bloqueo máx':>12} "
+          f"{'líneas log':>10} {'KiB disco':>10} {'respuestas':>10}")
+    with tempfile.TemporaryDirectory() as directorio:
+        await escenario("antes", directorio, updates, intrusos)
+        await escenario("despues", directorio, updates, intrusos)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
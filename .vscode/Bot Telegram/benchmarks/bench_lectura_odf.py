@@ -0,0 +1,147 @@
+"""
+Benchmark de lectura de .odt/.ods: DOM de odfpy + pyexcel ("antes") frente a
+los lectores en streaming de convertir_preguntas ("después").
+
+Genera documentos de examen de distintos tamaños (preguntas con cuatro
+opciones, con negritas, espacios múltiples y saltos de línea) y una hoja de
+respuestas, comprueba que ambos caminos producen los mismos bloques de
+pregunta y las mismas respuestas, y mide tiempo y pico de RSS. Cada medida
+se hace en un proceso nuevo para que el pico de memoria sea el de esa lectura.
+
+Requiere odfpy y pyexcel-ods3 (para generar los ficheros y para "antes").
+
+Uso: python benchmarks/bench_lectura_odf.py [preguntas ...]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+DIR_BOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIR_BOT)
+
+import convertir_preguntas
+
+
+def pico_rss_kb():
+    """Pico de RSS del proceso (VmHWM de /proc, Linux). ru_maxrss no sirve aquí:
+    en Linux el hijo hereda el pico del proceso padre que lo lanzó."""
+    try:
+        with open("/proc/self/status") as f:
+            for linea in f:
+                if linea.startswith("VmHWM:"):
+                    return int(linea.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+# --- Camino anterior (odfpy / pyexcel), tal como estaba en convertir_preguntas.py ---
+
+def antes_texto_odt(path):
+    from odf.opendocument import load
+    from odf import text as odftext
+    from odf import teletype
+    doc = load(path)
+    paras = doc.getElementsByType(odftext.P)
+    lines = [teletype.extractText(p).strip() for p in paras if teletype.extractText(p).strip()]
+    return "\n".join(lines)
+
+
+def antes_filas_ods(path):
+    from pyexcel_ods3 import get_data
+    data = get_data(path)
+    return data[next(iter(data.keys()))]
+
+
+def leer(modo, odt, ods):
+    """Bloques de pregunta y filas de respuestas por el camino indicado (iteradores)"""
+    if modo == "antes":
+        bloques = convertir_preguntas.split_questions_from_text(antes_texto_odt(odt))
+        filas = antes_filas_ods(ods)
+    else:
+        bloques = convertir_preguntas.split_questions_from_text(convertir_preguntas.iterar_lineas_odt(odt))
+        filas = convertir_preguntas.iterar_filas_ods(ods)
+    return bloques, filas
+
+
+def generar(directorio, preguntas):
+    from odf.opendocument import OpenDocumentText
+    from odf.style import Style, TextProperties
+    from odf.text import LineBreak, P, S, Span
+    from pyexcel_ods3 import save_data
+
+    doc = OpenDocumentText()
+    negrita = Style(name="Negrita", family="text")
+    negrita.addElement(TextProperties(fontweight="bold"))
+    doc.automaticstyles.addElement(negrita)
+    for i in range(1, preguntas + 1):
+        # split_questions_from_text reconoce números de hasta 3 cifras: numerar por secciones
+        p = P(text=f"{(i - 1) % 999 + 1}. ¿Cuál es la respuesta ")
+        p.addElement(Span(stylename=negrita, text="correcta"))
+        p.addText(f" de la pregunta {i}?")
+        p.addElement(S(c=3))
+        p.addText("(un punto)")
+        doc.text.addElement(p)
+        for letra in "ABCD":
+            opcion = P(text=f"{letra}) Opción {letra}")
+            if letra == "D":
+                opcion.addElement(LineBreak())
+                opcion.addText("con una segunda línea")
+            doc.text.addElement(opcion)
+        doc.text.addElement(P(text=""))
+    odt = os.path.join(directorio, f"preguntas_tema1_bloque{preguntas}.odt")
+    doc.save(odt)
+
+    ods = os.path.join(directorio, f"respuestas_tema1_bloque{preguntas}.ods")
+    save_data(ods, {"Respuestas": [["id", "respuesta"]] + [[i, "ABCD"[i % 4]] for i in range(1, preguntas + 1)]})
+    return odt, ods
+
+
+def medir_en_proceso(modo, odt, ods):
+    """Se ejecuta en el proceso hijo: imprime segundos, pico de RSS (KiB) y nº de bloques"""
+    inicio = time.perf_counter()
+    bloques, filas = leer(modo, odt, ods)
+    # Se recorren sin guardarlos: se mide lo que cuesta leer, no el resultado
+    num_bloques = sum(1 for _ in bloques)
+    num_filas = sum(1 for _ in filas)
+    segundos = time.perf_counter() - inicio
+    print(segundos, pico_rss_kb(), num_bloques, num_filas)
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--hijo":
+        medir_en_proceso(*sys.argv[2:5])
+        return
+
+    tamaños = [int(a) for a in sys.argv[1:]] or [1000, 5000, 20000]
+    # RSS de un proceso que solo importa este módulo, para restarlo
+    base = subprocess.run(
+        [sys.executable, "-c", "import sys; sys.path.insert(0, sys.argv[1]); import bench_lectura_odf; "
+         "print(bench_lectura_odf.pico_rss_kb())", os.path.dirname(os.path.abspath(__file__))],
+        capture_output=True, text=True, check=True
+    )
+    rss_base = int(base.stdout)
+    print(f"RSS base (intérprete + convertir_preguntas): {rss_base / 1024:.1f} MiB; "
+          f"el pico de 'antes' incluye importar odfpy y pyexcel")
+    print(f"{'preguntas':>9} {'KiB odt':>8} {'modo':>8} {'s':>8} {'pico RSS MiB':>13}")
+    with tempfile.TemporaryDirectory() as directorio:
+        for n in tamaños:
+            odt, ods = generar(directorio, n)
+            antes, despues = leer("antes", odt, ods), leer("despues", odt, ods)
+            assert all(list(a) == list(d) for a, d in zip(antes, despues)), "los dos caminos difieren"
+            for modo in ("antes", "despues"):
+                salida = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--hijo", modo, odt, ods],
+                    capture_output=True, text=True, check=True
+                ).stdout.split()
+                segundos, rss = float(salida[0]), int(salida[1])
+                print(f"{n:>9} {os.path.getsize(odt) // 1024:>8} {modo:>8} {segundos:>8.2f} "
+                      f"{(rss - rss_base) / 1024:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
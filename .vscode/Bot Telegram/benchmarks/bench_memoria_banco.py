@@ -0,0 +1,92 @@
+"""
+Benchmark de memoria y tiempo de carga del banco de preguntas.
+
+Compara la lista de dicts original (json.load tal cual) con el QuestionBank
+en columnas para bancos sintéticos de 10k, 100k y 1M preguntas. Cada medida
+se hace en un subproceso aparte para que el RSS no se contamine entre casos.
+
+Uso: python benchmarks/bench_memoria_banco.py [10000 100000 1000000]
+"""
+
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+DIR_BOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIR_BOT)
+
+OPCIONES_COMUNES = ["Todas las anteriores.", "Ninguna de las anteriores.", "Verdadero.", "Falso."]
+
+
+def rss_actual_kb():
+    """RSS actual leyendo /proc (Linux); si no existe, el pico de getrusage"""
+    try:
+        with open("/proc/self/statm") as f:
+            paginas = int(f.read().split()[1])
+        return paginas * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def generar_banco(ruta, n):
+    rnd = random.Random(n)
+    preguntas = []
+    for i in range(n):
+        opciones = [f"Opción {i}-{j} " + "x" * rnd.randint(10, 60) for j in range(3)]
+        opciones.append(rnd.choice(OPCIONES_COMUNES))
+        preguntas.append({
+            "id": i + 1,
+            "bloque": rnd.randint(1, 4),
+            "tema": rnd.randint(1, 10),
+            "pregunta": f"¿Pregunta sintética número {i}? " + "y" * rnd.randint(40, 200),
+            "opciones": opciones,
+            "respuesta_correcta": rnd.randint(0, 3),
+        })
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(preguntas, f, ensure_ascii=False)
+
+
+def medir(modo, ruta):
+    """Se ejecuta dentro del subproceso: carga el banco y mide"""
+    from banco_preguntas import QuestionBank
+
+    gc.collect()
+    base = rss_actual_kb()
+    inicio = time.perf_counter()
+    with open(ruta, "rb") as f:
+        if modo == "columnas":
+            datos = QuestionBank.desde_json(f.read())
+        else:
+            datos = json.load(f)
+    segundos = time.perf_counter() - inicio
+    gc.collect()
+    print(json.dumps({"segundos": segundos, "rss_kb": rss_actual_kb() - base, "n": len(datos)}))
+
+
+def main():
+    tamanos = [int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    print(f"{'preguntas':>10} {'modo':>10} {'carga (s)':>10} {'RSS (MB)':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in tamanos:
+            ruta = os.path.join(tmp, f"banco_{n}.json")
+            generar_banco(ruta, n)
+            for modo in ("dicts", "columnas"):
+                salida = subprocess.run(
+                    [sys.executable, __file__, "--medir", modo, ruta],
+                    capture_output=True, text=True, check=True
+                ).stdout
+                r = json.loads(salida)
+                print(f"{n:>10} {modo:>10} {r['segundos']:>10.2f} {r['rss_kb'] / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--medir":
+        medir(sys.argv[2], sys.argv[3])
+    else:
+        main()
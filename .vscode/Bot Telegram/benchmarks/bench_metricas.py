@@ -0,0 +1,118 @@
+"""
+Coste de las métricas (metricas.py) en el camino caliente y al servirlas.
+
+Mide:
+  - un handler vacío con y sin @cronometrar (la diferencia es lo que añade
+    cada update),
+  - registrar_llamada_api por llamada,
+  - exponer() con 20 handlers y 6 métodos de la API ya rellenos, y una
+    lectura real de GET /metrics por HTTP,
+y comprueba que las cubetas servidas son acumulativas y cuadran con _count.
+
+Uso: python benchmarks/bench_metricas.py [iteraciones]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+DIR_BOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIR_BOT)
+
+from metricas import Metricas, crear_servidor_metricas
+
+
+async def vacio(update, context):
+    return None
+
+
+async def reply_text(texto):
+    return None
+
+
+async def por_iteracion(corrutina, n):
+    inicio = time.perf_counter()
+    for _ in range(n):
+        await corrutina(None, None)
+    return (time.perf_counter() - inicio) / n
+
+
+async def leer(host, puerto):
+    reader, writer = await asyncio.open_connection(host, puerto)
+    writer.write(f"GET /metrics HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    datos = await reader.read()
+    writer.close()
+    return datos.partition(b"\r\n\r\n")[2].decode()
+
+
+def comprobar(texto):
+    cubetas = {}
+    for linea in texto.splitlines():
+        if linea.startswith("bot_handler_duracion_segundos_bucket"):
+            etiquetas, valor = linea.rsplit(" ", 1)
+            handler = etiquetas.split('"')[1]
+            cubetas.setdefault(handler, []).append(int(valor))
+        elif linea.startswith("bot_handler_duracion_segundos_count"):
+            etiquetas, valor = linea.rsplit(" ", 1)
+            handler = etiquetas.split('"')[1]
+            serie = cubetas[handler]
+            assert serie == sorted(serie), "las cubetas deben ser acumulativas"
+            assert serie[-1] == int(valor), "+Inf debe coincidir con _count"
+
+
+async def medir(n):
+    metricas = Metricas()
+    base = await por_iteracion(vacio, n)
+    cronometrado = await por_iteracion(metricas.cronometrar(vacio), n)
+    print(f"handler vacío: {base * 1e6:.3f} µs, con @cronometrar: {cronometrado * 1e6:.3f} µs "
+          f"(+{(cronometrado - base) * 1e6:.3f} µs/update)")
+
+    inicio = time.perf_counter()
+    for i in range(n):
+        metricas.registrar_llamada_api(reply_text, i % 97 / 1000)
+    print(f"registrar_llamada_api: {(time.perf_counter() - inicio) / n * 1e6:.3f} µs/llamada")
+
+    for i in range(20):
+        async def handler(update, context):
+            return None
+        handler.__name__ = f"handler_{i}"
+        envuelto = metricas.cronometrar(handler)
+        for _ in range(100):
+            await envuelto(None, None)
+    for nombre in ("send_message", "edit_message_text", "answer", "get_updates", "set_webhook"):
+        async def metodo():
+            return None
+        metodo.__name__ = nombre
+        metricas.registrar_llamada_api(metodo, 0.02, RuntimeError() if nombre == "answer" else None)
+    metricas.denegar("usuario")
+    metricas.medidor("bot_sesiones_activas", "Tests en curso", lambda: 1234)
+
+    repeticiones = 1000
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        texto = metricas.exponer()
+    print(f"exponer(): {(time.perf_counter() - inicio) / repeticiones * 1e3:.3f} ms, "
+          f"{len(texto.splitlines())} líneas, {len(texto.encode()) / 1024:.1f} KiB")
+    comprobar(texto)
+
+    servidor = crear_servidor_metricas(metricas, "127.0.0.1", 0)
+    await servidor.iniciar()
+    try:
+        inicio = time.perf_counter()
+        for _ in range(100):
+            texto = await leer(servidor.host, servidor.puerto)
+        print(f"GET /metrics por HTTP: {(time.perf_counter() - inicio) / 100 * 1e3:.3f} ms")
+        comprobar(texto)
+    finally:
+        await servidor.detener()
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    asyncio.run(medir(n))
+
+
+if __name__ == "__main__":
+    main()
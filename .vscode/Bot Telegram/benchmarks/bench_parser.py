@@ -0,0 +1,162 @@
+"""
+Benchmark del parser de preguntas de convertir_preguntas.
+
+1. Corpus dorado (benchmarks/corpus_parser): cada `X.txt` debe dar
+   exactamente las preguntas de `X.esperado.json`, y los casos de
+   `respuestas.json` los índices de `respuestas.esperado.json`. Los ficheros
+   esperados se generaron con el parser anterior (split_questions_from_text +
+   extract_options_and_question con re sin compilar y options_cache).
+2. Equivalencia aleatoria: documentos generados mezclando los casos raros del
+   corpus, comparados con la copia del parser anterior que hay aquí abajo.
+3. Rendimiento en preguntas/s: "antes" (bloques + extracción) frente a
+   iterar_preguntas (una sola pasada).
+
+Uso: python benchmarks/bench_parser.py [preguntas] [repeticiones]
+"""
+
+import glob
+import json
+import os
+import random
+import re
+import sys
+import time
+
+DIR_BOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIR_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus_parser")
+sys.path.insert(0, DIR_BOT)
+
+import convertir_preguntas
+
+
+# --- Parser anterior, tal como estaba en convertir_preguntas.py ---
+
+def antes_split(text):
+    lines = text.splitlines() if isinstance(text, str) else text
+    current = None
+    for ln in lines:
+        m = re.match(r'^\s*(\d{1,3})[\.|\)]\s*(.*)', ln)
+        if m:
+            if current:
+                yield current
+            current = m.group(2).strip()
+        else:
+            if current is None:
+                continue
+            else:
+                current += '\n' + ln.strip()
+    if current:
+        yield current
+
+
+def antes_extract(block):
+    lines = block.splitlines()
+    question_lines = []
+    options = []
+    opt_pattern = re.compile(r'^\s*([A-Da-d]|\d+)\s*[\)\.|\-:]\s*(.+)')
+    for ln in lines:
+        m = opt_pattern.match(ln)
+        if m:
+            options.append(m.group(2).strip())
+        else:
+            if ';' in ln and (re.search(r'\bA\)', ln) is None):
+                parts = [p.strip() for p in ln.split(';') if p.strip()]
+                if len(parts) >= 2 and all(len(p.split()) < 40 for p in parts):
+                    options.extend(parts)
+                else:
+                    question_lines.append(ln)
+            else:
+                question_lines.append(ln)
+    question_text = ' '.join(question_lines).strip()
+    if not options:
+        m = re.search(r'Opciones[:\-]\s*(.+)', block, re.IGNORECASE)
+        if m:
+            options = [p.strip() for p in re.split('[;\n]', m.group(1)) if p.strip()]
+    return question_text, options
+
+
+def antes(lineas):
+    return [antes_extract(b) for b in antes_split(lineas)]
+
+
+def despues(lineas):
+    return list(convertir_preguntas.iterar_preguntas(lineas))
+
+
+# --- Corpus ---
+
+def comprobar_corpus():
+    for ruta in sorted(glob.glob(os.path.join(DIR_CORPUS, "*.txt"))):
+        with open(ruta, encoding="utf-8") as f:
+            lineas = f.read().splitlines()
+        with open(ruta[:-4] + ".esperado.json", encoding="utf-8") as f:
+            esperado = [(p["pregunta"], p["opciones"]) for p in json.load(f)]
+        obtenido = despues(lineas)
+        por_bloques = [convertir_preguntas.extract_options_and_question(b)
+                       for b in convertir_preguntas.split_questions_from_text(lineas)]
+        assert obtenido == esperado, f"{os.path.basename(ruta)}: iterar_preguntas difiere"
+        assert por_bloques == esperado, f"{os.path.basename(ruta)}: split + extract difiere"
+        print(f"  {os.path.basename(ruta)}: {len(esperado)} preguntas idénticas")
+
+    with open(os.path.join(DIR_CORPUS, "respuestas.json"), encoding="utf-8") as f:
+        casos = json.load(f)
+    with open(os.path.join(DIR_CORPUS, "respuestas.esperado.json"), encoding="utf-8") as f:
+        esperado = json.load(f)
+    obtenido = [convertir_preguntas.answer_value_to_index(val, len(opciones), convertir_preguntas.indice_opciones(opciones))
+                for val, opciones in casos]
+    assert obtenido == esperado, f"answer_value_to_index difiere: {obtenido}"
+    print(f"  respuestas.json: {len(casos)} casos idénticos")
+
+
+def lineas_aleatorias(rng, n):
+    """n líneas mezclando las del corpus con variaciones de espacios"""
+    plantillas = []
+    for ruta in glob.glob(os.path.join(DIR_CORPUS, "*.txt")):
+        with open(ruta, encoding="utf-8") as f:
+            plantillas.extend(f.read().splitlines())
+    plantillas += ["", "   ", "Opciones:", "opciones-", "A)", "1.", "x; y", "A) a; b"]
+    return [rng.choice(["", " ", "\t"]) + rng.choice(plantillas) + rng.choice(["", "  "]) for _ in range(n)]
+
+
+def documento(preguntas):
+    """Documento típico: enunciado de dos líneas y cuatro opciones"""
+    lineas = []
+    for i in range(1, preguntas + 1):
+        lineas.append(f"{(i - 1) % 999 + 1}. ¿Cuál es la respuesta correcta de la pregunta {i}?")
+        lineas.append("Señale solo una de las siguientes (un punto)")
+        for letra in "ABCD":
+            lineas.append(f"{letra}) Opción {letra} de la pregunta {i}")
+    return lineas
+
+
+def main():
+    preguntas = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    repeticiones = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    print("Corpus dorado:")
+    comprobar_corpus()
+
+    rng = random.Random(16)
+    for _ in range(300):
+        lineas = lineas_aleatorias(rng, rng.randint(1, 60))
+        assert antes(lineas) == despues(lineas), f"difiere con:\n" + "\n".join(lineas)
+    print("Equivalencia aleatoria: 300 documentos idénticos")
+
+    lineas = documento(preguntas)
+    assert antes(lineas) == despues(lineas)
+    print(f"\n{preguntas} preguntas ({len(lineas)} líneas), mejor de {repeticiones}")
+    print(f"{'modo':>8} {'s':>8} {'preguntas/s':>12}")
+    mejores = {}
+    for nombre, funcion in (("antes", antes), ("despues", despues)):
+        mejor = float("inf")
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            funcion(lineas)
+            mejor = min(mejor, time.perf_counter() - inicio)
+        mejores[nombre] = mejor
+        print(f"{nombre:>8} {mejor:>8.3f} {preguntas / mejor:>12.0f}")
+    print(f"mejora x{mejores['antes'] / mejores['despues']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
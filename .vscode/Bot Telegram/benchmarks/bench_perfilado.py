@@ -0,0 +1,79 @@
+"""
+Coste del perfilado bajo demanda (perfilado.py).
+
+Mide un handler vacío sin decorar, con @perfilar y sin captura (lo que
+cuesta tenerlo siempre puesto), durante un muestreo de 1 de cada 10 y
+durante una captura cProfile, y escribe el informe de una captura corta
+con un handler que gasta CPU y otro que espera (como una llamada a Telegram).
+
+Uso: python benchmarks/bench_perfilado.py [iteraciones]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+DIR_BOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIR_BOT)
+
+from perfilado import Perfilador
+
+
+async def vacio(update, context):
+    return None
+
+
+async def calcular(update, context):
+    return sum(i * i for i in range(20000))
+
+
+async def esperar(update, context):
+    await asyncio.sleep(0.005)
+
+
+async def por_iteracion(corrutina, n):
+    inicio = time.perf_counter()
+    for _ in range(n):
+        await corrutina(None, None)
+    return (time.perf_counter() - inicio) / n
+
+
+async def medir(n):
+    with tempfile.TemporaryDirectory() as tmp:
+        perfilador = Perfilador(tmp)
+        envuelto = perfilador.perfilar(vacio)
+        base = await por_iteracion(vacio, n)
+        apagado = await por_iteracion(envuelto, n)
+        print(f"handler vacío: {base * 1e6:.3f} µs, con @perfilar apagado: {apagado * 1e6:.3f} µs "
+              f"(+{(apagado - base) * 1e6:.3f} µs/update)")
+
+        resumenes = []
+
+        async def guardar(resumen):
+            resumenes.append(resumen)
+
+        for modo, cada in (("muestreo", 10), ("cprofile", 1)):
+            perfilador.iniciar(modo, 60, cada, guardar)
+            activo = await por_iteracion(envuelto, n // 10)
+            await perfilador.detener()
+            print(f"con captura {modo}: {activo * 1e6:.3f} µs/update")
+
+        perfilador.iniciar("cprofile", 1, al_terminar=guardar)
+        cpu, io = perfilador.perfilar(calcular), perfilador.perfilar(esperar)
+        await asyncio.gather(*(cpu(None, None) for _ in range(20)), *(io(None, None) for _ in range(20)))
+        perfilador.anotar("recarga_banco", 0.25)
+        await perfilador.detener()
+        print("\n" + resumenes[-1])
+        ficheros = sorted(os.listdir(tmp))
+        assert any(f.endswith(".prof") for f in ficheros) and any(f.endswith(".txt") for f in ficheros)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    asyncio.run(medir(n))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark de throughput de respuestas con y sin persistencia de sesiones.
+
+Simula muchos usuarios respondiendo a la vez: cada respuesta hace lo mismo
+que manejar_respuesta (TestSession.responder + almacen.guardar) y cede el
+event loop. Con SQLite el volcado por lotes corre en paralelo; el tiempo
+incluye el último volcado para que no se escondan escrituras pendientes.
+
+Uso: python benchmarks/bench_persistencia.py [usuarios] [preguntas_por_test]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+DIR_BOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIR_BOT)
+
+from almacen_sesiones import AlmacenSesiones, AlmacenSQLite
+from banco_preguntas import QuestionBank
+from sesiones import TestSession
+
+
+async def usuario(user_id, banco, almacen, cantidad):
+    sesion = TestSession(banco, banco.muestrear(range(len(banco)), cantidad), "aleatorio", None, cantidad)
+    almacen.guardar(user_id, sesion)
+    while not sesion.terminado:
+        sesion.responder(random.randrange(4))
+        almacen.guardar(user_id, sesion)
+        await asyncio.sleep(0)
+    almacen.borrar(user_id)
+
+
+async def medir(nombre, almacen, banco, usuarios, cantidad):
+    tarea_volcado = asyncio.create_task(almacen.vaciar_periodicamente())
+    inicio = time.perf_counter()
+    await asyncio.gather(*(usuario(uid, banco, almacen, cantidad) for uid in range(usuarios)))
+    await almacen.vaciar()
+    segundos = time.perf_counter() - inicio
+    tarea_volcado.cancel()
+    await almacen.cerrar()
+    total = usuarios * cantidad
+    print(f"{nombre:>20} {total:>10} {segundos:>10.3f} {total / segundos:>14.0f}")
+
+
+async def main():
+    usuarios = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    cantidad = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    banco = QuestionBank(
+        {"id": i, "bloque": 1, "tema": 1, "pregunta": f"P{i}", "opciones": ["A", "B", "C", "D"],
+         "respuesta_correcta": i % 4}
+        for i in range(5000)
+    )
+    print(f"{'almacén':>20} {'respuestas':>10} {'tiempo(s)':>10} {'respuestas/s':>14}")
+    await medir("memoria", AlmacenSesiones(), banco, usuarios, cantidad)
+    with tempfile.TemporaryDirectory() as tmp:
+        for intervalo in (0.05, 1.0):
+            almacen = AlmacenSQLite(os.path.join(tmp, f"sesiones_{intervalo}.db"), intervalo=intervalo)
+            await medir(f"sqlite (lote {intervalo}s)", almacen, banco, usuarios, cantidad)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+"""
+Benchmark de procesar_preguntas: reconstrucción tras cambiar un fichero.
+
+Genera un corpus sintético de `ficheros` temaX_bloqueY.json con
+`preguntas` preguntas cada uno y mide:
+  - completo: reprocesar todo ignorando el manifiesto (lo que se hacía siempre),
+  - sin cambios: segunda ejecución con el manifiesto,
+  - 1 cambio: tras modificar una pregunta de un solo fichero.
+Comprueba además que los IDs de los ficheros no tocados no cambian.
+
+Uso: python benchmarks/bench_procesar.py [ficheros] [preguntas] [--compacto]
+"""
+
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+DIR_BOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIR_BOT)
+
+from procesar_preguntas import procesar_preguntas
+
+
+def generar_corpus(directorio, ficheros, preguntas):
+    for f in range(ficheros):
+        tema, bloque = 1 + f // 4, 1 + f % 4
+        contenido = [
+            {"id": i + 1, "pregunta": f"¿Pregunta {i} del tema {tema}, bloque {bloque}? " + "texto " * 20,
+             "opciones": [f"Opción {j} de la pregunta {i}" for j in range(4)], "respuesta_correcta": i % 4}
+            for i in range(preguntas)
+        ]
+        with open(os.path.join(directorio, f"tema{tema}_bloque{bloque}.json"), "w", encoding="utf-8") as fh:
+            json.dump(contenido, fh, ensure_ascii=False, indent=2)
+
+
+def medir(nombre, **kwargs):
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        resultado = procesar_preguntas(**kwargs)
+    segundos = time.perf_counter() - inicio
+    print(f"{nombre:>12} {segundos * 1000:>10.1f} {resultado['reprocesados']:>12} {resultado['preguntas']:>10}")
+    return segundos
+
+
+def main():
+    argumentos = [a for a in sys.argv[1:] if not a.startswith("--")]
+    ficheros = int(argumentos[0]) if argumentos else 500
+    preguntas = int(argumentos[1]) if len(argumentos) > 1 else 40
+    compacto = "--compacto" in sys.argv
+
+    with tempfile.TemporaryDirectory() as raiz:
+        fuentes = os.path.join(raiz, "tests")
+        os.makedirs(fuentes)
+        generar_corpus(fuentes, ficheros, preguntas)
+        salida = os.path.join(raiz, "preguntas.json")
+        opciones = {"directorio": fuentes, "ruta_salida": salida, "compacto": compacto}
+
+        print(f"{ficheros} ficheros x {preguntas} preguntas ({'compacto' if compacto else 'indentado'})")
+        print(f"{'escenario':>12} {'ms':>10} {'reprocesados':>12} {'preguntas':>10}")
+        t_completo = medir("completo", completo=True, **opciones)
+        with open(salida, encoding="utf-8") as fh:
+            ids_antes = [p["id"] for p in json.load(fh)]
+        medir("sin cambios", **opciones)
+
+        # Cambiar el enunciado de una pregunta de un fichero
+        ruta = os.path.join(fuentes, "tema1_bloque1.json")
+        with open(ruta, encoding="utf-8") as fh:
+            contenido = json.load(fh)
+        contenido[0]["pregunta"] += " (revisada)"
+        with open(ruta, "w", encoding="utf-8") as fh:
+            json.dump(contenido, fh, ensure_ascii=False, indent=2)
+        t_cambio = medir("1 cambio", **opciones)
+
+        with open(salida, encoding="utf-8") as fh:
+            ids_despues = [p["id"] for p in json.load(fh)]
+        distintos = sum(a != b for a, b in zip(ids_antes, ids_despues))
+        print(f"IDs cambiados: {distintos} (esperado 1); mejora x{t_completo / t_cambio:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Micro-benchmark del coste de CPU por pregunta en los handlers.
+
+"antes": lo que hacía mostrar_pregunta en cada pregunta (construir los
+InlineKeyboardButton, el InlineKeyboardMarkup y formatear el texto) más la
+conversión del markup de la pregunta.
+"después": búsqueda en la CacheRender construida al cargar el banco.
+
+Requiere python-telegram-bot instalado (se miden sus objetos reales).
+
+Uso: python benchmarks/bench_render.py [ruta_preguntas.json] [repeticiones]
+"""
+
+import os
+import sys
+import time
+
+DIR_BOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIR_BOT)
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from banco_preguntas import leer_banco
+from renderizado import markdown_a_html, preparar_banco, texto_boton
+
+
+def antes(banco, idx, num, total):
+    pregunta = banco[idx]
+    keyboard = []
+    for i, opcion in enumerate(pregunta.opciones):
+        keyboard.append([InlineKeyboardButton(texto_boton(opcion), callback_data=f"respuesta_{idx}_{i}")])
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    mensaje = f"📝 Pregunta {num + 1}/{total}\n\n{markdown_a_html(pregunta.pregunta)}"
+    return mensaje, reply_markup
+
+
+def despues(banco, idx, num, total):
+    render = banco.render
+    mensaje = f"📝 Pregunta {num + 1}/{total}\n\n{render.textos[idx]}"
+    return mensaje, render.teclados[idx]
+
+
+def medir(nombre, funcion, banco, repeticiones):
+    n = len(banco)
+    inicio = time.process_time()
+    for r in range(repeticiones):
+        for idx in range(n):
+            funcion(banco, idx, idx, n)
+    segundos = time.process_time() - inicio
+    por_pregunta = segundos / (repeticiones * n) * 1e6
+    print(f"{nombre:>8} {por_pregunta:>14.2f}")
+    return por_pregunta
+
+
+def main():
+    ruta = sys.argv[1] if len(sys.argv) > 1 else os.path.join(DIR_BOT, "preguntas.json")
+    repeticiones = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    inicio = time.perf_counter()
+    banco, _ = leer_banco(ruta, preparar_banco)
+    print(f"{len(banco)} preguntas; banco + caché construidos en {time.perf_counter() - inicio:.3f} s")
+    print(f"{'modo':>8} {'µs CPU/pregunta':>14}")
+    t_antes = medir("antes", antes, banco, repeticiones)
+    t_despues = medir("después", despues, banco, repeticiones)
+    print(f"Mejora: x{t_antes / t_despues:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark de la selección de preguntas: uniforme frente a adaptativa.
+
+Con un banco sintético de 100k preguntas (por defecto) mide:
+  - construir el árbol de pesos de un conjunto (una vez por usuario, conjunto y banco),
+  - elegir k = 10, 50 y 100 preguntas: banco.muestrear (random.sample)
+    frente a SelectorAdaptativo.muestrear con el árbol ya construido,
+  - registrar una respuesta (actualiza la tasa y el árbol, O(log n)),
+y comprueba que las preguntas falladas salen más que las acertadas.
+
+Uso: python benchmarks/bench_seleccion.py [100000 ...]
+"""
+
+import os
+import random
+import sys
+import time
+
+DIR_BOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIR_BOT)
+
+from banco_preguntas import QuestionBank
+from seleccion_adaptativa import SelectorAdaptativo
+
+
+def generar_banco(n):
+    rnd = random.Random(n)
+    return QuestionBank({
+        "id": i + 1,
+        "bloque": rnd.randint(1, 4),
+        "tema": rnd.randint(1, 10),
+        "pregunta": f"¿Pregunta {i}?",
+        "opciones": ["a", "b", "c", "d"],
+        "respuesta_correcta": rnd.randint(0, 3),
+    } for i in range(n))
+
+
+def cronometrar(funcion, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) / repeticiones * 1e6
+
+
+def medir(n):
+    banco = generar_banco(n)
+    indices = banco.indices("aleatorio")
+    clave = ("aleatorio", None)
+    print(f"\n== {n} preguntas ==")
+
+    selector = SelectorAdaptativo(rng=random.Random(1))
+    inicio = time.perf_counter()
+    selector.muestrear(1, banco, clave, indices, 1)
+    print(f"  árbol (primer test del usuario)  {(time.perf_counter() - inicio) * 1e3:8.1f} ms")
+
+    # Historial realista: el usuario ha respondido 2000 preguntas, falla el 30 %
+    rnd = random.Random(2)
+    for indice in rnd.sample(indices, 2000):
+        selector.registrar(1, banco, indice, rnd.random() > 0.3)
+
+    for k in (10, 50, 100):
+        uniforme = cronometrar(lambda: banco.muestrear(indices, k), 2000)
+        adaptativa = cronometrar(lambda: selector.muestrear(1, banco, clave, indices, k), 2000)
+        print(f"  k={k:<4} uniforme {uniforme:8.1f} µs   adaptativa {adaptativa:8.1f} µs")
+
+    respuestas = [rnd.choice(indices) for _ in range(20000)]
+    posicion = iter(respuestas)
+    registrar = cronometrar(lambda: selector.registrar(1, banco, next(posicion), True), len(respuestas))
+    print(f"  registrar respuesta              {registrar:8.1f} µs")
+
+    # Preguntas siempre falladas frente a siempre acertadas (fuera de la ventana de recientes)
+    reloj = [0.0]
+    selector = SelectorAdaptativo(ventana_reciente=1, rng=random.Random(3), reloj=lambda: reloj[0])
+    falladas = set(rnd.sample(indices, 1000))
+    acertadas = set(rnd.sample([i for i in indices if i not in falladas], 1000))
+    for indice in falladas:
+        selector.registrar(2, banco, indice, False)
+    for indice in acertadas:
+        selector.registrar(2, banco, indice, True)
+    reloj[0] = 10.0
+    cuenta_falladas = cuenta_acertadas = 0
+    for _ in range(200):
+        elegidas = selector.muestrear(2, banco, clave, indices, 100)
+        cuenta_falladas += sum(i in falladas for i in elegidas)
+        cuenta_acertadas += sum(i in acertadas for i in elegidas)
+    print(f"  veces elegidas: falladas {cuenta_falladas}, acertadas {cuenta_acertadas}")
+    assert cuenta_falladas > cuenta_acertadas
+
+
+def main():
+    for n in [int(a) for a in sys.argv[1:]] or [100000]:
+        medir(n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark de memoria/asignaciones de las sesiones de test.
+
+Simula 1.000 usuarios haciendo a la vez un test de 100 preguntas y compara
+el estado antiguo (dict con lista de preguntas + un dict por respuesta) con
+TestSession (índices + bytearrays). Mide memoria con tracemalloc y el número
+de objetos que sigue el recolector de basura.
+
+Uso: python benchmarks/bench_sesiones.py [usuarios] [preguntas_por_test]
+"""
+
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+DIR_BOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIR_BOT)
+
+from banco_preguntas import QuestionBank
+from sesiones import TestSession
+
+
+def banco_sintetico(n=5000):
+    return QuestionBank(
+        {"id": i + 1, "bloque": 1 + i % 4, "tema": 1 + i % 9, "pregunta": f"Pregunta {i}",
+         "opciones": ["A", "B", "C", "D"], "respuesta_correcta": i % 4}
+        for i in range(n)
+    )
+
+
+def sesiones_dict(banco, usuarios, cantidad):
+    sesiones = {}
+    for uid in range(usuarios):
+        sesiones[uid] = {
+            "pregunta_actual": 0, "respuestas": [], "puntuacion": 0,
+            "preguntas": [banco[i] for i in banco.muestrear(range(len(banco)), cantidad)],
+        }
+    for sesion in sesiones.values():
+        for num, pregunta in enumerate(sesion["preguntas"]):
+            respuesta = random.randrange(4)
+            correcta = respuesta == pregunta.respuesta_correcta
+            sesion["puntuacion"] += correcta
+            sesion["respuestas"].append({
+                "pregunta": num, "respuesta_usuario": respuesta,
+                "respuesta_correcta": pregunta.respuesta_correcta, "correcta": correcta,
+            })
+            sesion["pregunta_actual"] += 1
+    return sesiones
+
+
+def sesiones_compactas(banco, usuarios, cantidad):
+    sesiones = {}
+    for uid in range(usuarios):
+        indices = banco.muestrear(range(len(banco)), cantidad)
+        sesiones[uid] = TestSession(banco, indices, "aleatorio", None, cantidad)
+    for sesion in sesiones.values():
+        while not sesion.terminado:
+            sesion.responder(random.randrange(4))
+    return sesiones
+
+
+def medir(nombre, funcion, banco, usuarios, cantidad):
+    gc.collect()
+    objetos_antes = len(gc.get_objects())
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    sesiones = funcion(banco, usuarios, cantidad)
+    segundos = time.perf_counter() - inicio
+    actual, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    objetos = len(gc.get_objects()) - objetos_antes
+    print(f"{nombre:>10} {segundos:>9.3f} {actual / 2**20:>11.2f} {pico / 2**20:>10.2f} {objetos:>12}")
+    return sesiones
+
+
+def main():
+    usuarios = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    cantidad = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    banco = banco_sintetico()
+    print(f"{usuarios} sesiones concurrentes x {cantidad} preguntas")
+    print(f"{'modo':>10} {'tiempo(s)':>9} {'memoria(MB)':>11} {'pico(MB)':>10} {'objetos GC':>12}")
+    medir("dicts", sesiones_dict, banco, usuarios, cantidad)
+    medir("compacto", sesiones_compactas, banco, usuarios, cantidad)
+
+
+if __name__ == "__main__":
+    main()
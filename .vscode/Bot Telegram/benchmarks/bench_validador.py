@@ -0,0 +1,121 @@
+"""
+Benchmark del validador sobre miles de ficheros temaX_bloqueY.json.
+
+Escenarios:
+  - antes: el bucle del validador anterior (serie, comprobaciones a mano),
+  - serie / paralelo: validar_directorio sin caché con 1 y con N procesos,
+  - sin cambios: segunda pasada con la caché (solo stat),
+  - 1 cambio: tras modificar un fichero.
+Un 1% de los ficheros lleva un error para comprobar que se detectan igual.
+
+Uso: python benchmarks/bench_validador.py [ficheros] [preguntas] [trabajadores]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+DIR_BOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIR_BOT)
+
+from validator_preguntas import validar_directorio
+
+
+def antes(directorio):
+    """Validador anterior (sin prints); devuelve la lista de errores"""
+    required_fields = ["pregunta", "opciones", "respuesta_correcta"]
+    errors = []
+    for fname in sorted(os.listdir(directorio)):
+        if not fname.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directorio, fname), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            errors.append((fname, f"JSON load error: {e}"))
+            continue
+        if not isinstance(data, list):
+            errors.append((fname, 'Top-level JSON value is not a list'))
+            continue
+        for i, q in enumerate(data, start=1):
+            if not isinstance(q, dict):
+                errors.append((fname, f'Item {i} is not an object'))
+                continue
+            for field in required_fields:
+                if field not in q:
+                    errors.append((fname, f'Item {i} missing field: {field}'))
+            opciones = q.get('opciones')
+            if not isinstance(opciones, list) or len(opciones) < 2:
+                errors.append((fname, f'Item {i} opciones must be a list with >=2 items'))
+            rc = q.get('respuesta_correcta')
+            if not isinstance(rc, int):
+                errors.append((fname, f'Item {i} respuesta_correcta must be an int index'))
+            elif isinstance(opciones, list) and not (0 <= rc < len(opciones)):
+                errors.append((fname, f'Item {i} respuesta_correcta index out of range'))
+    return errors
+
+
+def generar(directorio, ficheros, preguntas):
+    for f in range(ficheros):
+        contenido = [
+            {"id": i + 1, "pregunta": f"¿Pregunta {i} del fichero {f}? " + "texto " * 20,
+             "opciones": [f"Opción {j}" for j in range(4)], "respuesta_correcta": i % 4}
+            for i in range(preguntas)
+        ]
+        if f % 100 == 0:
+            contenido[-1]["respuesta_correcta"] = 7
+        with open(os.path.join(directorio, f"tema{f // 4 + 1}_bloque{f % 4 + 1}.json"), "w", encoding="utf-8") as fh:
+            json.dump(contenido, fh, ensure_ascii=False, indent=2)
+
+
+def medir(nombre, funcion, repeticiones=1):
+    """Mejor tiempo de `repeticiones` (solo los escenarios sin estado se repiten)"""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return nombre, mejor, resultado
+
+
+def main():
+    ficheros = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    preguntas = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    trabajadores = int(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    with tempfile.TemporaryDirectory() as raiz:
+        fuentes = os.path.join(raiz, "tests")
+        os.makedirs(fuentes)
+        generar(fuentes, ficheros, preguntas)
+        cache = os.path.join(raiz, "validador.cache.json")
+        opciones = {"directorio": fuentes, "ruta_banco": None}
+
+        filas = [medir("antes", lambda: antes(fuentes), 3)]
+        errores_antes = len(filas[0][2])
+        filas.append(medir("serie", lambda: validar_directorio(ruta_cache=None, trabajadores=1, **opciones), 3))
+        filas.append(medir("paralelo", lambda: validar_directorio(ruta_cache=cache, trabajadores=trabajadores, **opciones)))
+        filas.append(medir("sin cambios", lambda: validar_directorio(ruta_cache=cache, **opciones)))
+
+        ruta = os.path.join(fuentes, "tema1_bloque2.json")
+        with open(ruta, encoding="utf-8") as fh:
+            contenido = json.load(fh)
+        contenido[0]["pregunta"] += " (revisada)"
+        with open(ruta, "w", encoding="utf-8") as fh:
+            json.dump(contenido, fh, ensure_ascii=False, indent=2)
+        filas.append(medir("1 cambio", lambda: validar_directorio(ruta_cache=cache, **opciones)))
+
+        print(f"{ficheros} ficheros x {preguntas} preguntas, {os.cpu_count()} CPU")
+        print(f"{'escenario':>12} {'s':>8} {'ficheros/s':>11} {'validados':>10} {'errores':>8}")
+        for nombre, segundos, resultado in filas:
+            if isinstance(resultado, list):
+                validados, errores = ficheros, len(resultado)
+            else:
+                validados, errores = resultado["validados"], resultado["errores"]
+            print(f"{nombre:>12} {segundos:>8.3f} {ficheros / segundos:>11.0f} {validados:>10} {errores:>8}")
+        assert all(r[2]["errores"] == errores_antes for r in filas[1:]), "no se detectan los mismos errores"
+
+
+if __name__ == "__main__":
+    main()
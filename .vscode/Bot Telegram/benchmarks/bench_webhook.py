@@ -0,0 +1,130 @@
+"""
+Latencia update -> handler: webhook embebido frente a long polling.
+
+Webhook: se arranca el servidor real de servidor_webhook.py en local y se le
+hace POST de updates (grabadas en un fichero JSON o sintéticas) por una
+conexión keep-alive; se mide desde el envío hasta que `entregar` las recibe.
+
+Polling: se simula un getUpdates largo con un RTT de red configurable: una
+update que llega mientras la respuesta anterior viaja o mientras se envía la
+siguiente petición tiene que esperar a ese ciclo.
+
+Al webhook se le suma RTT/2 (el salto Telegram -> nuestro servidor) para que
+la comparación sea justa.
+
+Uso: python benchmarks/bench_webhook.py [n_updates] [rtt_ms] [updates_grabadas.json]
+"""
+
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+DIR_BOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIR_BOT)
+
+from servidor_webhook import crear_servidor_webhook
+
+SECRETO = "secreto-de-prueba"
+
+
+def updates_sinteticas(n):
+    return [
+        {
+            "update_id": i,
+            "callback_query": {
+                "id": str(i), "chat_instance": "1", "data": f"respuesta_{i % 4}",
+                "from": {"id": 1000 + i % 50, "is_bot": False, "first_name": "Test"},
+            },
+        }
+        for i in range(n)
+    ]
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+async def medir_webhook(updates, intervalo):
+    recibidas = {}
+
+    async def entregar(datos):
+        recibidas[datos["update_id"]] = time.perf_counter()
+
+    servidor = crear_servidor_webhook(entregar, SECRETO, "127.0.0.1", 0, "/webhook")
+    await servidor.iniciar()
+    reader, writer = await asyncio.open_connection("127.0.0.1", servidor.puerto)
+    enviadas = {}
+    for update in updates:
+        cuerpo = json.dumps(update).encode("utf-8")
+        writer.write(
+            b"POST /webhook HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+            + f"X-Telegram-Bot-Api-Secret-Token: {SECRETO}\r\nContent-Length: {len(cuerpo)}\r\n\r\n".encode()
+            + cuerpo
+        )
+        enviadas[update["update_id"]] = time.perf_counter()
+        await writer.drain()
+        # Leer la respuesta (cabeceras + cuerpo vacío)
+        while (await reader.readline()) not in (b"\r\n", b""):
+            pass
+        await asyncio.sleep(random.uniform(0, 2 * intervalo))
+    writer.close()
+    await servidor.detener()
+    return [recibidas[uid] - t for uid, t in enviadas.items()]
+
+
+async def medir_polling(updates, intervalo, rtt):
+    cola = asyncio.Queue()
+    latencias = []
+
+    async def productor():
+        for update in updates:
+            await cola.put((time.perf_counter(), update))
+            await asyncio.sleep(random.uniform(0, 2 * intervalo))
+
+    async def poller():
+        recibidas = 0
+        while recibidas < len(updates):
+            await asyncio.sleep(rtt / 2)           # la petición getUpdates viaja al servidor
+            lote = [await cola.get()]              # long poll: espera a que haya algo
+            while not cola.empty():
+                lote.append(cola.get_nowait())
+            await asyncio.sleep(rtt / 2)           # la respuesta vuelve
+            ahora = time.perf_counter()
+            latencias.extend(ahora - t for t, _ in lote)
+            recibidas += len(lote)
+
+    await asyncio.gather(productor(), poller())
+    return latencias
+
+
+def informe(nombre, latencias):
+    ms = [x * 1000 for x in latencias]
+    print(f"{nombre:>26} {statistics.median(ms):>9.2f} {percentil(ms, 0.95):>9.2f} {percentil(ms, 0.99):>9.2f}")
+
+
+async def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    rtt = (float(sys.argv[2]) if len(sys.argv) > 2 else 100.0) / 1000
+    if len(sys.argv) > 3:
+        with open(sys.argv[3], "r", encoding="utf-8") as f:
+            updates = json.load(f)
+    else:
+        updates = updates_sinteticas(n)
+    # Llegadas con separación aleatoria (media 20 ms) para no ir siempre en fase con el poller
+    intervalo = 0.02
+
+    print(f"{len(updates)} updates, RTT simulado {rtt * 1000:.0f} ms")
+    print(f"{'modo':>26} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9}")
+    local = await medir_webhook(updates, intervalo)
+    informe("webhook (local)", local)
+    informe("webhook (+RTT/2 de red)", [x + rtt / 2 for x in local])
+    informe("polling (simulado)", await medir_polling(updates, intervalo, rtt))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+"""
+Prueba de carga del procesado concurrente con serialización por usuario.
+
+Cada usuario simulado responde a su test y a veces hace doble clic (la misma
+callback_data dos veces). El "handler" reproduce la lógica de
+manejar_respuesta: comprueba que el clic corresponde a la pregunta actual,
+registra la respuesta y espera una llamada a la API con latencia aleatoria.
+
+Modos:
+  - secuencial:            una update detrás de otra (lo que hacía el bot)
+  - concurrente sin lock:  concurrencia a pelo (muestra la corrupción)
+  - concurrente + lock:    concurrencia con BloqueosPorUsuario
+
+Al final se comprueba que ninguna sesión tiene respuestas contadas dos veces
+ni puntuación distinta de la suma de sus aciertos.
+
+Uso: python benchmarks/carga_concurrencia.py [usuarios] [preguntas] [latencia_ms]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+
+DIR_BOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIR_BOT)
+
+from banco_preguntas import QuestionBank
+from concurrencia import BloqueosPorUsuario
+from sesiones import TestSession
+
+
+def crear_updates(sesiones, prob_doble_clic=0.2):
+    """Secuencia de clics (user_id, índice de pregunta, opción) intercalada entre usuarios"""
+    por_usuario = []
+    for user_id, sesion in sesiones.items():
+        clics = []
+        for indice in sesion.indices:
+            clic = (user_id, indice, random.randrange(4))
+            clics.append(clic)
+            if random.random() < prob_doble_clic:
+                clics.append(clic)
+        por_usuario.append(clics)
+    updates = []
+    while por_usuario:
+        cola = random.choice(por_usuario)
+        updates.append(cola.pop(0))
+        if not cola:
+            por_usuario.remove(cola)
+    return updates
+
+
+async def handler(sesiones, clic, latencia, comprobar_actual):
+    user_id, indice, opcion = clic
+    sesion = sesiones[user_id]
+    if sesion.terminado or (comprobar_actual and not sesion.es_pregunta_actual(indice)):
+        await asyncio.sleep(latencia * random.random())   # query.answer del rechazo
+        return
+    # Lectura / escritura separadas por un await, como en el handler real
+    num = sesion.pregunta_actual
+    await asyncio.sleep(latencia * random.random())       # query.answer
+    sesion.respuestas[num] = opcion
+    correcta = opcion == sesion.pregunta(num).respuesta_correcta
+    sesion.aciertos[num] = correcta
+    sesion.puntuacion += correcta
+    sesion.pregunta_actual = num + 1
+    await asyncio.sleep(latencia * random.random())       # edit_message_text
+
+
+async def ejecutar(modo, banco, usuarios, cantidad, latencia):
+    random.seed(1234)
+    sesiones = {
+        uid: TestSession(banco, banco.muestrear(range(len(banco)), cantidad), "aleatorio", None, cantidad)
+        for uid in range(usuarios)
+    }
+    updates = crear_updates(sesiones)
+    bloqueos = BloqueosPorUsuario()
+
+    async def con_lock(clic):
+        async with bloqueos.bloquear(clic[0]):
+            await handler(sesiones, clic, latencia, True)
+
+    inicio = time.perf_counter()
+    if modo == "secuencial":
+        for clic in updates:
+            await handler(sesiones, clic, latencia, True)
+    elif modo == "concurrente sin lock":
+        await asyncio.gather(*(handler(sesiones, clic, latencia, False) for clic in updates))
+    else:
+        await asyncio.gather(*(con_lock(clic) for clic in updates))
+    segundos = time.perf_counter() - inicio
+
+    corruptas = sum(
+        1 for s in sesiones.values()
+        if s.pregunta_actual != s.total or s.puntuacion != sum(s.aciertos)
+    )
+    print(f"{modo:>22} {len(updates):>8} {segundos:>9.2f} {len(updates) / segundos:>11.0f} {corruptas:>10}")
+    return corruptas
+
+
+async def main():
+    usuarios = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    cantidad = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    latencia = (float(sys.argv[3]) if len(sys.argv) > 3 else 5.0) / 1000
+    banco = QuestionBank(
+        {"id": i, "pregunta": f"P{i}", "opciones": ["A", "B", "C", "D"], "respuesta_correcta": i % 4}
+        for i in range(2000)
+    )
+    print(f"{usuarios} usuarios x {cantidad} preguntas, latencia API hasta {latencia * 1000:.0f} ms")
+    print(f"{'modo':>22} {'updates':>8} {'tiempo(s)':>9} {'updates/s':>11} {'corruptas':>10}")
+    await ejecutar("secuencial", banco, usuarios, cantidad, latencia)
+    await ejecutar("concurrente sin lock", banco, usuarios, cantidad, latencia)
+    corruptas = await ejecutar("concurrente + lock", banco, usuarios, cantidad, latencia)
+    if corruptas:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,201 @@
+"""
+Prueba de carga de los handlers reales de main.py con Updates sintéticas.
+
+N usuarios simulados (ver simulacion.py) hacen a la vez el flujo completo
+/test -> bloque_ -> tema_ -> cantidad_ -> respuesta_ contra un BotGrabador
+(opcionalmente con latencia de API) y se mide:
+  - latencia de cada handler (p50/p95/p99, en ms) por tipo de update,
+  - updates por segundo,
+  - llamadas salientes por respuesta (y por método),
+  - pico de memoria: RSS máximo del proceso y, con --tracemalloc, el pico
+    de memoria de Python durante la carga (más preciso, pero más lento).
+
+Los resultados se imprimen y, con --json, se guardan en un fichero para
+seguir regresiones; con --comparar se contrastan con otro JSON anterior y
+se sale con código 1 si alguna métrica empeora más que --tolerancia.
+
+Uso: python benchmarks/carga_handlers.py [--usuarios 200] [--cantidad 50]
+         [--latencia-ms 0] [--mensaje-unico] [--adaptativa] [--tracemalloc]
+         [--json resultados.json] [--comparar base.json] [--tolerancia 0.25]
+Requiere python-telegram-bot y python-dotenv (los importa main.py).
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import resource
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+from simulacion import BotGrabador, UsuarioSimulado, autorizar, instalar_banco_sintetico
+import main
+
+BLOQUES = ("1", "2", "3", "4", "aleatorio")
+ORDEN_HANDLERS = ("test", "bloque", "tema", "cantidad", "respuesta")
+
+# Métrica -> True si más es mejor (para --comparar)
+METRICAS_REGRESION = {
+    "updates_por_segundo": True,
+    "llamadas_por_respuesta": False,
+    "handlers.respuesta.p95_ms": False,
+    "handlers.respuesta.p99_ms": False,
+    "handlers.cantidad.p95_ms": False,
+}
+
+
+def percentil(ordenados, p):
+    """Percentil p (0-100) por rango más cercano de una lista ordenada"""
+    if not ordenados:
+        return 0.0
+    return ordenados[max(0, min(len(ordenados), math.ceil(p / 100 * len(ordenados))) - 1)]
+
+
+def rss_maximo_mib():
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maximo / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+async def ejecutar(args):
+    main.MENSAJE_UNICO = args.mensaje_unico
+    main.SELECCION_ADAPTATIVA = args.adaptativa
+    instalar_banco_sintetico(args.preguntas)
+    bot = BotGrabador(latencia=args.latencia_ms / 1000)
+    rnd = random.Random(args.semilla)
+
+    usuarios = [UsuarioSimulado(bot, uid, random.Random(rnd.random())) for uid in range(1, args.usuarios + 1)]
+    autorizar(*(u.entidad.id for u in usuarios))
+    latencias = defaultdict(list)
+
+    def medir(handler, segundos):
+        latencias[handler].append(segundos)
+
+    async def alumno(usuario):
+        # Llegadas escalonadas, como usuarios reales que no pulsan a la vez
+        await asyncio.sleep(rnd.random() * args.escalonado)
+        respuestas = 0
+        for _ in range(args.tests):
+            respuestas += await usuario.hacer_test(usuario.rnd.choice(BLOQUES), args.cantidad, medir)
+        return respuestas
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    respuestas = sum(await asyncio.gather(*(alumno(u) for u in usuarios)))
+    segundos = time.perf_counter() - inicio
+    pico_python = tracemalloc.get_traced_memory()[1] / 2**20 if args.tracemalloc else None
+    tracemalloc.stop()
+    await main.despachador.detener()
+
+    updates = sum(len(v) for v in latencias.values())
+    llamadas = defaultdict(int)
+    for metodo, _, _ in bot.llamadas:
+        llamadas[metodo] += 1
+    handlers = {}
+    for nombre in ORDEN_HANDLERS:
+        ordenados = sorted(latencias.get(nombre, ()))
+        if ordenados:
+            handlers[nombre] = {
+                "n": len(ordenados),
+                "p50_ms": percentil(ordenados, 50) * 1000,
+                "p95_ms": percentil(ordenados, 95) * 1000,
+                "p99_ms": percentil(ordenados, 99) * 1000,
+                "max_ms": ordenados[-1] * 1000,
+            }
+    return {
+        "parametros": {
+            "usuarios": args.usuarios, "tests_por_usuario": args.tests, "cantidad": args.cantidad,
+            "preguntas_banco": args.preguntas, "latencia_ms": args.latencia_ms,
+            "mensaje_unico": args.mensaje_unico, "adaptativa": args.adaptativa, "semilla": args.semilla,
+        },
+        "entorno": {"python": platform.python_version(), "plataforma": platform.platform()},
+        "segundos": segundos,
+        "updates": updates,
+        "respuestas": respuestas,
+        "updates_por_segundo": updates / segundos if segundos else 0.0,
+        "llamadas_por_respuesta": len(bot.llamadas) / respuestas if respuestas else 0.0,
+        "llamadas": dict(sorted(llamadas.items())),
+        "handlers": handlers,
+        "memoria": {"rss_maximo_mib": rss_maximo_mib(), "pico_python_mib": pico_python},
+    }
+
+
+def imprimir(resultado):
+    p = resultado["parametros"]
+    print(f"{p['usuarios']} usuarios x {p['tests_por_usuario']} tests de {p['cantidad']} preguntas, "
+          f"latencia API {p['latencia_ms']} ms, mensaje único: {p['mensaje_unico']}")
+    print(f"{'handler':>10} {'n':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'máx ms':>9}")
+    for nombre, h in resultado["handlers"].items():
+        print(f"{nombre:>10} {h['n']:>8} {h['p50_ms']:>9.3f} {h['p95_ms']:>9.3f} {h['p99_ms']:>9.3f} {h['max_ms']:>9.3f}")
+    print(f"\n{resultado['updates']} updates en {resultado['segundos']:.2f} s: "
+          f"{resultado['updates_por_segundo']:.0f} updates/s")
+    detalle = ", ".join(f"{m}={n}" for m, n in resultado["llamadas"].items())
+    print(f"{resultado['llamadas_por_respuesta']:.2f} llamadas/respuesta ({detalle})")
+    memoria = resultado["memoria"]
+    linea = f"RSS máximo: {memoria['rss_maximo_mib']:.1f} MiB"
+    if memoria["pico_python_mib"] is not None:
+        linea += f", pico de memoria Python: {memoria['pico_python_mib']:.1f} MiB"
+    print(linea)
+
+
+def valor(resultado, metrica):
+    for parte in metrica.split("."):
+        resultado = resultado[parte]
+    return resultado
+
+
+def comparar(resultado, base, tolerancia):
+    """Métricas que empeoran más que `tolerancia` respecto a `base`"""
+    regresiones = []
+    for metrica, mas_es_mejor in METRICAS_REGRESION.items():
+        try:
+            antes, ahora = valor(base, metrica), valor(resultado, metrica)
+        except KeyError:
+            continue
+        if not antes:
+            continue
+        cambio = (ahora - antes) / antes
+        empeora = -cambio if mas_es_mejor else cambio
+        marca = "REGRESIÓN" if empeora > tolerancia else "ok"
+        print(f"  {metrica:<28} {antes:>10.3f} -> {ahora:>10.3f} ({cambio:+.1%}) {marca}")
+        if empeora > tolerancia:
+            regresiones.append(metrica)
+    return regresiones
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Prueba de carga de los handlers del bot")
+    parser.add_argument("--usuarios", type=int, default=200)
+    parser.add_argument("--tests", type=int, default=1, help="tests seguidos por usuario")
+    parser.add_argument("--cantidad", type=int, default=50, choices=(50, 100))
+    parser.add_argument("--preguntas", type=int, default=2000, help="tamaño del banco sintético")
+    parser.add_argument("--latencia-ms", type=float, default=0.0, help="latencia simulada de cada llamada a la API")
+    parser.add_argument("--escalonado", type=float, default=0.0, help="segundos en los que llegan los usuarios")
+    parser.add_argument("--mensaje-unico", action="store_true")
+    parser.add_argument("--adaptativa", action="store_true", help="selección adaptativa de preguntas")
+    parser.add_argument("--tracemalloc", action="store_true", help="medir el pico de memoria de Python")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--json", help="guardar los resultados en este fichero")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior con la que comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="empeoramiento relativo permitido")
+    args = parser.parse_args()
+
+    resultado = asyncio.run(ejecutar(args))
+    imprimir(resultado)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        print(f"\nComparación con {args.comparar}:")
+        if comparar(resultado, base, args.tolerancia):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,62 @@
+"""
+Comprobación por contadores: llamadas a la API de Telegram por pregunta respondida.
+
+Ejecuta tests completos con los handlers reales (ver simulacion.py) en el
+modo clásico y en el modo mensaje único, cuenta las llamadas salientes
+durante la fase de respuestas y falla (exit 1) si el modo mensaje único
+supera 2 llamadas por respuesta (answerCallbackQuery + editMessageText).
+
+Uso: python benchmarks/llamadas_por_respuesta.py [usuarios] [cantidad]
+"""
+
+import asyncio
+import sys
+
+from simulacion import BotGrabador, UsuarioSimulado, autorizar, instalar_banco_sintetico
+import main
+
+MAX_LLAMADAS_MENSAJE_UNICO = 2
+
+
+async def medir(mensaje_unico, usuarios, cantidad):
+    main.MENSAJE_UNICO = mensaje_unico
+    bot = BotGrabador()
+    total_respuestas = 0
+    llamadas_respuesta = 0
+    for uid in range(1, usuarios + 1):
+        usuario = UsuarioSimulado(bot, uid)
+        autorizar(uid)
+        # Contar solo las llamadas de la fase de respuestas
+        await usuario.comando(main.test, "/test")
+        await usuario.pulsar("bloque_aleatorio")
+        await usuario.pulsar(f"cantidad_{cantidad}")
+        antes = bot.contar()
+        while uid in main.test_sessions:
+            opciones = [b for b in usuario.botones() if b.startswith("respuesta_")]
+            await usuario.pulsar(usuario.rnd.choice(opciones))
+            total_respuestas += 1
+        llamadas_respuesta += bot.contar() - antes
+
+    por_respuesta = llamadas_respuesta / total_respuestas
+    modo = "mensaje único" if mensaje_unico else "clásico"
+    detalle = ", ".join(
+        f"{m}={bot.contar(m)}" for m in ("answerCallbackQuery", "editMessageText", "sendMessage")
+    )
+    print(f"{modo:>14}: {por_respuesta:.2f} llamadas/respuesta ({detalle})")
+    return por_respuesta
+
+
+async def main_async():
+    usuarios = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    cantidad = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    instalar_banco_sintetico()
+    await medir(False, usuarios, cantidad)
+    por_respuesta = await medir(True, usuarios, cantidad)
+    if por_respuesta > MAX_LLAMADAS_MENSAJE_UNICO:
+        print(f"FALLO: se esperaban como mucho {MAX_LLAMADAS_MENSAJE_UNICO} llamadas por respuesta")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async())
@@ -0,0 +1,167 @@
+"""
+Simulación del despachador de envíos contra una API falsa con límites.
+
+La API falsa imita el flood control de Telegram: como mucho `--global`
+llamadas por segundo en total y una por `--intervalo-chat` segundos a cada
+chat (con una pequeña ráfaga tolerada); si se supera, lanza un error con
+`retry_after`. Cada llamada tarda una latencia con jitter.
+
+answerCallbackQuery no cuenta en el límite global (como en Telegram).
+
+Tráfico: N alumnos respondiendo (answerCallbackQuery + editMessageText del
+mismo mensaje, a veces dos ediciones seguidas) mezclados con un envío masivo
+a muchos chats. Se compara llamar directamente (reintentando a ciegas tras
+el 429) con pasar por DespachadorEnvios, e informa de llamadas/s, retraso
+p50/p99 por tipo de tráfico, número de 429 y ediciones fusionadas.
+
+No necesita python-telegram-bot.
+
+Uso: python benchmarks/sim_envios.py [alumnos] [masivos] [segundos]
+"""
+
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+
+DIR_BOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIR_BOT)
+
+from envios import DespachadorEnvios, PRIORIDAD_INTERACTIVA, PRIORIDAD_MASIVA
+
+LIMITE_GLOBAL = 30
+INTERVALO_CHAT = 1.0
+RAFAGA_CHAT = 3
+LATENCIA = 0.05
+JITTER = 0.03
+
+
+class RetryAfterFalso(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Flood control exceeded. Retry in {retry_after} seconds")
+        self.retry_after = retry_after
+
+
+class APIFalsa:
+    """Ventana deslizante global + GCRA por chat, como el flood control de Telegram"""
+
+    def __init__(self, rnd):
+        self.rnd = rnd
+        self.envios_globales = []
+        self.teorico_chat = {}
+        self.llamadas = 0
+        self.rechazos = 0
+
+    def _admitir(self, chat_id, contar_global):
+        ahora = time.monotonic()
+        if not contar_global:
+            return 0
+        self.envios_globales = [t for t in self.envios_globales if t > ahora - 1.0]
+        if len(self.envios_globales) >= LIMITE_GLOBAL:
+            return 1
+        if chat_id is not None:
+            teorico = self.teorico_chat.get(chat_id, 0.0)
+            if teorico - (RAFAGA_CHAT - 1) * INTERVALO_CHAT > ahora:
+                return max(1, round(teorico - ahora))
+            self.teorico_chat[chat_id] = max(teorico, ahora) + INTERVALO_CHAT
+        self.envios_globales.append(ahora)
+        return 0
+
+    async def llamada(self, chat_id, contar_chat=True, contar_global=True):
+        espera = self._admitir(chat_id if contar_chat else None, contar_global)
+        await asyncio.sleep(max(0.0, LATENCIA + self.rnd.uniform(-JITTER, JITTER)))
+        if espera:
+            self.rechazos += 1
+            raise RetryAfterFalso(espera)
+        self.llamadas += 1
+        return True
+
+
+async def directo(func, *args, chat_id=None, **kwargs):
+    """Sin despachador: llamar y, ante un 429, dormir lo indicado y repetir"""
+    while True:
+        try:
+            return await func(*args)
+        except RetryAfterFalso as e:
+            await asyncio.sleep(e.retry_after)
+
+
+async def alumno(api, enviar, chat_id, respuestas, retrasos, rnd, con_prioridades):
+    for _ in range(respuestas):
+        await asyncio.sleep(rnd.uniform(1.0, 4.0))  # pensando la respuesta
+        inicio = time.monotonic()
+        kw = {"prioridad": PRIORIDAD_INTERACTIVA} if con_prioridades else {}
+        # answerCallbackQuery no cuenta en el límite global de Telegram
+        kw_respuesta = {"limite_global": False} if con_prioridades else {}
+        ediciones = 2 if rnd.random() < 0.2 else 1  # doble clic o corrección + pregunta
+        await asyncio.gather(
+            enviar(api.llamada, None, False, False, **kw_respuesta),
+            *(enviar(api.llamada, chat_id, chat_id=chat_id, fusion=("editar", chat_id), **kw)
+              if con_prioridades else enviar(api.llamada, chat_id, chat_id=chat_id)
+              for _ in range(ediciones)),
+        )
+        retrasos["interactivo"].append(time.monotonic() - inicio)
+
+
+async def masivo(api, enviar, chats, retrasos, con_prioridades):
+    async def uno(chat_id):
+        inicio = time.monotonic()
+        kw = {"prioridad": PRIORIDAD_MASIVA} if con_prioridades else {}
+        await enviar(api.llamada, chat_id, chat_id=chat_id, **kw)
+        retrasos["masivo"].append(time.monotonic() - inicio)
+    await asyncio.gather(*(uno(c) for c in chats))
+
+
+def percentil(valores, p):
+    if not valores:
+        return float("nan")
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))]
+
+
+async def escenario(nombre, alumnos, masivos, respuestas, con_despachador):
+    rnd = random.Random(42)
+    api = APIFalsa(rnd)
+    retrasos = {"interactivo": [], "masivo": []}
+    despachador = None
+    if con_despachador:
+        despachador = DespachadorEnvios(LIMITE_GLOBAL, INTERVALO_CHAT, RAFAGA_CHAT)
+        enviar = despachador.llamar
+    else:
+        enviar = directo
+
+    inicio = time.monotonic()
+    await asyncio.gather(
+        *(alumno(api, enviar, 1000 + i, respuestas, retrasos, random.Random(i), con_despachador)
+          for i in range(alumnos)),
+        masivo(api, enviar, range(100000, 100000 + masivos), retrasos, con_despachador),
+    )
+    segundos = time.monotonic() - inicio
+    if despachador is not None:
+        await despachador.detener()
+
+    fila = [nombre, f"{api.llamadas / segundos:.1f}", str(api.rechazos)]
+    for tipo in ("interactivo", "masivo"):
+        fila.append(f"{percentil(retrasos[tipo], 50) * 1000:.0f}")
+        fila.append(f"{percentil(retrasos[tipo], 99) * 1000:.0f}")
+    fila.append(str(despachador.fusionadas if despachador is not None else 0))
+    print(" ".join(f"{c:>12}" for c in fila))
+
+
+async def main():
+    logging.basicConfig(level=logging.ERROR)  # sin los avisos de cada reintento
+    alumnos = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    masivos = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    respuestas = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    print(f"{alumnos} alumnos x {respuestas} respuestas + {masivos} envíos masivos; "
+          f"API: {LIMITE_GLOBAL}/s global, 1 cada {INTERVALO_CHAT} s por chat, latencia {LATENCIA * 1000:.0f} ms")
+    cabecera = ["modo", "llamadas/s", "429", "int p50 ms", "int p99 ms", "mas p50 ms", "mas p99 ms", "fusionadas"]
+    print(" ".join(f"{c:>12}" for c in cabecera))
+    await escenario("directo", alumnos, masivos, respuestas, False)
+    await escenario("despachador", alumnos, masivos, respuestas, True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,206 @@
+"""
+Dobles de Telegram para ejecutar los handlers reales de main.py sin red.
+
+- BotGrabador: registra cada llamada saliente (método, chat, tiempo) y, si
+  se le da `latencia`, la hace esperar como si fuera a la API.
+- UsuarioSimulado: construye Updates/CallbackQuery falsas con la misma forma
+  que usan los handlers y recorre el flujo /test -> bloque_ -> tema_ ->
+  cantidad_ -> respuesta_ pulsando los botones del último teclado recibido.
+
+Se importa main con ALMACEN_SESIONES=memoria para no crear sesiones.db, con
+la lista de autorizados en un directorio temporal y sin límites de envío
+(el despachador no espera: aquí no hay API que proteger).
+Requiere python-telegram-bot y python-dotenv (los importa main.py).
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+DIR_BOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIR_BOT)
+os.environ.setdefault("ALMACEN_SESIONES", "memoria")
+os.environ.setdefault("ENVIOS_POR_SEGUNDO", "1e9")
+os.environ.setdefault("INTERVALO_ENVIOS_CHAT", "0")
+os.environ.setdefault("RUTA_AUTORIZADOS", os.path.join(tempfile.mkdtemp(), "usuarios_autorizados.txt"))
+
+import main
+from banco_preguntas import QuestionBank
+from renderizado import preparar_banco
+
+# Prefijo de callback_data -> handler (mismos patrones que en main())
+HANDLERS_CALLBACK = (
+    ("bloque_", main.seleccionar_bloque),
+    ("tema_", main.seleccionar_tema),
+    ("cantidad_", main.seleccionar_cantidad),
+    ("respuesta_", main.manejar_respuesta),
+)
+
+
+class BotGrabador:
+    """Registra las llamadas a la API en lugar de hacerlas"""
+
+    def __init__(self, latencia=0.0):
+        self.llamadas = []  # (método, chat_id, instante)
+        self.latencia = latencia  # segundos por llamada (con variación aleatoria de ±50 %)
+        self._ultimo_id = 0
+
+    def registrar(self, metodo, chat_id):
+        self.llamadas.append((metodo, chat_id, time.perf_counter()))
+
+    async def llamada(self, metodo, chat_id):
+        self.registrar(metodo, chat_id)
+        if self.latencia:
+            await asyncio.sleep(self.latencia * random.uniform(0.5, 1.5))
+
+    def nuevo_id(self):
+        self._ultimo_id += 1
+        return self._ultimo_id
+
+    def contar(self, metodo=None):
+        return sum(1 for m, _, _ in self.llamadas if metodo is None or m == metodo)
+
+
+class Entidad:
+    """Usuario o chat mínimo"""
+
+    def __init__(self, id, username=None, first_name="Simulado"):
+        self.id = id
+        self.username = username
+        self.first_name = first_name
+
+
+class MensajeFalso:
+    def __init__(self, bot, chat, text="", reply_markup=None):
+        self.bot = bot
+        self.chat = chat
+        self.chat_id = chat.id
+        self.message_id = bot.nuevo_id()
+        self.text = text
+        self.reply_markup = reply_markup
+        self.usuario = None
+
+    async def reply_text(self, text, reply_markup=None, parse_mode=None, **kwargs):
+        await self.bot.llamada("sendMessage", self.chat_id)
+        mensaje = MensajeFalso(self.bot, self.chat, text, reply_markup)
+        if self.usuario is not None:
+            self.usuario.recibir(mensaje)
+        return mensaje
+
+
+class QueryFalsa:
+    def __init__(self, bot, usuario, mensaje, data):
+        self.id = str(bot.nuevo_id())
+        self.bot = bot
+        self.from_user = usuario.entidad
+        self.message = mensaje
+        self.data = data
+
+    async def answer(self, text=None, show_alert=False, **kwargs):
+        await self.bot.llamada("answerCallbackQuery", self.message.chat_id)
+        return True
+
+    async def edit_message_text(self, text, reply_markup=None, parse_mode=None, **kwargs):
+        await self.bot.llamada("editMessageText", self.message.chat_id)
+        self.message.text = text
+        self.message.reply_markup = reply_markup
+        return self.message
+
+
+class UpdateFalsa:
+    def __init__(self, usuario, message=None, callback_query=None):
+        self.effective_user = usuario.entidad
+        self.effective_chat = usuario.chat
+        self.message = message
+        self.callback_query = callback_query
+        self.effective_message = message if message is not None else callback_query.message
+
+
+class ContextoFalso:
+    def __init__(self):
+        self.user_data = {}
+
+
+class UsuarioSimulado:
+    """Un alumno que recorre el flujo completo del test"""
+
+    def __init__(self, bot, user_id, rnd=None):
+        self.bot = bot
+        self.entidad = Entidad(user_id, username=f"sim{user_id}")
+        self.chat = Entidad(user_id)
+        self.contexto = ContextoFalso()
+        self.rnd = rnd or random.Random(user_id)
+        self.ultimo_teclado = None  # mensaje con botones más reciente
+
+    def recibir(self, mensaje):
+        if mensaje.reply_markup is not None:
+            self.ultimo_teclado = mensaje
+
+    async def comando(self, handler, texto):
+        mensaje = MensajeFalso(self.bot, self.chat, texto)
+        mensaje.usuario = self
+        await handler(UpdateFalsa(self, message=mensaje), self.contexto)
+
+    def botones(self):
+        if self.ultimo_teclado is None or self.ultimo_teclado.reply_markup is None:
+            return []
+        return [b.callback_data for fila in self.ultimo_teclado.reply_markup.inline_keyboard for b in fila]
+
+    async def pulsar(self, data, medir=None):
+        """Pulsa el botón `data` del último teclado; `medir(prefijo, segundos)` recibe la latencia"""
+        mensaje = self.ultimo_teclado
+        mensaje.usuario = self
+        query = QueryFalsa(self.bot, self, mensaje, data)
+        for prefijo, handler in HANDLERS_CALLBACK:
+            if data.startswith(prefijo):
+                inicio = time.perf_counter()
+                await handler(UpdateFalsa(self, callback_query=query), self.contexto)
+                if medir is not None:
+                    medir(prefijo.rstrip("_"), time.perf_counter() - inicio)
+                # Tras una edición el teclado vigente es el del mensaje editado
+                self.recibir(mensaje)
+                return
+        raise ValueError(f"Botón sin handler: {data}")
+
+    async def hacer_test(self, bloque="aleatorio", cantidad=50, medir=None):
+        """/test -> bloque -> (tema) -> cantidad -> responder hasta terminar.
+        Devuelve el número de respuestas enviadas."""
+        inicio = time.perf_counter()
+        await self.comando(main.test, "/test")
+        if medir is not None:
+            medir("test", time.perf_counter() - inicio)
+        await self.pulsar(f"bloque_{bloque}", medir)
+        temas = [b for b in self.botones() if b.startswith("tema_")]
+        if temas:
+            await self.pulsar(self.rnd.choice(temas), medir)
+        await self.pulsar(f"cantidad_{cantidad}", medir)
+
+        respuestas = 0
+        while self.entidad.id in main.test_sessions:
+            opciones = [b for b in self.botones() if b.startswith("respuesta_")]
+            if not opciones:
+                break
+            await self.pulsar(self.rnd.choice(opciones), medir)
+            respuestas += 1
+        return respuestas
+
+
+def instalar_banco_sintetico(n=2000, bloques=4, temas=5):
+    """Sustituye el banco de main por uno sintético con bloques y temas"""
+    banco = QuestionBank(
+        {"id": i + 1, "bloque": 1 + i % bloques, "tema": 1 + (i // bloques) % temas,
+         "pregunta": f"¿Pregunta **{i}** de *prueba*?", "opciones": [f"Opción {j}" for j in range(4)],
+         "respuesta_correcta": i % 4}
+        for i in range(n)
+    )
+    main.instalar_banco(preparar_banco(banco))
+    return banco
+
+
+def autorizar(*user_ids):
+    """Añade los usuarios simulados a la lista de autorizados"""
+    for uid in user_ids:
+        main.autorizados.añadir(uid)
@@ -0,0 +1,50 @@
+"""
+Serialización por usuario para el procesado concurrente de updates.
+
+Con `concurrent_updates` la Application atiende varias updates a la vez; así
+un `edit_message_text` lento de un usuario no retrasa a los demás. Pero dos
+clics seguidos del mismo usuario no pueden tocar su sesión a la vez: cada
+usuario tiene un asyncio.Lock (FIFO, así que sus clics se procesan en orden
+de llegada) que se libera de memoria cuando nadie lo espera.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from functools import wraps
+
+
+class BloqueosPorUsuario:
+    """Un lock por usuario, creado bajo demanda"""
+
+    def __init__(self):
+        self._bloqueos = {}  # user_id -> [asyncio.Lock, nº de tareas que lo usan]
+
+    def __len__(self):
+        return len(self._bloqueos)
+
+    @asynccontextmanager
+    async def bloquear(self, user_id):
+        entrada = self._bloqueos.get(user_id)
+        if entrada is None:
+            entrada = self._bloqueos[user_id] = [asyncio.Lock(), 0]
+        entrada[1] += 1
+        try:
+            async with entrada[0]:
+                yield
+        finally:
+            entrada[1] -= 1
+            if entrada[1] == 0:
+                del self._bloqueos[user_id]
+
+
+bloqueos_usuario = BloqueosPorUsuario()
+
+
+def serializar_por_usuario(func):
+    """Decorator: las updates de un mismo usuario se ejecutan de una en una y en orden"""
+    @wraps(func)
+    async def wrapper(update, context):
+        async with bloqueos_usuario.bloquear(update.effective_user.id):
+            return await func(update, context)
+
+    return wrapper
@@ -6,6 +6,18 @@ Script básico para convertir un par de archivos:
 Salida: escribe `tests/temaX_bloqueY.json` con estructura:
 { "preguntas": [ { "id": ..., "pregunta": ..., "opciones": [...], "respuesta_correcta": index }, ... ] }
 
+Modo lote: `--lote DIRECTORIO` busca todos los pares
+preguntas_temaX_bloqueY.odt / respuestas_temaX_bloqueY.ods del directorio y
+los convierte en paralelo (un proceso por núcleo o `--trabajadores N`),
+saltando las salidas más recientes que sus entradas (`--forzar` para
+reconvertir). Los avisos de cada fichero se recogen en un informe
+estructurado (`--informe informe.json`) en lugar de imprimirse.
+
+Los .odt/.ods se leen en streaming: se abre content.xml dentro del zip y
+se recorre con un parser XML incremental (iterparse), descartando cada
+párrafo o fila en cuanto se ha leído, sin construir el documento completo.
+Solo usa la biblioteca estándar.
+
 Notas: el parser es heurístico. Sube un ejemplo real para que lo adaptemos.
 """
 
@@ -13,98 +25,250 @@ import sys
 import os
 import re
 import json
+import time
+import itertools
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+# Espacios de nombres de OpenDocument
+_TEXT = '{urn:oasis:names:tc:opendocument:xmlns:text:1.0}'
+_TABLE = '{urn:oasis:names:tc:opendocument:xmlns:table:1.0}'
+_OFFICE = '{urn:oasis:names:tc:opendocument:xmlns:office:1.0}'
+_P = _TEXT + 'p'
+_FILA = _TABLE + 'table-row'
+_HOJA = _TABLE + 'table'
+_CELDAS = (_TABLE + 'table-cell', _TABLE + 'covered-table-cell')
+
+
+def _texto_elemento(elem):
+    """Texto de un párrafo como teletype.extractText: <text:s c="n"/> son n
+    espacios, <text:tab/> un tabulador y <text:line-break/> un salto de línea"""
+    partes = []
 
-try:
-    from odf.opendocument import load
-    from odf import text as odftext
-    from odf import teletype
-except Exception:
-    load = None
+    def recorrer(e):
+        if e.tag == _TEXT + 's':
+            partes.append(' ' * int(e.get(_TEXT + 'c', '1')))
+        elif e.tag == _TEXT + 'tab':
+            partes.append('\t')
+        elif e.tag == _TEXT + 'line-break':
+            partes.append('\n')
+        else:
+            if e.text:
+                partes.append(e.text)
+            for hijo in e:
+                recorrer(hijo)
+                if hijo.tail:
+                    partes.append(hijo.tail)
+
+    recorrer(elem)
+    return ''.join(partes)
+
+
+def _recorrer_content_xml(path, etiqueta, fin=None):
+    """Devuelve cada elemento `etiqueta` de content.xml ya completo. Todo lo
+    que no está dentro de uno de ellos se quita del árbol al cerrarse, así la
+    memoria no crece con el documento. Para al cerrarse el primer `fin`."""
+    with zipfile.ZipFile(path) as z, z.open('content.xml') as f:
+        pila = []
+        abiertos = 0
+        for evento, elem in ET.iterparse(f, events=('start', 'end')):
+            if evento == 'start':
+                pila.append(elem)
+                if elem.tag == etiqueta:
+                    abiertos += 1
+                continue
+            pila.pop()
+            if elem.tag == etiqueta:
+                abiertos -= 1
+                yield elem
+            elif elem.tag == fin:
+                return
+            if not abiertos and pila:
+                pila[-1].remove(elem)
 
-try:
-    from pyexcel_ods3 import get_data
-except Exception:
-    get_data = None
+
+def iterar_parrafos_odt(path):
+    """Texto de cada <text:p> del .odt, en orden"""
+    for parrafo in _recorrer_content_xml(path, _P):
+        yield _texto_elemento(parrafo)
+
+
+def iterar_lineas_odt(path):
+    """Líneas no vacías del documento (lo que antes se obtenía con
+    extract_text_from_odt(path).splitlines(), pero sin tenerlo entero en memoria)"""
+    for parrafo in iterar_parrafos_odt(path):
+        parrafo = parrafo.strip()
+        if parrafo:
+            yield from parrafo.splitlines()
 
 
 def extract_text_from_odt(path):
-    if load is None:
-        raise RuntimeError("odfpy no está instalado. Ejecuta: pip install odfpy")
-    doc = load(path)
-    paras = doc.getElementsByType(odftext.P)
-    lines = [teletype.extractText(p).strip() for p in paras if teletype.extractText(p).strip()]
-    # Algunas veces el documento tiene saltos separados; también devolveremos texto completo
-    full = "\n".join(lines)
-    return full
+    return "\n".join(iterar_lineas_odt(path))
+
+
+def _valor_celda(celda):
+    """Valor de una celda con los mismos tipos que devolvía pyexcel"""
+    tipo = celda.get(_OFFICE + 'value-type')
+    if tipo in ('float', 'percentage', 'currency'):
+        valor = float(celda.get(_OFFICE + 'value'))
+        return int(valor) if valor.is_integer() else valor
+    if tipo == 'boolean':
+        return celda.get(_OFFICE + 'boolean-value') == 'true'
+    if tipo == 'date':
+        return celda.get(_OFFICE + 'date-value')
+    if tipo == 'time':
+        return celda.get(_OFFICE + 'time-value')
+    return '\n'.join(_texto_elemento(p) for p in celda if p.tag == _P)
+
+
+def iterar_filas_ods(path):
+    """Filas de la primera hoja del .ods como listas de valores. Como pyexcel,
+    se quitan las celdas vacías del final de cada fila y las filas vacías del
+    final de la hoja (las repeticiones de relleno no se expanden)."""
+    filas_vacias = 0
+    for fila in _recorrer_content_xml(path, _FILA, fin=_HOJA):
+        valores = []
+        celdas_vacias = 0
+        for celda in fila:
+            if celda.tag not in _CELDAS:
+                continue
+            repeticiones = int(celda.get(_TABLE + 'number-columns-repeated', '1'))
+            valor = _valor_celda(celda)
+            if valor == '':
+                celdas_vacias += repeticiones
+                continue
+            valores.extend([''] * celdas_vacias)
+            celdas_vacias = 0
+            valores.extend([valor] * repeticiones)
+        repeticiones = int(fila.get(_TABLE + 'number-rows-repeated', '1'))
+        if not valores:
+            filas_vacias += repeticiones
+            continue
+        for _ in range(filas_vacias):
+            yield []
+        filas_vacias = 0
+        for _ in range(repeticiones):
+            yield list(valores)
+
+
+# Patrones del parser, compilados una vez
+_RE_NUMERO = re.compile(r'\s*(\d{1,3})[\.|\)]\s*(.*)')
+_RE_OPCION = re.compile(r'\s*([A-Da-d]|\d+)\s*[\)\.|\-:]\s*(.+)')
+_RE_A_PARENTESIS = re.compile(r'\bA\)')
+_RE_OPCIONES = re.compile(r'Opciones[:\-]\s*(.*)', re.IGNORECASE)
+_RE_LETRA = re.compile(r'[A-Za-z]')
+_RE_ENTERO = re.compile(r'\d+')
+
+
+def _parsear(lines, numeradas=True):
+    """Máquina de estados del parser: (enunciado, opciones) de cada pregunta.
+
+    Con `numeradas`, una línea "N." o "N)" abre pregunta nueva y se ignora lo
+    anterior a la primera; si no, todas las líneas son de una sola pregunta
+    (sin quitarles espacios). Cada línea se clasifica al llegar (opción, lista
+    separada por ';' o enunciado) y a la vez se busca el primer "Opciones:",
+    que solo se usa si la pregunta no tiene ninguna otra opción."""
+    numero = _RE_NUMERO.match if numeradas else None
+    opcion = _RE_OPCION.match
+    marcador = _RE_OPCIONES.search
+    a_parentesis = _RE_A_PARENTESIS.search
+    enunciado = opciones = tras_marcador = None
+    pendiente = False   # "Opciones:" al final de línea: su texto está en la siguiente no vacía
+    vacia = True        # solo la línea del número, sin texto: no cuenta como pregunta
+    if not numeradas:
+        enunciado, opciones = [], []
+    for ln in lines:
+        if numeradas:
+            m = numero(ln)
+            if m:
+                if not vacia:
+                    if not opciones and tras_marcador is not None:
+                        opciones = [p.strip() for p in tras_marcador.split(';') if p.strip()]
+                    yield ' '.join(enunciado).strip(), opciones
+                ln = m.group(2).strip()
+                enunciado, opciones, tras_marcador, pendiente = [], [], None, False
+                vacia = not ln
+            elif enunciado is None:
+                # líneas antes del primer número — ignorar o tratar como prefacio
+                continue
+            else:
+                ln = ln.strip()
+                vacia = False
+        else:
+            vacia = False
+        # Con alguna opción ya encontrada, "Opciones:" no se va a usar
+        if tras_marcador is None and not opciones:
+            if pendiente:
+                if ln.strip():
+                    tras_marcador = ln.lstrip()
+            else:
+                m = marcador(ln)
+                if m:
+                    if m.group(1).strip():
+                        tras_marcador = m.group(1)
+                    else:
+                        pendiente = True
+        m = opcion(ln)
+        if m:
+            opciones.append(m.group(2).strip())
+        elif ';' in ln and a_parentesis(ln) is None:
+            # Varias opciones en la misma línea separadas por ';'
+            parts = [p.strip() for p in ln.split(';') if p.strip()]
+            if len(parts) >= 2 and all(len(p.split()) < 40 for p in parts):
+                opciones.extend(parts)
+            else:
+                enunciado.append(ln)
+        else:
+            enunciado.append(ln)
+    if not vacia or not numeradas:
+        if not opciones and tras_marcador is not None:
+            opciones = [p.strip() for p in tras_marcador.split(';') if p.strip()]
+        yield ' '.join(enunciado).strip(), opciones
+
+
+def iterar_preguntas(lines):
+    """(enunciado, opciones) de cada pregunta en una sola pasada sobre las
+    líneas: es lo mismo que extract_options_and_question sobre cada bloque de
+    split_questions_from_text, sin construir los bloques."""
+    return _parsear(lines)
 
 
 def split_questions_from_text(text):
-    """Heurística simple: detecta líneas que empiezan por número + '.' o número + ')'"""
-    lines = text.splitlines()
-    q_blocks = []
+    """Heurística simple: detecta líneas que empiezan por número + '.' o número + ')'.
+    Acepta el texto completo o un iterable de líneas (p. ej. iterar_lineas_odt)
+    y devuelve los bloques de pregunta según se van completando."""
+    lines = text.splitlines() if isinstance(text, str) else text
     current = None
     for ln in lines:
-        m = re.match(r'^\s*(\d{1,3})[\.|\)]\s*(.*)', ln)
+        m = _RE_NUMERO.match(ln)
         if m:
             # nueva pregunta
-            if current:
-                q_blocks.append(current)
-            current = m.group(2).strip()
-        else:
-            if current is None:
-                # líneas antes del primer número — ignorar o tratar como prefacio
-                continue
-            else:
-                current += '\n' + ln.strip()
-    if current:
-        q_blocks.append(current)
-    return q_blocks
+            if current and (len(current) > 1 or current[0]):
+                yield '\n'.join(current)
+            current = [m.group(2).strip()]
+        elif current is not None:
+            current.append(ln.strip())
+    if current and (len(current) > 1 or current[0]):
+        yield '\n'.join(current)
 
 
 def extract_options_and_question(block):
     """Intenta separar la pregunta del bloque y extraer opciones.
     Opciones esperadas como líneas que empiezan con A), A., a), a.", 'A -' etc.
+    Si no hay ninguna, se usa lo que sigue a 'Opciones:' separado por ';'.
     """
-    lines = block.splitlines()
-    question_lines = []
-    options = []
-    opt_pattern = re.compile(r'^\s*([A-Da-d]|\d+)\s*[\)\.|\-:]\s*(.+)')
-    for ln in lines:
-        m = opt_pattern.match(ln)
-        if m:
-            opt_text = m.group(2).strip()
-            options.append(opt_text)
-        else:
-            # Si detectamos que la línea contiene varias opciones separadas por ; o — intentar dividir
-            if ';' in ln and (re.search(r'\bA\)', ln) is None):
-                parts = [p.strip() for p in ln.split(';') if p.strip()]
-                if len(parts) >= 2 and all(len(p.split()) < 40 for p in parts):
-                    options.extend(parts)
-                else:
-                    question_lines.append(ln)
-            else:
-                question_lines.append(ln)
-    question_text = ' '.join(question_lines).strip()
-    # Si no encontramos opciones, intentar extraer con patrón 'opciones:'
-    if not options:
-        m = re.search(r'Opciones[:\-]\s*(.+)', block, re.IGNORECASE)
-        if m:
-            parts = [p.strip() for p in re.split('[;\n]', m.group(1)) if p.strip()]
-            options = parts
-    return question_text, options
+    return next(_parsear(block.splitlines(), numeradas=False))
 
 
 def read_answers_from_ods(path):
-    if get_data is None:
-        raise RuntimeError("pyexcel_ods3 no está instalado. Ejecuta: pip install pyexcel-ods3")
-    data = get_data(path)
-    # Tomar la primera hoja
-    first_sheet = next(iter(data.keys()))
-    rows = data[first_sheet]
-    if not rows:
+    # Primera hoja, fila a fila
+    rows = iterar_filas_ods(path)
+    first_row = next(rows, None)
+    if first_row is None:
         return []
     # Detectar si la primera fila es encabezado con 'id' o 'respuesta'
-    headers = [str(c).strip().lower() for c in rows[0]]
+    headers = [str(c).strip().lower() for c in first_row]
     mapping_by_id = False
     id_col = None
     ans_col = None
@@ -120,7 +284,7 @@ def read_answers_from_ods(path):
     # Construir lista de respuestas; si mapping_by_id -> dict, else list by order (skipping header)
     if mapping_by_id:
         m = {}
-        for r in rows[1:]:
+        for r in rows:
             if len(r) <= max(id_col, ans_col):
                 continue
             pid = r[id_col]
@@ -134,11 +298,11 @@ def read_answers_from_ods(path):
         answers = []
         # Si la primera fila parece header (contiene texto) y no números/letters, podríamos saltarla
         start_idx = 0
-        if any(isinstance(c, str) and re.search(r'[a-zA-Z]', c) for c in rows[0]):
+        if any(isinstance(c, str) and re.search(r'[a-zA-Z]', c) for c in first_row):
             # intentar detectar si primera fila es header de texto; si sí y contiene palabras como 'id' o 'respuesta'
-            if any(str(c).strip().lower() in ('id','respuesta','respuesta_correcta','answer') for c in rows[0]):
+            if any(str(c).strip().lower() in ('id','respuesta','respuesta_correcta','answer') for c in first_row):
                 start_idx = 1
-        for r in rows[start_idx:]:
+        for r in (rows if start_idx else itertools.chain([first_row], rows)):
             if not r:
                 answers.append(None)
                 continue
@@ -148,39 +312,60 @@ def read_answers_from_ods(path):
         return answers
 
 
-def answer_value_to_index(val, options_len):
+def indice_opciones(opciones):
+    """Texto normalizado de cada opción -> su índice (la primera si se repite)"""
+    indice = {}
+    for i, opt in enumerate(opciones):
+        indice.setdefault(str(opt).strip().lower(), i)
+    return indice
+
+
+def answer_value_to_index(val, options_len, indice=None):
+    """Índice de la respuesta `val`: letra (A, b...), número (0 o 1-based) o,
+    si se pasa `indice` (ver indice_opciones), el texto exacto de una opción"""
     if val is None:
         return None
     s = str(val).strip()
     if not s:
         return None
     # letra A,B,C or a,b,c
-    m = re.match(r'^([A-Za-z])$', s)
-    if m:
-        ch = m.group(1).upper()
-        idx = ord(ch) - ord('A')
+    if _RE_LETRA.fullmatch(s):
+        idx = ord(s.upper()) - ord('A')
         if 0 <= idx < options_len:
             return idx
     # number
-    m = re.match(r'^(\d+)$', s)
-    if m:
-        n = int(m.group(1))
+    elif _RE_ENTERO.fullmatch(s):
+        n = int(s)
         # puede ser 0-based o 1-based; preferir 1-based (si n==0 improbable)
         if 0 <= n < options_len:
             return n
         if 1 <= n <= options_len:
             return n - 1
     # texto that matches one of the options exactly
-    for i, opt in enumerate(options_cache if 'options_cache' in globals() else []):
-        if s.lower() == str(opt).strip().lower():
-            return i
+    if indice:
+        return indice.get(s.lower())
     return None
 
 
-def convertir(preguntas_path, respuestas_path=None, out_dir=None):
+def ruta_salida(preguntas_path, out_dir=None):
+    """preguntas_temaX_bloqueY.odt -> out_dir/preguntas_temaX_bloqueY.json"""
     if out_dir is None:
         out_dir = os.path.join(os.path.dirname(__file__), 'tests')
-    os.makedirs(out_dir, exist_ok=True)
+    stem = re.sub(r'\.odt$', '', os.path.basename(preguntas_path), flags=re.IGNORECASE)
+    return os.path.join(out_dir, stem + '.json')
+
+
+def convertir(preguntas_path, respuestas_path=None, out_dir=None, avisos=None):
+    """Convierte un par odt/ods. Si se pasa la lista `avisos`, los avisos se
+    añaden a ella como dicts (y no se imprime el progreso) en vez de imprimirse."""
+    return _convertir(preguntas_path, respuestas_path, out_dir, avisos)[0]
+
+
+def _convertir(preguntas_path, respuestas_path=None, out_dir=None, avisos=None):
+    """Devuelve (ruta de salida, número de preguntas)"""
+    informar = print if avisos is None else (lambda *args: None)
+    out_path = ruta_salida(preguntas_path, out_dir)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
 
     base = os.path.basename(preguntas_path)
     stem = re.sub(r'\.odt$', '', base, flags=re.IGNORECASE)
@@ -192,12 +377,9 @@ def convertir(preguntas_path, respuestas_path=None, out_dir=None):
         tema = int(m.group(1))
         bloque = int(m.group(2))
 
-    print(f"Extrayendo texto de: {preguntas_path}")
-    text = extract_text_from_odt(preguntas_path)
-    q_blocks = split_questions_from_text(text)
+    informar(f"Extrayendo texto de: {preguntas_path}")
     preguntas_list = []
-    for idx, block in enumerate(q_blocks, start=1):
-        q_text, options = extract_options_and_question(block)
+    for idx, (q_text, options) in enumerate(iterar_preguntas(iterar_lineas_odt(preguntas_path)), start=1):
         qid = idx
         pregunta_obj = {
             'id': qid,
@@ -208,7 +390,7 @@ def convertir(preguntas_path, respuestas_path=None, out_dir=None):
 
     answers_map = None
     if respuestas_path:
-        print(f"Leyendo respuestas de: {respuestas_path}")
+        informar(f"Leyendo respuestas de: {respuestas_path}")
         ans = read_answers_from_ods(respuestas_path)
         answers_map = ans
 
@@ -216,6 +398,7 @@ def convertir(preguntas_path, respuestas_path=None, out_dir=None):
     for i, p in enumerate(preguntas_list):
         options_len = len(p['opciones'])
         mapped = None
+        val = None
         if isinstance(answers_map, dict):
             # buscar por id
             key = str(p['id'])
@@ -224,31 +407,146 @@ def convertir(preguntas_path, respuestas_path=None, out_dir=None):
         elif isinstance(answers_map, list):
             if i < len(answers_map):
                 val = answers_map[i]
-                # opción: permitir que la función use opciones
-                # usar variable global temporal para matching exacto
-                globals()['options_cache'] = p['opciones']
-                mapped = answer_value_to_index(val, options_len)
-                if 'options_cache' in globals():
-                    del globals()['options_cache']
+                # en esta forma también vale el texto exacto de una opción
+                mapped = answer_value_to_index(val, options_len, indice_opciones(p['opciones']))
         # Si no mapeado, dejar 0 y advertir
         if mapped is None:
             mapped = 0
-            print(f"Advertencia: no se pudo mapear respuesta para pregunta id={p['id']}, se asigna 0 por defecto")
+            if avisos is None:
+                print(f"Advertencia: no se pudo mapear respuesta para pregunta id={p['id']}, se asigna 0 por defecto")
+            else:
+                avisos.append({'tipo': 'respuesta_no_mapeada', 'id': p['id'], 'valor': None if val is None else str(val)})
         p['respuesta_correcta'] = mapped
 
     # Opcional: no incluir bloque/tema en el JSON, lo añadimos en procesar_preguntas.py
-    out_name = stem + '.json'
-    out_path = os.path.join(out_dir, out_name)
     with open(out_path, 'w', encoding='utf-8') as f:
         json.dump({'preguntas': preguntas_list}, f, ensure_ascii=False, indent=2)
 
-    print(f"Generado: {out_path} ({len(preguntas_list)} preguntas)")
-    return out_path
+    informar(f"Generado: {out_path} ({len(preguntas_list)} preguntas)")
+    return out_path, len(preguntas_list)
+
+
+# --- Modo lote ---
+
+def buscar_pares(directorio):
+    """Pares (preguntas .odt, respuestas .ods o None) del directorio, ordenados por nombre"""
+    nombres = {n.lower(): n for n in os.listdir(directorio)}
+    pares = []
+    for nombre in sorted(os.listdir(directorio)):
+        m = re.fullmatch(r'preguntas_(tema\d+_bloque\d+)\.odt', nombre, re.IGNORECASE)
+        if not m:
+            continue
+        respuestas = nombres.get(f"respuestas_{m.group(1)}.ods".lower())
+        pares.append((
+            os.path.join(directorio, nombre),
+            os.path.join(directorio, respuestas) if respuestas else None,
+        ))
+    return pares
+
+
+def esta_actualizado(preguntas_path, respuestas_path, out_dir=None):
+    """La salida existe y es más reciente que sus entradas"""
+    try:
+        salida = os.path.getmtime(ruta_salida(preguntas_path, out_dir))
+    except OSError:
+        return False
+    entradas = [preguntas_path] + ([respuestas_path] if respuestas_path else [])
+    return all(os.path.getmtime(e) <= salida for e in entradas)
+
+
+def _convertir_par(preguntas_path, respuestas_path, out_dir):
+    """Trabajo de un proceso del pool: nunca lanza, devuelve una entrada del informe"""
+    inicio = time.perf_counter()
+    avisos = []
+    entrada = {'preguntas': preguntas_path, 'respuestas': respuestas_path}
+    if respuestas_path is None:
+        avisos.append({'tipo': 'sin_respuestas'})
+    try:
+        salida, n = _convertir(preguntas_path, respuestas_path, out_dir, avisos)
+        entrada.update(salida=salida, num_preguntas=n, error=None)
+    except Exception as e:
+        entrada.update(salida=None, num_preguntas=0, error=f"{type(e).__name__}: {e}")
+    entrada.update(avisos=avisos, segundos=round(time.perf_counter() - inicio, 4))
+    return entrada
+
+
+def convertir_directorio(directorio, out_dir=None, trabajadores=None, forzar=False):
+    """Convierte todos los pares del directorio en un pool de procesos.
+    Devuelve el informe: {'convertidos', 'omitidos', 'errores', 'num_preguntas', 'segundos'}"""
+    inicio = time.perf_counter()
+    pendientes = []
+    omitidos = []
+    for preguntas_path, respuestas_path in buscar_pares(directorio):
+        if not forzar and esta_actualizado(preguntas_path, respuestas_path, out_dir):
+            omitidos.append(preguntas_path)
+        else:
+            pendientes.append((preguntas_path, respuestas_path, out_dir))
+
+    if trabajadores == 1 or len(pendientes) <= 1:
+        resultados = [_convertir_par(*p) for p in pendientes]
+    else:
+        with ProcessPoolExecutor(max_workers=trabajadores) as pool:
+            # Los ficheros grandes primero para que no queden rezagados al final
+            pendientes.sort(key=lambda p: os.path.getsize(p[0]), reverse=True)
+            resultados = list(pool.map(_convertir_par, *zip(*pendientes)))
+        resultados.sort(key=lambda r: r['preguntas'])
+
+    return {
+        'convertidos': [r for r in resultados if r['error'] is None],
+        'omitidos': omitidos,
+        'errores': [r for r in resultados if r['error'] is not None],
+        'num_preguntas': sum(r['num_preguntas'] for r in resultados),
+        'segundos': round(time.perf_counter() - inicio, 4),
+    }
+
+
+def imprimir_informe(informe):
+    for r in informe['convertidos']:
+        print(f"✅ {os.path.basename(r['preguntas'])}: {r['num_preguntas']} preguntas, "
+              f"{len(r['avisos'])} avisos ({r['segundos'] * 1000:.0f} ms)")
+        # Resumen por tipo; el detalle de cada aviso va en el informe JSON
+        tipos = {}
+        for aviso in r['avisos']:
+            tipos[aviso['tipo']] = tipos.get(aviso['tipo'], 0) + 1
+        for tipo, n in tipos.items():
+            print(f"     ⚠️  {tipo}: {n}")
+    for r in informe['errores']:
+        print(f"❌ {os.path.basename(r['preguntas'])}: {r['error']}")
+    convertidos = len(informe['convertidos'])
+    segundos = informe['segundos'] or 1e-9
+    print(f"\n{convertidos} convertidos, {len(informe['omitidos'])} sin cambios, {len(informe['errores'])} con error")
+    print(f"{informe['num_preguntas']} preguntas en {segundos:.2f} s: "
+          f"{convertidos / segundos:.1f} ficheros/s, {informe['num_preguntas'] / segundos:.0f} preguntas/s")
+
+
+def _valor_opcion(args, nombre, defecto=None):
+    if nombre in args:
+        i = args.index(nombre)
+        if i + 1 < len(args):
+            return args[i + 1]
+    return defecto
 
 
 if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == '--lote':
+        args = sys.argv[2:]
+        trabajadores = _valor_opcion(args, '--trabajadores')
+        informe = convertir_directorio(
+            args[0],
+            out_dir=_valor_opcion(args, '--salida'),
+            trabajadores=int(trabajadores) if trabajadores else None,
+            forzar='--forzar' in args,
+        )
+        imprimir_informe(informe)
+        ruta_informe = _valor_opcion(args, '--informe')
+        if ruta_informe:
+            with open(ruta_informe, 'w', encoding='utf-8') as f:
+                json.dump(informe, f, ensure_ascii=False, indent=2)
+        sys.exit(1 if informe['errores'] else 0)
     if len(sys.argv) < 2:
         print("Uso: python convertir_preguntas.py preguntas_temaX_bloqueY.odt [respuestas_temaX_bloqueY.ods]")
+        print("     python convertir_preguntas.py --lote DIRECTORIO [--trabajadores N] [--salida DIR] "
+              "[--forzar] [--informe informe.json]")
         sys.exit(1)
     preguntas = sys.argv[1]
     respuestas = sys.argv[2] if len(sys.argv) > 2 else None
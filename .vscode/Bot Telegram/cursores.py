@@ -0,0 +1,199 @@
+"""
+Cursores de preguntas sin repetición por usuario y bloque/tema.
+
+Cada usuario recorre cada conjunto de preguntas (un bloque/tema o el banco
+entero) en un orden barajado propio y no vuelve a ver una pregunta hasta
+haber visto todas las del conjunto. La permutación no se guarda: es una
+red de Feistel con la semilla del cursor como clave (biyectiva sobre
+0..n-1 gracias al "cycle walking"), así que un cursor son unos pocos
+enteros (semilla, desplazamiento, tamaño) y sacar las k siguientes
+preguntas cuesta O(k). Al agotarse el conjunto se baraja con otra semilla.
+
+Tras una recarga del banco los cursores se reconcilian por id de pregunta:
+las preguntas ya vistas en la vuelta actual que siguen existiendo se
+apartan (`excluidos`), las borradas desaparecen y las nuevas entran en la
+vuelta actual. La recarga solo apunta el banco anterior; cada cursor (en
+memoria o guardado en el almacén) se reconcilia la primera vez que se usa
+con el banco nuevo, fuera del event loop, con un mapa id -> índice que se
+construye una vez por banco. Un cursor de un banco que ya no se conserva
+(el banco cambió con el bot parado) empieza de cero.
+"""
+
+import asyncio
+import logging
+import random
+from bisect import bisect_left
+from collections import OrderedDict
+
+_MASCARA_64 = (1 << 64) - 1
+_RONDAS = 4
+MAX_BANCOS_ANTERIORES = 2  # bancos anteriores que se conservan para reconciliar cursores
+
+
+def _mezclar(x):
+    """Mezcla de 64 bits (splitmix64)"""
+    x = (x + 0x9E3779B97F4A7C15) & _MASCARA_64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASCARA_64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASCARA_64
+    return x ^ (x >> 31)
+
+
+class Permutacion:
+    """Permutación pseudoaleatoria de range(n) determinada por `semilla`, sin materializar"""
+
+    __slots__ = ("n", "_mitad", "_mascara", "_claves")
+
+    def __init__(self, n, semilla):
+        self.n = n
+        # Dominio de 2^(2·mitad) >= n: menos de 4n, así que el cycle walking da < 4 pasos de media
+        self._mitad = max(1, ((n - 1).bit_length() + 1) // 2)
+        self._mascara = (1 << self._mitad) - 1
+        self._claves = [_mezclar(semilla * _RONDAS + r) & 0xFFFFFFFF for r in range(_RONDAS)]
+
+    def __getitem__(self, i):
+        mitad, mascara, n = self._mitad, self._mascara, self.n
+        while True:
+            izquierda, derecha = i >> mitad, i & mascara
+            for clave in self._claves:
+                # Función de ronda: hash multiplicativo de 32 bits (barato en enteros pequeños)
+                x = ((derecha ^ clave) * 0x45D9F3B) & 0xFFFFFFFF
+                izquierda, derecha = derecha, izquierda ^ ((x ^ (x >> 16)) & mascara)
+            i = (izquierda << mitad) | derecha
+            if i < n:
+                return i
+
+
+class Cursor:
+    """Posición de un usuario en el recorrido barajado de un conjunto de preguntas"""
+
+    __slots__ = ("semilla", "desplazamiento", "tamaño", "huella", "excluidos", "_permutacion")
+
+    def __init__(self, semilla, tamaño, huella, desplazamiento=0, excluidos=()):
+        self.semilla = semilla
+        self.desplazamiento = desplazamiento
+        self.tamaño = tamaño
+        self.huella = huella
+        self.excluidos = set(excluidos)  # ids ya vistos en esta vuelta (solo tras una recarga)
+        self._permutacion = None
+
+    def _nueva_vuelta(self, tamaño, rng):
+        self.semilla = rng.getrandbits(63)
+        self.desplazamiento = 0
+        self.tamaño = tamaño
+        self.excluidos.clear()
+        self._permutacion = None
+
+    def _posiciones(self):
+        """Posiciones del conjunto ya recorridas en esta vuelta (en orden)"""
+        permutacion = Permutacion(self.tamaño, self.semilla)
+        return (permutacion[i] for i in range(self.desplazamiento))
+
+    def siguientes(self, banco, indices, cantidad, rng=random):
+        """Los `cantidad` índices del banco siguientes del recorrido de `indices`
+        (como mucho len(indices), sin repetir dentro del mismo test)"""
+        cantidad = min(cantidad, len(indices))
+        elegidos = []
+        vistos = set()
+        ids = banco._ids
+        while len(elegidos) < cantidad:
+            if self.desplazamiento >= self.tamaño:
+                self._nueva_vuelta(len(indices), rng)
+            if self._permutacion is None:
+                self._permutacion = Permutacion(self.tamaño, self.semilla)
+            indice = indices[self._permutacion[self.desplazamiento]]
+            self.desplazamiento += 1
+            if indice in vistos or (self.excluidos and ids[indice] in self.excluidos):
+                continue
+            vistos.add(indice)
+            elegidos.append(indice)
+        return elegidos
+
+    def reconciliar(self, anterior, nuevo, indices_anteriores, indices_nuevos, indice_de_id=None):
+        """Adapta el cursor del banco `anterior` al `nuevo` conservando qué
+        preguntas (por id) se han visto ya en la vuelta actual.
+        `indice_de_id` es el mapa id -> índice de `nuevo` (ver mapa_de_ids).
+        Coste proporcional a las preguntas vistas, no al tamaño del conjunto."""
+        if indice_de_id is None:
+            indice_de_id = mapa_de_ids(nuevo)
+        ids_anteriores = anterior._ids
+        vistos = set(self.excluidos)
+        vistos.update(ids_anteriores[indices_anteriores[p]] for p in self._posiciones())
+        self.excluidos = set()
+        for id_pregunta in vistos:
+            indice = indice_de_id.get(id_pregunta)
+            if indice is not None and _contiene(indices_nuevos, indice):
+                self.excluidos.add(id_pregunta)
+        self.tamaño = len(indices_nuevos)
+        self.desplazamiento = self.tamaño if len(self.excluidos) >= self.tamaño else 0
+        self.huella = nuevo.huella
+        self._permutacion = None
+
+
+def mapa_de_ids(banco):
+    """{id de pregunta: índice} del banco (O(n): se construye una vez por banco)"""
+    return {id_pregunta: indice for indice, id_pregunta in enumerate(banco._ids)}
+
+
+def _contiene(indices, indice):
+    """`indice` está en `indices` (índices del banco en orden creciente)"""
+    pos = bisect_left(indices, indice)
+    return pos < len(indices) and indices[pos] == indice
+
+
+def _indices(banco, clave):
+    bloque, tema = clave
+    try:
+        return banco.indices(bloque, tema)
+    except ValueError:
+        return ()
+
+
+class CursoresPreguntas:
+    """Cursores de todos los usuarios, restaurados del almacén la primera vez que se usan"""
+
+    def __init__(self, almacen, rng=None):
+        self.almacen = almacen
+        self.rng = rng or random.Random()
+        self._usuarios = {}  # user_id -> {(bloque, tema): Cursor}
+        self._anteriores = OrderedDict()  # huella -> banco anterior a una recarga
+        self._mapa = (None, None)  # (huella, tarea que construye su mapa id -> índice)
+
+    async def siguientes(self, user_id, banco, clave, indices, cantidad):
+        """`cantidad` preguntas de `indices` (el conjunto `clave` = (bloque, tema))
+        que el usuario no ha visto en la vuelta actual"""
+        propios = self._usuarios.get(user_id)
+        if propios is None:
+            propios = await self.almacen.restaurar_cursores(user_id)
+            propios = self._usuarios.setdefault(user_id, propios)
+        cursor = propios.get(clave)
+        if cursor is not None and cursor.huella != banco.huella and cursor.huella in self._anteriores:
+            anterior = self._anteriores[cursor.huella]
+            indice_de_id = await self._mapa_de_ids(banco)
+            await asyncio.to_thread(cursor.reconciliar, anterior, banco, _indices(anterior, clave),
+                                    indices, indice_de_id)
+        if cursor is None or cursor.huella != banco.huella or cursor.tamaño != len(indices):
+            if cursor is not None:
+                logging.info(f"Cursor {clave} de {user_id} reiniciado: el banco de preguntas ha cambiado")
+            cursor = propios[clave] = Cursor(self.rng.getrandbits(63), len(indices), banco.huella)
+        elegidos = cursor.siguientes(banco, indices, cantidad, self.rng)
+        self.almacen.guardar_cursor(user_id, clave, cursor)
+        return elegidos
+
+    def _mapa_de_ids(self, banco):
+        """Tarea (compartida) que construye en otro hilo el mapa id -> índice de `banco`"""
+        huella, tarea = self._mapa
+        if huella != banco.huella:
+            tarea = asyncio.ensure_future(asyncio.to_thread(mapa_de_ids, banco))
+            self._mapa = (banco.huella, tarea)
+        return tarea
+
+    def reconciliar(self, anterior, nuevo):
+        """Apunta que los cursores de `anterior` pasan a `nuevo` (O(1): cada
+        cursor se reconcilia la próxima vez que se usa, ver `siguientes`)"""
+        if anterior.huella is None or anterior.huella == nuevo.huella:
+            return
+        self._anteriores[anterior.huella] = anterior
+        self._anteriores.move_to_end(anterior.huella)
+        self._anteriores.pop(nuevo.huella, None)
+        while len(self._anteriores) > MAX_BANCOS_ANTERIORES:
+            self._anteriores.popitem(last=False)
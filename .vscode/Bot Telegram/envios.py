@@ -0,0 +1,316 @@
+"""
+Despachador central de llamadas salientes a la API de Telegram.
+
+Todas las llamadas (reply_text, edit_message_text, query.answer...) pasan
+por `DespachadorEnvios.llamar`, que:
+  - respeta un límite global de llamadas por segundo (espaciadas
+    uniformemente, sin ráfagas que rebasen la ventana de 1 s) y un
+    ritmo por chat (un mensaje cada `intervalo_chat` con ráfagas cortas de
+    hasta `rafaga_chat`, para no retrasar la corrección + siguiente pregunta),
+  - atiende antes las llamadas interactivas (respuestas a botones) que las
+    normales y éstas antes que las masivas,
+  - fusiona ediciones pendientes del mismo mensaje: si llega una edición
+    nueva antes de enviar la anterior, solo se envía la última,
+  - ante un RetryAfter (HTTP 429) pausa ese chat (o todo, si la llamada no
+    es de un chat) el tiempo indicado y reintenta con backoff.
+
+Las llamadas con `limite_global=False` (answerCallbackQuery: Telegram no
+las cuenta entre los mensajes enviados) no pasan por la cola: se hacen en
+el acto, reintentando solo ellas ante un RetryAfter.
+
+No importa telegram: cualquier excepción con atributo `retry_after`
+(segundos o timedelta) se trata como RetryAfter.
+
+La cola es una por chat (heap por prioridad) más dos heaps de chats: los
+que ya pueden recibir, ordenados por la prioridad de su primer envío, y los
+que esperan su turno (GCRA), ordenados por el instante en que estarán
+listos. Elegir el siguiente envío cuesta O(log n) aunque haya muchos chats
+frenados; una entrada de un heap que ya no corresponde al primer envío de
+su chat se descarta al salir.
+
+Si se asigna `observador`, se le llama tras cada intento real contra la
+API como `observador(func, segundos, error)` (error None si fue bien).
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from datetime import timedelta
+
+PRIORIDAD_INTERACTIVA = 0
+PRIORIDAD_NORMAL = 1
+PRIORIDAD_MASIVA = 2
+
+
+class _Envio:
+    __slots__ = ("func", "args", "kwargs", "chat_id", "fusion", "futuro", "intentos", "encolado")
+
+    def __init__(self, func, args, kwargs, chat_id, fusion, futuro):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.chat_id = chat_id
+        self.fusion = fusion
+        self.futuro = futuro
+        self.intentos = 0
+        self.encolado = time.monotonic()
+
+
+def segundos_retry_after(error):
+    espera = getattr(error, "retry_after", None)
+    if isinstance(espera, timedelta):
+        return espera.total_seconds()
+    return float(espera) if espera is not None else None
+
+
+def _encadenar(origen, destino):
+    """Cuando `origen` termine, `destino` recibe su mismo resultado o excepción"""
+    def copiar(futuro):
+        if destino.done():
+            return
+        if futuro.cancelled():
+            destino.cancel()
+        elif futuro.exception() is not None:
+            destino.set_exception(futuro.exception())
+        else:
+            destino.set_result(futuro.result())
+    origen.add_done_callback(copiar)
+
+
+class DespachadorEnvios:
+    """Cola con prioridades y límites de ritmo para las llamadas a la API"""
+
+    def __init__(self, por_segundo=30.0, intervalo_chat=1.0, rafaga_chat=3, max_reintentos=5):
+        self.por_segundo = por_segundo
+        self.intervalo_chat = intervalo_chat
+        self._tolerancia_chat = (rafaga_chat - 1) * intervalo_chat
+        self.max_reintentos = max_reintentos
+        self._por_chat = {}                  # chat_id -> heap de (prioridad, secuencia, _Envio)
+        self._listos = []                    # heap de (prioridad, secuencia, chat_id) del primero de cada chat listo
+        self._esperando = []                 # heap de (instante en que estará listo, chat_id)
+        self._en_espera = set()              # chats con entrada en `_esperando`
+        self._encolados = 0
+        self._secuencia = itertools.count()
+        self._pendientes_fusion = {}         # clave de fusión -> _Envio aún no enviado
+        self._ultimo_fusion = {}             # clave de fusión -> _Envio más reciente (enviado o no)
+        self._proximo_chat = {}              # chat_id -> instante teórico del siguiente envío (GCRA)
+        self._limite_chats = 10000           # tamaño de `_proximo_chat` que dispara la limpieza
+        self._pausa_global = 0.0
+        self._tokens = 1.0
+        self._ultimo_relleno = time.monotonic()
+        self._hay_trabajo = None
+        self._tarea = None
+        self._en_curso = set()               # referencias a las tareas de envío activas
+        self.fusionadas = 0
+        self.reintentos = 0
+        self.observador = None
+
+    def __len__(self):
+        return self._encolados
+
+    async def llamar(self, func, *args, chat_id=None, prioridad=PRIORIDAD_NORMAL, fusion=None,
+                     limite_global=True, **kwargs):
+        """Encola `func(*args, **kwargs)` y espera su resultado.
+        `fusion` identifica llamadas que se sustituyen entre sí (p. ej. ediciones
+        del mismo mensaje): mientras la anterior no se haya enviado, se reemplaza.
+        Con `limite_global=False` la llamada no espera turno en la cola."""
+        if not limite_global:
+            return await self._llamar_directo(func, args, kwargs)
+        self._arrancar()
+        if fusion is not None:
+            pendiente = self._pendientes_fusion.get(fusion)
+            if pendiente is not None:
+                pendiente.func, pendiente.args, pendiente.kwargs = func, args, kwargs
+                self.fusionadas += 1
+                return await asyncio.shield(pendiente.futuro)
+
+        envio = _Envio(func, args, kwargs, chat_id, fusion, asyncio.get_running_loop().create_future())
+        if fusion is not None:
+            self._pendientes_fusion[fusion] = envio
+            self._ultimo_fusion[fusion] = envio
+        self._encolar(prioridad, envio)
+        return await asyncio.shield(envio.futuro)
+
+    def _arrancar(self):
+        if self._tarea is None or self._tarea.done():
+            self._hay_trabajo = asyncio.Event()
+            self._tarea = asyncio.create_task(self._bucle())
+
+    def _encolar(self, prioridad, envio):
+        elemento = (prioridad, next(self._secuencia), envio)
+        cola = self._por_chat.setdefault(envio.chat_id, [])
+        heapq.heappush(cola, elemento)
+        self._encolados += 1
+        if cola[0] is elemento:
+            self._programar(envio.chat_id, time.monotonic())
+        self._hay_trabajo.set()
+
+    def _listo_en(self, chat_id):
+        if chat_id is None:
+            return 0.0
+        return self._proximo_chat.get(chat_id, 0.0) - self._tolerancia_chat
+
+    def _programar(self, chat_id, ahora):
+        """Apunta el primer envío de `chat_id` en `_listos` o, si su chat aún no
+        puede recibir, el chat en `_esperando`"""
+        listo_en = self._listo_en(chat_id)
+        if listo_en <= ahora:
+            prioridad, secuencia, _ = self._por_chat[chat_id][0]
+            heapq.heappush(self._listos, (prioridad, secuencia, chat_id))
+        elif chat_id not in self._en_espera:
+            self._en_espera.add(chat_id)
+            heapq.heappush(self._esperando, (listo_en, chat_id))
+
+    async def detener(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            self._tarea = None
+
+    async def _llamar_directo(self, func, args, kwargs):
+        intentos = 0
+        while True:
+            inicio = time.perf_counter()
+            try:
+                resultado = await func(*args, **kwargs)
+            except Exception as e:
+                if self.observador is not None:
+                    self.observador(func, time.perf_counter() - inicio, e)
+                espera = segundos_retry_after(e)
+                if espera is None or intentos >= self.max_reintentos:
+                    raise
+                intentos += 1
+                self.reintentos += 1
+                logging.warning(f"RetryAfter de {espera:.1f} s (fuera de la cola), reintento {intentos}")
+                await asyncio.sleep(espera * (1 + 0.5 * (intentos - 1)))
+                continue
+            if self.observador is not None:
+                self.observador(func, time.perf_counter() - inicio, None)
+            return resultado
+
+    # --- bucle de envío ---
+
+    def _rellenar_tokens(self, ahora):
+        # Capacidad 1: una llamada cada 1/por_segundo, nunca más de `por_segundo` en un segundo
+        self._tokens = min(1.0, self._tokens + (ahora - self._ultimo_relleno) * self.por_segundo)
+        self._ultimo_relleno = ahora
+
+    def _siguiente_listo(self, ahora):
+        """Saca de la cola el envío más prioritario cuyo chat ya puede recibir.
+        Devuelve (elemento o None, instante en que habrá alguno listo)."""
+        # Chats cuyo turno ya llegó: pasan a `_listos` (o vuelven a esperar si un
+        # RetryAfter les retrasó el turno mientras tanto)
+        while self._esperando and self._esperando[0][0] <= ahora:
+            _, chat_id = heapq.heappop(self._esperando)
+            self._en_espera.discard(chat_id)
+            if self._por_chat.get(chat_id):
+                self._programar(chat_id, ahora)
+
+        while self._listos:
+            _, secuencia, chat_id = heapq.heappop(self._listos)
+            cola = self._por_chat.get(chat_id)
+            if not cola or cola[0][1] != secuencia:
+                continue  # entrada vieja: ese envío ya salió o otro más prioritario pasó delante
+            if self._listo_en(chat_id) > ahora:
+                self._programar(chat_id, ahora)
+                continue
+            elemento = heapq.heappop(cola)
+            self._encolados -= 1
+            if not cola:
+                del self._por_chat[chat_id]
+            return elemento, ahora
+        return None, self._esperando[0][0] if self._esperando else float("inf")
+
+    async def _bucle(self):
+        while True:
+            if not self._encolados:
+                self._hay_trabajo.clear()
+                await self._hay_trabajo.wait()
+                continue
+
+            ahora = time.monotonic()
+            if ahora < self._pausa_global:
+                await asyncio.sleep(self._pausa_global - ahora)
+                continue
+
+            self._rellenar_tokens(ahora)
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.por_segundo)
+                continue
+
+            elemento, proximo = self._siguiente_listo(ahora)
+            if elemento is None:
+                # Todos los chats con trabajo están en espera: dormir hasta el primero
+                # (o hasta que llegue algo nuevo, que puede ser de otro chat)
+                self._hay_trabajo.clear()
+                try:
+                    await asyncio.wait_for(self._hay_trabajo.wait(), timeout=proximo - ahora)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._tokens -= 1
+            prioridad, _, envio = elemento
+            if envio.chat_id is not None:
+                teorico = self._proximo_chat.get(envio.chat_id, 0.0)
+                self._proximo_chat[envio.chat_id] = max(teorico, ahora) + self.intervalo_chat
+            if envio.chat_id in self._por_chat:
+                # El siguiente del mismo chat, ya con su nuevo turno
+                self._programar(envio.chat_id, ahora)
+            if envio.fusion is not None and self._pendientes_fusion.get(envio.fusion) is envio:
+                del self._pendientes_fusion[envio.fusion]
+            tarea = asyncio.create_task(self._ejecutar(prioridad, envio))
+            self._en_curso.add(tarea)
+            tarea.add_done_callback(self._en_curso.discard)
+
+    async def _ejecutar(self, prioridad, envio):
+        inicio = time.perf_counter()
+        try:
+            resultado = await envio.func(*envio.args, **envio.kwargs)
+        except Exception as e:
+            if self.observador is not None:
+                self.observador(envio.func, time.perf_counter() - inicio, e)
+            espera = segundos_retry_after(e)
+            if espera is None or envio.intentos >= self.max_reintentos:
+                self._terminar(envio)
+                if not envio.futuro.done():
+                    envio.futuro.set_exception(e)
+                return
+            # Flood control: pausar el chat (o todo) y reintentar con backoff creciente
+            envio.intentos += 1
+            self.reintentos += 1
+            hasta = time.monotonic() + espera * (1 + 0.5 * (envio.intentos - 1))
+            if envio.chat_id is not None:
+                # Sin ráfaga hasta que pase la espera indicada por Telegram
+                self._proximo_chat[envio.chat_id] = max(
+                    self._proximo_chat.get(envio.chat_id, 0.0), hasta + self._tolerancia_chat
+                )
+            else:
+                self._pausa_global = max(self._pausa_global, hasta)
+            logging.warning(f"RetryAfter de {espera:.1f} s (chat {envio.chat_id}), reintento {envio.intentos}")
+            if envio.fusion is not None:
+                posterior = self._ultimo_fusion.get(envio.fusion, envio)
+                if posterior is not envio:
+                    # Mientras tanto llegó otra edición del mismo mensaje: reintentar esta
+                    # la pisaría con el texto viejo. Se descarta y recibe el resultado de la nueva.
+                    _encadenar(posterior.futuro, envio.futuro)
+                    return
+                self._pendientes_fusion[envio.fusion] = envio
+            self._encolar(prioridad, envio)
+            return
+        if self.observador is not None:
+            self.observador(envio.func, time.perf_counter() - inicio, None)
+        self._terminar(envio)
+        if not envio.futuro.done():
+            envio.futuro.set_result(resultado)
+        # Limpiar chats inactivos para que el dict no crezca sin límite. El umbral se
+        # dobla si casi todos siguen activos, para no recorrerlo en cada envío (O(1) amortizado)
+        if len(self._proximo_chat) > self._limite_chats:
+            ahora = time.monotonic()
+            self._proximo_chat = {c: t for c, t in self._proximo_chat.items() if t > ahora}
+            self._limite_chats = max(10000, 2 * len(self._proximo_chat))
+
+    def _terminar(self, envio):
+        if envio.fusion is not None and self._ultimo_fusion.get(envio.fusion) is envio:
+            del self._ultimo_fusion[envio.fusion]
@@ -0,0 +1,270 @@
+"""
+Resultados de los usuarios: histórico de solo escritura al final + agregados.
+
+Cada respuesta y cada test terminado se añade como un registro binario de
+tamaño fijo (REGISTRO) a resultados.log, que nunca se reescribe. A la vez
+se actualizan en O(1) los agregados del usuario para la pregunta de su
+bloque/tema, su bloque y el total: respuestas, aciertos, media móvil,
+racha actual y mejor racha, tests y media móvil de los tests. /estadisticas
+solo lee esos agregados, sin recorrer el histórico.
+
+Como en almacen_sesiones, los handlers solo tocan memoria: una tarea en
+segundo plano añade los registros pendientes al fichero desde otro hilo.
+Cada cierto volumen se guarda una instantánea (JSON) de los agregados con
+el desplazamiento del histórico que incluye; al arrancar se carga la
+instantánea y solo se reproduce lo escrito después.
+
+El volcado periódico y cerrar() pueden escribir a la vez desde dos hilos:
+la escritura va bajo un lock, los bloques del histórico se añaden en el
+orden en que se generaron y nunca se sustituye una instantánea por otra
+más antigua. Un bloque solo sale de la cola cuando está entero en disco:
+si la escritura falla se deshace lo escrito a medias y se reintenta en el
+siguiente volcado, y no se guarda una instantánea que vaya por delante de
+lo que hay en el fichero.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import struct
+import threading
+import time
+from collections import deque
+
+# tipo, bloque, tema, aciertos, total, user_id, id de pregunta (0 en un test), momento
+REGISTRO = struct.Struct("<BBBxHHqqd")
+RESPUESTA, TEST = 0, 1
+
+ALFA_RESPUESTAS = 0.1   # media móvil de aciertos: pesan sobre todo las ~20 últimas respuestas
+ALFA_TESTS = 0.3        # media móvil del porcentaje de los tests
+BYTES_INSTANTANEA = 1 << 20  # histórico nuevo tras el que se guarda otra instantánea
+
+
+class Agregado:
+    """Contadores de un usuario en un ámbito: total (0, 0), bloque (b, 0) o tema (b, t)"""
+
+    __slots__ = ("respuestas", "aciertos", "media", "racha", "mejor_racha",
+                 "tests", "media_tests", "mejor_test")
+
+    def __init__(self, respuestas=0, aciertos=0, media=0.0, racha=0, mejor_racha=0,
+                 tests=0, media_tests=0.0, mejor_test=0.0):
+        self.respuestas = respuestas
+        self.aciertos = aciertos
+        self.media = media
+        self.racha = racha
+        self.mejor_racha = mejor_racha
+        self.tests = tests
+        self.media_tests = media_tests
+        self.mejor_test = mejor_test
+
+    @property
+    def porcentaje(self):
+        return self.aciertos / self.respuestas * 100 if self.respuestas else 0.0
+
+    def respuesta(self, acierto):
+        self.respuestas += 1
+        self.aciertos += acierto
+        self.media = acierto if self.respuestas == 1 else self.media + ALFA_RESPUESTAS * (acierto - self.media)
+        if acierto:
+            self.racha += 1
+            if self.racha > self.mejor_racha:
+                self.mejor_racha = self.racha
+        else:
+            self.racha = 0
+
+    def test(self, porcentaje):
+        self.tests += 1
+        self.media_tests = porcentaje if self.tests == 1 else self.media_tests + ALFA_TESTS * (porcentaje - self.media_tests)
+        if porcentaje > self.mejor_test:
+            self.mejor_test = porcentaje
+
+    def como_lista(self):
+        return [getattr(self, campo) for campo in self.__slots__]
+
+
+def _ambitos(bloque, tema):
+    """Claves de agregado que actualiza un evento de (bloque, tema); 0 = sin asignar"""
+    if not bloque:
+        return ((0, 0),)
+    if not tema:
+        return ((0, 0), (bloque, 0))
+    return ((0, 0), (bloque, 0), (bloque, tema))
+
+
+def _numero(valor):
+    """Bloque/tema de una sesión ("1", "aleatorio", None...) como entero 0..255"""
+    try:
+        numero = int(valor)
+    except (TypeError, ValueError):
+        return 0
+    return numero if 0 < numero < 256 else 0
+
+
+class RegistroResultados:
+    """Histórico de resultados y agregados por usuario. Sin `ruta` solo vive en memoria."""
+
+    def __init__(self, ruta=None, intervalo=1.0):
+        self.ruta = ruta
+        self.ruta_instantanea = ruta + ".agregados.json" if ruta else None
+        self.intervalo = intervalo
+        self._usuarios = {}          # user_id -> {(bloque, tema): Agregado}
+        self._pendiente = bytearray()
+        self._generados = 0          # bytes del histórico sacados de `_pendiente` (en disco o en cola)
+        self._escritos = 0           # bytes del histórico ya en disco (solo lo toca `_escribir`)
+        self._en_instantanea = 0     # bytes del histórico incluidos en la última instantánea
+        self._por_escribir = deque()  # bloques del histórico, en orden, aún sin escribir
+        self._instantanea_escrita = -1  # desplazamiento de la instantánea que hay en disco
+        self._lock = threading.Lock()
+
+    # --- Actualización (O(1), solo memoria) ---
+
+    def _aplicar(self, tipo, user_id, bloque, tema, aciertos, total):
+        agregados = self._usuarios.get(user_id)
+        if agregados is None:
+            agregados = self._usuarios[user_id] = {}
+        for clave in _ambitos(bloque, tema):
+            agregado = agregados.get(clave)
+            if agregado is None:
+                agregado = agregados[clave] = Agregado()
+            if tipo == RESPUESTA:
+                agregado.respuesta(aciertos)
+            else:
+                agregado.test(aciertos / total * 100 if total else 0.0)
+
+    def _añadir(self, tipo, user_id, bloque, tema, aciertos, total, id_pregunta):
+        self._aplicar(tipo, user_id, bloque, tema, aciertos, total)
+        if self.ruta:
+            self._pendiente += REGISTRO.pack(tipo, bloque, tema, aciertos, total, user_id, id_pregunta, time.time())
+
+    def registrar_respuesta(self, user_id, id_pregunta, bloque, tema, acierto):
+        """Respuesta a una pregunta de (bloque, tema) (enteros, None/0 = sin asignar)"""
+        self._añadir(RESPUESTA, user_id, bloque or 0, tema or 0, int(acierto), 1, id_pregunta)
+
+    def registrar_test(self, user_id, bloque, tema, aciertos, total):
+        """Test terminado; `bloque`/`tema` son los elegidos en el menú ("aleatorio" cuenta solo en el total)"""
+        self._añadir(TEST, user_id, _numero(bloque), _numero(tema), aciertos, total, 0)
+
+    # --- Consulta ---
+
+    def agregados(self, user_id):
+        """{(bloque, tema): Agregado} del usuario; (0, 0) es el total y (b, 0) el bloque b"""
+        return self._usuarios.get(user_id, {})
+
+    # --- Persistencia ---
+
+    def cargar(self):
+        """Carga la instantánea y reproduce el histórico escrito después (al arrancar)"""
+        if not self.ruta:
+            return 0
+        desde = 0
+        try:
+            with open(self.ruta_instantanea, encoding="utf-8") as f:
+                instantanea = json.load(f)
+            self._usuarios = {
+                int(user_id): {tuple(map(int, clave.split(","))): Agregado(*valores)
+                               for clave, valores in agregados.items()}
+                for user_id, agregados in instantanea["usuarios"].items()
+            }
+            desde = instantanea["desplazamiento"]
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logging.error(f"Instantánea de resultados no válida ({e}): se reproduce todo el histórico")
+            self._usuarios = {}
+
+        try:
+            with open(self.ruta, "r+b") as f:
+                tamaño = f.seek(0, os.SEEK_END)
+                completo = tamaño - tamaño % REGISTRO.size
+                if completo != tamaño:
+                    # Registro a medias de una parada brusca: se descarta
+                    f.truncate(completo)
+                if desde > completo:
+                    logging.error("La instantánea de resultados va por delante del histórico: se reproduce todo")
+                    self._usuarios, desde = {}, 0
+                f.seek(desde)
+                datos = f.read()
+        except FileNotFoundError:
+            completo, datos = 0, b""
+
+        aplicar = self._aplicar
+        for tipo, bloque, tema, aciertos, total, user_id, _, _ in REGISTRO.iter_unpack(datos):
+            aplicar(tipo, user_id, bloque, tema, aciertos, total)
+        self._generados = self._escritos = completo
+        self._en_instantanea = desde
+        return len(datos) // REGISTRO.size
+
+    def _instantanea(self):
+        return {
+            "desplazamiento": self._generados + len(self._pendiente),
+            "usuarios": {
+                str(user_id): {f"{b},{t}": agregado.como_lista() for (b, t), agregado in agregados.items()}
+                for user_id, agregados in self._usuarios.items()
+            },
+        }
+
+    async def vaciar(self, instantanea=False):
+        """Añade al histórico los registros pendientes (y guarda instantánea si toca)"""
+        if not self.ruta:
+            return
+        if instantanea or self._generados + len(self._pendiente) - self._en_instantanea >= BYTES_INSTANTANEA:
+            estado = self._instantanea()
+        else:
+            estado = None
+            if not self._pendiente and not self._por_escribir:
+                return
+        if self._pendiente:
+            self._por_escribir.append(self._pendiente)
+            self._generados += len(self._pendiente)
+            self._pendiente = bytearray()
+        # Los contadores solo avanzan si la escritura termina bien
+        if await asyncio.to_thread(self._escribir, estado):
+            self._en_instantanea = max(self._en_instantanea, estado["desplazamiento"])
+
+    def _escribir(self, estado):
+        """Escribe los bloques en cola y, si cabe, la instantánea. True si guardó la instantánea."""
+        with self._lock:
+            # Quien llegue primero escribe todo lo encolado hasta ahora, en orden
+            if self._por_escribir:
+                with open(self.ruta, "ab", buffering=0) as f:
+                    try:
+                        while self._por_escribir:
+                            bloque = memoryview(self._por_escribir[0])
+                            while bloque:
+                                bloque = bloque[f.write(bloque):]
+                            self._escritos += len(self._por_escribir.popleft())
+                    except OSError:
+                        # Sin registros a medias: el reintento vuelve a escribir el bloque entero
+                        f.truncate(self._escritos)
+                        raise
+            if estado is None:
+                return False
+            desplazamiento = estado["desplazamiento"]
+            if self._instantanea_escrita <= desplazamiento <= self._escritos:
+                temporal = self.ruta_instantanea + ".tmp"
+                with open(temporal, "w", encoding="utf-8") as f:
+                    json.dump(estado, f, separators=(",", ":"))
+                os.replace(temporal, self.ruta_instantanea)
+                self._instantanea_escrita = desplazamiento
+                return True
+            return False
+
+    async def vaciar_periodicamente(self):
+        while True:
+            await asyncio.sleep(self.intervalo)
+            try:
+                await self.vaciar()
+            except Exception as e:
+                logging.error(f"Error al guardar resultados en {self.ruta}: {e}")
+
+    async def cerrar(self):
+        await self.vaciar(instantanea=True)
+
+
+def crear_registro_resultados():
+    """Histórico en RUTA_RESULTADOS; solo en memoria si ALMACEN_SESIONES=memoria"""
+    if os.getenv("ALMACEN_SESIONES", "sqlite").strip().lower() == "memoria":
+        return RegistroResultados()
+    ruta = os.getenv("RUTA_RESULTADOS", os.path.join(os.path.dirname(__file__), "resultados.log"))
+    return RegistroResultados(ruta, intervalo=float(os.getenv("INTERVALO_GUARDADO", "1")))
@@ -0,0 +1,37 @@
+"""
+Formato de los textos de las preguntas: `**negrita**` y `*cursiva*` a HTML.
+
+No importa telegram (como menus.py), así que se puede usar y probar sin
+python-telegram-bot; renderizado.py lo usa al construir la caché.
+
+Los marcadores se emparejan en una sola pasada con una pila, así que las
+etiquetas siempre quedan bien anidadas: Telegram rechaza con BadRequest
+HTML como `<b>a <i>b</b> c</i>`. Un marcador sin pareja, o que cerraría
+cruzando a otro, se deja como texto.
+"""
+
+import html
+import re
+
+_MARCADOR = re.compile(r"(\*\*|\*)")
+_ETIQUETAS = {"**": ("<b>", "</b>"), "*": ("<i>", "</i>")}
+
+
+def markdown_a_html(texto):
+    """Escapa el texto y convierte **negrita** / *cursiva* a etiquetas HTML"""
+    partes = _MARCADOR.split(html.escape(texto, quote=False))
+    abiertos = []  # (marcador, posición en `partes`) aún sin cerrar
+    for pos in range(1, len(partes), 2):
+        marcador = partes[pos]
+        # Solo cierra el último abierto y si hay algo dentro ("****" se queda como texto)
+        if abiertos and abiertos[-1][0] == marcador and any(partes[abiertos[-1][1] + 1:pos]):
+            _, inicio = abiertos.pop()
+            partes[inicio], partes[pos] = _ETIQUETAS[marcador]
+        else:
+            abiertos.append((marcador, pos))
+    return "".join(partes)
+
+
+def texto_boton(texto):
+    """Los botones no admiten formato: quitar los marcadores"""
+    return texto.replace("*", "")
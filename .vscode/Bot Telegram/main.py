@@ -1,24 +1,71 @@
 import os
 import json
 import logging
-import random
+import asyncio
+import math
+import signal
 from dotenv import load_dotenv
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, ConversationHandler, CallbackQueryHandler
 from functools import wraps
+from banco_preguntas import QuestionBank, RecargadorBanco
+from sesiones import TestSession
+from almacen_sesiones import crear_almacen
+from servidor_webhook import crear_servidor_webhook, parsear_direccion
+from concurrencia import serializar_por_usuario
+from autorizacion import ListaAutorizados, crear_lista_autorizados
+from registro_intrusos import AgrupadorIntentos, configurar_registro_intrusos
+from seleccion_adaptativa import SelectorAdaptativo
+from cursores import CursoresPreguntas
+from estadisticas import crear_registro_resultados
+from metricas import Metricas, crear_servidor_metricas
+from perfilado import crear_perfilador
+from envios import DespachadorEnvios, PRIORIDAD_INTERACTIVA, PRIORIDAD_NORMAL, PRIORIDAD_MASIVA
+from menus import BLOQUE_NOMBRE, MENSAJE_BLOQUES, MENSAJE_CANTIDAD_ALEATORIO, mensaje_cantidad
+from renderizado import (
+    TECLADO_BLOQUES, TECLADO_CANTIDAD, PARSE_MODE_PREGUNTAS, markdown_a_html, preparar_banco
+)
 
 # 1. Cargamos las variables de entorno (el Token)
 load_dotenv()
 TOKEN = os.getenv("TELEGRAM_TOKEN")
-def cargar_usuarios_autorizados_from_env():
-    """Lee `USUARIOS_AUTORIZADOS` desde variables de entorno o .env y normaliza.
+# Servidor de la Bot API (vacío = api.telegram.org): un telegram-bot-api propio o el
+# sustituto local de benchmarks/api_telegram_local.py para pruebas de extremo a extremo
+API_TELEGRAM_URL = os.getenv("API_TELEGRAM_URL", "").strip().rstrip("/")
+# Modo de recepción de updates: "polling" (por defecto) o "webhook"
+MODO_BOT = os.getenv("MODO_BOT", "polling").strip().lower()
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")            # URL pública registrada en Telegram
+WEBHOOK_ESCUCHA = os.getenv("WEBHOOK_ESCUCHA", "0.0.0.0:8443")
+WEBHOOK_RUTA = os.getenv("WEBHOOK_RUTA", "/webhook")
+WEBHOOK_SECRETO = os.getenv("WEBHOOK_SECRETO", "")
+# Updates atendidas a la vez (las de un mismo usuario siempre van en serie)
+UPDATES_CONCURRENTES = int(os.getenv("UPDATES_CONCURRENTES", "256"))
+# Modo de mensaje único: la corrección y la siguiente pregunta van en una sola edición
+MENSAJE_UNICO = os.getenv("MENSAJE_UNICO", "0").strip().lower() in ("1", "true", "si", "sí")
+HISTORIAL_MENSAJE_UNICO = 10  # respuestas recientes que se muestran como ✅/❌
+# Selección adaptativa: más probabilidad para las preguntas que el usuario falla y las que no ha visto hace tiempo
+SELECCION_ADAPTATIVA = os.getenv("SELECCION_ADAPTATIVA", "0").strip().lower() in ("1", "true", "si", "sí")
+# Límites de envío (Telegram: ~30 mensajes/s en total y ~1/s por chat)
+ENVIOS_POR_SEGUNDO = float(os.getenv("ENVIOS_POR_SEGUNDO", "30"))
+INTERVALO_ENVIOS_CHAT = float(os.getenv("INTERVALO_ENVIOS_CHAT", "1"))
+RAFAGA_ENVIOS_CHAT = int(os.getenv("RAFAGA_ENVIOS_CHAT", "3"))
+# Intrusos: agrupar intentos repetidos y no contestar al mismo más de una vez por enfriamiento
+VENTANA_INTRUSOS = float(os.getenv("VENTANA_INTRUSOS", "60"))
+ENFRIAMIENTO_INTRUSOS = float(os.getenv("ENFRIAMIENTO_INTRUSOS", "300"))
+MAX_BYTES_LOG_INTRUSOS = int(os.getenv("MAX_BYTES_LOG_INTRUSOS", str(5 * 1024 * 1024)))
+COPIAS_LOG_INTRUSOS = int(os.getenv("COPIAS_LOG_INTRUSOS", "5"))
+# Métricas de Prometheus en http://METRICAS_ESCUCHA/metrics (vacío para desactivarlas)
+METRICAS_ESCUCHA = os.getenv("METRICAS_ESCUCHA", "127.0.0.1:9464").strip()
+
+def cargar_usuarios_autorizados_from_env(variable="USUARIOS_AUTORIZADOS"):
+    """Lee `USUARIOS_AUTORIZADOS` (u otra `variable`) desde variables de entorno o .env y normaliza.
     Soporta formatos como:
       - JSON array: ["@user", "12345"]
       - Comma separated: @user,12345,user2
       - Con o sin corchetes, con o sin espacios
     Devuelve un set con IDs (strings) y nombres de usuario (con y sin '@').
     """
-    raw = os.getenv("USUARIOS_AUTORIZADOS", "")
+    raw = os.getenv(variable, "")
     if not raw:
         return set()
 
@@ -64,24 +111,42 @@ def cargar_usuarios_autorizados_from_env():
     return result
 
 
-# Cargar usuarios autorizados normalizados
-USUARIOS_AUTORIZADOS = cargar_usuarios_autorizados_from_env()
+# Usuarios autorizados: fichero RUTA_AUTORIZADOS que se recarga al cambiar
+# (la primera vez se crea con lo que haya en USUARIOS_AUTORIZADOS)
+autorizados = crear_lista_autorizados(cargar_usuarios_autorizados_from_env())
+# Administradores: pueden usar comandos de mantenimiento como /recargar o /autorizar
+administradores = ListaAutorizados(cargar_usuarios_autorizados_from_env("ADMINISTRADORES"))
+
+# Fichero del banco: el compilado preguntas.bin (se mapea en memoria) si existe,
+# si no preguntas.json; RUTA_PREGUNTAS fuerza uno concreto
+RUTA_PREGUNTAS_JSON = os.path.join(os.path.dirname(__file__), "preguntas.json")
+RUTA_PREGUNTAS_BIN = os.path.join(os.path.dirname(__file__), "preguntas.bin")
+
+def elegir_ruta_preguntas():
+    ruta = os.getenv("RUTA_PREGUNTAS")
+    if ruta:
+        return ruta
+    return RUTA_PREGUNTAS_BIN if os.path.exists(RUTA_PREGUNTAS_BIN) else RUTA_PREGUNTAS_JSON
 
 # Variables globales para almacenar datos del test
-preguntas = []
-test_sessions = {}  # Almacena el estado del test por usuario
+banco = QuestionBank([])
+recargador = RecargadorBanco(
+    elegir_ruta_preguntas(),
+    intervalo=float(os.getenv("INTERVALO_RECARGA", "5")),
+    preparar=preparar_banco
+)
+test_sessions = {}  # Almacena el estado del test por usuario (user_id -> TestSession)
+almacen = crear_almacen()  # Persistencia de test_sessions (SQLite por defecto)
+selector = SelectorAdaptativo()  # Pesos por usuario para SELECCION_ADAPTATIVA
+cursores = CursoresPreguntas(almacen)  # Recorrido sin repetición por usuario y bloque/tema
+resultados = crear_registro_resultados()  # Histórico de respuestas y agregados para /estadisticas
 
 # Estados para la conversación
 SELECCIONAR_BLOQUE, SELECCIONAR_TEMA, SELECCIONAR_CANTIDAD = range(3)
 
-# Configuración de temas por bloque
-TEMAS_POR_BLOQUE = {
-    "1": 9,
-    "2": 5,
-    "3": 9,
-    "4": 10,
-    "aleatorio": 0  # sin límite para aleatorio
-}
+# Temas disponibles por bloque: {bloque: [(tema, num_preguntas), ...]}
+# Se calcula a partir del índice del banco en cargar_preguntas()
+TEMAS_POR_BLOQUE = {}
 
 # 2. Configuración de Logs (Para ver errores en la terminal)
 logging.basicConfig(
@@ -91,56 +156,71 @@ logging.basicConfig(
 
 # 2b. Configurar logging de intrusos en archivo
 def configurar_logging_intrusos():
-    """Configura el logger para registrar intentos de acceso no autorizados"""
+    """Configura el logger para registrar intentos de acceso no autorizados.
+    La escritura (con rotación y gzip) se hace en un hilo aparte vía cola."""
     ruta_log = os.path.join(os.path.dirname(__file__), 'intrusos.log')
-    
-    # Crear logger específico para intrusos
-    logger_intrusos = logging.getLogger('intrusos')
-    logger_intrusos.setLevel(logging.WARNING)
-    
-    # Handler para archivo
-    file_handler = logging.FileHandler(ruta_log, encoding='utf-8')
-    file_handler.setLevel(logging.WARNING)
-    
-    # Formato con más detalles
-    formatter = logging.Formatter(
-        '%(asctime)s | USUARIO NO AUTORIZADO | Username: %(username)s | ID: %(user_id)s | Chat: %(chat_id)s'
+    return configurar_registro_intrusos(ruta_log, MAX_BYTES_LOG_INTRUSOS, COPIAS_LOG_INTRUSOS)
+
+# Crear logger de intrusos y el agrupador de intentos repetidos
+logger_intrusos, escucha_intrusos = configurar_logging_intrusos()
+intentos_intrusos = AgrupadorIntentos(logger_intrusos, VENTANA_INTRUSOS, ENFRIAMIENTO_INTRUSOS)
+
+# 2c. Envíos a Telegram: todos pasan por el despachador (límites, prioridades, RetryAfter)
+despachador = DespachadorEnvios(ENVIOS_POR_SEGUNDO, INTERVALO_ENVIOS_CHAT, RAFAGA_ENVIOS_CHAT)
+
+# 2d. Métricas: latencia de handlers, llamadas a la API, denegaciones y medidores
+metricas = Metricas()
+despachador.observador = metricas.registrar_llamada_api
+metricas.medidor("bot_sesiones_activas", "Tests en curso en memoria", lambda: len(test_sessions))
+metricas.medidor("bot_banco_preguntas", "Preguntas del banco instalado", lambda: len(banco))
+metricas.medidor("bot_envios_en_cola", "Llamadas a la API esperando en el despachador", lambda: len(despachador))
+servidor_metricas = (
+    crear_servidor_metricas(metricas, *parsear_direccion(METRICAS_ESCUCHA, 9464)) if METRICAS_ESCUCHA else None
+)
+
+# 2e. Perfilado bajo demanda de los handlers (se activa con /perfil)
+perfilador = crear_perfilador()
+
+async def responder(mensaje, *args, prioridad=PRIORIDAD_NORMAL, **kwargs):
+    """reply_text a través del despachador"""
+    return await despachador.llamar(mensaje.reply_text, *args, chat_id=mensaje.chat_id, prioridad=prioridad, **kwargs)
+
+async def editar(query, *args, **kwargs):
+    """edit_message_text interactivo; una edición nueva del mismo mensaje sustituye a la pendiente"""
+    mensaje = query.message
+    return await despachador.llamar(
+        query.edit_message_text, *args,
+        chat_id=mensaje.chat_id, prioridad=PRIORIDAD_INTERACTIVA,
+        fusion=("editar", mensaje.chat_id, mensaje.message_id), **kwargs
     )
-    file_handler.setFormatter(formatter)
-    logger_intrusos.addHandler(file_handler)
-    
-    return logger_intrusos
 
-# Crear logger de intrusos
-logger_intrusos = configurar_logging_intrusos()
+async def contestar(query, *args, **kwargs):
+    """query.answer (quita el reloj del botón): sin esperar turno, no cuenta en el límite global ni por chat"""
+    return await despachador.llamar(query.answer, *args, limite_global=False, **kwargs)
 
 # 3. Función decoradora para controlar acceso de usuarios
 def require_authorization(func):
     """Decorator to check if user is authorized before executing command"""
     @wraps(func)
     async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        user_id = str(update.effective_user.id)
-        username = update.effective_user.username or update.effective_user.first_name or "Desconocido"
-        chat_id = update.effective_chat.id
-        
-        # Permitir por ID numérico o por nombre de usuario
-        is_authorized = user_id in USUARIOS_AUTORIZADOS or f"@{username}" in USUARIOS_AUTORIZADOS
+        usuario = update.effective_user
         
-        if not is_authorized:
-            # Registrar intento no autorizado en el archivo de log
-            logger_intrusos.warning(
-                f"Intento de acceso no autorizado",
-                extra={
-                    'username': username,
-                    'user_id': user_id,
-                    'chat_id': chat_id
-                }
-            )
-            
-            await update.message.reply_text(
-                "❌ No tienes permiso para usar este comando. Tu acceso está restringido."
-            )
-            logging.warning(f"Acceso denegado a usuario: {username} (ID: {user_id})")
+        # Búsqueda por ID; el username solo se mira la primera vez (para resolverlo a su ID)
+        if not autorizados.permitido(usuario.id, usuario.username):
+            user_id = str(usuario.id)
+            username = usuario.username or usuario.first_name or "Desconocido"
+            chat_id = update.effective_chat.id
+            # Registrar el intento (agrupado por ventana) y contestar solo si pasó el enfriamiento
+            es_nuevo, contestar_intruso = intentos_intrusos.registrar(user_id, chat_id, username)
+            metricas.denegar("usuario")
+            if es_nuevo:
+                logging.warning(f"Acceso denegado a usuario: {username} (ID: {user_id})")
+            if contestar_intruso and update.effective_message is not None:
+                await responder(
+                    update.effective_message,
+                    "❌ No tienes permiso para usar este comando. Tu acceso está restringido.",
+                    prioridad=PRIORIDAD_MASIVA
+                )
             return
         
         # Si está autorizado, ejecutar la función
@@ -148,50 +228,104 @@ def require_authorization(func):
     
     return wrapper
 
+# 3b. Decorador para comandos de administración
+def require_admin(func):
+    """Decorator to restrict a command to the users listed in ADMINISTRADORES"""
+    @wraps(func)
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        usuario = update.effective_user
+        
+        if not administradores.permitido(usuario.id, usuario.username):
+            metricas.denegar("admin")
+            await responder(update.message, "❌ Este comando es solo para administradores.")
+            logging.warning(f"Comando de administración denegado a: {usuario.username or ''} (ID: {usuario.id})")
+            return
+        
+        return await func(update, context)
+    
+    return wrapper
+
 # 4. Función para cargar preguntas del JSON
 def cargar_preguntas():
-    """Carga las preguntas desde el archivo preguntas.json"""
-    global preguntas
+    """Carga las preguntas desde el archivo preguntas.json y construye el índice"""
+    nuevo = preparar_banco(QuestionBank([]))
+    if (recargador.ruta == RUTA_PREGUNTAS_BIN and os.path.exists(RUTA_PREGUNTAS_JSON)
+            and os.path.getmtime(RUTA_PREGUNTAS_JSON) > os.path.getmtime(RUTA_PREGUNTAS_BIN)):
+        logging.warning("preguntas.json es más reciente que preguntas.bin: ejecuta procesar_preguntas.py para recompilarlo")
     try:
-        ruta_archivo = os.path.join(os.path.dirname(__file__), "preguntas.json")
-        with open(ruta_archivo, 'r', encoding='utf-8') as f:
-            preguntas = json.load(f)
-        logging.info(f"Se cargaron {len(preguntas)} preguntas correctamente")
+        nuevo = recargador.cargar()
+        logging.info(f"Se cargaron {len(nuevo)} preguntas correctamente")
     except FileNotFoundError:
-        logging.error("Archivo preguntas.json no encontrado")
-        preguntas = []
+        logging.error(f"Archivo {recargador.ruta} no encontrado")
     except json.JSONDecodeError:
         logging.error("Error al decodificar preguntas.json")
-        preguntas = []
+    except ValueError as e:
+        # Preguntas con campos no válidos o banco binario corrupto: arrancar con el banco vacío
+        if recargador.ruta.endswith(".bin"):
+            logging.error(f"Banco binario no válido ({e}): ejecuta procesar_preguntas.py")
+        else:
+            logging.error(f"{recargador.ruta} no válido: {e}")
+    except OSError as e:
+        logging.error(f"No se pudo leer {recargador.ruta}: {e}")
+    
+    instalar_banco(nuevo)
+
+# 4b. Sustitución atómica del banco (carga inicial y recargas en caliente)
+def instalar_banco(nuevo, segundos=None):
+    """Sustituye el banco activo. Los tests en curso conservan sus preguntas ya seleccionadas."""
+    global banco, TEMAS_POR_BLOQUE
+    anteriores = len(banco)
+    cursores.reconciliar(banco, nuevo)
+    banco, TEMAS_POR_BLOQUE = nuevo, nuevo.temas_por_bloque()
+    if segundos is not None:
+        perfilador.anotar("recarga_banco", segundos)
+        logging.info(f"Banco recargado en {segundos * 1000:.1f} ms: {anteriores} → {len(nuevo)} preguntas")
 
 # 5. Función para filtrar preguntas por bloque y tema
 def filtrar_preguntas_por_bloque_tema(bloque, tema=None):
-    """Filtra las preguntas según el bloque y opcionalmente tema seleccionado"""
-    if bloque == "aleatorio":
-        return preguntas
-    
-    bloque_int = int(bloque)
-    filtered = [p for p in preguntas if p.get("bloque") == bloque_int]
-    
-    # Si se especifica tema, filtrar también por tema
-    if tema is not None:
-        tema_int = int(tema)
-        filtered = [p for p in filtered if p.get("tema") == tema_int]
-    
-    return filtered
+    """Devuelve los índices (sin copiar) de las preguntas del bloque y opcionalmente tema"""
+    return banco.indices(bloque, tema)
 
 # 6. Función para seleccionar preguntas aleatorias
-def seleccionar_preguntas_aleatorias(preguntas_filtradas, cantidad):
-    """Selecciona una cantidad aleatoria de preguntas del conjunto filtrado"""
-    if len(preguntas_filtradas) < cantidad:
-        logging.warning(f"Solo hay {len(preguntas_filtradas)} preguntas disponibles, se retornarán todas")
-        return preguntas_filtradas
-    return random.sample(preguntas_filtradas, cantidad)
+async def seleccionar_preguntas_aleatorias(indices_filtrados, cantidad, user_id=None, clave=None):
+    """Selecciona al azar los índices de `cantidad` preguntas del conjunto filtrado.
+    Con `user_id` y la `clave` del conjunto, (bloque, tema), sigue el recorrido sin
+    repetición del usuario; en modo adaptativo la probabilidad de cada pregunta
+    depende de su historial."""
+    if len(indices_filtrados) < cantidad:
+        logging.warning(f"Solo hay {len(indices_filtrados)} preguntas disponibles, se retornarán todas")
+    if user_id is None:
+        return banco.muestrear(indices_filtrados, cantidad)
+    if SELECCION_ADAPTATIVA:
+        return selector.muestrear(user_id, banco, clave, indices_filtrados, cantidad)
+    return await cursores.siguientes(user_id, banco, clave, indices_filtrados, cantidad)
+
+# 7. Recuperar el test en curso del usuario (memoria o, tras un reinicio, el almacén)
+async def obtener_sesion(user_id):
+    """Devuelve la TestSession del usuario, restaurándola del almacén si hace falta"""
+    sesion = test_sessions.get(user_id)
+    if sesion is None:
+        sesion = await almacen.restaurar(user_id, banco)
+        if sesion is not None:
+            test_sessions[user_id] = sesion
+            logging.info(f"Sesión restaurada para usuario ID: {user_id} en la pregunta {sesion.pregunta_actual + 1}")
+    return sesion
+
+# 8. Bloque/tema elegidos en los menús (user_data o, tras un reinicio, el almacén)
+async def obtener_seleccion(user_id, user_data):
+    """Devuelve (bloque, tema) elegidos por el usuario, restaurándolos del almacén si hace falta"""
+    if 'bloque' not in user_data:
+        guardada = await almacen.restaurar_seleccion(user_id)
+        if guardada is not None:
+            user_data['bloque'], user_data['tema'] = guardada
+    return user_data.get('bloque', 'aleatorio'), user_data.get('tema', None)
 
 
 # --- FUNCIONES DE COMANDOS (Handlers) ---
 
 # Función START con control de acceso
+@metricas.cronometrar
+@perfilador.perfilar
 @require_authorization
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Comando /start - Inicia el bot y da bienvenida al usuario autorizado"""
@@ -215,48 +349,31 @@ Bienvenido a tu plataforma de estudio online.
 ¿Qué deseas hacer?
     """
     
-    await update.message.reply_text(welcome_message, parse_mode="Markdown")
+    await responder(update.message, welcome_message, parse_mode="Markdown")
     logging.info(f"Usuario autorizado iniciado: {username} (ID: {user_id})")
 
 
 # Función TEST - Inicia el test online
+@metricas.cronometrar
+@perfilador.perfilar
 @require_authorization
 async def test(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Comando /test - Muestra menú para seleccionar bloque"""
     user_id = update.effective_user.id
     
-    if not preguntas:
-        await update.message.reply_text("❌ No hay preguntas disponibles. Por favor, intenta más tarde.")
+    if not len(banco):
+        await responder(update.message, "❌ No hay preguntas disponibles. Por favor, intenta más tarde.")
         return SELECCIONAR_BLOQUE
     
-    # Crear botones para seleccionar bloque
-    keyboard = [
-        [InlineKeyboardButton("📚 Bloque I", callback_data="bloque_1")],
-        [InlineKeyboardButton("📚 Bloque II", callback_data="bloque_2")],
-        [InlineKeyboardButton("📚 Bloque III", callback_data="bloque_3")],
-        [InlineKeyboardButton("📚 Bloque IV", callback_data="bloque_4")],
-        [InlineKeyboardButton("🎲 Test Aleatorio (Todos los Bloques)", callback_data="bloque_aleatorio")]
-    ]
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    mensaje = """
-🎯 **Selecciona el bloque de preguntas:**
-
-1️⃣ Bloque I
-2️⃣ Bloque II
-3️⃣ Bloque III
-4️⃣ Bloque IV
-🎲 Test Aleatorio (todos los bloques)
-
-_Selecciona una opción para continuar._
-    """
-    
-    await update.message.reply_text(mensaje, reply_markup=reply_markup, parse_mode="Markdown")
+    # Menú de bloques (construido una sola vez en renderizado.py)
+    await responder(update.message, MENSAJE_BLOQUES, reply_markup=TECLADO_BLOQUES, parse_mode="Markdown")
     return SELECCIONAR_BLOQUE
 
 
 # Función para manejar la selección de bloque
+@metricas.cronometrar
+@perfilador.perfilar
+@serializar_por_usuario
 async def seleccionar_bloque(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Maneja la selección de bloque y muestra el menú de temas"""
     query = update.callback_query
@@ -265,111 +382,56 @@ async def seleccionar_bloque(update: Update, context: ContextTypes.DEFAULT_TYPE)
     
     # Guardar bloque seleccionado en la sesión
     context.user_data['bloque'] = bloque_seleccionado
+    almacen.guardar_seleccion(user_id, bloque_seleccionado, context.user_data.get('tema'))
     
-    await query.answer()
-    
-    bloque_nombre = {
-        "1": "Bloque I",
-        "2": "Bloque II",
-        "3": "Bloque III",
-        "4": "Bloque IV",
-        "aleatorio": "Test Aleatorio (Todos los Bloques)"
-    }
+    await contestar(query)
     
     # Si es aleatorio, saltamos directamente a cantidad
     if bloque_seleccionado == "aleatorio":
-        # Mostrar menú de cantidad de preguntas
-        keyboard = [
-            [InlineKeyboardButton("📋 50 preguntas", callback_data="cantidad_50")],
-            [InlineKeyboardButton("📋 100 preguntas", callback_data="cantidad_100")]
-        ]
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        mensaje = f"""
-✅ Bloque seleccionado: **{bloque_nombre.get(bloque_seleccionado, 'Desconocido')}**
-
-📊 **¿Cuántas preguntas deseas responder?**
-
-• 50 preguntas
-• 100 preguntas
-
-_Selecciona una opción para continuar._
-        """
-        
-        await query.edit_message_text(mensaje, reply_markup=reply_markup, parse_mode="Markdown")
+        await editar(query, MENSAJE_CANTIDAD_ALEATORIO, reply_markup=TECLADO_CANTIDAD, parse_mode="Markdown")
         return SELECCIONAR_CANTIDAD
     
-    # Para bloques específicos, mostrar menú de temas
-    num_temas = TEMAS_POR_BLOQUE.get(bloque_seleccionado, 0)
+    # Para bloques específicos, mostrar menú de temas (solo los que tienen preguntas)
+    menu = banco.render.menus_tema.get(bloque_seleccionado)
     
-    # Crear botones de temas
-    keyboard = []
-    for i in range(1, num_temas + 1):
-        keyboard.append([InlineKeyboardButton(f"📖 Tema {i}", callback_data=f"tema_{i}")])
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    mensaje = f"""
-✅ Bloque seleccionado: **{bloque_nombre.get(bloque_seleccionado, 'Desconocido')}**
-
-📚 **Selecciona un tema:**
-
-_Elige el tema del que deseas practicar preguntas._
-    """
+    if menu is None:
+        await editar(query, "❌ Este bloque todavía no tiene preguntas. Usa /test para elegir otro.")
+        return SELECCIONAR_BLOQUE
     
-    await query.edit_message_text(mensaje, reply_markup=reply_markup, parse_mode="Markdown")
+    mensaje, reply_markup = menu
+    await editar(query, mensaje, reply_markup=reply_markup, parse_mode="Markdown")
     return SELECCIONAR_TEMA
 
 
 # Función para manejar la selección de tema
+@metricas.cronometrar
+@perfilador.perfilar
+@serializar_por_usuario
 async def seleccionar_tema(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Maneja la selección de tema y pregunta por la cantidad de preguntas"""
     query = update.callback_query
     user_id = query.from_user.id
     tema_seleccionado = query.data.split("_")[1]
     
-    # Guardar tema seleccionado en la sesión
+    # Guardar tema seleccionado en la sesión (el bloque puede venir del almacén tras un reinicio)
+    bloque, _ = await obtener_seleccion(user_id, context.user_data)
     context.user_data['tema'] = tema_seleccionado
+    almacen.guardar_seleccion(user_id, bloque, tema_seleccionado)
     
-    await query.answer()
+    await contestar(query)
     
     # Obtener bloque y tema
-    bloque = context.user_data.get('bloque', 'aleatorio')
-    tema = context.user_data.get('tema', None)
-    
-    bloque_nombre = {
-        "1": "Bloque I",
-        "2": "Bloque II",
-        "3": "Bloque III",
-        "4": "Bloque IV",
-        "aleatorio": "Test Aleatorio"
-    }
-    
-    # Mostrar menú de cantidad de preguntas
-    keyboard = [
-        [InlineKeyboardButton("📋 50 preguntas", callback_data="cantidad_50")],
-        [InlineKeyboardButton("📋 100 preguntas", callback_data="cantidad_100")]
-    ]
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    mensaje = f"""
-✅ Bloque: **{bloque_nombre.get(bloque, 'Desconocido')}**
-✅ Tema: **{tema}**
-
-📊 **¿Cuántas preguntas deseas responder?**
-
-• 50 preguntas
-• 100 preguntas
-
-_Selecciona una opción para continuar._
-    """
+    tema = tema_seleccionado
     
-    await query.edit_message_text(mensaje, reply_markup=reply_markup, parse_mode="Markdown")
+    # Mostrar menú de cantidad de preguntas (mensaje precalculado por bloque/tema)
+    mensaje = banco.render.mensajes_cantidad.get((bloque, tema)) or mensaje_cantidad(bloque, tema)
+    await editar(query, mensaje, reply_markup=TECLADO_CANTIDAD, parse_mode="Markdown")
     return SELECCIONAR_CANTIDAD
 
 # Función para manejar la selección de cantidad de preguntas
+@metricas.cronometrar
+@perfilador.perfilar
+@serializar_por_usuario
 async def seleccionar_cantidad(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Maneja la selección de cantidad de preguntas e inicia el test"""
     query = update.callback_query
@@ -378,42 +440,35 @@ async def seleccionar_cantidad(update: Update, context: ContextTypes.DEFAULT_TYP
     cantidad = int(cantidad_str)
     
     # Obtener bloque y tema seleccionados
-    bloque = context.user_data.get('bloque', 'aleatorio')
-    tema = context.user_data.get('tema', None)
+    bloque, tema = await obtener_seleccion(user_id, context.user_data)
     
     # Filtrar preguntas por bloque y tema
     preguntas_filtradas = filtrar_preguntas_por_bloque_tema(bloque, tema)
     
     if not preguntas_filtradas:
-        await query.answer("❌ No hay preguntas en esta selección", show_alert=True)
+        await contestar(query, "❌ No hay preguntas en esta selección", show_alert=True)
         return SELECCIONAR_BLOQUE
     
-    # Seleccionar preguntas aleatorias
-    preguntas_seleccionadas = seleccionar_preguntas_aleatorias(preguntas_filtradas, cantidad)
+    # Seleccionar preguntas aleatorias (el tema no cuenta en modo aleatorio)
+    clave = (bloque, None if bloque == "aleatorio" else tema)
+    preguntas_seleccionadas = await seleccionar_preguntas_aleatorias(preguntas_filtradas, cantidad, user_id, clave)
     
     # Inicializar sesión del test
-    test_sessions[user_id] = {
-        "pregunta_actual": 0,
-        "respuestas": [],
-        "puntuacion": 0,
-        "preguntas": preguntas_seleccionadas,
-        "bloque": bloque,
-        "tema": tema,
-        "cantidad": cantidad
-    }
-    
-    bloque_nombre = {
-        "1": "Bloque I",
-        "2": "Bloque II",
-        "3": "Bloque III",
-        "4": "Bloque IV",
-        "aleatorio": "Test Aleatorio"
-    }
-    
-    await query.answer()
-    await query.edit_message_text(
+    test_sessions[user_id] = TestSession(banco, preguntas_seleccionadas, bloque, tema, cantidad)
+    almacen.guardar(user_id, test_sessions[user_id])
+    
+    await contestar(query)
+    
+    # En modo mensaje único el menú se convierte directamente en la primera pregunta
+    if MENSAJE_UNICO:
+        mensaje, reply_markup = componer_pregunta(test_sessions[user_id])
+        await editar(query, mensaje, reply_markup=reply_markup, parse_mode=PARSE_MODE_PREGUNTAS)
+        return
+    
+    await editar(
+        query,
         f"🎯 **Test iniciado**\n\n"
-        f"Bloque: {bloque_nombre.get(bloque, 'Desconocido')}\n"
+        f"Bloque: {BLOQUE_NOMBRE.get(bloque, 'Desconocido')}\n"
         f"Preguntas: {cantidad}\n\n"
         f"_Cargando primera pregunta..._",
         parse_mode="Markdown"
@@ -422,47 +477,49 @@ async def seleccionar_cantidad(update: Update, context: ContextTypes.DEFAULT_TYP
     # Mostrar primera pregunta
     await mostrar_pregunta(update, context, user_id)
 
+# Texto y teclado de la pregunta actual de una sesión
+def componer_pregunta(sesion, cabecera=""):
+    """Devuelve (mensaje HTML, teclado) de la pregunta actual, con `cabecera` delante"""
+    num_pregunta = sesion.pregunta_actual
+    indice_banco = sesion.indices[num_pregunta]
+    
+    # Texto (ya en HTML) y teclado precalculados al cargar el banco de la sesión
+    render = sesion.banco.render
+    mensaje = f"{cabecera}📝 Pregunta {num_pregunta + 1}/{sesion.total}\n\n{render.textos[indice_banco]}"
+    return mensaje, render.teclados[indice_banco]
+
+
+# Registro breve de la sesión para el modo mensaje único (sustituye al historial del chat)
+def componer_historial(sesion):
+    """Ej.: "✅✅❌✅  Aciertos: 3/4" con las últimas respuestas"""
+    recientes = "".join("✅" if acierto else "❌" for acierto in sesion.ultimos_aciertos(HISTORIAL_MENSAJE_UNICO))
+    return f"{recientes}  Aciertos: {sesion.puntuacion}/{sesion.pregunta_actual}"
+
+
 # Función para mostrar preguntas
 async def mostrar_pregunta(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int):
     """Muestra la pregunta actual del test"""
     if user_id not in test_sessions:
-        await update.message.reply_text("❌ No hay test activo. Usa /test para comenzar.")
+        await responder(update.effective_message, "❌ No hay test activo. Usa /test para comenzar.")
         return
     
     sesion = test_sessions[user_id]
-    num_pregunta = sesion["pregunta_actual"]
-    preguntas_test = sesion["preguntas"]
     
     # Verificar si ya se respondieron todas las preguntas
-    if num_pregunta >= len(preguntas_test):
+    if sesion.terminado:
         await finalizar_test(update, user_id)
         return
     
-    pregunta = preguntas_test[num_pregunta]
-    
-    # Crear botones para las opciones
-    keyboard = []
-    for idx, opcion in enumerate(pregunta["opciones"]):
-        keyboard.append([InlineKeyboardButton(opcion, callback_data=f"respuesta_{idx}")])
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    mensaje = f"""
-📝 Pregunta {num_pregunta + 1}/{len(preguntas_test)}
+    mensaje, reply_markup = componer_pregunta(sesion)
+    await responder(update.effective_message, mensaje, reply_markup=reply_markup, parse_mode=PARSE_MODE_PREGUNTAS)
 
-{pregunta['pregunta']}
-    """
-    
-    await update.message.reply_text(mensaje, reply_markup=reply_markup)
 
-
-# Función para finalizar el test
-async def finalizar_test(update: Update, user_id: int):
-    """Finaliza el test y muestra los resultados"""
-    sesion = test_sessions[user_id]
-    total_preguntas = len(preguntas)
-    respuestas_correctas = sesion["puntuacion"]
-    porcentaje = (respuestas_correctas / total_preguntas) * 100 if total_preguntas > 0 else 0
+# Texto de resultados de un test terminado
+def componer_resultado(sesion):
+    """Mensaje final (Markdown) con la puntuación de la sesión"""
+    total_preguntas = sesion.total
+    respuestas_correctas = sesion.puntuacion
+    porcentaje = sesion.porcentaje
     
     # Determinar mensaje motivador según el porcentaje
     if porcentaje == 100:
@@ -489,57 +546,95 @@ async def finalizar_test(update: Update, user_id: int):
 
 💡 Usa /test para hacer otro test o /salir para terminar.
     """
-    
-    await update.message.reply_text(resultado, parse_mode="Markdown")
-    
-    # Limpiar sesión
+    return resultado
+
+
+# Función para finalizar el test
+async def finalizar_test(update: Update, user_id: int):
+    """Finaliza el test y muestra los resultados"""
+    sesion = test_sessions[user_id]
+    await responder(update.effective_message, componer_resultado(sesion), parse_mode="Markdown")
+    cerrar_sesion(user_id, sesion)
+
+
+def cerrar_sesion(user_id, sesion):
+    """Elimina la sesión terminada (memoria y almacén) y guarda su resultado"""
     del test_sessions[user_id]
-    logging.info(f"Test finalizado para usuario ID: {user_id}. Puntuación: {respuestas_correctas}/{total_preguntas}")
+    almacen.borrar(user_id)
+    resultados.registrar_test(user_id, sesion.bloque, sesion.tema, sesion.puntuacion, sesion.total)
+    logging.info(f"Test finalizado para usuario ID: {user_id}. Puntuación: {sesion.puntuacion}/{sesion.total}")
 
 
 # Función para manejar respuestas del test
+@metricas.cronometrar
+@perfilador.perfilar
+@serializar_por_usuario
 async def manejar_respuesta(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Maneja las respuestas seleccionadas en el test"""
     query = update.callback_query
     user_id = query.from_user.id
     
-    if user_id not in test_sessions:
-        await query.answer("❌ No hay test activo", show_alert=True)
+    sesion = await obtener_sesion(user_id)
+    if sesion is None:
+        await contestar(query, "❌ No hay test activo", show_alert=True)
         return
     
-    # Extraer el número de la respuesta seleccionada
-    respuesta_idx = int(query.data.split("_")[1])
-    sesion = test_sessions[user_id]
-    num_pregunta = sesion["pregunta_actual"]
-    preguntas_test = sesion["preguntas"]
-    pregunta = preguntas_test[num_pregunta]
+    # callback_data = "respuesta_<índice de la pregunta en el banco>_<opción>"
+    partes = query.data.split("_")
+    
+    # Los teclados antiguos "respuesta_<opción>" no dicen a qué pregunta responden:
+    # puntuarlos contra la pregunta actual contaría un clic viejo como respuesta nueva.
+    # Tampoco se aceptan números negativos o no numéricos (callback_data manipulado)
+    if len(partes) != 3 or not (partes[1].isdecimal() and partes[2].isdecimal()):
+        await contestar(query, "⚠️ Esta pregunta ya no es válida")
+        return
+    indice, respuesta_idx = int(partes[1]), int(partes[2])
     
-    # Verificar si la respuesta es correcta
-    es_correcta = respuesta_idx == pregunta["respuesta_correcta"]
+    # Rechazar dobles clics o clics sobre preguntas ya respondidas en vez de puntuarlos dos veces
+    if not sesion.es_pregunta_actual(indice):
+        await contestar(query, "⚠️ Esta pregunta ya estaba respondida")
+        return
+    if sesion.terminado:
+        await contestar(query, "❌ No hay test activo", show_alert=True)
+        return
+    if respuesta_idx >= sesion.banco.num_opciones(indice):
+        await contestar(query, "⚠️ Esta pregunta ya no es válida")
+        return
+    
+    # Registrar la respuesta y pasar a la siguiente pregunta (se persiste en diferido)
+    es_correcta, pregunta = sesion.responder(respuesta_idx)
+    almacen.guardar(user_id, sesion)
+    if SELECCION_ADAPTATIVA:
+        selector.registrar(user_id, sesion.banco, pregunta.indice, es_correcta)
+    resultados.registrar_respuesta(user_id, pregunta.id, pregunta.bloque, pregunta.tema, es_correcta)
     if es_correcta:
-        sesion["puntuacion"] += 1
         mensaje = "✅ ¡Correcto!"
     else:
-        mensaje = f"❌ Incorrecto. La respuesta correcta era: {pregunta['opciones'][pregunta['respuesta_correcta']]}"
-    
-    sesion["respuestas"].append({
-        "pregunta": num_pregunta,
-        "respuesta_usuario": respuesta_idx,
-        "respuesta_correcta": pregunta["respuesta_correcta"],
-        "correcta": es_correcta
-    })
-    
-    # Pasar a la siguiente pregunta
-    sesion["pregunta_actual"] += 1
+        mensaje = f"❌ Incorrecto. La respuesta correcta era: {sesion.banco.render.correctas[pregunta.indice]}"
+    
+    await contestar(query)
+    
+    # Modo mensaje único: corrección + historial + siguiente pregunta (o resultado) en una sola edición
+    if MENSAJE_UNICO:
+        cabecera = f"{mensaje}\n{componer_historial(sesion)}\n\n"
+        if sesion.terminado:
+            resultado = markdown_a_html(componer_resultado(sesion))
+            await editar(query, cabecera + resultado, parse_mode=PARSE_MODE_PREGUNTAS)
+            cerrar_sesion(user_id, sesion)
+        else:
+            texto, reply_markup = componer_pregunta(sesion, cabecera)
+            await editar(query, texto, reply_markup=reply_markup, parse_mode=PARSE_MODE_PREGUNTAS)
+        return
     
-    await query.answer()
-    await query.edit_message_text(text=f"{mensaje}\n\n⏳ Cargando siguiente pregunta...")
+    await editar(query, text=f"{mensaje}\n\n⏳ Cargando siguiente pregunta...", parse_mode=PARSE_MODE_PREGUNTAS)
     
     # Mostrar siguiente pregunta después de un pequeño delay
     await mostrar_pregunta(update, context, user_id)
 
 
 # Función de ayuda
+@metricas.cronometrar
+@perfilador.perfilar
 @require_authorization
 async def ayuda(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Comando /ayuda - Muestra la ayuda del bot"""
@@ -550,6 +645,7 @@ async def ayuda(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 /start - Inicia el bot y te da la bienvenida
 /test - Comienza un nuevo test con todas las preguntas
+/estadisticas - Muestra tu progreso por bloque y tema
 /ayuda - Muestra esta ayuda
 /salir - Termina el test actual
 
@@ -569,20 +665,265 @@ async def ayuda(update: Update, context: ContextTypes.DEFAULT_TYPE):
 ¿Necesitas más ayuda? Contacta con el administrador.
     """
     
-    await update.message.reply_text(help_text, parse_mode="Markdown")
+    await responder(update.message, help_text, parse_mode="Markdown")
 
 
 # Función para salir/cancelar el test
+@metricas.cronometrar
+@perfilador.perfilar
 @require_authorization
+@serializar_por_usuario
 async def salir(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Comando /salir - Termina el test actual"""
     user_id = update.effective_user.id
     
-    if user_id in test_sessions:
+    if await obtener_sesion(user_id) is not None:
         del test_sessions[user_id]
-        await update.message.reply_text("❌ Test cancelado. Usa /test para comenzar uno nuevo.")
+        almacen.borrar(user_id)
+        await responder(update.message, "❌ Test cancelado. Usa /test para comenzar uno nuevo.")
     else:
-        await update.message.reply_text("No hay test activo. Usa /test para comenzar.")
+        await responder(update.message, "No hay test activo. Usa /test para comenzar.")
+
+
+# Texto de /estadisticas a partir de los agregados del usuario (no recorre el histórico)
+def componer_estadisticas(agregados):
+    """Mensaje (Markdown) con el total, cada bloque y cada tema del usuario"""
+    total = agregados.get((0, 0))
+    if total is None:
+        return "📊 Todavía no has respondido ninguna pregunta. Usa /test para empezar."
+
+    lineas = [
+        "📊 **Tus estadísticas**\n",
+        f"**Total:** {total.aciertos}/{total.respuestas} aciertos ({total.porcentaje:.1f}%)",
+        f"• Media reciente: {total.media * 100:.0f}%",
+        f"• Racha actual: {total.racha} (mejor: {total.mejor_racha})",
+    ]
+    if total.tests:
+        lineas.append(f"• Tests terminados: {total.tests} (media reciente {total.media_tests:.0f}%, "
+                      f"mejor {total.mejor_test:.0f}%)")
+
+    for (bloque, tema), agregado in sorted(agregados.items()):
+        if not bloque or not agregado.respuestas:
+            continue
+        resumen = (f"{agregado.aciertos}/{agregado.respuestas} ({agregado.porcentaje:.0f}%), "
+                   f"reciente {agregado.media * 100:.0f}%, racha {agregado.racha}")
+        if tema:
+            lineas.append(f"   – Tema {tema}: {resumen}")
+        else:
+            lineas.append(f"\n**{BLOQUE_NOMBRE.get(str(bloque), f'Bloque {bloque}')}:** {resumen}")
+    return "\n".join(lineas)
+
+
+@metricas.cronometrar
+@perfilador.perfilar
+@require_authorization
+async def estadisticas(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Comando /estadisticas - Aciertos, medias y rachas del usuario por bloque y tema"""
+    user_id = update.effective_user.id
+    await responder(update.message, componer_estadisticas(resultados.agregados(user_id)), parse_mode="Markdown")
+
+
+# Comando de administración para forzar la recarga del banco de preguntas
+@require_admin
+async def recargar(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Comando /recargar - Vuelve a leer preguntas.json sin reiniciar el bot"""
+    anteriores = len(banco)
+    try:
+        nuevo, segundos = await recargador.recargar(forzar=True)
+    except Exception as e:
+        await responder(update.message, f"❌ No se pudo recargar el banco: {e}")
+        return
+    
+    instalar_banco(nuevo, segundos)
+    delta = len(nuevo) - anteriores
+    await responder(
+        update.message,
+        f"🔄 Banco recargado\n\n"
+        f"Tiempo de parseo: {segundos * 1000:.1f} ms\n"
+        f"Preguntas: {anteriores} → {len(nuevo)} ({delta:+d})"
+    )
+
+
+# Comando de administración para perfilar el bot en caliente
+@require_admin
+async def perfil(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Comando /perfil muestreo|cprofile [segundos] [1 de cada N] | parar - Mide los handlers"""
+    uso = (
+        "Uso:\n/perfil muestreo [segundos] [N] - tiempo real y de CPU de 1 de cada N llamadas\n"
+        "/perfil cprofile [segundos] - cProfile del bucle de eventos\n/perfil parar"
+    )
+    args = [a.lower() for a in context.args or ()]
+    if not args:
+        estado = "🟢 Hay una captura en curso" if perfilador.activo else "⚪ Sin captura en curso"
+        await responder(update.message, f"{estado}\n\n{uso}")
+        return
+    if args[0] == "parar":
+        if not perfilador.activo:
+            await responder(update.message, "ℹ️ No hay ninguna captura en curso")
+            return
+        await perfilador.detener()
+        return
+    try:
+        modo = args[0]
+        if modo not in ("muestreo", "cprofile"):
+            raise ValueError(modo)
+        segundos = float(args[1]) if len(args) > 1 else 60.0
+        if not math.isfinite(segundos):
+            raise ValueError(segundos)
+        cada = int(args[2]) if len(args) > 2 and modo == "muestreo" else (10 if modo == "muestreo" else 1)
+    except ValueError:
+        await responder(update.message, uso)
+        return
+    
+    mensaje = update.message
+    async def enviar_resumen(resumen):
+        await responder(mensaje, resumen[:4000], prioridad=PRIORIDAD_MASIVA)
+    
+    if not perfilador.iniciar(modo, segundos, cada, enviar_resumen):
+        await responder(update.message, "⏳ Ya hay una captura en curso (/perfil parar para terminarla)")
+        return
+    logging.info(f"Perfilado {modo} pedido por ID {update.effective_user.id}")
+    await responder(update.message, f"⏱️ Perfil {modo} en marcha; te envío el resumen al terminar")
+
+
+# Comandos de administración de usuarios: /autorizar, /desautorizar, /autorizados
+async def _cambiar_autorizados(update, context, comando, cambio, hecho, sin_cambio):
+    if not context.args:
+        await responder(update.message, f"Uso: /{comando} <ID o @usuario> ...")
+        return
+    lineas = []
+    for entrada in context.args:
+        lineas.append(f"{hecho if cambio(entrada) else sin_cambio}: {entrada}")
+    if autorizados.sucio:
+        await autorizados.guardar()
+    logging.info(f"Autorizados modificados por ID {update.effective_user.id}: {' '.join(lineas)}")
+    await responder(update.message, "\n".join(lineas) + f"\n\nTotal: {len(autorizados)}")
+
+
+@require_admin
+async def autorizar(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Comando /autorizar <ID o @usuario> ... - Da acceso sin reiniciar el bot"""
+    await _cambiar_autorizados(update, context, "autorizar", autorizados.añadir, "✅ Autorizado", "ℹ️ Ya estaba o no es válido")
+
+
+@require_admin
+async def desautorizar(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Comando /desautorizar <ID o @usuario> ... - Retira el acceso"""
+    await _cambiar_autorizados(update, context, "desautorizar", autorizados.quitar, "🚫 Retirado", "ℹ️ No estaba")
+
+
+@require_admin
+async def listar_autorizados(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Comando /autorizados - Lista las entradas de la lista de acceso"""
+    lineas = autorizados.describir()
+    await responder(update.message, f"👥 Autorizados ({len(lineas)}):\n\n" + "\n".join(lineas))
+
+
+# Tareas en segundo plano que arrancan junto a la aplicación. Se guardan para
+# pararlas en detener_tareas antes de cerrar lo que usan (app.stop() no las espera)
+tareas_fondo = []
+
+async def iniciar_tareas(app: Application):
+    """Carga las estadísticas y lanza la vigilancia de preguntas.json y de la lista
+    de autorizados, el guardado periódico de sesiones y resultados y el resumen
+    periódico de intentos de intrusos; abre el servidor de métricas"""
+    reproducidos = await asyncio.to_thread(resultados.cargar)
+    if reproducidos:
+        logging.info(f"Estadísticas: {reproducidos} resultados reproducidos del histórico")
+    tareas_fondo.extend(asyncio.create_task(corrutina) for corrutina in (
+        recargador.vigilar(instalar_banco),
+        almacen.vaciar_periodicamente(),
+        resultados.vaciar_periodicamente(),
+        intentos_intrusos.vaciar_periodicamente(),
+        autorizados.vigilar(),
+        metricas.vigilar_bucle(),
+    ))
+    if servidor_metricas is not None:
+        try:
+            await servidor_metricas.iniciar()
+        except OSError as e:
+            logging.error(f"No se pudo abrir el servidor de métricas en {METRICAS_ESCUCHA}: {e}")
+
+
+async def detener_tareas(app: Application):
+    """Escribe las sesiones y resultados pendientes y los resúmenes de intrusos antes de apagar el bot"""
+    # Primero las tareas periódicas: ninguna debe seguir escribiendo en lo que se cierra abajo
+    for tarea in tareas_fondo:
+        tarea.cancel()
+    await asyncio.gather(*tareas_fondo, return_exceptions=True)
+    tareas_fondo.clear()
+    await perfilador.detener()
+    await despachador.detener()
+    if servidor_metricas is not None:
+        await servidor_metricas.detener()
+    await almacen.cerrar()
+    await resultados.cerrar()
+    if autorizados.sucio:
+        await autorizados.guardar()
+    intentos_intrusos.vaciar(todo=True)
+    escucha_intrusos.stop()
+
+
+# Parada ordenada: run_polling instalaba los manejadores de SIGINT/SIGTERM; sin él van a mano
+def señal_de_parada():
+    """Evento que se activa con SIGINT (Ctrl+C) o SIGTERM (systemd, docker stop)"""
+    evento = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for numero in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(numero, evento.set)
+        except (NotImplementedError, RuntimeError):
+            # Windows: no hay manejadores en el loop; Ctrl+C cancela asyncio.run y los finally se ejecutan igual
+            pass
+    return evento
+
+
+# Modo webhook: servidor HTTP embebido en lugar de run_polling
+async def ejecutar_webhook(app: Application):
+    """Registra el webhook en Telegram y sirve las updates hasta SIGINT/SIGTERM"""
+    parada = señal_de_parada()
+    if not WEBHOOK_URL or not WEBHOOK_SECRETO:
+        raise RuntimeError("El modo webhook necesita WEBHOOK_URL y WEBHOOK_SECRETO")
+    
+    async def entregar(datos):
+        await app.update_queue.put(Update.de_json(datos, app.bot))
+    
+    host, puerto = parsear_direccion(WEBHOOK_ESCUCHA)
+    servidor = crear_servidor_webhook(entregar, WEBHOOK_SECRETO, host, puerto, WEBHOOK_RUTA)
+    
+    # post_init/post_shutdown solo los llama run_polling/run_webhook: aquí van a mano
+    async with app:
+        await iniciar_tareas(app)
+        await app.bot.set_webhook(url=WEBHOOK_URL, secret_token=WEBHOOK_SECRETO, allowed_updates=Update.ALL_TYPES)
+        await app.start()
+        await servidor.iniciar()
+        logging.info(f"Bot iniciado en modo webhook ({host}:{puerto}{WEBHOOK_RUTA})")
+        try:
+            await parada.wait()
+            logging.info("Señal de parada recibida: apagando el bot")
+        finally:
+            await servidor.detener()
+            await app.stop()
+            await detener_tareas(app)
+
+
+# Modo polling: run_polling() crea su propio event loop y no se puede usar
+# dentro de asyncio.run, así que la Application se arranca a mano como en ejecutar_webhook
+async def ejecutar_polling(app: Application):
+    """Pide updates con getUpdates hasta SIGINT/SIGTERM (Ctrl+C, systemd, docker stop)"""
+    parada = señal_de_parada()
+    async with app:
+        await iniciar_tareas(app)
+        await app.start()
+        await app.updater.start_polling(allowed_updates=Update.ALL_TYPES)
+        logging.info("Bot iniciado correctamente")
+        try:
+            await parada.wait()
+            logging.info("Señal de parada recibida: apagando el bot")
+        finally:
+            await app.updater.stop()
+            await app.stop()
+            await detener_tareas(app)
 
 
 # Función principal - Configura el bot
@@ -592,13 +933,27 @@ async def main():
     cargar_preguntas()
     
     # Crear la aplicación
-    app = Application.builder().token(TOKEN).build()
+    constructor = (
+        Application.builder()
+        .token(TOKEN)
+        .concurrent_updates(UPDATES_CONCURRENTES)
+    )
+    if API_TELEGRAM_URL:
+        constructor = constructor.base_url(f"{API_TELEGRAM_URL}/bot").base_file_url(f"{API_TELEGRAM_URL}/file/bot")
+        logging.info(f"Usando la Bot API de {API_TELEGRAM_URL}")
+    app = constructor.build()
     
     # Registrar handlers de comandos
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("test", test))
     app.add_handler(CommandHandler("ayuda", ayuda))
+    app.add_handler(CommandHandler("estadisticas", estadisticas))
     app.add_handler(CommandHandler("salir", salir))
+    app.add_handler(CommandHandler("recargar", recargar))
+    app.add_handler(CommandHandler("perfil", perfil))
+    app.add_handler(CommandHandler("autorizar", autorizar))
+    app.add_handler(CommandHandler("desautorizar", desautorizar))
+    app.add_handler(CommandHandler("autorizados", listar_autorizados))
     
     # Registrar handlers para botones de selección
     app.add_handler(CallbackQueryHandler(seleccionar_bloque, pattern="^bloque_"))
@@ -609,10 +964,16 @@ async def main():
     app.add_handler(CallbackQueryHandler(manejar_respuesta, pattern="^respuesta_"))
     
     # Iniciar el bot
-    logging.info("Bot iniciado correctamente")
-    await app.run_polling()
+    if MODO_BOT == "webhook":
+        await ejecutar_webhook(app)
+        return
+    
+    await ejecutar_polling(app)
 
 
 if __name__ == "__main__":
-    import asyncio
-    asyncio.run(main())
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        # Solo llega aquí donde no hay manejadores de señales (Windows): el apagado ya se hizo
+        pass
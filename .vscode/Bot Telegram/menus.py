@@ -0,0 +1,65 @@
+"""
+Datos de los menús fijos: nombres de bloque, textos y botones (texto,
+callback_data). No importa telegram, para que las herramientas sin
+python-telegram-bot (validator_preguntas.py) vean los mismos bloques que
+ofrece el bot; renderizado.py construye los teclados a partir de aquí.
+"""
+
+BLOQUE_NOMBRE = {
+    "1": "Bloque I",
+    "2": "Bloque II",
+    "3": "Bloque III",
+    "4": "Bloque IV",
+    "aleatorio": "Test Aleatorio (Todos los Bloques)"
+}
+
+MENSAJE_BLOQUES = """
+🎯 **Selecciona el bloque de preguntas:**
+
+1️⃣ Bloque I
+2️⃣ Bloque II
+3️⃣ Bloque III
+4️⃣ Bloque IV
+🎲 Test Aleatorio (todos los bloques)
+
+_Selecciona una opción para continuar._
+    """
+
+BOTONES_BLOQUES = [
+    ("📚 Bloque I", "bloque_1"),
+    ("📚 Bloque II", "bloque_2"),
+    ("📚 Bloque III", "bloque_3"),
+    ("📚 Bloque IV", "bloque_4"),
+    ("🎲 Test Aleatorio (Todos los Bloques)", "bloque_aleatorio"),
+]
+
+BOTONES_CANTIDAD = [
+    ("📋 50 preguntas", "cantidad_50"),
+    ("📋 100 preguntas", "cantidad_100"),
+]
+
+# Menú de cantidad tras elegir "aleatorio" (no hay paso de tema)
+MENSAJE_CANTIDAD_ALEATORIO = f"""
+✅ Bloque seleccionado: **{BLOQUE_NOMBRE['aleatorio']}**
+
+📊 **¿Cuántas preguntas deseas responder?**
+
+• 50 preguntas
+• 100 preguntas
+
+_Selecciona una opción para continuar._
+        """
+
+
+def mensaje_cantidad(bloque, tema):
+    return f"""
+✅ Bloque: **{BLOQUE_NOMBRE.get(bloque, 'Desconocido')}**
+✅ Tema: **{tema}**
+
+📊 **¿Cuántas preguntas deseas responder?**
+
+• 50 preguntas
+• 100 preguntas
+
+_Selecciona una opción para continuar._
+    """
@@ -0,0 +1,186 @@
+"""
+Métricas del bot en formato de texto de Prometheus.
+
+Todo lo que se mide ocurre en el hilo del event loop, así que los contadores
+son enteros y listas normales sin locks: registrar una observación es un
+bisect y un par de sumas. Los histogramas guardan la cuenta de cada cubeta
+por separado y solo se acumulan (como pide el formato) al servir /metrics.
+Los medidores (sesiones activas, tamaño del banco...) son funciones que se
+evalúan en ese momento, no en cada update.
+
+crear_servidor_metricas sirve GET /metrics con servidor_http, igual que el
+webhook.
+"""
+
+import asyncio
+import logging
+import time
+from bisect import bisect_left
+from functools import wraps
+
+from servidor_http import ServidorHTTP, respuesta_texto
+
+# Límites superiores de las cubetas de latencia, en segundos
+CUBETAS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TIPO_CONTENIDO = "text/plain; version=0.0.4; charset=utf-8"
+
+# Funciones del despachador -> método de la Bot API
+METODOS_API = {
+    "reply_text": "sendMessage", "send_message": "sendMessage",
+    "edit_message_text": "editMessageText", "answer": "answerCallbackQuery",
+}
+
+
+class Histograma:
+    """Cuentas por cubeta (no acumuladas), suma y total de observaciones"""
+
+    __slots__ = ("cuentas", "suma")
+
+    def __init__(self):
+        self.cuentas = [0] * (len(CUBETAS) + 1)  # la última es +Inf
+        self.suma = 0.0
+
+    def observar(self, valor):
+        self.cuentas[bisect_left(CUBETAS, valor)] += 1
+        self.suma += valor
+
+
+def _etiquetas(**etiquetas):
+    partes = []
+    for nombre, valor in etiquetas.items():
+        valor = str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        partes.append(f'{nombre}="{valor}"')
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+class Metricas:
+    """Registro de métricas del proceso"""
+
+    def __init__(self):
+        self.handlers = {}          # nombre -> Histograma
+        self.errores_handler = {}   # nombre -> excepciones no capturadas
+        self.llamadas_api = {}      # método -> Histograma de duración
+        self.errores_api = {}       # (método, tipo de error) -> veces
+        self.denegadas = {}         # "usuario" / "admin" -> veces
+        self.retraso_bucle = Histograma()
+        self.retraso_maximo = 0.0   # desde el último scrape
+        self._medidores = []        # (nombre, ayuda, función)
+
+    # --- Registro (camino caliente) ---
+
+    def cronometrar(self, func):
+        """Decorador: histograma de duración del handler y cuenta de excepciones"""
+        nombre = func.__name__
+        histograma = self.handlers.setdefault(nombre, Histograma())
+
+        @wraps(func)
+        async def envoltura(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                self.errores_handler[nombre] = self.errores_handler.get(nombre, 0) + 1
+                raise
+            finally:
+                histograma.observar(time.perf_counter() - inicio)
+
+        return envoltura
+
+    def registrar_llamada_api(self, func, segundos, error=None):
+        """Observador de DespachadorEnvios: una llamada real a la API (con su error, si lo hubo)"""
+        nombre = getattr(func, "__name__", "desconocido")
+        metodo = METODOS_API.get(nombre, nombre)
+        histograma = self.llamadas_api.get(metodo)
+        if histograma is None:
+            histograma = self.llamadas_api[metodo] = Histograma()
+        histograma.observar(segundos)
+        if error is not None:
+            clave = (metodo, type(error).__name__)
+            self.errores_api[clave] = self.errores_api.get(clave, 0) + 1
+
+    def denegar(self, tipo):
+        self.denegadas[tipo] = self.denegadas.get(tipo, 0) + 1
+
+    def medidor(self, nombre, ayuda, funcion):
+        """Gauge que se calcula con `funcion()` al servir las métricas"""
+        self._medidores.append((nombre, ayuda, funcion))
+
+    async def vigilar_bucle(self, intervalo=0.5):
+        """Mide el retraso del event loop: cuánto tarda en despertar un sleep de `intervalo`"""
+        while True:
+            inicio = time.perf_counter()
+            await asyncio.sleep(intervalo)
+            retraso = max(0.0, time.perf_counter() - inicio - intervalo)
+            self.retraso_bucle.observar(retraso)
+            if retraso > self.retraso_maximo:
+                self.retraso_maximo = retraso
+
+    # --- Exposición ---
+
+    @staticmethod
+    def _histograma(lineas, nombre, histograma, **etiquetas):
+        acumulado = 0
+        for limite, cuenta in zip(CUBETAS, histograma.cuentas):
+            acumulado += cuenta
+            lineas.append(f"{nombre}_bucket{_etiquetas(**etiquetas, le=limite)} {acumulado}")
+        acumulado += histograma.cuentas[-1]
+        lineas.append(f"{nombre}_bucket{_etiquetas(**etiquetas, le='+Inf')} {acumulado}")
+        lineas.append(f"{nombre}_sum{_etiquetas(**etiquetas)} {histograma.suma!r}")
+        lineas.append(f"{nombre}_count{_etiquetas(**etiquetas)} {acumulado}")
+
+    def exponer(self):
+        """Texto de todas las métricas en formato de exposición de Prometheus 0.0.4"""
+        lineas = []
+
+        def cabecera(nombre, tipo, ayuda):
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+
+        cabecera("bot_handler_duracion_segundos", "histogram", "Duración de cada handler de Telegram")
+        for nombre, histograma in sorted(self.handlers.items()):
+            self._histograma(lineas, "bot_handler_duracion_segundos", histograma, handler=nombre)
+        cabecera("bot_handler_errores_total", "counter", "Excepciones no capturadas por handler")
+        for nombre, veces in sorted(self.errores_handler.items()):
+            lineas.append(f"bot_handler_errores_total{_etiquetas(handler=nombre)} {veces}")
+
+        cabecera("bot_api_duracion_segundos", "histogram", "Duración de las llamadas a la Bot API por método")
+        for metodo, histograma in sorted(self.llamadas_api.items()):
+            self._histograma(lineas, "bot_api_duracion_segundos", histograma, metodo=metodo)
+        cabecera("bot_api_llamadas_total", "counter", "Llamadas a la Bot API por método (incluidas las fallidas)")
+        for metodo, histograma in sorted(self.llamadas_api.items()):
+            lineas.append(f"bot_api_llamadas_total{_etiquetas(metodo=metodo)} {sum(histograma.cuentas)}")
+        cabecera("bot_api_errores_total", "counter", "Llamadas a la Bot API fallidas por método y tipo de error")
+        for (metodo, error), veces in sorted(self.errores_api.items()):
+            lineas.append(f"bot_api_errores_total{_etiquetas(metodo=metodo, error=error)} {veces}")
+
+        cabecera("bot_autorizaciones_denegadas_total", "counter", "Accesos denegados (usuario no autorizado o comando de admin)")
+        for tipo, veces in sorted(self.denegadas.items()):
+            lineas.append(f"bot_autorizaciones_denegadas_total{_etiquetas(tipo=tipo)} {veces}")
+
+        cabecera("bot_retraso_bucle_segundos", "histogram", "Retraso del event loop al despertar un sleep")
+        self._histograma(lineas, "bot_retraso_bucle_segundos", self.retraso_bucle)
+        cabecera("bot_retraso_bucle_maximo_segundos", "gauge", "Retraso máximo del event loop desde la última lectura")
+        lineas.append(f"bot_retraso_bucle_maximo_segundos {self.retraso_maximo!r}")
+        self.retraso_maximo = 0.0
+
+        for nombre, ayuda, funcion in self._medidores:
+            try:
+                valor = funcion()
+            except Exception as e:
+                logging.error(f"Métrica {nombre} no disponible: {e}")
+                continue
+            cabecera(nombre, "gauge", ayuda)
+            lineas.append(f"{nombre} {valor}")
+        lineas.append("")
+        return "\n".join(lineas)
+
+
+def crear_servidor_metricas(metricas, host="127.0.0.1", puerto=9464, ruta="/metrics"):
+    """Crea (sin arrancar) el servidor HTTP que sirve las métricas"""
+    servidor = ServidorHTTP(host, puerto)
+
+    async def servir(peticion):
+        return respuesta_texto(metricas.exponer(), tipo=TIPO_CONTENIDO)
+
+    servidor.ruta("GET", ruta, servir)
+    return servidor
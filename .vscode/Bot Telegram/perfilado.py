@@ -0,0 +1,216 @@
+"""
+Perfilado bajo demanda de los handlers, activable en caliente con /perfil.
+
+Perfilador.perfilar envuelve cada handler (por fuera de require_authorization
+y serializar_por_usuario). Sin captura activa solo comprueba un atributo y
+llama al handler. Hay dos tipos de captura, limitadas en el tiempo:
+  - muestreo: mide 1 de cada `cada` llamadas de cada handler y apunta su
+    tiempo real y su tiempo de CPU (time.thread_time). La diferencia es lo
+    que el handler pasó esperando: llamadas a Telegram, disco y también
+    otros handlers que se ejecutaban a la vez. Con mucha concurrencia, el
+    tiempo de CPU incluye la CPU de esos otros handlers.
+  - cprofile: cProfile sobre el hilo del event loop durante unos segundos,
+    además de medir todas las llamadas como en el muestreo. Lo que corre en
+    asyncio.to_thread (la lectura de preguntas.json, SQLite) no aparece en
+    el perfil: se ve como espera del handler. Las recargas del banco se
+    anotan aparte con `anotar`.
+
+Al terminar se escribe en RUTA_PERFILES un resumen de texto con las funciones
+más costosas y, si hubo cProfile, también el .prof (para pstats o snakeviz).
+El administrador recibe un resumen corto.
+"""
+
+import asyncio
+import cProfile
+import io
+import logging
+import math
+import os
+import pstats
+import time
+from datetime import datetime
+from functools import wraps
+
+MAX_SEGUNDOS = 600.0  # una captura nunca dura más que esto
+FUNCIONES_INFORME = 40  # funciones por orden en el fichero
+FUNCIONES_RESUMEN = 8   # funciones en el resumen para el administrador
+
+
+class Tiempos:
+    """Tiempos acumulados de un handler durante una captura"""
+
+    __slots__ = ("llamadas", "medidas", "real", "cpu", "maximo")
+
+    def __init__(self):
+        self.llamadas = 0
+        self.medidas = 0
+        self.real = 0.0
+        self.cpu = 0.0
+        self.maximo = 0.0
+
+    def sumar(self, real, cpu):
+        self.medidas += 1
+        self.real += real
+        self.cpu += cpu
+        if real > self.maximo:
+            self.maximo = real
+
+
+class Captura:
+    """Una captura en curso: muestreo (cada > 1) o cProfile + todas las llamadas"""
+
+    def __init__(self, modo, segundos, cada=1):
+        self.modo = modo
+        self.segundos = segundos
+        self.cada = cada
+        self.inicio = time.time()
+        self.tiempos = {}  # handler -> Tiempos
+        self.perfil = cProfile.Profile() if modo == "cprofile" else None
+
+    async def medir(self, nombre, func, args, kwargs):
+        tiempos = self.tiempos.get(nombre)
+        if tiempos is None:
+            tiempos = self.tiempos[nombre] = Tiempos()
+        tiempos.llamadas += 1
+        if tiempos.llamadas % self.cada:
+            return await func(*args, **kwargs)
+        real, cpu = time.perf_counter(), time.thread_time()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            tiempos.sumar(time.perf_counter() - real, time.thread_time() - cpu)
+
+
+class Perfilador:
+    def __init__(self, directorio):
+        self.directorio = directorio
+        self._captura = None
+        self._al_terminar = None
+        self._tarea = None
+
+    @property
+    def activo(self):
+        return self._captura is not None
+
+    def perfilar(self, func):
+        """Decorador de handlers: sin captura activa no añade más que una comprobación"""
+        nombre = func.__name__
+
+        @wraps(func)
+        async def envoltura(*args, **kwargs):
+            captura = self._captura
+            if captura is None:
+                return await func(*args, **kwargs)
+            return await captura.medir(nombre, func, args, kwargs)
+
+        return envoltura
+
+    def anotar(self, nombre, segundos):
+        """Apunta un tiempo medido fuera de los handlers (p. ej. la recarga del banco)"""
+        captura = self._captura
+        if captura is not None:
+            tiempos = captura.tiempos.setdefault(nombre, Tiempos())
+            tiempos.llamadas += 1
+            tiempos.sumar(segundos, 0.0)
+
+    def iniciar(self, modo, segundos, cada=1, al_terminar=None):
+        """Empieza una captura de `segundos` (como mucho MAX_SEGUNDOS). Al acabar se
+        escribe el informe y se llama a `al_terminar(resumen)`. Devuelve False si ya
+        había una en curso y lanza ValueError si `segundos` no es un número finito."""
+        if not math.isfinite(segundos):
+            # min/max no acotan NaN: asyncio.sleep(nan) no vuelve y cProfile quedaría activo
+            raise ValueError(f"duración no válida: {segundos}")
+        if self._captura is not None:
+            return False
+        captura = Captura(modo, min(max(segundos, 1.0), MAX_SEGUNDOS), max(int(cada), 1))
+        self._captura = captura
+        self._al_terminar = al_terminar
+        if captura.perfil is not None:
+            captura.perfil.enable()
+        self._tarea = asyncio.create_task(self._terminar_tras(captura))
+        logging.info(f"Perfilado {modo} iniciado durante {captura.segundos:.0f} s")
+        return True
+
+    async def detener(self):
+        """Termina antes de tiempo la captura en curso (escribiendo su informe)"""
+        captura = self._captura
+        if captura is not None:
+            self._tarea.cancel()
+            await self._cerrar(captura)
+
+    async def _terminar_tras(self, captura):
+        await asyncio.sleep(captura.segundos)
+        await self._cerrar(captura)
+
+    async def _cerrar(self, captura):
+        if captura.perfil is not None:
+            captura.perfil.disable()
+        self._captura = None
+        al_terminar, self._al_terminar = self._al_terminar, None
+        resumen = await asyncio.to_thread(self._escribir, captura, time.time() - captura.inicio)
+        logging.info(resumen.splitlines()[0])
+        if al_terminar is not None:
+            try:
+                await al_terminar(resumen)
+            except Exception as e:
+                logging.error(f"No se pudo enviar el resumen del perfil: {e}")
+
+    # --- Informe ---
+
+    def _escribir(self, captura, duracion):
+        os.makedirs(self.directorio, exist_ok=True)
+        base = os.path.join(self.directorio, f"perfil-{datetime.fromtimestamp(captura.inicio):%Y%m%d-%H%M%S}")
+        tabla = self._tabla(captura)
+        funciones, top = "", []
+        if captura.perfil is not None:
+            captura.perfil.dump_stats(base + ".prof")
+            salida = io.StringIO()
+            estadisticas = pstats.Stats(captura.perfil, stream=salida)
+            for orden in ("tottime", "cumulative"):
+                salida.write(f"\n=== Ordenado por {orden} ===\n")
+                estadisticas.sort_stats(orden).print_stats(FUNCIONES_INFORME)
+            funciones = salida.getvalue()
+            top = self._top(estadisticas)
+
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(f"Perfil {captura.modo} de {duracion:.1f} s ({datetime.fromtimestamp(captura.inicio):%Y-%m-%d %H:%M:%S})\n")
+            if captura.cada > 1:
+                f.write(f"Muestreo: 1 de cada {captura.cada} llamadas\n")
+            f.write("\n" + "\n".join(tabla) + "\n")
+            f.write(funciones)
+
+        lineas = [f"📈 Perfil {captura.modo} de {duracion:.0f} s", ""]
+        lineas += tabla
+        if top:
+            lineas += ["", "Funciones con más tiempo propio:"] + top
+        lineas += ["", f"Informe: {base}.txt"]
+        return "\n".join(lineas)
+
+    @staticmethod
+    def _tabla(captura):
+        if not captura.tiempos:
+            return ["(ninguna llamada)"]
+        lineas = ["handler: llamadas, medio / CPU / espera / máx (ms)"]
+        por_coste = sorted(captura.tiempos.items(), key=lambda e: e[1].real, reverse=True)
+        for nombre, t in por_coste:
+            if not t.medidas:
+                lineas.append(f"{nombre}: {t.llamadas}, sin muestras")
+                continue
+            real, cpu = t.real / t.medidas * 1000, t.cpu / t.medidas * 1000
+            lineas.append(
+                f"{nombre}: {t.llamadas}, {real:.1f} / {cpu:.1f} / {max(real - cpu, 0.0):.1f} / {t.maximo * 1000:.1f}"
+            )
+        return lineas
+
+    @staticmethod
+    def _top(estadisticas):
+        filas = sorted(estadisticas.stats.items(), key=lambda e: e[1][2], reverse=True)[:FUNCIONES_RESUMEN]
+        top = []
+        for (fichero, linea, funcion), (_, llamadas, propio, acumulado, _) in filas:
+            donde = f"{os.path.basename(fichero)}:{linea}" if linea else fichero
+            top.append(f"{propio * 1000:.0f} ms ({acumulado * 1000:.0f} ms acum.) x{llamadas} {funcion} {donde}")
+        return top
+
+
+def crear_perfilador():
+    return Perfilador(os.getenv("RUTA_PERFILES", os.path.join(os.path.dirname(__file__), "perfiles")))
@@ -1,10 +1,19 @@
 import os
+import sys
 import json
 import re
+import hashlib
 from pathlib import Path
 
+from banco_preguntas import QuestionBank
+from banco_binario import escribir_banco_binario, leer_huella_binaria
+
 # Directorio donde están los ficheros (carpeta 'tests')
 DIRECTORIO = os.path.join(os.path.dirname(__file__), 'tests')
+RUTA_SALIDA = os.path.join(os.path.dirname(__file__), 'preguntas.json')
+
+# Versión del formato del manifiesto: si cambia, se reconstruye todo
+VERSION_MANIFIESTO = 1
 
 def extraer_tema_bloque(nombre_fichero):
     """
@@ -21,78 +30,227 @@ def extraer_tema_bloque(nombre_fichero):
         return tema, bloque
     return None, None
 
-def procesar_preguntas():
+def ruta_manifiesto(ruta_salida):
+    """preguntas.json -> preguntas.manifest.json"""
+    base, _ = os.path.splitext(ruta_salida)
+    return base + '.manifest.json'
+
+def ruta_binaria(ruta_salida):
+    """preguntas.json -> preguntas.bin (banco compilado que mapea el bot)"""
+    base, _ = os.path.splitext(ruta_salida)
+    return base + '.bin'
+
+def compilar_binario(datos, ruta_salida):
+    """Escribe preguntas.bin a partir del contenido de preguntas.json si el
+    que hay no se compiló desde este mismo contenido. Devuelve True si lo escribe."""
+    ruta = ruta_binaria(ruta_salida)
+    huella = hashlib.sha256(datos).hexdigest()
+    if leer_huella_binaria(ruta) == huella:
+        return False
+    try:
+        escribir_banco_binario(QuestionBank.desde_json(datos), ruta, huella)
+    except PermissionError as e:
+        # En Windows no se puede sustituir un fichero que otro proceso tiene mapeado
+        print(f"⚠️  No se pudo sustituir {ruta} ({e}); reinicia el bot para que use el banco nuevo")
+        return False
+    return True
+
+def id_contenido(pregunta, ocupados):
     """
-    Procesa todos los ficheros temaX_bloqueX.json y crea preguntas.json
+    ID estable derivado del enunciado y las opciones (no de la posición ni
+    de la respuesta correcta, para que corregir una respuesta o añadir
+    ficheros no cambie los IDs). Entero positivo de 63 bits; si choca con
+    uno ya asignado (pregunta repetida) se añade un sufijo "#n".
     """
-    preguntas_combinadas = []
-    id_global = 1
-    ficheros_procesados = []
-    
-    # Buscar todos los ficheros JSON en el directorio
-    for fichero in sorted(os.listdir(DIRECTORIO)):
+    base = json.dumps([pregunta.get('pregunta'), pregunta.get('opciones')], ensure_ascii=False)
+    n = 0
+    while True:
+        texto = f"{base}#{n}" if n else base
+        id_pregunta = int.from_bytes(hashlib.sha256(texto.encode('utf-8')).digest()[:8], 'big') >> 1
+        if id_pregunta and id_pregunta not in ocupados:
+            ocupados.add(id_pregunta)
+            return id_pregunta
+        n += 1
+
+def serializar_preguntas(preguntas, compacto):
+    """Fragmento del array de salida con las preguntas de un fichero (sin corchetes)"""
+    if compacto:
+        return ',\n'.join(json.dumps(p, ensure_ascii=False, separators=(',', ':')) for p in preguntas)
+    return ',\n'.join(
+        '  ' + json.dumps(p, ensure_ascii=False, indent=2).replace('\n', '\n  ') for p in preguntas
+    )
+
+def leer_fichero_preguntas(contenido, fichero, bloque, tema, ocupados):
+    """Parsea un temaX_bloqueX.json y devuelve sus preguntas con id, bloque y tema"""
+    preguntas = json.loads(contenido)
+
+    # Si es un objeto con clave "preguntas", extraer el array
+    if isinstance(preguntas, dict) and 'preguntas' in preguntas:
+        preguntas = preguntas['preguntas']
+
+    # Asegurarse de que es una lista
+    if not isinstance(preguntas, list):
+        raise ValueError(f"{fichero} no contiene un array de preguntas")
+
+    resultado = []
+    for pregunta in preguntas:
+        if isinstance(pregunta, dict):
+            # El id de los ficheros fuente es local a cada fichero: se sustituye por uno global estable
+            resto = {k: v for k, v in pregunta.items() if k not in ('id', 'bloque', 'tema')}
+            resultado.append({'id': id_contenido(pregunta, ocupados), 'bloque': bloque, 'tema': tema, **resto})
+    return resultado
+
+def cargar_manifiesto(ruta_salida, compacto):
+    """Devuelve las entradas del manifiesto anterior y el contenido de la salida
+    anterior, o ({}, b'') si no se pueden reutilizar"""
+    try:
+        with open(ruta_manifiesto(ruta_salida), 'r', encoding='utf-8') as f:
+            manifiesto = json.load(f)
+        with open(ruta_salida, 'rb') as f:
+            salida = f.read()
+        st = os.stat(ruta_salida)
+    except (OSError, ValueError):
+        return {}, b''
+
+    formato = 'compacto' if compacto else 'indentado'
+    # preguntas.json editado a mano, otro formato u otra versión: reconstruir desde cero
+    if (manifiesto.get('version') != VERSION_MANIFIESTO or manifiesto.get('formato') != formato
+            or manifiesto.get('salida') != [st.st_mtime_ns, st.st_size]):
+        return {}, b''
+    return manifiesto.get('ficheros', {}), salida
+
+def procesar_preguntas(directorio=DIRECTORIO, ruta_salida=RUTA_SALIDA, compacto=False, completo=False,
+                       binario=True):
+    """
+    Procesa los ficheros temaX_bloqueX.json y crea preguntas.json de forma incremental.
+
+    El manifiesto (preguntas.manifest.json) guarda por fichero su hash, sus IDs
+    y el tramo de bytes que ocupa en la salida. Los ficheros sin cambios no se
+    vuelven a parsear: su tramo se copia tal cual de la salida anterior.
+    `completo` ignora el manifiesto; `compacto` escribe una pregunta por línea.
+    Con `binario` se compila además preguntas.bin (ver banco_binario.py).
+    Devuelve {'ficheros', 'reprocesados', 'preguntas'}.
+    """
+    anteriores, salida_anterior = ({}, b'') if completo else cargar_manifiesto(ruta_salida, compacto)
+
+    # Primera pasada: qué ficheros siguen igual (stat y, si cambió, hash)
+    candidatos = []
+    for fichero in sorted(os.listdir(directorio)):
         if fichero.endswith('.json') and fichero != 'preguntas.json':
-            ruta_fichero = os.path.join(DIRECTORIO, fichero)
-            
             # Extraer tema y bloque del nombre
             tema, bloque = extraer_tema_bloque(fichero)
-            
+
             if tema is None or bloque is None:
                 print(f"⚠️  Fichero ignorado (formato incorrecto): {fichero}")
                 continue
-            
+
+            ruta_fichero = os.path.join(directorio, fichero)
+            st = os.stat(ruta_fichero)
+            anterior = anteriores.get(fichero)
+            contenido = None
+            if anterior is not None and (anterior['bloque'], anterior['tema']) == (bloque, tema):
+                if [anterior['mtime_ns'], anterior['size']] != [st.st_mtime_ns, st.st_size]:
+                    contenido = Path(ruta_fichero).read_bytes()
+                    if hashlib.sha256(contenido).hexdigest() != anterior['sha256']:
+                        anterior = None
+            else:
+                anterior = None
+            candidatos.append((fichero, bloque, tema, st, anterior, contenido))
+
+    # IDs de los ficheros sin cambios: los nuevos no pueden reutilizarlos
+    ocupados = set()
+    for _, _, _, _, anterior, _ in candidatos:
+        if anterior is not None:
+            ocupados.update(anterior['ids'])
+
+    fragmentos = []
+    ficheros = {}
+    ficheros_procesados = []
+    total_preguntas = 0
+    reprocesados = 0
+    desplazamiento = 2  # tras "[\n"
+    for fichero, bloque, tema, st, anterior, contenido in candidatos:
+        ruta_fichero = os.path.join(directorio, fichero)
+        if anterior is not None:
+            fragmento = salida_anterior[anterior['inicio']:anterior['inicio'] + anterior['longitud']]
+            sha256, ids = anterior['sha256'], anterior['ids']
+        else:
             try:
-                with open(ruta_fichero, 'r', encoding='utf-8') as f:
-                    preguntas = json.load(f)
-                
-                # Si es un objeto con clave "preguntas", extraer el array
-                if isinstance(preguntas, dict) and 'preguntas' in preguntas:
-                    preguntas = preguntas['preguntas']
-                
-                # Asegurarse de que es una lista
-                if not isinstance(preguntas, list):
-                    print(f"⚠️  {fichero} no contiene un array de preguntas")
-                    continue
-                
-                # Procesar cada pregunta
-                for pregunta in preguntas:
-                    if isinstance(pregunta, dict):
-                        # Añadir campos de bloque y tema
-                        pregunta['bloque'] = bloque
-                        pregunta['tema'] = tema
-                        
-                        # Asegurarse de que tiene ID
-                        if 'id' not in pregunta:
-                            pregunta['id'] = id_global
-                        
-                        preguntas_combinadas.append(pregunta)
-                        id_global += 1
-                
-                ficheros_procesados.append(f"{fichero} → Bloque {bloque}, Tema {tema} ({len(preguntas)} preguntas)")
-                print(f"✅ Procesado: {fichero} → Bloque {bloque}, Tema {tema} ({len(preguntas)} preguntas)")
-            
+                if contenido is None:
+                    contenido = Path(ruta_fichero).read_bytes()
+                preguntas = leer_fichero_preguntas(contenido, fichero, bloque, tema, ocupados)
             except json.JSONDecodeError as e:
                 print(f"❌ Error al procesar {fichero}: {e}")
+                continue
+            except ValueError as e:
+                print(f"⚠️  {e}")
+                continue
             except Exception as e:
                 print(f"❌ Error inesperado en {fichero}: {e}")
-    
+                continue
+            fragmento = serializar_preguntas(preguntas, compacto).encode('utf-8')
+            sha256, ids = hashlib.sha256(contenido).hexdigest(), [p['id'] for p in preguntas]
+            reprocesados += 1
+            print(f"✅ Procesado: {fichero} → Bloque {bloque}, Tema {tema} ({len(preguntas)} preguntas)")
+
+        if fragmento:
+            if fragmentos:
+                desplazamiento += 2  # ",\n" entre fragmentos
+            fragmentos.append(fragmento)
+        ficheros[fichero] = {
+            'sha256': sha256, 'mtime_ns': st.st_mtime_ns, 'size': st.st_size,
+            'bloque': bloque, 'tema': tema,
+            'inicio': desplazamiento, 'longitud': len(fragmento), 'ids': ids,
+        }
+        desplazamiento += len(fragmento)
+        total_preguntas += len(ids)
+        ficheros_procesados.append(f"{fichero} → Bloque {bloque}, Tema {tema} ({len(ids)} preguntas)")
+
     # Guardar en preguntas.json (en la carpeta padre, no en tests)
-    if preguntas_combinadas:
-        ruta_salida = os.path.join(os.path.dirname(__file__), 'preguntas.json')
-        with open(ruta_salida, 'w', encoding='utf-8') as f:
-            json.dump(preguntas_combinadas, f, ensure_ascii=False, indent=2)
-        
+    if total_preguntas:
+        # Si nada cambió no se reescribe: así el bot no recarga preguntas.json
+        sin_cambios = not reprocesados and list(ficheros) == list(anteriores)
+        if sin_cambios:
+            datos = salida_anterior
+        else:
+            datos = b'[\n' + b',\n'.join(fragmentos) + b'\n]\n'
+            # Escritura atómica: el bot recarga preguntas.json en caliente
+            temporal = ruta_salida + '.tmp'
+            with open(temporal, 'wb') as f:
+                f.write(datos)
+            os.replace(temporal, ruta_salida)
+        binario_escrito = binario and compilar_binario(datos, ruta_salida)
+
+        st = os.stat(ruta_salida)
+        manifiesto = {
+            'version': VERSION_MANIFIESTO,
+            'formato': 'compacto' if compacto else 'indentado',
+            'salida': [st.st_mtime_ns, st.st_size],
+            'ficheros': ficheros,
+        }
+        with open(ruta_manifiesto(ruta_salida), 'w', encoding='utf-8') as f:
+            json.dump(manifiesto, f, separators=(',', ':'))
+
         print("\n" + "="*60)
-        print(f"✅ Ficheros procesados: {len(ficheros_procesados)}")
-        for item in ficheros_procesados:
-            print(f"   {item}")
-        print(f"\n✅ Total de preguntas: {len(preguntas_combinadas)}")
-        print(f"✅ Archivo guardado: {ruta_salida}")
+        print(f"✅ Ficheros procesados: {len(ficheros_procesados)} ({reprocesados} reprocesados, "
+              f"{len(ficheros_procesados) - reprocesados} sin cambios)")
+        if reprocesados == len(ficheros_procesados):
+            for item in ficheros_procesados:
+                print(f"   {item}")
+        print(f"\n✅ Total de preguntas: {total_preguntas}")
+        print(f"✅ Archivo {'sin cambios' if sin_cambios else 'guardado'}: {ruta_salida}")
+        if binario_escrito:
+            print(f"✅ Banco binario compilado: {ruta_binaria(ruta_salida)}")
         print("="*60)
     else:
         print("\n❌ No se encontraron preguntas para procesar")
 
+    return {'ficheros': len(ficheros_procesados), 'reprocesados': reprocesados, 'preguntas': total_preguntas}
+
 if __name__ == "__main__":
     print("🔄 Procesando ficheros de preguntas...\n")
-    procesar_preguntas()
+    # --compacto: una pregunta por línea; --completo: ignorar el manifiesto y reprocesar todo;
+    # --sin-binario: no compilar preguntas.bin
+    procesar_preguntas(compacto='--compacto' in sys.argv, completo='--completo' in sys.argv,
+                       binario='--sin-binario' not in sys.argv)
     print("\n✅ Proceso completado")
@@ -0,0 +1,156 @@
+"""
+Registro de intentos de acceso no autorizados, resistente a floods.
+
+- El logger "intrusos" solo tiene un QueueHandler: los handlers dejan el
+  registro en una cola (sin tocar disco) y un QueueListener lo escribe
+  desde su propio hilo en un RotatingFileHandler que comprime con gzip los
+  ficheros rotados (intrusos.log.1.gz, intrusos.log.2.gz...).
+- `AgrupadorIntentos` agrupa los intentos repetidos del mismo
+  (user_id, chat_id): se registra el primero de cada ventana y, al cerrarla,
+  una línea de resumen con cuántos más hubo. Además decide si se contesta
+  al intruso, como mucho una vez cada `enfriamiento` segundos, para que el
+  spam no consuma el límite de envíos.
+"""
+
+import asyncio
+import gzip
+import logging
+import os
+import queue
+import shutil
+import time
+from collections import OrderedDict
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+FORMATO_INTRUSOS = (
+    '%(asctime)s | USUARIO NO AUTORIZADO | Username: %(username)s | ID: %(user_id)s | '
+    'Chat: %(chat_id)s | %(message)s'
+)
+
+
+def _nombre_comprimido(nombre):
+    return nombre + ".gz"
+
+
+def _rotar_comprimiendo(origen, destino):
+    """Rotación de RotatingFileHandler: comprime el fichero cerrado (en el hilo del listener)"""
+    with open(origen, "rb") as entrada, gzip.open(destino, "wb") as salida:
+        shutil.copyfileobj(entrada, salida)
+    os.remove(origen)
+
+
+def configurar_registro_intrusos(ruta, max_bytes=5 * 1024 * 1024, copias=5):
+    """Prepara el logger "intrusos" con cola + escritura en segundo plano.
+    Devuelve (logger, listener); hay que llamar a listener.stop() al apagar."""
+    manejador = RotatingFileHandler(ruta, maxBytes=max_bytes, backupCount=copias, encoding="utf-8", delay=True)
+    manejador.namer = _nombre_comprimido
+    manejador.rotator = _rotar_comprimiendo
+    manejador.setFormatter(logging.Formatter(FORMATO_INTRUSOS))
+
+    cola = queue.SimpleQueue()
+    logger = logging.getLogger("intrusos")
+    logger.setLevel(logging.WARNING)
+    logger.propagate = False
+    for anterior in list(logger.handlers):
+        logger.removeHandler(anterior)
+    logger.addHandler(QueueHandler(cola))
+
+    listener = QueueListener(cola, manejador, respect_handler_level=True)
+    listener.start()
+    return logger, listener
+
+
+class _Infractor:
+    __slots__ = ("username", "inicio", "ultimo", "cuenta", "ultima_respuesta")
+
+    def __init__(self, username, ahora):
+        self.username = username
+        self.inicio = ahora
+        self.ultimo = ahora
+        self.cuenta = 1
+        self.ultima_respuesta = float("-inf")
+
+
+class AgrupadorIntentos:
+    """Agrupa intentos repetidos por (user_id, chat_id) y limita las respuestas"""
+
+    # Al llenarse se descarta de golpe esta fracción (los menos activos): O(1) amortizado por intento
+    FRACCION_DESCARTE = 0.1
+
+    def __init__(self, logger, ventana=60.0, enfriamiento=300.0, max_infractores=10000):
+        self.logger = logger
+        self.ventana = ventana
+        self.enfriamiento = enfriamiento
+        self.max_infractores = max_infractores
+        self._infractores = OrderedDict()  # (user_id, chat_id) -> _Infractor, del menos al más activo
+        self.intentos = 0
+        self.registros = 0
+
+    def registrar(self, user_id, chat_id, username, ahora=None):
+        """Anota un intento. Devuelve (es_nuevo, responder): `es_nuevo` si es el
+        primero de su ventana (ya registrado en el log) y `responder` si toca
+        contestar al usuario según el enfriamiento."""
+        ahora = time.monotonic() if ahora is None else ahora
+        self.intentos += 1
+        clave = (user_id, chat_id)
+        infractor = self._infractores.get(clave)
+        es_nuevo = infractor is None or ahora - infractor.inicio >= self.ventana
+        if infractor is None:
+            if len(self._infractores) >= self.max_infractores:
+                self._liberar_espacio()
+            infractor = self._infractores[clave] = _Infractor(username, ahora)
+        elif es_nuevo:
+            # Ventana anterior cerrada: resumirla y empezar otra (se conserva el enfriamiento)
+            self._resumir(clave, infractor)
+            infractor.username, infractor.inicio, infractor.ultimo, infractor.cuenta = username, ahora, ahora, 1
+            self._infractores.move_to_end(clave)
+        else:
+            infractor.cuenta += 1
+            infractor.ultimo = ahora
+            self._infractores.move_to_end(clave)
+
+        if es_nuevo:
+            self._emitir(clave, username, "Intento de acceso no autorizado")
+
+        responder = ahora - infractor.ultima_respuesta >= self.enfriamiento
+        if responder:
+            infractor.ultima_respuesta = ahora
+        return es_nuevo, responder
+
+    def _emitir(self, clave, username, mensaje):
+        self.registros += 1
+        self.logger.warning(mensaje, extra={"username": username, "user_id": clave[0], "chat_id": clave[1]})
+
+    def _resumir(self, clave, infractor):
+        if infractor.cuenta > 1:
+            self._emitir(
+                clave, infractor.username,
+                f"Resumen: {infractor.cuenta - 1} intentos más en {infractor.ultimo - infractor.inicio:.0f} s"
+            )
+        infractor.cuenta = 0
+
+    def vaciar(self, ahora=None, todo=False):
+        """Resume las ventanas cerradas (o todas con `todo`) y olvida a los
+        infractores cuyo enfriamiento ya pasó"""
+        ahora = time.monotonic() if ahora is None else ahora
+        for clave, infractor in list(self._infractores.items()):
+            if todo or ahora - infractor.inicio >= self.ventana:
+                if infractor.cuenta:
+                    self._resumir(clave, infractor)
+                if todo or ahora - infractor.ultima_respuesta >= self.enfriamiento:
+                    del self._infractores[clave]
+
+    def _liberar_espacio(self):
+        """Descarta (resumiéndolos) los infractores menos activos de una vez, en lugar de
+        recorrerlos todos con cada intento nuevo durante un flood de cuentas distintas"""
+        for _ in range(max(1, int(self.max_infractores * self.FRACCION_DESCARTE))):
+            if not self._infractores:
+                break
+            clave, infractor = self._infractores.popitem(last=False)
+            if infractor.cuenta:
+                self._resumir(clave, infractor)
+
+    async def vaciar_periodicamente(self):
+        while True:
+            await asyncio.sleep(self.ventana)
+            self.vaciar()
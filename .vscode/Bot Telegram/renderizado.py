@@ -0,0 +1,102 @@
+"""
+Caché de presentación: textos y teclados ya construidos.
+
+Los teclados fijos (bloques, cantidad) se crean una vez al importar el
+módulo a partir de los datos de menus.py.
+Lo que depende del banco (texto de cada pregunta convertido a HTML, su
+teclado de opciones y los menús de temas) lo construye `CacheRender` al
+cargar el banco, de modo que los handlers solo hacen búsquedas. Con el
+banco binario (banco_binario.py) las preguntas se convierten al mostrarse.
+
+Las preguntas usan `**negrita**` y `*cursiva*`; se escapan y convierten a
+HTML (parse_mode="HTML") con formato.py. En los botones no hay formato, así
+que allí simplemente se quitan los asteriscos.
+"""
+
+from functools import lru_cache
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from formato import markdown_a_html, texto_boton
+from menus import BLOQUE_NOMBRE, BOTONES_BLOQUES, BOTONES_CANTIDAD, mensaje_cantidad
+
+PARSE_MODE_PREGUNTAS = "HTML"
+# Preguntas ya convertidas que se guardan por banco cuando se convierten al mostrarlas
+RENDER_EN_MEMORIA = 4096
+
+
+def _teclado(botones):
+    """[(texto, callback_data), ...] -> InlineKeyboardMarkup de una columna"""
+    return InlineKeyboardMarkup([[InlineKeyboardButton(t, callback_data=d)] for t, d in botones])
+
+
+# --- Menús fijos ---
+
+TECLADO_BLOQUES = _teclado(BOTONES_BLOQUES)
+TECLADO_CANTIDAD = _teclado(BOTONES_CANTIDAD)
+
+
+# --- Caché dependiente del banco ---
+
+class _Perezosa:
+    """Secuencia que construye cada elemento al pedirlo y recuerda los últimos"""
+
+    __slots__ = ("_construir",)
+
+    def __init__(self, construir, maximo=RENDER_EN_MEMORIA):
+        self._construir = lru_cache(maxsize=maximo)(construir)
+
+    def __getitem__(self, idx):
+        return self._construir(idx)
+
+
+class CacheRender:
+    """Texto HTML, teclado y respuesta correcta (HTML) de cada pregunta del
+    banco, más los menús de temas y de cantidad por bloque/tema.
+    Con un banco perezoso (binario mapeado) las preguntas se convierten la
+    primera vez que se muestran en lugar de todas al cargar."""
+
+    def __init__(self, banco):
+        def texto(idx):
+            return markdown_a_html(banco.enunciado(idx))
+
+        def teclado(idx):
+            return _teclado(
+                (texto_boton(opcion), f"respuesta_{idx}_{num}") for num, opcion in enumerate(banco.opciones(idx))
+            )
+
+        def correcta(idx):
+            pregunta = banco[idx]
+            opciones = pregunta.opciones
+            correcta = pregunta.respuesta_correcta
+            return markdown_a_html(opciones[correcta]) if correcta < len(opciones) else ""
+
+        if banco.perezoso:
+            self.textos = _Perezosa(texto)
+            self.teclados = _Perezosa(teclado)
+            self.correctas = _Perezosa(correcta)
+        else:
+            self.textos = [texto(idx) for idx in range(len(banco))]
+            self.teclados = [teclado(idx) for idx in range(len(banco))]
+            self.correctas = [correcta(idx) for idx in range(len(banco))]
+
+        self.menus_tema = {}
+        self.mensajes_cantidad = {}
+        for bloque, temas in banco.temas_por_bloque().items():
+            texto = f"""
+✅ Bloque seleccionado: **{BLOQUE_NOMBRE.get(bloque, 'Desconocido')}**
+
+📚 **Selecciona un tema:**
+
+_Elige el tema del que deseas practicar preguntas._
+    """
+            teclado = _teclado((f"📖 Tema {tema} ({n})", f"tema_{tema}") for tema, n in temas)
+            self.menus_tema[bloque] = (texto, teclado)
+            for tema, _ in temas:
+                self.mensajes_cantidad[(bloque, str(tema))] = mensaje_cantidad(bloque, tema)
+
+
+def preparar_banco(banco):
+    """Construye la caché de presentación del banco (se llama al cargarlo)"""
+    banco.render = CacheRender(banco)
+    return banco
@@ -0,0 +1,225 @@
+"""
+Selección adaptativa de preguntas por usuario.
+
+Cada pregunta tiene para cada usuario un peso que crece con su tasa de
+fallo reciente (media móvil exponencial de sus respuestas) y que baja
+mientras la pregunta se ha visto hace poco. Los pesos de cada conjunto de
+preguntas que el usuario usa (un bloque/tema o el banco entero) viven en un
+árbol de Fenwick:
+  - responder una pregunta actualiza su peso en O(log n),
+  - elegir k preguntas sin reemplazo cuesta O(k log n),
+  - el árbol se construye en O(n) la primera vez que el usuario usa ese
+    conjunto con ese banco, no en cada test.
+
+Las estadísticas se guardan por id de pregunta, así que sobreviven a una
+recarga del banco; los árboles del banco anterior se descartan y se
+reconstruyen con ellas al usarse.
+"""
+
+import random
+import time
+from bisect import bisect_left
+from array import array
+from collections import OrderedDict, deque
+
+# Peso = (PESO_BASE + tasa de fallo) × (PENALIZACION_RECIENTE si se vio hace menos de VENTANA_RECIENTE)
+PESO_BASE = 0.1
+TASA_INICIAL = 0.5          # preguntas nunca respondidas: a medio camino
+SUAVIZADO = 0.3             # peso de la última respuesta en la media móvil
+PENALIZACION_RECIENTE = 0.1
+VENTANA_RECIENTE = 24 * 3600
+ARBOLES_POR_USUARIO = 8
+
+
+class ArbolFenwick:
+    """Sumas prefijas de pesos (floats) con actualización y búsqueda en O(log n)"""
+
+    __slots__ = ("pesos", "_arbol", "_paso", "total")
+
+    def __init__(self, pesos):
+        self.pesos = array("d", pesos)
+        n = len(self.pesos)
+        arbol = array("d", bytes(8)) + self.pesos
+        for i in range(1, n + 1):
+            j = i + (i & -i)
+            if j <= n:
+                arbol[j] += arbol[i]
+        self._arbol = arbol
+        self._paso = 1 << (n.bit_length() - 1) if n else 0
+        self.total = sum(self.pesos)
+
+    def __len__(self):
+        return len(self.pesos)
+
+    def fijar(self, pos, peso):
+        delta = peso - self.pesos[pos]
+        if not delta:
+            return
+        self.pesos[pos] = peso
+        self.total += delta
+        arbol = self._arbol
+        i = pos + 1
+        n = len(self.pesos)
+        while i <= n:
+            arbol[i] += delta
+            i += i & -i
+
+    def buscar(self, u):
+        """Posición cuya suma prefija es la primera que supera `u` (0 <= u < total)"""
+        arbol = self._arbol
+        n = len(self.pesos)
+        pos = 0
+        paso = self._paso
+        while paso:
+            siguiente = pos + paso
+            if siguiente <= n and arbol[siguiente] <= u:
+                pos = siguiente
+                u -= arbol[siguiente]
+            paso >>= 1
+        return min(pos, n - 1)
+
+    def muestrear(self, k, rng=random):
+        """k posiciones distintas con probabilidad proporcional al peso, en O(k log n).
+        Una posición repetida se descarta y se vuelve a tirar (equivale a muestrear
+        sin reemplazo); si hay muchas repeticiones porque pocas preguntas concentran
+        el peso, las elegidas se ponen a 0 mientras se muestrea y después se restauran."""
+        elegidas = {}
+        quitados = []
+        repetidas = 0
+        fallos = 0
+        try:
+            while len(elegidas) < k and self.total > 1e-12:
+                pos = self.buscar(rng.random() * self.total)
+                if pos in elegidas:
+                    repetidas += 1
+                    if repetidas > k and not quitados:
+                        for p in elegidas:
+                            quitados.append((p, self.pesos[p]))
+                            self.fijar(p, 0.0)
+                    continue
+                peso = self.pesos[pos]
+                if peso <= 0:
+                    # Error de redondeo acumulado en el árbol: recalcularlo y reintentar
+                    fallos += 1
+                    if fallos > 100:
+                        break
+                    if fallos == 1:
+                        self.__init__(self.pesos)
+                    continue
+                elegidas[pos] = None
+                if quitados:
+                    quitados.append((pos, peso))
+                    self.fijar(pos, 0.0)
+        finally:
+            for pos, peso in quitados:
+                self.fijar(pos, peso)
+        return list(elegidas)
+
+
+def calcular_peso(tasa, reciente):
+    peso = PESO_BASE + tasa
+    return peso * PENALIZACION_RECIENTE if reciente else peso
+
+
+class _Conjunto:
+    """Árbol de pesos de un conjunto de preguntas (índices del banco, ordenados)"""
+
+    __slots__ = ("indices", "arbol")
+
+    def __init__(self, indices, arbol):
+        self.indices = indices
+        self.arbol = arbol
+
+    def posicion(self, indice):
+        pos = bisect_left(self.indices, indice)
+        return pos if pos < len(self.indices) and self.indices[pos] == indice else None
+
+
+class _EstadoUsuario:
+    __slots__ = ("tasas", "recientes", "vistas", "generacion", "conjuntos")
+
+    def __init__(self):
+        self.tasas = {}             # id de pregunta -> tasa de fallo reciente
+        self.recientes = {}         # id de pregunta -> momento en que se vio por última vez
+        # (momento, id, índice, generación del banco) en orden de llegada; se guarda
+        # la generación y no el banco para no retener bancos ya recargados
+        self.vistas = deque()
+        self.generacion = None      # banco al que corresponden los índices de `conjuntos`
+        self.conjuntos = OrderedDict()  # clave del conjunto -> _Conjunto (LRU)
+
+
+class SelectorAdaptativo:
+    """Pesos por usuario y muestreo ponderado de preguntas"""
+
+    def __init__(self, ventana_reciente=VENTANA_RECIENTE, rng=None, reloj=time.monotonic):
+        self.ventana_reciente = ventana_reciente
+        self.rng = rng or random.Random()
+        self.reloj = reloj
+        self._usuarios = {}
+
+    def _estado(self, user_id, banco=None):
+        estado = self._usuarios.get(user_id)
+        if estado is None:
+            estado = self._usuarios[user_id] = _EstadoUsuario()
+        if banco is not None and estado.generacion != banco.generacion:
+            # Banco nuevo: los índices cambian, los árboles se rehacen al usarse
+            estado.generacion = banco.generacion
+            estado.conjuntos.clear()
+        return estado
+
+    def _caducar(self, estado, ahora):
+        """Devuelve su peso normal a las preguntas que ya no son recientes"""
+        limite = ahora - self.ventana_reciente
+        vistas = estado.vistas
+        while vistas and vistas[0][0] <= limite:
+            momento, id_pregunta, indice, generacion = vistas.popleft()
+            if estado.recientes.get(id_pregunta) != momento:
+                continue  # se volvió a ver después
+            del estado.recientes[id_pregunta]
+            if generacion == estado.generacion:
+                self._actualizar(estado, indice, calcular_peso(estado.tasas.get(id_pregunta, TASA_INICIAL), False))
+
+    def _actualizar(self, estado, indice, peso):
+        for conjunto in estado.conjuntos.values():
+            pos = conjunto.posicion(indice)
+            if pos is not None:
+                conjunto.arbol.fijar(pos, peso)
+
+    def _conjunto(self, estado, banco, clave, indices):
+        conjunto = estado.conjuntos.get(clave)
+        if conjunto is not None:
+            estado.conjuntos.move_to_end(clave)
+            return conjunto
+        ids = banco._ids
+        tasas, recientes = estado.tasas, estado.recientes
+        if tasas or recientes:
+            pesos = (calcular_peso(tasas.get(ids[i], TASA_INICIAL), ids[i] in recientes) for i in indices)
+        else:
+            pesos = [calcular_peso(TASA_INICIAL, False)] * len(indices)
+        conjunto = estado.conjuntos[clave] = _Conjunto(indices, ArbolFenwick(pesos))
+        if len(estado.conjuntos) > ARBOLES_POR_USUARIO:
+            estado.conjuntos.popitem(last=False)
+        return conjunto
+
+    def muestrear(self, user_id, banco, clave, indices, cantidad):
+        """`cantidad` índices del banco elegidos de `indices` (ordenados, p. ej.
+        banco.indices(bloque, tema)) según los pesos del usuario. `clave`
+        identifica el conjunto, p. ej. (bloque, tema)."""
+        estado = self._estado(user_id, banco)
+        self._caducar(estado, self.reloj())
+        conjunto = self._conjunto(estado, banco, clave, indices)
+        return [indices[pos] for pos in conjunto.arbol.muestrear(min(cantidad, len(indices)), self.rng)]
+
+    def registrar(self, user_id, banco, indice, acierto):
+        """Actualiza la tasa de fallo de la pregunta y la marca como vista (O(log n) por árbol).
+        `banco` es el de la sesión: si ya se recargó, solo se actualizan las estadísticas."""
+        estado = self._estado(user_id)
+        ahora = self.reloj()
+        id_pregunta = banco._ids[indice]
+        tasa = estado.tasas.get(id_pregunta, TASA_INICIAL)
+        tasa += SUAVIZADO * ((0.0 if acierto else 1.0) - tasa)
+        estado.tasas[id_pregunta] = tasa
+        estado.recientes[id_pregunta] = ahora
+        estado.vistas.append((ahora, id_pregunta, indice, banco.generacion))
+        if banco.generacion == estado.generacion:
+            self._actualizar(estado, indice, calcular_peso(tasa, True))
@@ -0,0 +1,131 @@
+"""
+Servidor HTTP/1.1 mínimo sobre asyncio.
+
+Solo lo imprescindible para recibir el webhook de Telegram y servir
+endpoints internos: peticiones con Content-Length (sin chunked),
+conexiones keep-alive y rutas exactas (método, ruta).
+"""
+
+import asyncio
+import json
+import logging
+
+MAX_CUERPO = 1 << 20  # 1 MiB; las updates de Telegram son mucho más pequeñas
+
+RAZONES = {
+    200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found",
+    405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large", 429: "Too Many Requests",
+    500: "Internal Server Error",
+}
+
+
+class Peticion:
+    """Petición HTTP ya leída"""
+
+    __slots__ = ("metodo", "ruta", "consulta", "cabeceras", "cuerpo")
+
+    def __init__(self, metodo, ruta, consulta, cabeceras, cuerpo):
+        self.metodo = metodo
+        self.ruta = ruta
+        self.consulta = consulta
+        self.cabeceras = cabeceras  # claves en minúsculas
+        self.cuerpo = cuerpo
+
+    def json(self):
+        return json.loads(self.cuerpo) if self.cuerpo else None
+
+
+def respuesta_json(obj, estado=200):
+    """(estado, tipo de contenido, cuerpo) para devolver JSON desde un manejador"""
+    return estado, "application/json", json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def respuesta_texto(texto, estado=200, tipo="text/plain; charset=utf-8"):
+    return estado, tipo, texto.encode("utf-8")
+
+
+class ServidorHTTP:
+    """Servidor con rutas exactas. Cada manejador es `async def f(peticion)` y
+    devuelve (estado, tipo de contenido, cuerpo en bytes)."""
+
+    def __init__(self, host="127.0.0.1", puerto=8080):
+        self.host = host
+        self.puerto = puerto
+        self._rutas = {}
+        self._servidor = None
+
+    def ruta(self, metodo, ruta, manejador):
+        self._rutas[(metodo.upper(), ruta)] = manejador
+
+    async def iniciar(self):
+        self._servidor = await asyncio.start_server(self._atender, self.host, self.puerto)
+        # Con puerto 0 el sistema elige uno libre; lo exponemos para los tests de carga
+        self.puerto = self._servidor.sockets[0].getsockname()[1]
+        logging.info(f"Servidor HTTP escuchando en {self.host}:{self.puerto}")
+
+    async def detener(self):
+        if self._servidor is not None:
+            self._servidor.close()
+            await self._servidor.wait_closed()
+            self._servidor = None
+
+    async def _leer_peticion(self, reader):
+        linea = await reader.readline()
+        if not linea:
+            return None
+        metodo, objetivo, _ = linea.decode("latin-1").split(" ", 2)
+        ruta, _, consulta = objetivo.partition("?")
+
+        cabeceras = {}
+        while True:
+            linea = await reader.readline()
+            if linea in (b"\r\n", b"\n", b""):
+                break
+            nombre, _, valor = linea.decode("latin-1").partition(":")
+            cabeceras[nombre.strip().lower()] = valor.strip()
+
+        longitud = int(cabeceras.get("content-length", "0"))
+        if longitud > MAX_CUERPO:
+            raise ValueError("cuerpo demasiado grande")
+        cuerpo = await reader.readexactly(longitud) if longitud else b""
+        return Peticion(metodo.upper(), ruta, consulta, cabeceras, cuerpo)
+
+    async def _atender(self, reader, writer):
+        try:
+            while True:
+                try:
+                    peticion = await self._leer_peticion(reader)
+                except (ValueError, asyncio.IncompleteReadError):
+                    await self._escribir(writer, *respuesta_texto("", 400), cerrar=True)
+                    break
+                if peticion is None:
+                    break
+
+                manejador = self._rutas.get((peticion.metodo, peticion.ruta))
+                if manejador is None:
+                    resultado = respuesta_texto("", 404)
+                else:
+                    try:
+                        resultado = await manejador(peticion)
+                    except Exception as e:
+                        logging.error(f"Error atendiendo {peticion.metodo} {peticion.ruta}: {e}")
+                        resultado = respuesta_texto("", 500)
+
+                cerrar = peticion.cabeceras.get("connection", "").lower() == "close"
+                await self._escribir(writer, *resultado, cerrar=cerrar)
+                if cerrar:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _escribir(self, writer, estado, tipo, cuerpo, cerrar=False):
+        cabecera = (
+            f"HTTP/1.1 {estado} {RAZONES.get(estado, '')}\r\n"
+            f"Content-Type: {tipo}\r\n"
+            f"Content-Length: {len(cuerpo)}\r\n"
+            f"Connection: {'close' if cerrar else 'keep-alive'}\r\n\r\n"
+        )
+        writer.write(cabecera.encode("latin-1") + cuerpo)
+        await writer.drain()
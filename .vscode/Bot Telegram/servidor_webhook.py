@@ -0,0 +1,47 @@
+"""
+Recepción de updates por webhook como alternativa a run_polling.
+
+Telegram hace POST de cada update a WEBHOOK_URL con la cabecera
+`X-Telegram-Bot-Api-Secret-Token`; aquí se valida esa cabecera y se entrega
+el JSON decodificado a `entregar` (normalmente, a la cola de updates de la
+Application).
+"""
+
+import hmac
+import logging
+
+from servidor_http import ServidorHTTP, respuesta_texto
+
+CABECERA_SECRETO = "x-telegram-bot-api-secret-token"
+
+
+def crear_servidor_webhook(entregar, secreto, host="0.0.0.0", puerto=8443, ruta="/webhook"):
+    """Crea (sin arrancar) el servidor HTTP que recibe las updates.
+    `entregar` es `async def entregar(datos_update)`."""
+    servidor = ServidorHTTP(host, puerto)
+    secreto_bytes = (secreto or "").encode("utf-8")
+
+    async def recibir_update(peticion):
+        recibido = peticion.cabeceras.get(CABECERA_SECRETO, "").encode("utf-8")
+        if secreto_bytes and not hmac.compare_digest(recibido, secreto_bytes):
+            logging.warning("Webhook rechazado: secret token incorrecto")
+            return respuesta_texto("", 403)
+        try:
+            datos = peticion.json()
+        except (ValueError, UnicodeDecodeError):
+            return respuesta_texto("", 400)
+        await entregar(datos)
+        return respuesta_texto("", 200)
+
+    servidor.ruta("POST", ruta, recibir_update)
+    return servidor
+
+
+def parsear_direccion(direccion, puerto_por_defecto=8443):
+    """"0.0.0.0:8443" -> ("0.0.0.0", 8443); admite también solo host o solo puerto"""
+    host, separador, puerto = direccion.strip().rpartition(":")
+    if not separador:
+        if direccion.strip().isdigit():
+            return "0.0.0.0", int(direccion)
+        return direccion.strip() or "0.0.0.0", puerto_por_defecto
+    return host or "0.0.0.0", int(puerto)
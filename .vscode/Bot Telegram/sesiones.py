@@ -0,0 +1,73 @@
+"""
+Estado compacto de un test en curso.
+
+En lugar de guardar la lista de preguntas y un dict por respuesta, cada
+sesión guarda los índices de sus preguntas en el banco con el que se creó
+(así sobrevive a una recarga en caliente) y dos bytearrays con la respuesta
+del usuario y si fue correcta. Puntuación y progreso se mantienen en O(1).
+"""
+
+from array import array
+
+SIN_RESPONDER = 0xFF
+
+
+class TestSession:
+    """Test en curso de un usuario"""
+
+    __slots__ = (
+        "banco", "indices", "respuestas", "aciertos",
+        "pregunta_actual", "puntuacion", "bloque", "tema", "cantidad"
+    )
+
+    def __init__(self, banco, indices, bloque, tema, cantidad):
+        self.banco = banco
+        self.indices = array("I", indices)
+        self.respuestas = bytearray([SIN_RESPONDER]) * len(self.indices)
+        self.aciertos = bytearray(len(self.indices))
+        self.pregunta_actual = 0
+        self.puntuacion = 0
+        self.bloque = bloque
+        self.tema = tema
+        self.cantidad = cantidad
+
+    @property
+    def total(self):
+        return len(self.indices)
+
+    @property
+    def terminado(self):
+        return self.pregunta_actual >= len(self.indices)
+
+    @property
+    def porcentaje(self):
+        return (self.puntuacion / self.total) * 100 if self.total > 0 else 0
+
+    def ultimos_aciertos(self, n):
+        """Aciertos (1/0) de las últimas `n` preguntas respondidas"""
+        fin = self.pregunta_actual
+        return self.aciertos[max(0, fin - n):fin]
+
+    def pregunta(self, num=None):
+        """Pregunta número `num` del test (por defecto la actual)"""
+        if num is None:
+            num = self.pregunta_actual
+        return self.banco[self.indices[num]]
+
+    def es_pregunta_actual(self, indice_banco):
+        """True si `indice_banco` es la pregunta pendiente de responder.
+        Un clic repetido o tardío sobre una pregunta ya respondida da False."""
+        return not self.terminado and self.indices[self.pregunta_actual] == indice_banco
+
+    def responder(self, respuesta_idx):
+        """Registra la respuesta a la pregunta actual y avanza.
+        Devuelve (es_correcta, pregunta respondida)."""
+        num = self.pregunta_actual
+        pregunta = self.pregunta(num)
+        es_correcta = respuesta_idx == pregunta.respuesta_correcta
+
+        self.respuestas[num] = respuesta_idx
+        self.aciertos[num] = es_correcta
+        self.puntuacion += es_correcta
+        self.pregunta_actual = num + 1
+        return es_correcta, pregunta
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from almacen_sesiones import AlmacenSQLite
+from banco_preguntas import QuestionBank
+from cursores import Cursor
+from sesiones import TestSession as Sesion
+
+
+def banco(huella="h1"):
+    b = QuestionBank(
+        {"id": i + 1, "bloque": 1, "tema": 1, "pregunta": "?", "opciones": ["a", "b"]}
+        for i in range(10)
+    )
+    b.huella = huella
+    return b
+
+
+def ejecutar(corrutina):
+    return asyncio.run(corrutina)
+
+
+def test_sesion_sobrevive_al_reinicio(tmp_path):
+    ruta = str(tmp_path / "sesiones.db")
+    b = banco()
+
+    async def prueba():
+        almacen = AlmacenSQLite(ruta)
+        sesion = Sesion(b, [3, 1, 4], "1", "1", 3)
+        sesion.respuestas[0], sesion.aciertos[0] = 1, 1
+        sesion.pregunta_actual, sesion.puntuacion = 1, 1
+        almacen.guardar(7, sesion)
+        almacen.guardar_cursor(7, ("1", None), Cursor(42, 10, b.huella, 3, [5]))
+        almacen.guardar_seleccion(7, "2", "3")
+        await almacen.cerrar()
+
+        almacen = AlmacenSQLite(ruta)
+        restaurada = await almacen.restaurar(7, b)
+        cursores = await almacen.restaurar_cursores(7)
+        seleccion = await almacen.restaurar_seleccion(7)
+        await almacen.cerrar()
+        return restaurada, cursores, seleccion
+
+    restaurada, cursores, seleccion = ejecutar(prueba())
+    assert list(restaurada.indices) == [3, 1, 4]
+    assert (restaurada.pregunta_actual, restaurada.puntuacion) == (1, 1)
+    assert restaurada.respuestas[0] == 1 and restaurada.aciertos[0] == 1
+    cursor = cursores[("1", None)]
+    assert (cursor.semilla, cursor.desplazamiento, set(cursor.excluidos)) == (42, 3, {5})
+    assert seleccion == ("2", "3")
+
+
+def test_banco_distinto_descarta_la_sesion(tmp_path):
+    ruta = str(tmp_path / "sesiones.db")
+
+    async def prueba():
+        almacen = AlmacenSQLite(ruta)
+        almacen.guardar(7, Sesion(banco(), [0], "1", "1", 1))
+        await almacen.cerrar()
+        almacen = AlmacenSQLite(ruta)
+        restaurada = await almacen.restaurar(7, banco("h2"))
+        await almacen.cerrar()
+        return restaurada
+
+    assert ejecutar(prueba()) is None
+
+
+def test_escritura_fallida_no_pierde_el_lote(tmp_path, monkeypatch):
+    b = banco()
+
+    async def prueba():
+        almacen = AlmacenSQLite(str(tmp_path / "sesiones.db"))
+        vieja, nueva = Sesion(b, [0], "1", "1", 1), Sesion(b, [1], "1", "1", 1)
+        almacen.guardar(1, vieja)
+        almacen.guardar(2, vieja)
+        almacen.guardar_seleccion(1, "1", None)
+
+        escribir = almacen._escribir
+
+        def escribir_con_cambio(*args):
+            # Llega un cambio del usuario 2 mientras el lote está en vuelo
+            almacen.guardar(2, nueva)
+            raise OSError("disco lleno")
+
+        monkeypatch.setattr(almacen, "_escribir", escribir_con_cambio)
+        with pytest.raises(OSError):
+            await almacen.vaciar()
+        pendientes = dict(almacen._pendientes)
+        selecciones = dict(almacen._selecciones)
+
+        monkeypatch.setattr(almacen, "_escribir", escribir)
+        await almacen.cerrar()
+        return vieja, nueva, pendientes, selecciones
+
+    vieja, nueva, pendientes, selecciones = ejecutar(prueba())
+    assert pendientes[1] is vieja
+    assert pendientes[2] is nueva
+    assert selecciones == {1: ("1", None)}
@@ -0,0 +1,61 @@
+import hashlib
+import json
+import random
+
+from banco_binario import abrir_banco_binario, escribir_banco_binario, leer_huella_binaria
+from banco_preguntas import QuestionBank
+from seleccion_adaptativa import SelectorAdaptativo
+
+HUELLA = hashlib.sha256(b"preguntas").hexdigest()
+
+
+def compilar(tmp_path, preguntas):
+    origen = QuestionBank.desde_json(json.dumps(preguntas).encode())
+    ruta = str(tmp_path / "preguntas.bin")
+    escribir_banco_binario(origen, ruta, HUELLA)
+    return origen, abrir_banco_binario(ruta)
+
+
+def preguntas_mezcladas(n=60):
+    # Temas intercalados dentro de cada bloque, y alguna pregunta sin tema
+    return [{"id": i + 1, "bloque": 1 + i % 2, "tema": (i * 7) % 4 or None,
+             "pregunta": f"¿{i}? ñ", "opciones": ["Sí", "No", f"op{i}"], "respuesta_correcta": i % 3}
+            for i in range(n)]
+
+
+def test_mismo_contenido_que_el_json(tmp_path):
+    origen, binario = compilar(tmp_path, preguntas_mezcladas())
+    assert binario.huella == HUELLA == leer_huella_binaria(str(tmp_path / "preguntas.bin"))
+    assert len(binario) == len(origen)
+    for idx in range(len(origen)):
+        assert (binario[idx].id, binario[idx].bloque, binario[idx].tema) == (origen[idx].id, origen[idx].bloque, origen[idx].tema)
+        assert binario.enunciado(idx) == origen.enunciado(idx)
+        assert binario.opciones(idx) == origen.opciones(idx)
+        assert binario.num_opciones(idx) == origen.num_opciones(idx) == 3
+    assert binario.temas_por_bloque() == origen.temas_por_bloque()
+
+
+def test_indices_por_bloque_ordenados(tmp_path):
+    origen, binario = compilar(tmp_path, preguntas_mezcladas())
+    for bloque in ("1", "2"):
+        assert list(binario.indices(bloque)) == list(origen.indices(bloque))
+        assert list(binario.indices(bloque)) == sorted(binario.indices(bloque))
+        for tema in ("1", "2", "3"):
+            assert list(binario.indices(bloque, tema)) == list(origen.indices(bloque, tema))
+
+
+def test_seleccion_adaptativa_sobre_el_bloque(tmp_path):
+    _, binario = compilar(tmp_path, preguntas_mezcladas())
+    selector = SelectorAdaptativo(rng=random.Random(5), reloj=lambda: 0.0, ventana_reciente=0.0)
+    indices = binario.indices("1")
+    fallada = indices[len(indices) // 2]
+    selector.muestrear(1, binario, ("1", None), indices, 5)
+    for _ in range(10):
+        selector.registrar(1, binario, fallada, acierto=False)
+    conjunto = selector._usuarios[1].conjuntos[("1", None)]
+    # La pregunta fallada se encuentra en el conjunto y solo cambia su peso
+    posicion = conjunto.posicion(fallada)
+    assert posicion is not None and conjunto.indices[posicion] == fallada
+    cambiados = [pos for pos, peso in enumerate(conjunto.arbol.pesos) if peso != conjunto.arbol.pesos[0]]
+    assert cambiados == [posicion]
+    assert [conjunto.posicion(i) for i in indices] == list(range(len(indices)))
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+from banco_preguntas import QuestionBank, leer_banco
+
+
+def pregunta(id_pregunta, bloque=1, tema=1, **extra):
+    return {"id": id_pregunta, "bloque": bloque, "tema": tema, "pregunta": f"¿{id_pregunta}?",
+            "opciones": ["a", "b", "c"], "respuesta_correcta": 1, **extra}
+
+
+def desde(datos):
+    return QuestionBank.desde_json(json.dumps(datos).encode())
+
+
+def test_lista_de_preguntas():
+    banco = desde([pregunta(1), pregunta(2, tema=2), pregunta(3, bloque=None, tema=None)])
+    assert len(banco) == 3
+    assert banco[0].opciones == ["a", "b", "c"] and banco[0].respuesta_correcta == 1
+    assert banco[2].bloque is None and banco[2].tema is None
+    assert list(banco.indices("1")) == [0, 1]
+    assert list(banco.indices("1", "2")) == [1]
+    assert list(banco.indices("aleatorio")) == [0, 1, 2]
+    assert banco.temas_por_bloque() == {"1": [(1, 1), (2, 1)]}
+
+
+def test_envoltorio_preguntas_sin_filas_fantasma():
+    banco = desde({"preguntas": [pregunta(1), pregunta(2)]})
+    assert len(banco) == 2
+    assert [banco[i].id for i in range(2)] == [1, 2]
+
+
+def test_objetos_anidados_no_son_preguntas():
+    banco = desde([pregunta(1, meta={"autor": "x", "id": 99})])
+    assert len(banco) == 1
+
+
+def test_numeros_como_texto():
+    banco = desde([pregunta("7", bloque="2", tema="3")])
+    assert (banco[0].id, banco[0].bloque, banco[0].tema) == (7, 2, 3)
+
+
+@pytest.mark.parametrize("campo, valor", [
+    ("id", "siete"), ("id", 1.5), ("respuesta_correcta", "b"), ("respuesta_correcta", -1),
+    ("bloque", 300), ("tema", 256), ("bloque", True), ("opciones", "a, b"), ("pregunta", 3),
+])
+def test_campo_no_valido_da_value_error_con_la_pregunta(campo, valor):
+    with pytest.raises(ValueError, match="pregunta 2"):
+        desde([pregunta(1), pregunta(2, **{campo: valor})])
+
+
+@pytest.mark.parametrize("datos", [{"otra": []}, "texto", 3, [1]])
+def test_no_es_lista_de_preguntas(datos):
+    with pytest.raises(ValueError):
+        desde(datos)
+
+
+def test_leer_banco_y_huella(tmp_path):
+    ruta = tmp_path / "preguntas.json"
+    ruta.write_text(json.dumps([pregunta(1)]), encoding="utf-8")
+    banco, huella = leer_banco(str(ruta))
+    assert len(banco) == 1 and banco.huella == huella and len(huella) == 64
+
+
+def test_muestrear_sin_repetir():
+    banco = desde([pregunta(i) for i in range(1, 51)])
+    elegidos = banco.muestrear(banco.indices("1"), 20)
+    assert len(elegidos) == len(set(elegidos)) == 20
+    assert banco.muestrear(banco.indices("1", "1"), 100) == list(range(50))
+
+
+def test_num_opciones():
+    banco = desde([pregunta(1), pregunta(2, opciones=["a", "b"])])
+    assert [banco.num_opciones(i) for i in range(2)] == [3, 2]
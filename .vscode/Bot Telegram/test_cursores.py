@@ -0,0 +1,122 @@
+import asyncio
+import random
+
+import pytest
+
+from almacen_sesiones import AlmacenSesiones
+from banco_preguntas import QuestionBank
+from cursores import Cursor, CursoresPreguntas, Permutacion
+
+
+def banco(ids, huella):
+    b = QuestionBank(
+        {"id": id_pregunta, "bloque": 1, "tema": 1, "pregunta": "?", "opciones": ["a", "b"]}
+        for id_pregunta in ids
+    )
+    b.huella = huella
+    return b
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 7, 64, 100, 1000])
+def test_permutacion_es_biyectiva(n):
+    for semilla in (0, 1, 2**62):
+        permutacion = Permutacion(n, semilla)
+        assert sorted(permutacion[i] for i in range(n)) == list(range(n))
+
+
+def test_permutacion_depende_de_la_semilla():
+    orden = [Permutacion(100, s)[i] for s in (1, 2) for i in range(100)]
+    assert orden[:100] != orden[100:]
+    assert [Permutacion(100, 1)[i] for i in range(100)] == orden[:100]
+
+
+def test_cursor_no_repite_hasta_agotar_el_conjunto():
+    b = banco(range(1, 31), "h")
+    indices = b.indices("1", "1")
+    cursor = Cursor(7, len(indices), "h")
+    rng = random.Random(1)
+    vuelta = [i for _ in range(3) for i in cursor.siguientes(b, indices, 10, rng)]
+    assert sorted(vuelta) == list(range(30))
+    # La siguiente vuelta usa otra semilla
+    semilla = cursor.semilla
+    assert len(set(cursor.siguientes(b, indices, 10, rng))) == 10
+    assert cursor.semilla != semilla
+
+
+def test_reconciliar_conserva_las_vistas_por_id():
+    anterior = banco(range(1, 21), "h1")
+    cursor = Cursor(3, 20, "h1")
+    vistas = {anterior._ids[i] for i in cursor.siguientes(anterior, anterior.indices("1", "1"), 8)}
+
+    # El banco nuevo borra una vista, mantiene el resto y añade preguntas nuevas
+    borrada = min(vistas)
+    nuevo = banco([i for i in range(1, 26) if i != borrada], "h2")
+    indices = nuevo.indices("1", "1")
+    cursor.reconciliar(anterior, nuevo, anterior.indices("1", "1"), indices)
+    assert cursor.excluidos == vistas - {borrada}
+    assert (cursor.tamaño, cursor.huella) == (24, "h2")
+
+    # Lo que queda de la vuelta son justo las no vistas, incluidas las nuevas
+    pendientes = 24 - len(cursor.excluidos)
+    resto = [nuevo._ids[i] for i in cursor.siguientes(nuevo, indices, pendientes)]
+    assert set(resto) == set(range(1, 26)) - vistas
+
+
+def test_cursores_preguntas_reconcilia_tras_recarga():
+    class Almacen(AlmacenSesiones):
+        def __init__(self):
+            self.guardados = {}
+
+        def guardar_cursor(self, user_id, clave, cursor):
+            self.guardados[(user_id, clave)] = cursor.huella
+
+    async def prueba():
+        almacen = Almacen()
+        cursores = CursoresPreguntas(almacen, random.Random(2))
+        anterior = banco(range(1, 11), "h1")
+        clave = ("1", "1")
+        vistas = await cursores.siguientes(5, anterior, clave, anterior.indices(*clave), 6)
+        nuevo = banco(range(1, 13), "h2")
+        cursores.reconciliar(anterior, nuevo)
+        resto = await cursores.siguientes(5, nuevo, clave, nuevo.indices(*clave), 6)
+        return vistas, resto, almacen.guardados
+
+    vistas, resto, guardados = asyncio.run(prueba())
+    assert set(resto).isdisjoint(vistas)
+    assert sorted(vistas + resto) == list(range(12))
+    assert guardados == {(5, ("1", "1")): "h2"}
+
+
+def test_cursor_guardado_se_reconcilia_al_restaurarlo():
+    """Un cursor que solo está en el almacén no se reinicia tras una recarga"""
+    anterior = banco(range(1, 11), "h1")
+    clave = ("1", "1")
+    guardado = Cursor(9, 10, "h1")
+    vistas = guardado.siguientes(anterior, anterior.indices(*clave), 4)
+
+    class Almacen(AlmacenSesiones):
+        async def restaurar_cursores(self, user_id):
+            return {clave: guardado}
+
+    async def prueba():
+        cursores = CursoresPreguntas(Almacen(), random.Random(3))
+        nuevo = banco(range(1, 11), "h2")
+        cursores.reconciliar(anterior, nuevo)
+        return await cursores.siguientes(8, nuevo, clave, nuevo.indices(*clave), 6)
+
+    resto = asyncio.run(prueba())
+    assert guardado.huella == "h2"
+    assert sorted(vistas + resto) == list(range(10))
+
+
+def test_recarga_no_recorre_los_cursores():
+    class Explota(Cursor):
+        def reconciliar(self, *args):
+            raise AssertionError("la recarga no debe reconciliar cursores")
+
+    cursores = CursoresPreguntas(AlmacenSesiones())
+    cursores._usuarios = {u: {("1", "1"): Explota(u, 10, "h1")} for u in range(300)}
+    anteriores = [banco(range(1, 11), f"h{i}") for i in range(1, 5)]
+    for anterior, nuevo in zip(anteriores, anteriores[1:]):
+        cursores.reconciliar(anterior, nuevo)
+    assert list(cursores._anteriores) == ["h2", "h3"]
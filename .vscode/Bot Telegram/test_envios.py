@@ -0,0 +1,185 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+from envios import PRIORIDAD_INTERACTIVA, PRIORIDAD_MASIVA, DespachadorEnvios, segundos_retry_after
+
+
+class RetryAfter(Exception):
+    def __init__(self, segundos):
+        super().__init__(f"Retry in {segundos}")
+        self.retry_after = segundos
+
+
+class ApiFalsa:
+    """Apunta cada llamada; `fallos` es la lista de RetryAfter que se lanzarán antes de acertar"""
+
+    def __init__(self, fallos=(), latencia=0.0):
+        self.enviados = []
+        self.fallos = list(fallos)
+        self.latencia = latencia
+
+    async def editar(self, texto):
+        await asyncio.sleep(self.latencia)
+        if self.fallos:
+            raise self.fallos.pop(0)
+        self.enviados.append(texto)
+        return texto
+
+
+def ejecutar(corrutina):
+    return asyncio.run(corrutina)
+
+
+def test_segundos_retry_after():
+    assert segundos_retry_after(RetryAfter(3)) == 3.0
+    assert segundos_retry_after(RetryAfter(timedelta(seconds=2))) == 2.0
+    assert segundos_retry_after(ValueError()) is None
+
+
+def test_ediciones_pendientes_se_fusionan():
+    async def prueba():
+        despachador = DespachadorEnvios(por_segundo=1000, intervalo_chat=0.05, rafaga_chat=1)
+        api = ApiFalsa()
+        # El primer envío gasta el turno del chat: las ediciones esperan en la cola
+        primero = asyncio.create_task(despachador.llamar(api.editar, "cero", chat_id=1))
+        await asyncio.sleep(0.01)
+        tareas = [asyncio.create_task(despachador.llamar(api.editar, t, chat_id=1, fusion="m"))
+                  for t in ("uno", "dos", "tres")]
+        resultados = await asyncio.gather(*tareas)
+        await primero
+        await despachador.detener()
+        return api.enviados, resultados, despachador.fusionadas
+
+    enviados, resultados, fusionadas = ejecutar(prueba())
+    assert enviados == ["cero", "tres"]
+    assert resultados == ["tres"] * 3
+    assert fusionadas == 2
+
+
+def test_retry_after_reintenta():
+    async def prueba():
+        despachador = DespachadorEnvios(por_segundo=1000, intervalo_chat=0.0)
+        api = ApiFalsa(fallos=[RetryAfter(0.01)])
+        resultado = await despachador.llamar(api.editar, "hola", chat_id=1)
+        await despachador.detener()
+        return resultado, api.enviados, despachador.reintentos
+
+    assert ejecutar(prueba()) == ("hola", ["hola"], 1)
+
+
+def test_error_que_no_es_retry_after_se_propaga():
+    async def prueba():
+        despachador = DespachadorEnvios(por_segundo=1000, intervalo_chat=0.0)
+        api = ApiFalsa(fallos=[RuntimeError("caído")])
+        try:
+            with pytest.raises(RuntimeError):
+                await despachador.llamar(api.editar, "hola", chat_id=1)
+        finally:
+            await despachador.detener()
+
+    ejecutar(prueba())
+
+
+def test_reintento_no_pisa_una_edicion_posterior():
+    async def prueba():
+        despachador = DespachadorEnvios(por_segundo=1000, intervalo_chat=0.0)
+        api = ApiFalsa(fallos=[RetryAfter(0.05)], latencia=0.02)
+        vieja = asyncio.create_task(despachador.llamar(api.editar, "vieja", chat_id=1, fusion="m"))
+        await asyncio.sleep(0.005)  # la vieja ya está en vuelo
+        nueva = asyncio.create_task(despachador.llamar(api.editar, "nueva", chat_id=1, fusion="m"))
+        resultados = await asyncio.gather(vieja, nueva)
+        await asyncio.sleep(0.1)  # margen para un reintento que no debe llegar
+        await despachador.detener()
+        return api.enviados, resultados
+
+    enviados, resultados = ejecutar(prueba())
+    assert enviados == ["nueva"]
+    assert resultados == ["nueva", "nueva"]
+
+
+def test_prioridades():
+    async def prueba():
+        despachador = DespachadorEnvios(por_segundo=1000, intervalo_chat=0.0)
+        api = ApiFalsa()
+        # Las tres se encolan antes de que arranque el bucle de envío
+        tareas = [
+            asyncio.create_task(despachador.llamar(api.editar, "masiva", chat_id=1, prioridad=PRIORIDAD_MASIVA)),
+            asyncio.create_task(despachador.llamar(api.editar, "normal", chat_id=2)),
+            asyncio.create_task(despachador.llamar(api.editar, "interactiva", chat_id=3, prioridad=PRIORIDAD_INTERACTIVA)),
+        ]
+        await asyncio.gather(*tareas)
+        await despachador.detener()
+        return api.enviados
+
+    assert ejecutar(prueba()) == ["interactiva", "normal", "masiva"]
+
+
+def test_sin_limite_global_no_espera_a_la_cola():
+    async def prueba():
+        despachador = DespachadorEnvios(por_segundo=1, intervalo_chat=0.0)
+        api = ApiFalsa()
+        # Cola llena de mensajes a 1/s: una respuesta a botón no debe esperar detrás
+        cola = [asyncio.create_task(despachador.llamar(api.editar, f"m{i}", chat_id=i)) for i in range(5)]
+        await asyncio.sleep(0)
+        inicio = asyncio.get_running_loop().time()
+        await despachador.llamar(api.editar, "respuesta", limite_global=False)
+        espera = asyncio.get_running_loop().time() - inicio
+        for tarea in cola:
+            tarea.cancel()
+        await despachador.detener()
+        return espera, api.enviados
+
+    espera, enviados = ejecutar(prueba())
+    assert espera < 0.5
+    assert "respuesta" in enviados
+
+
+def test_sin_limite_global_reintenta_retry_after():
+    async def prueba():
+        despachador = DespachadorEnvios()
+        api = ApiFalsa(fallos=[RetryAfter(0.01)])
+        return await despachador.llamar(api.editar, "ok", limite_global=False), despachador.reintentos
+
+    assert ejecutar(prueba()) == ("ok", 1)
+
+
+def test_chats_frenados_no_retrasan_a_los_listos():
+    async def prueba():
+        despachador = DespachadorEnvios(por_segundo=100000, intervalo_chat=10.0, rafaga_chat=1)
+        api = ApiFalsa()
+        # Un envío por chat gasta su turno; el segundo de cada uno queda frenado 10 s
+        await asyncio.gather(*(despachador.llamar(api.editar, f"a{c}", chat_id=c) for c in range(2000)))
+        frenados = [asyncio.create_task(despachador.llamar(api.editar, f"b{c}", chat_id=c)) for c in range(2000)]
+        await asyncio.sleep(0.01)
+        inicio = asyncio.get_running_loop().time()
+        await despachador.llamar(api.editar, "libre", chat_id=-1)
+        espera = asyncio.get_running_loop().time() - inicio
+        pendientes = len(despachador)
+        for tarea in frenados:
+            tarea.cancel()
+        await despachador.detener()
+        return espera, pendientes, len(despachador._esperando)
+
+    espera, pendientes, esperando = ejecutar(prueba())
+    assert espera < 0.5
+    assert pendientes == 2000
+    assert esperando == 2000
+
+
+def test_prioridad_dentro_de_un_chat_y_entre_chats():
+    async def prueba():
+        despachador = DespachadorEnvios(por_segundo=1000, intervalo_chat=0.0)
+        api = ApiFalsa()
+        tareas = [
+            asyncio.create_task(despachador.llamar(api.editar, "1-masiva", chat_id=1, prioridad=PRIORIDAD_MASIVA)),
+            asyncio.create_task(despachador.llamar(api.editar, "2-normal", chat_id=2)),
+            asyncio.create_task(despachador.llamar(api.editar, "1-interactiva", chat_id=1, prioridad=PRIORIDAD_INTERACTIVA)),
+            asyncio.create_task(despachador.llamar(api.editar, "sin-chat", prioridad=PRIORIDAD_MASIVA)),
+        ]
+        await asyncio.gather(*tareas)
+        await despachador.detener()
+        return api.enviados
+
+    assert ejecutar(prueba()) == ["1-interactiva", "2-normal", "1-masiva", "sin-chat"]
@@ -0,0 +1,157 @@
+import asyncio
+import json
+import os
+import threading
+
+import pytest
+
+import estadisticas
+from estadisticas import REGISTRO, RegistroResultados
+
+
+def ejecutar(corrutina):
+    return asyncio.run(corrutina)
+
+
+def rellenar(registro, desde, hasta):
+    for i in range(desde, hasta):
+        registro.registrar_respuesta(i % 3, i, 1 + i % 2, 1 + i % 4, i % 5 != 0)
+        if i % 7 == 0:
+            registro.registrar_test(i % 3, "1", "2", i % 10, 10)
+
+
+def como_dict(registro):
+    return {user_id: {clave: agregado.como_lista() for clave, agregado in agregados.items()}
+            for user_id, agregados in registro._usuarios.items()}
+
+
+def test_instantanea_mas_cola_del_historico(tmp_path, monkeypatch):
+    ruta = str(tmp_path / "resultados.log")
+    monkeypatch.setattr(estadisticas, "BYTES_INSTANTANEA", REGISTRO.size * 50)
+    registro = RegistroResultados(ruta)
+
+    async def prueba():
+        # Varias instantáneas por el camino y una cola sin instantánea al final
+        for tramo in range(0, 200, 30):
+            rellenar(registro, tramo, tramo + 30)
+            await registro.vaciar()
+
+    ejecutar(prueba())
+    with open(registro.ruta_instantanea, encoding="utf-8") as f:
+        assert 0 < json.load(f)["desplazamiento"] < registro._escritos
+
+    cargado = RegistroResultados(ruta)
+    reproducidos = cargado.cargar()
+    assert 0 < reproducidos < 210
+    assert como_dict(cargado) == como_dict(registro)
+
+    # Sin instantánea se reproduce todo y se llega a lo mismo
+    (tmp_path / "resultados.log.agregados.json").unlink()
+    desde_cero = RegistroResultados(ruta)
+    desde_cero.cargar()
+    assert como_dict(desde_cero) == como_dict(registro)
+
+
+def test_registro_a_medias_se_descarta(tmp_path):
+    ruta = str(tmp_path / "resultados.log")
+    registro = RegistroResultados(ruta)
+    rellenar(registro, 0, 10)
+    ejecutar(registro.vaciar())
+    with open(ruta, "ab") as f:
+        f.write(b"\x00" * (REGISTRO.size // 2))
+
+    cargado = RegistroResultados(ruta)
+    assert cargado.cargar() == 12  # 10 respuestas y 2 tests
+    assert como_dict(cargado) == como_dict(registro)
+
+
+def test_vaciado_y_cierre_a_la_vez(tmp_path, monkeypatch):
+    ruta = str(tmp_path / "resultados.log")
+    registro = RegistroResultados(ruta)
+    escribir = registro._escribir
+    dentro, soltar = threading.Event(), threading.Event()
+
+    def escribir_lento(estado):
+        # El primer volcado se queda parado a mitad, con el lock tomado
+        if not dentro.is_set():
+            with registro._lock:
+                dentro.set()
+                soltar.wait(5)
+        escribir(estado)
+
+    monkeypatch.setattr(registro, "_escribir", escribir_lento)
+
+    async def prueba():
+        rellenar(registro, 0, 20)
+        periodico = asyncio.create_task(registro.vaciar(instantanea=True))
+        await asyncio.to_thread(dentro.wait, 5)
+        rellenar(registro, 20, 40)
+        cierre = asyncio.create_task(registro.cerrar())
+        await asyncio.sleep(0.05)
+        soltar.set()
+        await asyncio.gather(periodico, cierre)
+
+    ejecutar(prueba())
+    cargado = RegistroResultados(ruta)
+    cargado.cargar()
+    assert como_dict(cargado) == como_dict(registro)
+    with open(registro.ruta_instantanea, encoding="utf-8") as f:
+        assert json.load(f)["desplazamiento"] == registro._escritos
+
+
+class FicheroQueFalla:
+    """Escribe la mitad del primer bloque y falla como un disco lleno"""
+
+    def __init__(self, f):
+        self.f = f
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.f.close()
+
+    def write(self, datos):
+        self.f.write(bytes(datos[:len(datos) // 2 + 1]))
+        raise OSError(28, "No space left on device")
+
+    def truncate(self, tamaño):
+        return self.f.truncate(tamaño)
+
+
+def test_escritura_fallida_no_pierde_ni_desalinea(tmp_path, monkeypatch):
+    ruta = str(tmp_path / "resultados.log")
+    registro = RegistroResultados(ruta)
+    rellenar(registro, 0, 10)
+    ejecutar(registro.vaciar())
+
+    fallos = []
+
+    def abrir(nombre, modo="r", *args, **kwargs):
+        fichero = open(nombre, modo, *args, **kwargs)
+        if modo == "ab" and not fallos:
+            fallos.append(nombre)
+            return FicheroQueFalla(fichero)
+        return fichero
+
+    monkeypatch.setattr(estadisticas, "open", abrir, raising=False)
+    rellenar(registro, 10, 30)
+    with pytest.raises(OSError):
+        ejecutar(registro.vaciar(instantanea=True))
+    # Ni registros a medias ni instantánea por delante del fichero
+    assert os.path.getsize(ruta) == registro._escritos
+    assert not os.path.exists(registro.ruta_instantanea)
+
+    rellenar(registro, 30, 40)
+    ejecutar(registro.vaciar(instantanea=True))
+    assert fallos == [ruta]
+    with open(registro.ruta_instantanea, encoding="utf-8") as f:
+        assert json.load(f)["desplazamiento"] == os.path.getsize(ruta)
+
+    cargado = RegistroResultados(ruta)
+    assert cargado.cargar() == 0
+    assert como_dict(cargado) == como_dict(registro)
+    (tmp_path / "resultados.log.agregados.json").unlink()
+    desde_cero = RegistroResultados(ruta)
+    desde_cero.cargar()
+    assert como_dict(desde_cero) == como_dict(registro)
@@ -0,0 +1,60 @@
+import random
+import re
+from html.parser import HTMLParser
+
+import pytest
+
+from formato import markdown_a_html, texto_boton
+
+
+class Anidado(HTMLParser):
+    """Comprueba que las etiquetas cierran en orden inverso al de apertura"""
+
+    def __init__(self):
+        super().__init__()
+        self.pila = []
+
+    def handle_starttag(self, etiqueta, _):
+        self.pila.append(etiqueta)
+
+    def handle_endtag(self, etiqueta):
+        assert self.pila and self.pila.pop() == etiqueta
+
+
+def bien_anidado(texto):
+    parser = Anidado()
+    parser.feed(texto)
+    parser.close()
+    return not parser.pila
+
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("**a** y *b*", "<b>a</b> y <i>b</i>"),
+    ("**a *b* c**", "<b>a <i>b</i> c</b>"),
+    ("*a **b** c*", "<i>a <b>b</b> c</i>"),
+    ("2 * 3 = 6", "2 * 3 = 6"),
+    ("****", "****"),
+    ("a < b & *c*", "a &lt; b &amp; <i>c</i>"),
+    ("**línea 1\nlínea 2**", "<b>línea 1\nlínea 2</b>"),
+])
+def test_conversion(texto, esperado):
+    assert markdown_a_html(texto) == esperado
+
+
+@pytest.mark.parametrize("texto", ["**a *b** c*", "***a***", "*a **b* c**", "**a *b**"])
+def test_marcadores_cruzados_no_cruzan_etiquetas(texto):
+    resultado = markdown_a_html(texto)
+    assert bien_anidado(resultado), resultado
+    # Solo cambian los marcadores: el resto del texto se conserva
+    assert re.sub(r"</?[bi]>", "", resultado).replace("*", "") == texto.replace("*", "")
+
+
+def test_aleatorio_siempre_bien_anidado():
+    rng = random.Random(1)
+    for _ in range(2000):
+        texto = "".join(rng.choice(["*", "**", "a", " ", "<"]) for _ in range(rng.randint(0, 12)))
+        assert bien_anidado(markdown_a_html(texto)), texto
+
+
+def test_texto_boton():
+    assert texto_boton("**Sí** *no*") == "Sí no"
@@ -0,0 +1,34 @@
+import asyncio
+
+import pytest
+
+from perfilado import Perfilador
+
+
+@pytest.mark.parametrize("segundos", [float("nan"), float("inf"), float("-inf")])
+def test_duracion_no_finita_se_rechaza(tmp_path, segundos):
+    perfilador = Perfilador(str(tmp_path))
+    with pytest.raises(ValueError):
+        perfilador.iniciar("cprofile", segundos)
+    assert not perfilador.activo
+
+
+def test_parar_una_captura_escribe_el_resumen(tmp_path):
+    async def prueba():
+        perfilador = Perfilador(str(tmp_path))
+        resumenes = []
+
+        async def al_terminar(resumen):
+            resumenes.append(resumen)
+
+        @perfilador.perfilar
+        async def handler():
+            return 1
+
+        assert perfilador.iniciar("muestreo", 1.0, 1, al_terminar)
+        await handler()
+        await perfilador.detener()
+        return perfilador.activo, resumenes
+
+    activo, resumenes = asyncio.run(prueba())
+    assert not activo and len(resumenes) == 1
@@ -0,0 +1,70 @@
+import gzip
+import logging
+import os
+
+from registro_intrusos import AgrupadorIntentos, configurar_registro_intrusos
+
+
+class LoggerFalso:
+    def __init__(self):
+        self.mensajes = []
+
+    def warning(self, mensaje, extra):
+        self.mensajes.append((extra["user_id"], mensaje))
+
+
+def test_agrupa_intentos_de_la_misma_ventana():
+    logger = LoggerFalso()
+    agrupador = AgrupadorIntentos(logger, ventana=60, enfriamiento=300)
+    assert agrupador.registrar("1", 1, "spam", ahora=0) == (True, True)
+    assert agrupador.registrar("1", 1, "spam", ahora=10) == (False, False)
+    assert agrupador.registrar("1", 1, "spam", ahora=20) == (False, False)
+    # Nueva ventana: resumen de la anterior, pero el enfriamiento de la respuesta sigue
+    assert agrupador.registrar("1", 1, "spam", ahora=70) == (True, False)
+    assert logger.mensajes == [
+        ("1", "Intento de acceso no autorizado"),
+        ("1", "Resumen: 2 intentos más en 20 s"),
+        ("1", "Intento de acceso no autorizado"),
+    ]
+    assert agrupador.registrar("1", 1, "spam", ahora=301)[1] is True
+
+
+def test_vaciar_resume_y_olvida():
+    logger = LoggerFalso()
+    agrupador = AgrupadorIntentos(logger, ventana=60, enfriamiento=100)
+    agrupador.registrar("1", 1, "a", ahora=0)
+    agrupador.registrar("1", 1, "a", ahora=5)
+    agrupador.vaciar(ahora=61)
+    assert logger.mensajes[-1] == ("1", "Resumen: 1 intentos más en 5 s")
+    assert len(agrupador._infractores) == 1  # aún en enfriamiento
+    agrupador.vaciar(ahora=101)
+    assert not agrupador._infractores
+
+
+def test_flood_de_cuentas_distintas_no_recorre_el_mapa(monkeypatch):
+    agrupador = AgrupadorIntentos(LoggerFalso(), max_infractores=1000)
+    recorridos = []
+    monkeypatch.setattr(agrupador, "vaciar", lambda *a, **k: recorridos.append(1))
+    # Un infractor activo durante todo el flood conserva su enfriamiento
+    agrupador.registrar("activo", 1, "x", ahora=0)
+    for i in range(20000):
+        agrupador.registrar(str(i), i, "x", ahora=1)
+        if i % 500 == 0:
+            assert agrupador.registrar("activo", 1, "x", ahora=1) == (False, False)
+    assert recorridos == []
+    assert len(agrupador._infractores) <= 1000
+    assert ("activo", 1) in agrupador._infractores
+
+
+def test_registro_en_fichero_con_rotacion_comprimida(tmp_path):
+    ruta = str(tmp_path / "intrusos.log")
+    logger, listener = configurar_registro_intrusos(ruta, max_bytes=200, copias=2)
+    try:
+        for i in range(10):
+            logger.warning("Intento", extra={"username": "u", "user_id": i, "chat_id": i})
+    finally:
+        listener.stop()
+        logging.getLogger("intrusos").handlers.clear()
+    assert os.path.exists(ruta + ".1.gz")
+    with gzip.open(ruta + ".1.gz", "rt", encoding="utf-8") as f:
+        assert "USUARIO NO AUTORIZADO" in f.read()
@@ -0,0 +1,78 @@
+import gc
+import random
+import weakref
+from collections import Counter
+
+from banco_preguntas import QuestionBank
+from seleccion_adaptativa import ArbolFenwick, SelectorAdaptativo, _Conjunto
+
+
+def banco(n, bloques=1):
+    return QuestionBank(
+        {"id": i + 1, "bloque": i % bloques + 1, "tema": 1, "pregunta": "?", "opciones": ["a", "b"]}
+        for i in range(n)
+    )
+
+
+def test_fenwick_sumas_y_busqueda():
+    pesos = [0.5, 0.0, 2.0, 1.0, 0.25]
+    arbol = ArbolFenwick(pesos)
+    assert arbol.total == sum(pesos)
+    acumulado = 0.0
+    for pos, peso in enumerate(pesos):
+        if peso:
+            assert arbol.buscar(acumulado) == pos
+            assert arbol.buscar(acumulado + peso * 0.99) == pos
+        acumulado += peso
+    arbol.fijar(1, 3.0)
+    assert arbol.total == sum(pesos) + 3.0
+    assert arbol.buscar(0.6) == 1
+
+
+def test_fenwick_muestrear_sin_repetir_y_restaura_pesos():
+    pesos = [100.0] + [0.01] * 49  # una posición concentra casi todo el peso
+    arbol = ArbolFenwick(pesos)
+    elegidas = arbol.muestrear(30, random.Random(1))
+    assert len(elegidas) == len(set(elegidas)) == 30
+    assert list(arbol.pesos) == pesos
+    assert abs(arbol.total - sum(pesos)) < 1e-9
+
+
+def test_fenwick_muestrea_proporcional_al_peso():
+    arbol = ArbolFenwick([1.0, 3.0])
+    rng = random.Random(2)
+    cuentas = Counter(arbol.muestrear(1, rng)[0] for _ in range(20000))
+    assert abs(cuentas[1] / 20000 - 0.75) < 0.02
+
+
+def test_conjunto_posicion():
+    conjunto = _Conjunto([2, 5, 9], ArbolFenwick([1.0] * 3))
+    assert [conjunto.posicion(i) for i in (2, 5, 9, 3, 10)] == [0, 1, 2, None, None]
+
+
+def test_falladas_salen_mas():
+    b = banco(20)
+    selector = SelectorAdaptativo(rng=random.Random(3), reloj=lambda: 0.0, ventana_reciente=0.0)
+    for indice in range(20):
+        for _ in range(5):
+            selector.registrar(1, b, indice, acierto=indice >= 2)
+    cuentas = Counter()
+    for _ in range(500):
+        cuentas.update(selector.muestrear(1, b, ("1", "1"), b.indices("1", "1"), 2))
+    assert cuentas.most_common(2)[0][0] in (0, 1) and cuentas.most_common(2)[1][0] in (0, 1)
+
+
+def test_no_retiene_bancos_recargados():
+    selector = SelectorAdaptativo(rng=random.Random(4))
+    viejo = banco(10)
+    selector.muestrear(1, viejo, ("1", "1"), viejo.indices("1", "1"), 5)
+    selector.registrar(1, viejo, 3, acierto=False)
+    referencia = weakref.ref(viejo)
+
+    nuevo = banco(10)
+    selector.muestrear(1, nuevo, ("1", "1"), nuevo.indices("1", "1"), 5)
+    del viejo
+    gc.collect()
+    assert referencia() is None
+    # La respuesta anterior a la recarga cuenta para el banco nuevo (por id de pregunta)
+    assert selector._usuarios[1].tasas[4] > 0.5
@@ -0,0 +1,61 @@
+import json
+import os
+import subprocess
+import sys
+
+from validator_preguntas import bloques_del_menu, validar_banco, validar_fichero
+
+DIR_BOT = os.path.dirname(os.path.abspath(__file__))
+PREGUNTA = {"id": 1, "pregunta": "¿2 + 2?", "opciones": ["3", "4"], "respuesta_correcta": 1}
+
+
+def escribir(tmp_path, nombre, datos):
+    ruta = tmp_path / nombre
+    ruta.write_text(json.dumps(datos), encoding="utf-8")
+    return str(ruta)
+
+
+def test_funciona_sin_python_telegram_bot():
+    codigo = (
+        "import sys; sys.modules['telegram'] = None\n"
+        "import validator_preguntas\n"
+        "print(validator_preguntas.bloques_del_menu())"
+    )
+    salida = subprocess.run([sys.executable, "-c", codigo], cwd=DIR_BOT, capture_output=True, text=True)
+    assert salida.returncode == 0, salida.stderr
+    assert salida.stdout.strip() == "[1, 2, 3, 4]"
+
+
+def test_bloques_del_menu():
+    assert bloques_del_menu() == [1, 2, 3, 4]
+
+
+def test_nombres_que_acepta_procesar_preguntas_no_avisan(tmp_path):
+    for nombre in ("tema1_bloque1.json", "preguntas_tema3_bloque2.json", "Tema2_Bloque4.JSON"):
+        resultado = validar_fichero(escribir(tmp_path, nombre, {"preguntas": [PREGUNTA]}))
+        assert resultado["errores"] == [] and resultado["avisos"] == [], nombre
+
+
+def test_nombre_que_ignora_procesar_preguntas_avisa(tmp_path):
+    resultado = validar_fichero(escribir(tmp_path, "bloque1.json", [PREGUNTA]))
+    assert any("procesar_preguntas lo ignora" in aviso for aviso in resultado["avisos"])
+
+
+def test_errores_de_esquema(tmp_path):
+    mala = dict(PREGUNTA, respuesta_correcta=5)
+    resultado = validar_fichero(escribir(tmp_path, "tema1_bloque1.json", [PREGUNTA, mala, "texto"]))
+    assert [e["item"] for e in resultado["errores"]] == [2, 3]
+
+
+def test_hash_sin_cambios(tmp_path):
+    ruta = escribir(tmp_path, "tema1_bloque1.json", [PREGUNTA])
+    resultado = validar_fichero(ruta)
+    assert validar_fichero(ruta, resultado["sha256"]) is None
+
+
+def test_bloque_o_tema_no_escalar_es_error_y_no_excepcion(tmp_path):
+    preguntas = [dict(PREGUNTA, bloque=[1], tema=1), dict(PREGUNTA, id=2, bloque=1, tema={"a": 1})]
+    resultado = validar_banco(escribir(tmp_path, "preguntas.json", preguntas), bloques_menu=[1])
+    assert [e["item"] for e in resultado["errores"]] == [1, 2]
+    assert resultado["temas_por_bloque"] == {}
+    assert any("2 preguntas sin bloque/tema" in aviso for aviso in resultado["avisos"])
@@ -1,51 +1,393 @@
+"""
+Validador de los ficheros de preguntas y del banco combinado.
+
+Valida cada tests/temaX_bloqueY.json (como lista o como {"preguntas": [...]},
+la forma que genera convertir_preguntas) y el preguntas.json que produce
+procesar_preguntas: IDs repetidos y cobertura de bloques/temas frente a los
+bloques que ofrece el menú del bot.
+
+Los esquemas se compilan una vez a una función por pregunta (`compilar_esquema`).
+Los ficheros se validan en un pool de procesos y el resultado se guarda en
+validador.cache.json por hash del contenido: los ficheros sin cambios no se
+vuelven a leer (si coinciden mtime y tamaño) ni a validar (si coincide el hash).
+
+Uso: python validator_preguntas.py [--json] [--trabajadores N] [--sin-cache] [--estricto]
+Código de salida: 0 sin errores, 1 si hay errores (o avisos, con --estricto).
+"""
+
+import hashlib
 import json
 import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from menus import BLOQUE_NOMBRE
+from procesar_preguntas import extraer_tema_bloque
+
+DIR_BOT = os.path.dirname(os.path.abspath(__file__))
+TESTS_DIR = os.path.join(DIR_BOT, "tests")
+RUTA_BANCO = os.path.join(DIR_BOT, "preguntas.json")
+RUTA_CACHE = os.path.join(DIR_BOT, "validador.cache.json")
+
+# Versión de las reglas: si cambia, la caché no se reutiliza
+VERSION_VALIDADOR = 2
+# Errores que se guardan por fichero (el resto solo se cuentan)
+MAX_ERRORES_FICHERO = 100
+
+_FALTA = object()
+
+# Reglas por campo: tipo, obligatorio (por defecto sí), min_longitud,
+# elementos (tipo de cada elemento), rango (mín, máx) e indice_de (campo lista)
+ESQUEMA_PREGUNTA = {
+    "pregunta": {"tipo": str, "min_longitud": 1},
+    "opciones": {"tipo": list, "min_longitud": 2, "elementos": str},
+    # El banco guarda la respuesta en un array de bytes
+    "respuesta_correcta": {"tipo": int, "rango": (0, 255), "indice_de": "opciones"},
+}
+
+# preguntas.json: además id global, y bloque/tema (sin ellos solo salen en el test aleatorio)
+ESQUEMA_BANCO = {
+    "id": {"tipo": int, "rango": (1, 2 ** 63 - 1)},
+    "bloque": {"tipo": int, "obligatorio": False, "rango": (1, 255)},
+    "tema": {"tipo": int, "obligatorio": False, "rango": (1, 255)},
+    **ESQUEMA_PREGUNTA,
+}
+
+_NOMBRES_TIPO = {str: "un texto", list: "una lista", int: "un entero"}
+
+
+def _codigo_campo(n, campo, reglas):
+    """Líneas de Python que comprueban `campo` (en la variable local vN)"""
+    tipo = reglas["tipo"]
+    obligatorio = reglas.get("obligatorio", True)
+    min_longitud = reglas.get("min_longitud")
+    elementos = reglas.get("elementos")
+    rango = reglas.get("rango")
+    indice_de = reglas.get("indice_de")
+    v = f"v{n}"
+    nombre_tipo = _NOMBRES_TIPO.get(tipo, tipo.__name__)
+    # bool es subclase de int, pero True no es un índice válido
+    no_es_tipo = f"type({v}) is not {tipo.__name__}"
+    if tipo is not int:
+        no_es_tipo += f" and not isinstance({v}, {tipo.__name__})"
+    lineas = [f"{v} = pregunta.get({campo!r}, _FALTA)"]
+    if obligatorio:
+        lineas += [f"if {v} is _FALTA:", f"    errores.append({f'falta el campo: {campo}'!r})"]
+    else:
+        lineas += [f"if {v} is _FALTA or {v} is None:", "    pass"]
+    lineas += [f"elif {no_es_tipo}:", f"    errores.append({f'{campo} debe ser {nombre_tipo}'!r})", "else:"]
+    cuerpo = []
+    if min_longitud is not None:
+        msg = f"{campo} debe tener al menos {min_longitud} elementos" if tipo is list else f"{campo} está vacío"
+        cuerpo += [f"if len({v}) < {min_longitud}:", f"    errores.append({msg!r})"]
+    if elementos is not None:
+        nombre = elementos.__name__
+        msg = f"debe ser {_NOMBRES_TIPO.get(elementos, nombre)}"
+        cuerpo += [f"for e in {v}:",
+                   f"    if type(e) is not {nombre} and not isinstance(e, {nombre}):",
+                   f"        errores.append(f'{campo}[{{{v}.index(e)}}] {msg}')",
+                   "        break"]
+    if rango is not None:
+        cuerpo += [f"if not {rango[0]} <= {v} <= {rango[1]}:",
+                   f"    errores.append({f'{campo} fuera de rango ({rango[0]}..{rango[1]})'!r})"]
+    if indice_de is not None:
+        cuerpo += [f"lista = pregunta.get({indice_de!r})",
+                   f"if type(lista) is list and not 0 <= {v} < len(lista):",
+                   f"    errores.append({f'{campo} no es un índice de {indice_de}'!r})"]
+    lineas += ["    " + c for c in cuerpo or ["pass"]]
+    return lineas
 
-TESTS_DIR = os.path.join(os.path.dirname(__file__), "tests")
 
-required_fields = ["pregunta", "opciones", "respuesta_correcta"]
+def _condicion_campo(n, campo, reglas):
+    """Expresión que es cierta si `campo` es válido (vía rápida: los tipos
+    deben ser exactos, las subclases pasan por la comprobación detallada)"""
+    v = f"v{n}"
+    partes = [f"type({v}) is {reglas['tipo'].__name__}"]
+    if reglas.get("min_longitud") is not None:
+        partes.append(f"len({v}) >= {reglas['min_longitud']}")
+    if reglas.get("elementos") is str:
+        # join lanza TypeError si algún elemento no es texto (lo recoge invalidos)
+        partes.append(f"_unir({v}) is not None")
+    elif reglas.get("elementos") is not None:
+        partes.append(f"all(type(e) is {reglas['elementos'].__name__} for e in {v})")
+    if reglas.get("rango") is not None:
+        partes.append(f"{reglas['rango'][0]} <= {v} <= {reglas['rango'][1]}")
+    if reglas.get("indice_de") is not None:
+        partes.append(f"(type(l := pregunta.get({reglas['indice_de']!r})) is not list or 0 <= {v} < len(l))")
+    asignar = f"({v} := pregunta.get({campo!r}))"
+    if reglas.get("obligatorio", True):
+        # Si falta, get da None y ya no cumple el tipo
+        return "(" + " and ".join([partes[0].replace(v, asignar, 1)] + partes[1:]) + ")"
+    return f"({asignar} is None or " + " and ".join(partes) + ")"
 
-errors = []
 
-for fname in sorted(os.listdir(TESTS_DIR)):
-    if not fname.endswith('.json'):
-        continue
-    path = os.path.join(TESTS_DIR, fname)
+def compilar_esquema(esquema):
+    """Convierte un esquema en `validar(pregunta) -> [mensajes]` (vacía si es
+    válida): genera el código de una sola función con todas las reglas en línea.
+    `validar.invalidos(preguntas)` recorre una lista entera con una sola
+    condición por pregunta y devuelve las posiciones (1-based) que no la cumplen."""
+    lineas = ["def validar(pregunta):",
+              "    if type(pregunta) is not dict:",
+              "        return ['no es un objeto']",
+              "    errores = []"]
+    for n, (campo, reglas) in enumerate(esquema.items()):
+        lineas += ["    " + linea for linea in _codigo_campo(n, campo, reglas)]
+    lineas.append("    return errores")
+    condicion = " and ".join(_condicion_campo(n, campo, reglas) for n, (campo, reglas) in enumerate(esquema.items()))
+    lineas += ["def invalidos(preguntas):",
+               "    malas = []",
+               "    for i, pregunta in enumerate(preguntas, 1):",
+               "        try:",
+               f"            if type(pregunta) is dict and {condicion}:",
+               "                continue",
+               "        except TypeError:",
+               "            pass",
+               "        malas.append(i)",
+               "    return malas"]
+    espacio = {"_FALTA": _FALTA, "_unir": "".join}
+    exec(compile("\n".join(lineas), "<esquema>", "exec"), espacio)
+    validar = espacio["validar"]
+    validar.invalidos = espacio["invalidos"]
+    return validar
+
+
+validar_pregunta = compilar_esquema(ESQUEMA_PREGUNTA)
+validar_pregunta_banco = compilar_esquema(ESQUEMA_BANCO)
+
+
+def _lista_preguntas(datos):
+    """Acepta una lista o {"preguntas": [...]}; None si no es ninguna de las dos"""
+    if isinstance(datos, dict) and "preguntas" in datos:
+        datos = datos["preguntas"]
+    return datos if isinstance(datos, list) else None
+
+
+def validar_preguntas(preguntas, validar=validar_pregunta):
+    """Errores de una lista de preguntas: [{'item': n (1-based), 'error': msg}], y cuántos hubo en total"""
+    errores = []
+    total = 0
+    # Solo las que no pasan la vía rápida se validan en detalle
+    for i in validar.invalidos(preguntas):
+        mensajes = validar(preguntas[i - 1])
+        if mensajes:
+            total += len(mensajes)
+            errores.extend({"item": i, "error": m} for m in mensajes[:MAX_ERRORES_FICHERO - len(errores)])
+    return errores, total
+
+
+def validar_fichero(ruta, sha256_previo=None):
+    """Valida un temaX_bloqueY.json. Si su hash coincide con `sha256_previo`
+    devuelve None (el resultado de la caché sigue valiendo)."""
+    with open(ruta, "rb") as f:
+        contenido = f.read()
+    sha256 = hashlib.sha256(contenido).hexdigest()
+    if sha256 == sha256_previo:
+        return None
+    resultado = {"fichero": os.path.basename(ruta), "sha256": sha256, "preguntas": 0, "errores": [], "avisos": []}
+    if extraer_tema_bloque(resultado["fichero"]) == (None, None):
+        resultado["avisos"].append("el nombre no contiene temaX_bloqueY.json: procesar_preguntas lo ignora")
     try:
-        with open(path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except Exception as e:
-        errors.append((fname, f"JSON load error: {e}"))
-        continue
-
-    if not isinstance(data, list):
-        errors.append((fname, 'Top-level JSON value is not a list'))
-        continue
-
-    for i, q in enumerate(data, start=1):
-        if not isinstance(q, dict):
-            errors.append((fname, f'Item {i} is not an object'))
+        preguntas = _lista_preguntas(json.loads(contenido))
+    except ValueError as e:
+        resultado["errores"].append({"item": None, "error": f"JSON inválido: {e}"})
+        return resultado
+    if preguntas is None:
+        resultado["errores"].append({"item": None, "error": 'no es una lista ni {"preguntas": [...]}'})
+        return resultado
+    resultado["preguntas"] = len(preguntas)
+    if not preguntas:
+        resultado["avisos"].append("no tiene preguntas")
+    errores, total = validar_preguntas(preguntas)
+    resultado["errores"] = errores
+    if total > len(errores):
+        resultado["avisos"].append(f"{total - len(errores)} errores más no mostrados")
+    return resultado
+
+
+def bloques_del_menu():
+    """Bloques que ofrece el teclado de /test"""
+    return sorted(int(b) for b in BLOQUE_NOMBRE if b.isdigit())
+
+
+def validar_banco(ruta=RUTA_BANCO, bloques_menu=None):
+    """Valida preguntas.json: esquema, IDs repetidos y cobertura de bloques/temas"""
+    if bloques_menu is None:
+        bloques_menu = bloques_del_menu()
+    with open(ruta, "rb") as f:
+        contenido = f.read()
+    resultado = {"fichero": os.path.basename(ruta), "sha256": hashlib.sha256(contenido).hexdigest(),
+                 "preguntas": 0, "errores": [], "avisos": [], "temas_por_bloque": {}}
+    try:
+        preguntas = _lista_preguntas(json.loads(contenido))
+    except ValueError as e:
+        resultado["errores"].append({"item": None, "error": f"JSON inválido: {e}"})
+        return resultado
+    if preguntas is None:
+        resultado["errores"].append({"item": None, "error": "no es una lista de preguntas"})
+        return resultado
+    resultado["preguntas"] = len(preguntas)
+    errores, total = validar_preguntas(preguntas, validar_pregunta_banco)
+    resultado["errores"] = errores
+    if total > len(errores):
+        resultado["avisos"].append(f"{total - len(errores)} errores más no mostrados")
+
+    objetos = [p for p in preguntas if isinstance(p, dict)]
+    repetidos = [i for i, n in Counter(p.get("id") for p in objetos if type(p.get("id")) is int).items() if n > 1]
+    if repetidos:
+        resultado["errores"].append({"item": None, "error": f"{len(repetidos)} IDs repetidos: {sorted(repetidos)[:20]}"})
+
+    # Cobertura: lo que el bot puede ofrecer en los menús de bloque y tema
+    # Solo pares de enteros: un bloque/tema que sea lista u objeto ya sale como error de esquema
+    por_bloque_tema = Counter((p.get("bloque"), p.get("tema")) for p in objetos
+                              if type(p.get("bloque")) is int and type(p.get("tema")) is int)
+    temas_por_bloque = {}
+    sin_asignar = len(objetos) - sum(por_bloque_tema.values())
+    for (bloque, tema), n in por_bloque_tema.items():
+        temas_por_bloque.setdefault(bloque, {})[tema] = n
+    resultado["temas_por_bloque"] = {str(b): {str(t): n for t, n in sorted(temas.items())}
+                                     for b, temas in sorted(temas_por_bloque.items())}
+    if sin_asignar:
+        resultado["avisos"].append(f"{sin_asignar} preguntas sin bloque/tema: solo salen en el test aleatorio")
+    for bloque in bloques_menu:
+        temas = temas_por_bloque.get(bloque)
+        if not temas:
+            resultado["avisos"].append(f"el menú ofrece el bloque {bloque} pero no tiene temas con preguntas")
+            continue
+        huecos = sorted(set(range(1, max(temas) + 1)) - set(temas))
+        if huecos:
+            resultado["avisos"].append(f"bloque {bloque}: faltan los temas {huecos}")
+    fuera = sorted(set(temas_por_bloque) - set(bloques_menu))
+    if fuera:
+        resultado["avisos"].append(f"bloques {fuera} no aparecen en el menú: solo salen en el test aleatorio")
+    return resultado
+
+
+# --- Caché por hash ---
+
+def cargar_cache(ruta_cache):
+    try:
+        with open(ruta_cache, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache.get("ficheros", {}) if cache.get("version") == VERSION_VALIDADOR else {}
+
+
+def guardar_cache(ruta_cache, entradas):
+    temporal = ruta_cache + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump({"version": VERSION_VALIDADOR, "ficheros": entradas}, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(temporal, ruta_cache)
+
+
+def validar_directorio(directorio=TESTS_DIR, ruta_banco=RUTA_BANCO, ruta_cache=RUTA_CACHE,
+                       trabajadores=None, bloques_menu=None):
+    """Valida los .json del directorio en paralelo y, si existe, el banco combinado.
+    `ruta_cache=None` desactiva la caché; `ruta_banco=None` omite el banco.
+    Devuelve el informe: {'ficheros', 'banco', 'errores', 'avisos', 'validados', 'en_cache', 'segundos'}"""
+    inicio = time.perf_counter()
+    anteriores = cargar_cache(ruta_cache) if ruta_cache else {}
+    entradas = {}
+    resultados = {}
+    pendientes = []
+    for nombre in sorted(os.listdir(directorio)):
+        if not nombre.endswith(".json") or nombre == "preguntas.json":
             continue
-        for field in required_fields:
-            if field not in q:
-                errors.append((fname, f'Item {i} missing field: {field}'))
-        # opciones must be a list with at least 2 items
-        opciones = q.get('opciones')
-        if not isinstance(opciones, list) or len(opciones) < 2:
-            errors.append((fname, f'Item {i} opciones must be a list with >=2 items'))
-        # respuesta_correcta must be int index within opciones range
-        rc = q.get('respuesta_correcta')
-        if not isinstance(rc, int):
-            errors.append((fname, f'Item {i} respuesta_correcta must be an int index'))
+        ruta = os.path.join(directorio, nombre)
+        st = os.stat(ruta)
+        anterior = anteriores.get(nombre)
+        if anterior is not None and [anterior["mtime_ns"], anterior["size"]] == [st.st_mtime_ns, st.st_size]:
+            entradas[nombre] = anterior
+            resultados[nombre] = anterior["resultado"]
         else:
-            if isinstance(opciones, list) and not (0 <= rc < len(opciones)):
-                errors.append((fname, f'Item {i} respuesta_correcta index out of range'))
-
-# Print summary
-if not errors:
-    print('OK: All test files validated successfully.')
-else:
-    print('Validation found issues:')
-    for fname, msg in errors:
-        print(f'- {fname}: {msg}')
-    print(f"\nTotal issues: {len(errors)}")
+            pendientes.append((nombre, ruta, st, anterior))
+
+    validados = 0
+    if pendientes:
+        args = [(ruta, anterior["resultado"]["sha256"] if anterior else None) for _, ruta, _, anterior in pendientes]
+        if trabajadores == 1 or len(pendientes) <= 8:
+            nuevos = [validar_fichero(*a) for a in args]
+        else:
+            with ProcessPoolExecutor(max_workers=trabajadores) as pool:
+                nuevos = list(pool.map(validar_fichero, *zip(*args), chunksize=max(1, len(args) // 64)))
+        for (nombre, _, st, anterior), resultado in zip(pendientes, nuevos):
+            if resultado is None:
+                # Solo cambió el mtime: mismo contenido, mismo resultado
+                resultado = anterior["resultado"]
+            else:
+                validados += 1
+            resultados[nombre] = resultado
+            entradas[nombre] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "resultado": resultado}
+
+    banco = None
+    if ruta_banco and os.path.exists(ruta_banco):
+        if bloques_menu is None:
+            bloques_menu = bloques_del_menu()
+        st = os.stat(ruta_banco)
+        clave = "__banco__"
+        anterior = anteriores.get(clave)
+        if (anterior is not None and anterior.get("bloques_menu") == bloques_menu
+                and [anterior["mtime_ns"], anterior["size"]] == [st.st_mtime_ns, st.st_size]):
+            banco = anterior["resultado"]
+        else:
+            banco = validar_banco(ruta_banco, bloques_menu)
+            validados += 1
+        entradas[clave] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size,
+                           "bloques_menu": bloques_menu, "resultado": banco}
+
+    if ruta_cache and entradas != anteriores:
+        guardar_cache(ruta_cache, entradas)
+
+    ficheros = list(resultados.values())
+    todos = ficheros + ([banco] if banco else [])
+    return {
+        "ficheros": ficheros,
+        "banco": banco,
+        "errores": sum(len(r["errores"]) for r in todos),
+        "avisos": sum(len(r["avisos"]) for r in todos),
+        "validados": validados,
+        "en_cache": len(todos) - validados,
+        "segundos": round(time.perf_counter() - inicio, 4),
+    }
+
+
+def imprimir_informe(informe):
+    todos = informe["ficheros"] + ([informe["banco"]] if informe["banco"] else [])
+    for r in todos:
+        for e in r["errores"]:
+            donde = f" (pregunta {e['item']})" if e["item"] is not None else ""
+            print(f"❌ {r['fichero']}{donde}: {e['error']}")
+        for aviso in r["avisos"]:
+            print(f"⚠️  {r['fichero']}: {aviso}")
+    print(f"\n{len(todos)} ficheros ({informe['validados']} validados, {informe['en_cache']} sin cambios) "
+          f"en {informe['segundos']:.2f} s")
+    if not informe["errores"]:
+        print("OK: All test files validated successfully.")
+    else:
+        print(f"Total issues: {informe['errores']} errores, {informe['avisos']} avisos")
+
+
+def _valor_opcion(args, nombre, defecto=None):
+    if nombre in args:
+        i = args.index(nombre)
+        if i + 1 < len(args):
+            return args[i + 1]
+    return defecto
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    trabajadores = _valor_opcion(args, "--trabajadores")
+    informe = validar_directorio(
+        ruta_cache=None if "--sin-cache" in args else RUTA_CACHE,
+        trabajadores=int(trabajadores) if trabajadores else None,
+    )
+    if "--json" in args:
+        json.dump(informe, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        imprimir_informe(informe)
+    fallo = informe["errores"] or ("--estricto" in args and informe["avisos"])
+    sys.exit(1 if fallo else 0)